@@ -0,0 +1,31 @@
+"""add_scheduler_leases
+
+Revision ID: 008_add_scheduler_leases
+Revises: 001_add_sites_tables
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008_add_scheduler_leases'
+down_revision = '001_add_sites_tables'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 調度器領導者租約表（APScheduler 的 apscheduler_jobs 表由任務存儲自行創建）
+    op.create_table(
+        'scheduler_leases',
+        sa.Column('name', sa.String(100), primary_key=True),
+        sa.Column('owner', sa.String(100), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('acquired_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('scheduler_leases')
@@ -0,0 +1,30 @@
+"""add_notification_unread_counters
+
+Revision ID: 009_add_notification_unread_counters
+Revises: 008_add_scheduler_leases
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009_add_notification_unread_counters'
+down_revision = '008_add_scheduler_leases'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 未讀計數表：首次讀取某接收人的計數時按 notifications 表初始化，之後增量維護
+    op.create_table(
+        'notification_unread_counters',
+        sa.Column('recipient', sa.String(255), primary_key=True),
+        sa.Column('unread_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_unread_counters')
@@ -0,0 +1,42 @@
+"""add_group_ai_stats_counters
+
+Revision ID: 010_add_group_ai_stats_counters
+Revises: 009_add_notification_unread_counters
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010_add_group_ai_stats_counters'
+down_revision = '009_add_notification_unread_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 儀表板計數表：寫入對話歷史/指標時增量更新，夜間任務對賬並清理過期的小時行
+    op.create_table(
+        'group_ai_stats_counters',
+        sa.Column('bucket', sa.String(20), primary_key=True),
+        sa.Column('sessions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('successful_sessions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_users', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('token_usage', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('error_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('response_time_sum', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('response_time_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_table(
+        'group_ai_stats_active_users',
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('user_id', sa.BigInteger(), primary_key=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('group_ai_stats_active_users')
+    op.drop_table('group_ai_stats_counters')
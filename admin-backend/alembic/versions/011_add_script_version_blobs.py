@@ -0,0 +1,44 @@
+"""add_script_version_blobs
+
+Revision ID: 011_add_script_version_blobs
+Revises: 010_add_group_ai_stats_counters
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '011_add_script_version_blobs'
+down_revision = '010_add_group_ai_stats_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # 劇本版本內容表：按內容哈希去重，存壓縮的完整快照或相對基準內容的行差異
+    op.create_table(
+        'group_ai_script_blobs',
+        sa.Column('content_hash', sa.String(64), primary_key=True),
+        sa.Column('base_hash', sa.String(64), nullable=True),
+        sa.Column('codec', sa.String(10), nullable=False),
+        sa.Column('chain_depth', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    # 版本行只保存內容哈希；舊行的內聯 yaml_content 由維護任務逐批遷入內容表
+    with op.batch_alter_table('group_ai_script_versions') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(64), nullable=True))
+        batch_op.alter_column('yaml_content', existing_type=sa.Text(), nullable=True)
+        batch_op.create_index('ix_group_ai_script_versions_content_hash', ['content_hash'])
+
+
+def downgrade() -> None:
+    # 降級前需保證所有版本仍有內聯內容（未遷移或已回寫）
+    with op.batch_alter_table('group_ai_script_versions') as batch_op:
+        batch_op.drop_index('ix_group_ai_script_versions_content_hash')
+        batch_op.drop_column('content_hash')
+        batch_op.alter_column('yaml_content', existing_type=sa.Text(), nullable=False)
+    op.drop_table('group_ai_script_blobs')
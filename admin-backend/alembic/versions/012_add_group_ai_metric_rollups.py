@@ -0,0 +1,87 @@
+"""add_group_ai_metric_rollups
+
+Revision ID: 012_add_group_ai_metric_rollups
+Revises: 011_add_script_version_blobs
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012_add_group_ai_metric_rollups'
+down_revision = '011_add_script_version_blobs'
+branch_labels = None
+depends_on = None
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+
+    # 指標分鐘匯總：主鍵 (account_id, metric_type, bucket) 兼作按賬號的範圍索引；PostgreSQL 上按月分區
+    if bind.dialect.name == 'postgresql':
+        op.execute("""
+            CREATE TABLE group_ai_metric_rollups (
+                account_id VARCHAR(100) NOT NULL DEFAULT '',
+                metric_type VARCHAR(50) NOT NULL,
+                bucket TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                value_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                PRIMARY KEY (account_id, metric_type, bucket)
+            ) PARTITION BY RANGE (bucket)
+        """)
+        op.execute("CREATE TABLE group_ai_metric_rollups_default PARTITION OF group_ai_metric_rollups DEFAULT")
+        month = _month_start(datetime.now())
+        for _ in range(3):
+            upper = _next_month(month)
+            op.execute(
+                f"CREATE TABLE group_ai_metric_rollups_{month:%Y%m} PARTITION OF group_ai_metric_rollups "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            )
+            month = upper
+        minute_expr = "date_trunc('minute', timestamp)"
+    else:
+        op.create_table(
+            'group_ai_metric_rollups',
+            sa.Column('account_id', sa.String(100), primary_key=True, server_default=''),
+            sa.Column('metric_type', sa.String(50), primary_key=True),
+            sa.Column('bucket', sa.DateTime(), primary_key=True),
+            sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('value_sum', sa.Float(), nullable=False, server_default='0'),
+        )
+        minute_expr = "strftime('%Y-%m-%d %H:%M:00.000000', timestamp)" if bind.dialect.name == 'sqlite' else None
+
+    op.create_index('ix_group_ai_metric_rollups_type_bucket', 'group_ai_metric_rollups', ['metric_type', 'bucket'])
+
+    # 原始指標表：儀表板與趨勢查詢按 (類型, 時間) / (賬號, 類型, 時間) 範圍掃描
+    op.create_index('ix_group_ai_metrics_type_timestamp', 'group_ai_metrics', ['metric_type', 'timestamp'])
+    op.create_index(
+        'ix_group_ai_metrics_account_type_timestamp', 'group_ai_metrics', ['account_id', 'metric_type', 'timestamp']
+    )
+
+    # 從現有原始指標回填匯總
+    if minute_expr is not None:
+        op.execute(f"""
+            INSERT INTO group_ai_metric_rollups (account_id, metric_type, bucket, count, value_sum)
+            SELECT COALESCE(account_id, ''), metric_type, {minute_expr}, COUNT(*), SUM(metric_value)
+            FROM group_ai_metrics
+            GROUP BY COALESCE(account_id, ''), metric_type, {minute_expr}
+        """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_group_ai_metrics_account_type_timestamp', table_name='group_ai_metrics')
+    op.drop_index('ix_group_ai_metrics_type_timestamp', table_name='group_ai_metrics')
+    op.drop_index('ix_group_ai_metric_rollups_type_bucket', table_name='group_ai_metric_rollups')
+    op.drop_table('group_ai_metric_rollups')
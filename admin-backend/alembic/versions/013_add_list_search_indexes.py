@@ -0,0 +1,74 @@
+"""add_list_search_indexes
+
+Revision ID: 013_add_list_search_indexes
+Revises: 012_add_group_ai_metric_rollups
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy.exc import OperationalError
+
+
+# revision identifiers, used by Alembic.
+revision = '013_add_list_search_indexes'
+down_revision = '012_add_group_ai_metric_rollups'
+branch_labels = None
+depends_on = None
+
+
+# 與 app.core.search.SEARCH_SPECS 一致：表名 -> 建立索引的列
+SEARCH_COLUMNS = {
+    'group_ai_accounts': ('account_id', 'display_name', 'username', 'phone_number'),
+    'group_ai_scripts': ('script_id', 'name', 'description', 'yaml_content'),
+    'group_ai_role_assignment_schemes': ('name', 'description'),
+    'audit_logs': ('description',),
+}
+
+
+def _upgrade_sqlite() -> None:
+    # FTS5 trigram 外部內容表 + 同步觸發器，創建後從源表重建一次
+    for table, columns in SEARCH_COLUMNS.items():
+        index = f'search_{table}'
+        cols = ', '.join(columns)
+        new_values = ', '.join(f'new.{c}' for c in columns)
+        old_values = ', '.join(f'old.{c}' for c in columns)
+        insert = f"INSERT INTO {index}(rowid, {cols}) VALUES (new.rowid, {new_values});"
+        delete = f"INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', old.rowid, {old_values});"
+        try:
+            op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({cols}, content='{table}', tokenize='trigram')")
+        except OperationalError as e:
+            # SQLite < 3.34 沒有 trigram 分詞器（或未編譯 FTS5）：跳過，應用按 LIKE 搜索
+            print(f"跳过搜索索引 {index}: {e}")
+            continue
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {table} BEGIN {insert} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {table} BEGIN {delete} END")
+        op.execute(f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END")
+        op.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def _upgrade_postgresql() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, columns in SEARCH_COLUMNS.items():
+        for column in columns:
+            op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)")
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _upgrade_sqlite()
+    elif dialect == 'postgresql':
+        _upgrade_postgresql()
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table, columns in SEARCH_COLUMNS.items():
+        if dialect == 'sqlite':
+            index = f'search_{table}'
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {index}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {index}")
+        elif dialect == 'postgresql':
+            for column in columns:
+                op.execute(f"DROP INDEX IF EXISTS ix_{table}_{column}_trgm")
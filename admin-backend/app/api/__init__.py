@@ -1,4 +1,4 @@
-from fastapi import APIRouter
+from app.core.routing import DeferredAPIRouter
 
 from app.api import routes
 from app.api import auth, users
@@ -18,7 +18,8 @@ from app.api import sites
 from app.api import analytics
 from app.api import contacts
 
-router = APIRouter()
+# 聚合路由：掛載到應用時才展開，避免每個端點在中間層重複構建
+router = DeferredAPIRouter()
 router.include_router(auth.router)
 router.include_router(users.router)
 router.include_router(routes.router)
@@ -1,5 +1,6 @@
 """
 数据统计 API
+查询通过 run_sync 在异步会话上执行，不阻塞事件循环
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
@@ -7,21 +8,111 @@ from typing import List, Optional
 from datetime import datetime, date, timedelta
 from pydantic import BaseModel
 
-from app.api.deps import get_db_session
+from app.core.pagination import CountMode, Page, paginate
 from app.crud import sites as crud_sites
+from app.db import AsyncDBSession, get_async_read_db
 from app.models.sites import SiteVisit, AIConversation, ContactForm
 
 router = APIRouter(prefix="/api/v1/analytics", tags=["analytics"])
 
 
+def _filter_site_and_date(query, model, site_id: Optional[int], start_date: Optional[date], end_date: Optional[date]):
+    """按站点和日期范围过滤"""
+    if site_id:
+        query = query.filter(model.site_id == site_id)
+
+    if start_date:
+        start_datetime = datetime.combine(start_date, datetime.min.time())
+        query = query.filter(model.created_at >= start_datetime)
+
+    if end_date:
+        end_datetime = datetime.combine(end_date, datetime.max.time())
+        query = query.filter(model.created_at <= end_datetime)
+
+    return query
+
+
+def query_records_page(
+    db: Session,
+    model,
+    *,
+    site_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    page: int = 1,
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
+) -> Page:
+    """查询访问/对话记录分页（同步会话，异步路由通过 run_sync 调用）"""
+    query = _filter_site_and_date(db.query(model), model, site_id, start_date, end_date)
+    return paginate(
+        query,
+        sort_column=model.created_at,
+        tiebreak_column=model.id,
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count_mode=count_mode,
+    )
+
+
+def get_conversation_stats_data(db: Session, days: int = 7) -> dict:
+    """统计对话数据（同步会话，异步路由通过 run_sync 调用）"""
+    from sqlalchemy import func
+
+    start_date = datetime.utcnow() - timedelta(days=days)
+
+    # 总对话数
+    total = db.query(func.count(AIConversation.id)).filter(
+        AIConversation.created_at >= start_date
+    ).scalar() or 0
+
+    # 按提供商统计
+    by_provider = {}
+    provider_stats = db.query(
+        AIConversation.ai_provider,
+        func.count(AIConversation.id).label('count')
+    ).filter(
+        AIConversation.created_at >= start_date
+    ).group_by(AIConversation.ai_provider).all()
+
+    for provider, count in provider_stats:
+        if provider:
+            by_provider[provider] = count
+
+    # 平均响应时间
+    avg_response_time = db.query(func.avg(AIConversation.response_time)).filter(
+        AIConversation.created_at >= start_date
+    ).scalar()
+    avg_response_time = int(avg_response_time) if avg_response_time else 0
+
+    # 平均 Token 数
+    avg_tokens = db.query(func.avg(AIConversation.tokens_used)).filter(
+        AIConversation.created_at >= start_date
+    ).scalar()
+    avg_tokens = int(avg_tokens) if avg_tokens else 0
+
+    # 常用问题（简化版，实际可以更复杂）
+    top_questions = []
+
+    return {
+        "total": total,
+        "by_provider": by_provider,
+        "avg_response_time": avg_response_time,
+        "avg_tokens": avg_tokens,
+        "top_questions": top_questions
+    }
+
+
 @router.get("/overview")
 async def get_analytics_overview(
     days: int = Query(7, ge=1, le=365, description="统计天数"),
-    db: Session = Depends(get_db_session)
+    db: AsyncDBSession = Depends(get_async_read_db)
 ):
     """获取概览数据"""
     try:
-        overview = crud_sites.get_analytics_overview(db, days=days)
+        overview = await db.run_sync(crud_sites.get_analytics_overview, days=days)
         return overview
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取概览数据失败: {str(e)}")
@@ -34,28 +125,25 @@ async def get_visits(
     end_date: Optional[date] = Query(None, description="结束日期"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db_session)
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="总数计算模式（exact, estimated, none）"),
+    db: AsyncDBSession = Depends(get_async_read_db)
 ):
     """获取访问记录"""
     try:
-        skip = (page - 1) * page_size
-        
-        query = db.query(SiteVisit)
-        
-        if site_id:
-            query = query.filter(SiteVisit.site_id == site_id)
-        
-        if start_date:
-            start_datetime = datetime.combine(start_date, datetime.min.time())
-            query = query.filter(SiteVisit.created_at >= start_datetime)
-        
-        if end_date:
-            end_datetime = datetime.combine(end_date, datetime.max.time())
-            query = query.filter(SiteVisit.created_at <= end_datetime)
-        
-        total = query.count()
-        visits = query.order_by(SiteVisit.created_at.desc()).offset(skip).limit(page_size).all()
-        
+        result_page = await db.run_sync(
+            query_records_page,
+            SiteVisit,
+            site_id=site_id,
+            start_date=start_date,
+            end_date=end_date,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count_mode=count_mode,
+        )
+        visits = result_page.items
+
         items = []
         for visit in visits:
             items.append({
@@ -69,14 +157,10 @@ async def get_visits(
                 "visit_duration": visit.visit_duration,
                 "created_at": visit.created_at.isoformat()
             })
-        
-        return {
-            "items": items,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size
-        }
+
+        return {"items": items, **result_page.meta()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取访问记录失败: {str(e)}")
 
@@ -88,28 +172,25 @@ async def get_conversations(
     end_date: Optional[date] = Query(None, description="结束日期"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db_session)
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor）"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="总数计算模式（exact, estimated, none）"),
+    db: AsyncDBSession = Depends(get_async_read_db)
 ):
     """获取对话记录"""
     try:
-        skip = (page - 1) * page_size
-        
-        query = db.query(AIConversation)
-        
-        if site_id:
-            query = query.filter(AIConversation.site_id == site_id)
-        
-        if start_date:
-            start_datetime = datetime.combine(start_date, datetime.min.time())
-            query = query.filter(AIConversation.created_at >= start_datetime)
-        
-        if end_date:
-            end_datetime = datetime.combine(end_date, datetime.max.time())
-            query = query.filter(AIConversation.created_at <= end_datetime)
-        
-        total = query.count()
-        conversations = query.order_by(AIConversation.created_at.desc()).offset(skip).limit(page_size).all()
-        
+        result_page = await db.run_sync(
+            query_records_page,
+            AIConversation,
+            site_id=site_id,
+            start_date=start_date,
+            end_date=end_date,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count_mode=count_mode,
+        )
+        conversations = result_page.items
+
         items = []
         for conv in conversations:
             items.append({
@@ -123,14 +204,10 @@ async def get_conversations(
                 "tokens_used": conv.tokens_used,
                 "created_at": conv.created_at.isoformat()
             })
-        
-        return {
-            "items": items,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size
-        }
+
+        return {"items": items, **result_page.meta()}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取对话记录失败: {str(e)}")
 
@@ -138,54 +215,10 @@ async def get_conversations(
 @router.get("/conversations/stats")
 async def get_conversation_stats(
     days: int = Query(7, ge=1, le=365, description="统计天数"),
-    db: Session = Depends(get_db_session)
+    db: AsyncDBSession = Depends(get_async_read_db)
 ):
     """获取对话统计"""
     try:
-        from sqlalchemy import func
-        
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        # 总对话数
-        total = db.query(func.count(AIConversation.id)).filter(
-            AIConversation.created_at >= start_date
-        ).scalar() or 0
-        
-        # 按提供商统计
-        by_provider = {}
-        provider_stats = db.query(
-            AIConversation.ai_provider,
-            func.count(AIConversation.id).label('count')
-        ).filter(
-            AIConversation.created_at >= start_date
-        ).group_by(AIConversation.ai_provider).all()
-        
-        for provider, count in provider_stats:
-            if provider:
-                by_provider[provider] = count
-        
-        # 平均响应时间
-        avg_response_time = db.query(func.avg(AIConversation.response_time)).filter(
-            AIConversation.created_at >= start_date
-        ).scalar()
-        avg_response_time = int(avg_response_time) if avg_response_time else 0
-        
-        # 平均 Token 数
-        avg_tokens = db.query(func.avg(AIConversation.tokens_used)).filter(
-            AIConversation.created_at >= start_date
-        ).scalar()
-        avg_tokens = int(avg_tokens) if avg_tokens else 0
-        
-        # 常用问题（简化版，实际可以更复杂）
-        top_questions = []
-        
-        return {
-            "total": total,
-            "by_provider": by_provider,
-            "avg_response_time": avg_response_time,
-            "avg_tokens": avg_tokens,
-            "top_questions": top_questions
-        }
+        return await db.run_sync(get_conversation_stats_data, days=days)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取对话统计失败: {str(e)}")
-
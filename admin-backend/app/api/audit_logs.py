@@ -8,11 +8,13 @@ from fastapi import APIRouter, Depends, Query, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 
-from app.api.deps import get_current_active_user, get_db_session
+from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.middleware.permission import check_permission
 from app.core.permissions import PermissionCode
-from app.crud.audit_log import get_audit_logs, get_audit_log_by_id
+from app.core.pagination import CountMode
+from app.db import get_read_db
+from app.crud.audit_log import get_audit_logs_page, get_audit_log_by_id
 from app.models.audit_log import AuditLog
 
 logger = logging.getLogger(__name__)
@@ -44,9 +46,12 @@ class AuditLogRead(BaseModel):
 class AuditLogListResponse(BaseModel):
     """審計日誌列表響應"""
     items: List[AuditLogRead]
-    total: int
+    total: Optional[int] = None  # count_mode=none 時為 None
     skip: int
     limit: int
+    total_estimated: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 # ============ API 端點 ============
@@ -61,31 +66,42 @@ async def list_audit_logs(
     resource_id: Optional[str] = Query(None, description="資源 ID"),
     start_date: Optional[datetime] = Query(None, description="開始時間"),
     end_date: Optional[datetime] = Query(None, description="結束時間"),
+    search: Optional[str] = Query(None, description="搜索關鍵詞（操作描述）"),
+    cursor: Optional[str] = Query(None, description="分頁游標（上一頁返回的 next_cursor）"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="總數計算模式（exact, estimated, none）"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db_session)
+    db: Session = Depends(get_read_db)
 ):
     """查詢審計日誌（需要 audit:view 權限）"""
     check_permission(current_user, PermissionCode.AUDIT_VIEW.value, db)
     
     try:
-        logs, total = get_audit_logs(
+        page = get_audit_logs_page(
             db,
             skip=skip,
             limit=limit,
+            cursor=cursor,
+            count_mode=count_mode,
             user_id=user_id,
             action=action,
             resource_type=resource_type,
             resource_id=resource_id,
             start_date=start_date,
             end_date=end_date,
+            search=search,
         )
         
         return AuditLogListResponse(
-            items=[AuditLogRead.model_validate(log) for log in logs],
-            total=total,
-            skip=skip,
+            items=[AuditLogRead.model_validate(log) for log in page.items],
+            total=page.total,
+            skip=(page.page - 1) * limit if cursor else skip,
             limit=limit,
+            total_estimated=page.total_estimated,
+            has_more=page.has_more,
+            next_cursor=page.next_cursor,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"查詢審計日誌失敗: {e}", exc_info=True)
         raise HTTPException(
@@ -98,7 +114,7 @@ async def list_audit_logs(
 async def get_audit_log(
     log_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db_session)
+    db: Session = Depends(get_read_db)
 ):
     """獲取審計日誌詳情（需要 audit:view 權限）"""
     check_permission(current_user, PermissionCode.AUDIT_VIEW.value, db)
@@ -1,28 +1,87 @@
+import asyncio
+import logging
+import time
 from datetime import timedelta
+from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from app.api.deps import get_db_session
+from app.api.deps import get_db_session, oauth2_scheme
+from app.core.auth_cache import access_token_claims, revoke_token
 from app.core.config import get_settings
-from app.core.security import create_access_token, verify_password
+from app.core.password_hasher import PasswordHasherBusy, get_password_hasher
+from app.core.security import create_access_token, password_needs_rehash
 from app.crud.user import get_user_by_email
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.schemas.auth import Token
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db_session)) -> Token:
-    user = get_user_by_email(db, email=form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db_session)) -> Token:
+    started = time.perf_counter()
+    hasher = get_password_hasher()
+    # 查詢（連同角色和權限）和提交都是同步數據庫 I/O，放到線程池執行，不阻塞事件循環
+    user = await asyncio.to_thread(get_user_by_email, db, email=form_data.username)
+    try:
+        # bcrypt 在專用線程池中計算，不阻塞事件循環
+        verified = bool(user) and await hasher.verify(form_data.password, user.hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="登录请求过多，请稍后重试",
+            headers={"Retry-After": "1"},
+        )
+    if not verified:
+        hasher.record_login(started)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="邮箱或密码错误")
     if not user.is_active:
+        hasher.record_login(started)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="账户已禁用")
+    # 提交後對象屬性會過期，再訪問會在事件循環中查庫，因此先取出令牌所需的字段
+    email = user.email
+    claims = access_token_claims(user)
+    rehashed = await _rehash_if_needed(db, user, form_data.password)
     settings = get_settings()
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
-    access_token = create_access_token(subject=user.email, expires_delta=access_token_expires)
+    access_token = create_access_token(
+        subject=email,
+        expires_delta=access_token_expires,
+        claims=claims,
+    )
+    hasher.record_login(started, rehashed=rehashed)
     return Token(access_token=access_token)
 
+
+async def _rehash_if_needed(db: Session, user, password: str) -> bool:
+    """按當前策略（方案、bcrypt 成本）重新哈希舊密碼；失敗不影響本次登錄"""
+    if not password_needs_rehash(user.hashed_password):
+        return False
+    email = user.email
+    try:
+        user.hashed_password = await get_password_hasher().hash(password)
+        await asyncio.to_thread(db.commit)
+        return True
+    except Exception as e:
+        await asyncio.to_thread(db.rollback)
+        logger.warning(f"登錄時重新哈希密碼失敗（用戶 {email}）: {e}")
+        return False
+
+
+@router.post("/logout")
+def logout(token: Optional[str] = Depends(oauth2_scheme)) -> dict:
+    """登出：撤銷當前令牌（所有進程的認證緩存同時失效）"""
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="未提供認證令牌",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    revoke_token(token)
+    return {"message": "已登出"}
+
@@ -1,3 +1,5 @@
+import logging
+import time
 from typing import Generator, Optional
 
 from fastapi import Depends, HTTPException, status
@@ -5,6 +7,16 @@ from fastapi.security import OAuth2PasswordBearer, HTTPBearer, HTTPAuthorization
 from jose import JWTError, jwt
 from sqlalchemy.orm import Session
 
+from app.core.auth_cache import (
+    AUTH_TAG,
+    TokenCache,
+    get_token_cache,
+    is_revoked,
+    principal_from_claims,
+    principal_from_user,
+    user_tag,
+)
+from app.core.cache import get_cache_manager
 from app.core.config import get_settings
 from app.core.security import decode_access_token
 from app.crud.user import get_user_by_email
@@ -64,6 +76,14 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # 快速路徑：令牌已驗證過且用戶/權限未變更時直接返回緩存的主體，不解碼、不查庫
+    token_cache = get_token_cache()
+    started = time.perf_counter()
+    principal = token_cache.get(auth_token)
+    if principal is not None:
+        token_cache.record("cache_hits", started)
+        return principal
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证身份",
@@ -79,23 +99,62 @@ def get_current_user(
     except JWTError as e:
         if settings.debug_auth_logs:
             logger.warning(f"🔍 [AUTH DEBUG] ❌ 准备抛出 401: JWT 解码失败 - {str(e)}")
+        token_cache.record("failures", started)
         raise credentials_exception
     if token_data.sub is None:
         if settings.debug_auth_logs:
             logger.warning("🔍 [AUTH DEBUG] ❌ 准备抛出 401: token_data.sub 为 None")
+        token_cache.record("failures", started)
+        raise credentials_exception
+    
+    # 在讀取用戶之前記錄標籤版本：讀取期間發生的變更會使緩存條目立即過期
+    tags = _auth_tag_versions(auth_token, token_data.sub)
+    if is_revoked(tags, auth_token):
+        if settings.debug_auth_logs:
+            logger.warning("🔍 [AUTH DEBUG] ❌ 准备抛出 401: token 已撤销")
+        token_cache.record("revoked", started)
         raise credentials_exception
+    expires_at = payload.get("exp") if isinstance(payload.get("exp"), (int, float)) else None
+    principal = principal_from_claims(payload, tags)
+    if principal is not None:
+        token_cache.put(auth_token, principal, tags, expires_at)
+        token_cache.record("claim_hits", started)
+        return principal
+    
     if settings.debug_auth_logs:
         logger.debug(f"🔍 [AUTH DEBUG] 查询用户: {token_data.sub}")
     user = get_user_by_email(db, email=token_data.sub)
     if user is None:
         if settings.debug_auth_logs:
             logger.warning(f"🔍 [AUTH DEBUG] ❌ 准备抛出 401: 用户不存在 - {token_data.sub}")
+        token_cache.record("failures", started)
         raise credentials_exception
+    _cache_principal(token_cache, auth_token, user, tags, expires_at)
+    token_cache.record("db_loads", started)
     if settings.debug_auth_logs:
         logger.debug(f"🔍 [AUTH DEBUG] ✅ 认证成功, 用户: {user.email}")
     return user
 
 
+def _auth_tag_versions(token: str, email: str) -> dict:
+    try:
+        return get_cache_manager().get_tag_versions(TokenCache.tags_for(token, email))
+    except Exception:
+        return {}
+
+
+def _cache_principal(token_cache: TokenCache, token: str, user, tags: dict, expires_at) -> None:
+    """緩存本次從數據庫加載的用戶（首個請求仍返回 ORM 對象）"""
+    if not token_cache.enabled or not tags:
+        return
+    try:
+        principal = principal_from_user(user, (tags.get(AUTH_TAG, 0), tags.get(user_tag(user.email), 0)))
+    except Exception as e:
+        logging.getLogger(__name__).debug(f"無法緩存認證主體: {e}")
+        return
+    token_cache.put(token, principal, tags, expires_at)
+
+
 def get_current_active_user(current_user=Depends(get_current_user)):
     import logging
     logger = logging.getLogger(__name__)
@@ -149,11 +208,7 @@ def get_optional_user(
         if not auth_token:
             return None
         
-        payload = jwt.decode(auth_token, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
-        token_data = TokenPayload(**payload)
-        if token_data.sub is None:
-            return None
-        user = get_user_by_email(db, email=token_data.sub)
+        user = get_current_user(token=auth_token, credentials=None, db=db)
         return user if user and user.is_active else None
     except (JWTError, Exception):
         # 認證失敗時返回 None，允許匿名訪問（僅用於測試環境）
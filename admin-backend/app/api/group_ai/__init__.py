@@ -5,6 +5,7 @@ import logging
 from fastapi import APIRouter, Depends
 
 from app.api.deps import get_current_active_user
+from app.core.routing import DeferredAPIRouter
 
 logger = logging.getLogger(__name__)
 
@@ -30,7 +31,7 @@ except Exception as e:
     groups = type('GroupsModule', (), {'router': EmptyRouter()})()
 
 # 路由級別的認證依賴
-router = APIRouter(
+router = DeferredAPIRouter(
     prefix="/group-ai",
     tags=["group-ai"],
 )
@@ -26,7 +26,9 @@ except ImportError:
     EXCEL_SUPPORT = False
     logger.warning("openpyxl 未安裝，不支持 Excel 文件")
 
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from app.crud.bulk import bulk_write, chunked
 from app.db import get_db
 from app.models.group_ai import GroupAIAccount
 from app.api.deps import get_current_active_user
@@ -137,55 +139,81 @@ def parse_excel_content(file_path: Path) -> List[AccountImportItem]:
 
 
 def save_accounts_to_db(accounts: List[AccountImportItem], db: Session) -> ImportResult:
-    """將賬號配置保存到數據庫"""
+    """
+    將賬號配置保存到數據庫
+
+    已存在的賬號（account_id 或 phone_number 等於 session_name）用一次 IN 查詢找出，
+    新增和更新在同一個事務中批量寫入，單行失敗只記錄到 errors。
+    """
     result = ImportResult(total=len(accounts), success=0, failed=0, errors=[])
-    
+
+    items: dict = {}
     for account_data in accounts:
-        try:
-            # 檢查是否已存在（根據 session_name 或 account_id）
-            existing = db.query(GroupAIAccount).filter(
-                (GroupAIAccount.account_id == account_data.session_name) |
-                (GroupAIAccount.phone_number == account_data.session_name)
-            ).first()
-            
-            if existing:
-                # 更新現有賬號的配置
-                if not existing.config:
-                    existing.config = {}
-                existing.config['telegram_api_id'] = account_data.api_id
-                existing.config['telegram_api_hash'] = account_data.api_hash
-                existing.config['telegram_session_name'] = account_data.session_name
-                result.success += 1
-                logger.info(f"更新賬號配置: {account_data.session_name}")
-            else:
-                # 創建新賬號記錄（僅配置，不啟動）
-                new_account = GroupAIAccount(
-                    account_id=account_data.session_name,
-                    phone_number=account_data.session_name,
-                    name=account_data.session_name,
-                    active=False,
-                    config={
-                        'telegram_api_id': account_data.api_id,
-                        'telegram_api_hash': account_data.api_hash,
-                        'telegram_session_name': account_data.session_name
-                    }
-                )
-                db.add(new_account)
-                result.success += 1
-                logger.info(f"創建新賬號配置: {account_data.session_name}")
-        
-        except Exception as e:
+        if account_data.session_name in items:
             result.failed += 1
-            error_msg = f"賬號 {account_data.session_name}: {str(e)}"
-            result.errors.append(error_msg)
-            logger.error(error_msg, exc_info=True)
-    
+            result.errors.append(f"賬號 {account_data.session_name}: 文件中重複")
+            continue
+        items[account_data.session_name] = account_data
+
+    # 檢查是否已存在（根據 session_name 或 account_id）
+    existing: dict = {}
+    names = list(items)
+    for chunk in chunked(names):
+        rows = db.query(GroupAIAccount.id, GroupAIAccount.account_id, GroupAIAccount.phone_number, GroupAIAccount.config).filter(
+            or_(GroupAIAccount.account_id.in_(chunk), GroupAIAccount.phone_number.in_(chunk))
+        )
+        for row in rows:
+            # account_id 匹配優先於 phone_number 匹配
+            if row.account_id in items:
+                existing[row.account_id] = row
+            elif row.phone_number in items:
+                existing.setdefault(row.phone_number, row)
+
+    inserts = []
+    updates = []
+    for name, account_data in items.items():
+        telegram_config = {
+            'telegram_api_id': account_data.api_id,
+            'telegram_api_hash': account_data.api_hash,
+            'telegram_session_name': account_data.session_name
+        }
+        current = existing.get(name)
+        if current:
+            # 更新現有賬號的配置
+            updates.append({"id": current.id, "config": {**(current.config or {}), **telegram_config}, "_key": name})
+        else:
+            # 創建新賬號記錄（僅配置，不啟動）
+            inserts.append({
+                "account_id": name,
+                "phone_number": name,
+                "session_file": f"{name}.session",
+                "script_id": "default",
+                "active": False,
+                "config": telegram_config,
+                "_key": name,
+            })
+
+    write_result = bulk_write(
+        db,
+        GroupAIAccount,
+        inserts,
+        updates,
+        key_func=lambda row: row["_key"],
+    )
     try:
         db.commit()
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"保存到數據庫失敗: {str(e)}")
-    
+
+    result.success = write_result.success_count
+    result.failed += write_result.failed_count
+    for error in write_result.errors:
+        error_msg = f"賬號 {error['key']}: {error['error']}"
+        result.errors.append(error_msg)
+        logger.error(error_msg)
+    logger.info(f"導入賬號配置: 新建 {len(write_result.inserted)}，更新 {len(write_result.updated)}，失敗 {result.failed}")
+
     return result
 
 
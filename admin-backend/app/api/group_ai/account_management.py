@@ -3,7 +3,6 @@
 扫描服务器账号、去重验证、删除重复账号、显示现有账号
 """
 import logging
-import paramiko
 import re
 from pathlib import Path
 from datetime import datetime
@@ -119,6 +118,7 @@ def scan_server_accounts(server_node: ServerNode, db: Optional[Session] = None)
     Returns:
         账号信息列表
     """
+    import paramiko
     accounts = []
     
     try:
@@ -549,6 +549,7 @@ async def delete_server_account(
             )
         
         # 删除文件
+        import paramiko
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         ssh.connect(
@@ -662,6 +663,7 @@ async def batch_delete_server_accounts(
             }
         
         # 删除文件
+        import paramiko
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         ssh.connect(
@@ -12,8 +12,10 @@ from pathlib import Path
 logger = logging.getLogger(__name__)
 
 # 導入緩存功能
-from app.core.cache import cached, invalidate_cache
+from app.core.cache import cached, invalidate_cache, invalidate_tags
 from app.core.errors import UserFriendlyError
+from app.core.pagination import CountMode, Page, paginate
+from app.core.search import apply_search
 
 # 導入限流（可選）
 try:
@@ -37,7 +39,8 @@ from group_ai_service import AccountManager
 from group_ai_service.service_manager import ServiceManager
 from group_ai_service.models.account import AccountConfig, AccountStatusEnum
 
-from app.db import get_db
+from app.crud.bulk import bulk_upsert
+from app.db import AsyncDBSession, get_async_read_db, get_db
 from app.models.group_ai import GroupAIAccount
 from sqlalchemy.orm import Session
 from app.utils.telegram_profile import get_telegram_profile
@@ -139,7 +142,12 @@ class AccountStatusResponse(BaseModel):
 
 class AccountListResponse(BaseModel):
     items: List[AccountResponse]
-    total: int
+    total: Optional[int] = None  # count_mode=none 時為 None
+    page: Optional[int] = None
+    page_size: Optional[int] = None
+    total_estimated: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 class BatchImportRequest(BaseModel):
@@ -394,23 +402,6 @@ async def create_account(
             db.refresh(db_account)
             
             logger.info(f"賬號創建成功: {request.account_id} (數據庫 ID: {db_account.id})")
-            
-            # 驗證數據是否已保存（使用新的會話確保讀取到最新數據）
-            from app.db import SessionLocal as NewSessionLocal
-            verify_db = NewSessionLocal()
-            try:
-                saved_account = verify_db.query(GroupAIAccount).filter(
-                    GroupAIAccount.account_id == request.account_id
-                ).first()
-                if not saved_account:
-                    logger.error(f"賬號創建後驗證失敗: {request.account_id} 在數據庫中不存在")
-                    raise HTTPException(
-                        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                        detail="賬號保存失敗：數據未正確寫入數據庫"
-                    )
-                logger.info(f"賬號驗證成功: {saved_account.account_id} 已持久化到數據庫")
-            finally:
-                verify_db.close()
         except HTTPException:
             db.rollback()
             raise
@@ -747,11 +738,68 @@ async def upload_session_file(
         )
 
 
+def _query_accounts_page(
+    db: Session,
+    *,
+    search: Optional[str] = None,
+    script_id: Optional[str] = None,
+    server_id: Optional[str] = None,
+    active: Optional[bool] = None,
+    sort_by: Optional[str] = "created_at",
+    sort_order: Optional[str] = "desc",
+    page: int = 1,
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
+) -> Page:
+    """查詢賬號分頁（同步會話；異步路由通過 run_sync 調用）"""
+    db_query = db.query(GroupAIAccount)
+    
+    # 搜索過濾（全文/trigram 索引；sort_by=relevance 時按相關度前置排序）
+    ranked = bool(search) and sort_by == "relevance"
+    db_query = apply_search(db_query, GroupAIAccount, search, ranked=ranked)
+    
+    # 劇本ID過濾
+    if script_id:
+        db_query = db_query.filter(GroupAIAccount.script_id == script_id)
+    
+    # 服務器ID過濾
+    if server_id:
+        db_query = db_query.filter(GroupAIAccount.server_id == server_id)
+    
+    # 激活狀態過濾
+    if active is not None:
+        db_query = db_query.filter(GroupAIAccount.active == active)
+    
+    # 排序
+    if sort_by == "account_id":
+        order_by = GroupAIAccount.account_id
+    elif sort_by == "display_name":
+        order_by = GroupAIAccount.display_name
+    elif sort_by == "script_id":
+        order_by = GroupAIAccount.script_id
+    else:  # 默認按創建時間
+        order_by = GroupAIAccount.created_at
+    
+    # 分頁（Keyset 游標 + 可選計數模式，避免深 OFFSET 與全表 COUNT；相關度排序時游標僅記錄偏移量）
+    return paginate(
+        db_query,
+        sort_column=order_by,
+        tiebreak_column=GroupAIAccount.id,
+        descending=sort_order != "asc",
+        page=page,
+        page_size=page_size,
+        cursor=cursor,
+        count_mode=count_mode,
+        keyset=not ranked,
+    )
+
+
 @router.get("/", response_model=AccountListResponse)
 @cached(prefix="accounts_list", ttl=30)  # 緩存 30 秒
 async def list_accounts(
     request: Request,  # 用於限流
-    db: Session = Depends(get_db),
+    db: AsyncDBSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_active_user),
     page: int = Query(1, ge=1, description="頁碼"),
     page_size: int = Query(20, ge=1, le=100, description="每頁數量"),
@@ -760,13 +808,15 @@ async def list_accounts(
     script_id: Optional[str] = Query(None, description="劇本ID過濾"),
     server_id: Optional[str] = Query(None, description="服務器ID過濾"),
     active: Optional[bool] = Query(None, description="是否激活過濾"),
-    sort_by: Optional[str] = Query("created_at", description="排序字段（account_id, display_name, created_at, script_id）"),
+    sort_by: Optional[str] = Query("created_at", description="排序字段（account_id, display_name, created_at, script_id, relevance）"),
     sort_order: Optional[str] = Query("desc", description="排序順序（asc, desc）"),
+    cursor: Optional[str] = Query(None, description="分頁游標（上一頁返回的 next_cursor）"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="總數計算模式（exact, estimated, none）"),
     _t: Optional[int] = Query(None, description="強制刷新時間戳（繞過緩存）"),
     service_manager: Optional[ServiceManager] = Depends(get_service_manager)
 ):
-    """列出所有賬號（支持搜索、過濾、排序，帶緩存）"""
-    check_permission(current_user, PermissionCode.ACCOUNT_VIEW.value, db)
+    """列出所有賬號（支持搜索、過濾、排序、游標分頁，帶緩存）"""
+    await db.run_sync(lambda session: check_permission(current_user, PermissionCode.ACCOUNT_VIEW.value, session))
     
     # 如果 ServiceManager 初始化失敗，返回空列表
     if service_manager is None:
@@ -778,52 +828,22 @@ async def list_accounts(
         invalidate_cache("accounts_list:*")
     
     try:
-        # 從數據庫獲取賬號列表（包含完整信息）
-        db_query = db.query(GroupAIAccount)
-        
-        # 搜索過濾
-        if search:
-            search_filter = f"%{search}%"
-            db_query = db_query.filter(
-                (GroupAIAccount.account_id.like(search_filter)) |
-                (GroupAIAccount.display_name.like(search_filter)) |
-                (GroupAIAccount.username.like(search_filter)) |
-                (GroupAIAccount.phone_number.like(search_filter))
-            )
-        
-        # 劇本ID過濾
-        if script_id:
-            db_query = db_query.filter(GroupAIAccount.script_id == script_id)
-        
-        # 服務器ID過濾
-        if server_id:
-            db_query = db_query.filter(GroupAIAccount.server_id == server_id)
-        
-        # 激活狀態過濾
-        if active is not None:
-            db_query = db_query.filter(GroupAIAccount.active == active)
-        
-        # 排序
-        if sort_by == "account_id":
-            order_by = GroupAIAccount.account_id
-        elif sort_by == "display_name":
-            order_by = GroupAIAccount.display_name
-        elif sort_by == "script_id":
-            order_by = GroupAIAccount.script_id
-        else:  # 默認按創建時間
-            order_by = GroupAIAccount.created_at
-        
-        if sort_order == "asc":
-            db_query = db_query.order_by(order_by.asc())
-        else:
-            db_query = db_query.order_by(order_by.desc())
-        
-        # 獲取總數（優化：使用 count() 而不是先查詢再計算）
-        total = db_query.count()
-        
-        # 分頁（優化：只查詢需要的字段，減少內存使用）
-        offset = (page - 1) * page_size
-        db_accounts = db_query.offset(offset).limit(page_size).all()
+        # 從數據庫獲取賬號列表（包含完整信息），查詢不阻塞事件循環
+        result_page = await db.run_sync(
+            _query_accounts_page,
+            search=search,
+            script_id=script_id,
+            server_id=server_id,
+            active=active,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count_mode=count_mode,
+        )
+        total = result_page.total
+        db_accounts = result_page.items
         
         # 獲取 AccountManager（用於獲取實時狀態）
         # 優化：只在需要時獲取，避免不必要的開銷
@@ -904,12 +924,20 @@ async def list_accounts(
         if status_filter:
             total = len(items)
         
-        logger.debug(f"返回 {len(items)} 個帳號 (page={page}, page_size={page_size}, total={total})")
-        result = AccountListResponse(items=items, total=total)
+        logger.debug(f"返回 {len(items)} 個帳號 (page={result_page.page}, page_size={page_size}, total={total})")
+        result = AccountListResponse(
+            items=items,
+            total=total,
+            page=result_page.page,
+            page_size=page_size,
+            total_estimated=result_page.total_estimated,
+            has_more=result_page.has_more,
+            next_cursor=result_page.next_cursor,
+        )
         
         # 緩存結果（僅在無搜索/過濾時，使用同步内存缓存）
         # 判斷是否應該使用緩存：只有在沒有搜索、過濾、排序參數時才緩存
-        use_cache = not (search or status_filter or script_id or server_id or active is not None or sort_by != "created_at" or sort_order != "desc")
+        use_cache = not (search or status_filter or script_id or server_id or active is not None or sort_by != "created_at" or sort_order != "desc" or cursor or count_mode != CountMode.EXACT)
         
         if use_cache:
             try:
@@ -949,7 +977,7 @@ async def list_accounts(
 
 
 @router.get("/{account_id}", response_model=AccountResponse)
-@cached(prefix="account_detail", ttl=15)  # 緩存 15 秒（賬號詳情變化較快）
+@cached(prefix="account_detail", ttl=15, tags=("account:{account_id}",))  # 緩存 15 秒（賬號詳情變化較快）
 async def get_account(
     account_id: str,
     current_user: User = Depends(get_current_active_user),
@@ -959,7 +987,7 @@ async def get_account(
 ):
     # 如果提供了強制刷新時間戳，清除緩存
     if _t is not None:
-        invalidate_cache(f"account_detail:{account_id}:*")
+        invalidate_tags(f"account:{account_id}")
     """獲取賬號詳情（需要 account:view 權限）"""
     check_permission(current_user, PermissionCode.ACCOUNT_VIEW.value, db)
     logger.info(f"[GET_ACCOUNT] 收到獲取賬號請求: account_id={account_id}")
@@ -1374,12 +1402,38 @@ async def batch_import_accounts(
             script_id=request.script_id,
             group_ids=request.group_ids
         )
+        
+        # 一次 IN 查詢 + 批量寫入持久化已加載的賬號，整批一個事務
+        rows = [
+            {
+                "account_id": account_id,
+                "session_file": str(Path(request.directory) / f"{account_id}.session"),
+                "script_id": request.script_id,
+                "group_ids": request.group_ids,
+            }
+            for account_id in loaded
+        ]
+        result = bulk_upsert(
+            db,
+            GroupAIAccount,
+            "account_id",
+            rows,
+            update_columns=("session_file", "script_id"),
+        )
+        db.commit()
+        
+        if result.success_count:
+            invalidate_cache("accounts_list*")
         return {
             "message": "批量導入完成",
             "loaded_count": len(loaded),
-            "account_ids": loaded
+            "account_ids": loaded,
+            "created_count": len(result.inserted),
+            "updated_count": len(result.updated),
+            "failed_items": [{"account_id": item["key"], "error": item["error"]} for item in result.errors]
         }
     except Exception as e:
+        db.rollback()
         raise HTTPException(status_code=500, detail=f"批量導入失敗: {str(e)}")
 
 
@@ -15,6 +15,7 @@ from app.middleware.permission import check_permission
 from app.core.permissions import PermissionCode
 from app.models.user import User
 from app.core.cache import cached, invalidate_cache
+from app.core.pagination import CountMode, paginate
 
 logger = logging.getLogger(__name__)
 
@@ -217,8 +218,15 @@ async def list_automation_tasks(
         if enabled is not None:
             query = query.filter(GroupAIAutomationTask.enabled == enabled)
         
-        total = query.count()
-        tasks = query.order_by(GroupAIAutomationTask.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+        # 列表響應不返回總數，跳過 COUNT 查詢
+        tasks = paginate(
+            query,
+            sort_column=GroupAIAutomationTask.created_at,
+            tiebreak_column=GroupAIAutomationTask.id,
+            page=page,
+            page_size=page_size,
+            count_mode=CountMode.NONE,
+        ).items
         
         return [
             AutomationTaskResponse(
@@ -255,6 +263,17 @@ async def list_automation_tasks(
         )
 
 
+@router.get("/scheduler/status")
+async def get_scheduler_status(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """獲取任務調度器狀態：領導者租約、任務數、按任務類型的調度延遲與執行耗時（需要 automation_task:view 權限）"""
+    check_permission(current_user, PermissionCode.AUTOMATION_TASK_VIEW.value, db)
+    from app.services.task_scheduler import get_task_scheduler
+    return get_task_scheduler().get_status()
+
+
 @router.get("/{task_id}", response_model=AutomationTaskResponse)
 async def get_automation_task(
     task_id: str,
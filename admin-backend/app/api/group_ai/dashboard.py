@@ -7,240 +7,75 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, List
 from fastapi import APIRouter
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, case
 
-from app.db import SessionLocal
+from app.db import AsyncDBSession, SessionLocal, get_async_read_db
 from app.models.group_ai import GroupAIAccount, GroupAIDialogueHistory, GroupAIMetric
 from app.api.group_ai.servers import load_server_configs
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from fastapi import Depends
 from app.core.cache import cached
+from app.core.cache_optimization import warmup_query
+from app.services.dashboard_counters import TOTAL_BUCKET, day_bucket, get_dashboard_counters
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["dashboard"])
 
 
+@warmup_query("dashboard_stats")
 def get_dashboard_stats() -> Dict[str, Any]:
-    """獲取儀表板統計數據（從群組AI系統）- 優化版本：合併查詢減少數據庫往返"""
+    """獲取儀表板統計數據（同步入口，自行管理會話；同時作為 dashboard_stats 緩存的預熱查詢）"""
     db: Session = SessionLocal()
+    try:
+        return collect_dashboard_stats(db)
+    finally:
+        db.close()
+
+
+def collect_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """收集儀表板統計數據（從群組AI系統）- 統計讀取增量計數行，只有最近會話/錯誤列表查詢原始表"""
     try:
         # 計算今日開始時間
         now = datetime.now()
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         yesterday_start = today_start - timedelta(days=1)
         
-        # 優化查詢 1：一次性獲取今日和昨日的會話統計（使用條件聚合）
-        try:
-            session_stats = db.query(
-                # 今日會話量
-                func.sum(case((GroupAIDialogueHistory.timestamp >= today_start, 1), else_=0)).label('today_sessions'),
-                # 昨日會話量
-                func.sum(case((
-                    and_(
-                        GroupAIDialogueHistory.timestamp >= yesterday_start,
-                        GroupAIDialogueHistory.timestamp < today_start
-                    ), 1
-                ), else_=0)).label('yesterday_sessions'),
-                # 總會話量（用於成功率計算）
-                func.count(GroupAIDialogueHistory.id).label('total_sessions'),
-                # 今日成功會話量（有回復的）
-                func.sum(case((
-                    and_(
-                        GroupAIDialogueHistory.timestamp >= today_start,
-                        GroupAIDialogueHistory.reply_text.isnot(None),
-                        GroupAIDialogueHistory.reply_text != ""
-                    ), 1
-                ), else_=0)).label('today_successful'),
-                # 昨日成功會話量
-                func.sum(case((
-                    and_(
-                        GroupAIDialogueHistory.timestamp >= yesterday_start,
-                        GroupAIDialogueHistory.timestamp < today_start,
-                        GroupAIDialogueHistory.reply_text.isnot(None),
-                        GroupAIDialogueHistory.reply_text != ""
-                    ), 1
-                ), else_=0)).label('yesterday_successful'),
-                # 總成功會話量
-                func.sum(case((
-                    and_(
-                        GroupAIDialogueHistory.reply_text.isnot(None),
-                        GroupAIDialogueHistory.reply_text != ""
-                    ), 1
-                ), else_=0)).label('total_successful'),
-            ).first()
-            
-            today_sessions = int(session_stats.today_sessions or 0)
-            yesterday_sessions = int(session_stats.yesterday_sessions or 0)
-            total_sessions = int(session_stats.total_sessions or 0)
-            today_successful = int(session_stats.today_successful or 0)
-            yesterday_successful = int(session_stats.yesterday_successful or 0)
-            total_successful = int(session_stats.total_successful or 0)
-        except Exception as e:
-            logger.warning(f"獲取會話統計失敗，使用備用查詢: {e}")
-            # 備用查詢（如果條件聚合不支持）
-            today_sessions = db.query(func.count(GroupAIDialogueHistory.id)).filter(
-                GroupAIDialogueHistory.timestamp >= today_start
-            ).scalar() or 0
-            yesterday_sessions = db.query(func.count(GroupAIDialogueHistory.id)).filter(
-                and_(
-                    GroupAIDialogueHistory.timestamp >= yesterday_start,
-                    GroupAIDialogueHistory.timestamp < today_start
-                )
-            ).scalar() or 0
-            total_sessions = db.query(func.count(GroupAIDialogueHistory.id)).scalar() or 0
-            total_successful = db.query(func.count(GroupAIDialogueHistory.id)).filter(
-                GroupAIDialogueHistory.reply_text.isnot(None),
-                GroupAIDialogueHistory.reply_text != ""
-            ).scalar() or 0
-            today_successful = db.query(func.count(GroupAIDialogueHistory.id)).filter(
-                and_(
-                    GroupAIDialogueHistory.timestamp >= today_start,
-                    GroupAIDialogueHistory.reply_text.isnot(None),
-                    GroupAIDialogueHistory.reply_text != ""
-                )
-            ).scalar() or 0
-            yesterday_successful = db.query(func.count(GroupAIDialogueHistory.id)).filter(
-                and_(
-                    GroupAIDialogueHistory.timestamp >= yesterday_start,
-                    GroupAIDialogueHistory.timestamp < today_start,
-                    GroupAIDialogueHistory.reply_text.isnot(None),
-                    GroupAIDialogueHistory.reply_text != ""
-                )
-            ).scalar() or 0
-        
+        # 統計數據：按主鍵讀取 total / 今日 / 昨日三個計數行（寫入時增量維護，見 dashboard_counters）
+        counters = get_dashboard_counters(db, [today_start.date(), yesterday_start.date()])
+        total = counters[TOTAL_BUCKET]
+        today = counters[day_bucket(today_start)]
+        yesterday = counters[day_bucket(yesterday_start)]
+
+        today_sessions = int(today["sessions"])
+        yesterday_sessions = int(yesterday["sessions"])
+        total_sessions = int(total["sessions"])
+        yesterday_successful = int(yesterday["successful_sessions"])
+        total_successful = int(total["successful_sessions"])
+
         sessions_change = calculate_change(today_sessions, yesterday_sessions)
         success_rate = (total_successful / total_sessions * 100) if total_sessions > 0 else 0.0
         yesterday_success_rate = (yesterday_successful / yesterday_sessions * 100) if yesterday_sessions > 0 else 0.0
         success_rate_change = calculate_change(success_rate, yesterday_success_rate, is_percentage=True)
-        
-        # 優化查詢 2：一次性獲取 Token 用量統計
-        try:
-            token_stats = db.query(
-                func.sum(case((
-                    and_(
-                        GroupAIMetric.metric_type == "token_usage",
-                        GroupAIMetric.timestamp >= today_start
-                    ), GroupAIMetric.metric_value
-                ), else_=0)).label('today_token'),
-                func.sum(case((
-                    and_(
-                        GroupAIMetric.metric_type == "token_usage",
-                        GroupAIMetric.timestamp >= yesterday_start,
-                        GroupAIMetric.timestamp < today_start
-                    ), GroupAIMetric.metric_value
-                ), else_=0)).label('yesterday_token'),
-            ).first()
-            
-            token_usage = float(token_stats.today_token or 0)
-            yesterday_token = float(token_stats.yesterday_token or 0)
-        except Exception as e:
-            logger.warning(f"獲取 Token 統計失敗，使用備用查詢: {e}")
-            token_usage = db.query(func.sum(GroupAIMetric.metric_value)).filter(
-                GroupAIMetric.metric_type == "token_usage",
-                GroupAIMetric.timestamp >= today_start
-            ).scalar() or 0
-            yesterday_token = db.query(func.sum(GroupAIMetric.metric_value)).filter(
-                GroupAIMetric.metric_type == "token_usage",
-                and_(
-                    GroupAIMetric.timestamp >= yesterday_start,
-                    GroupAIMetric.timestamp < today_start
-                )
-            ).scalar() or 0
-        
+
+        token_usage = float(today["token_usage"])
+        yesterday_token = float(yesterday["token_usage"])
         token_usage_change = calculate_change(token_usage, yesterday_token)
-        
-        # 優化查詢 3：一次性獲取錯誤數統計
-        try:
-            error_stats = db.query(
-                func.count(case((
-                    and_(
-                        GroupAIMetric.metric_type == "error",
-                        GroupAIMetric.timestamp >= today_start
-                    ), GroupAIMetric.id
-                ), else_=None)).label('today_errors'),
-                func.count(case((
-                    and_(
-                        GroupAIMetric.metric_type == "error",
-                        GroupAIMetric.timestamp >= yesterday_start,
-                        GroupAIMetric.timestamp < today_start
-                    ), GroupAIMetric.id
-                ), else_=None)).label('yesterday_errors'),
-            ).first()
-            
-            error_count = int(error_stats.today_errors or 0)
-            yesterday_errors = int(error_stats.yesterday_errors or 0)
-        except Exception as e:
-            logger.warning(f"獲取錯誤統計失敗，使用備用查詢: {e}")
-            error_count = db.query(func.count(GroupAIMetric.id)).filter(
-                GroupAIMetric.metric_type == "error",
-                GroupAIMetric.timestamp >= today_start
-            ).scalar() or 0
-            yesterday_errors = db.query(func.count(GroupAIMetric.id)).filter(
-                GroupAIMetric.metric_type == "error",
-                and_(
-                    GroupAIMetric.timestamp >= yesterday_start,
-                    GroupAIMetric.timestamp < today_start
-                )
-            ).scalar() or 0
-        
+
+        error_count = int(today["error_count"])
+        yesterday_errors = int(yesterday["error_count"])
         error_count_change = calculate_change(yesterday_errors, error_count, reverse=True)
-        
-        # 優化查詢 4：一次性獲取響應時間統計
-        try:
-            response_time_stats = db.query(
-                func.avg(case((
-                    and_(
-                        GroupAIMetric.metric_type == "response_time",
-                        GroupAIMetric.timestamp >= today_start
-                    ), GroupAIMetric.metric_value
-                ), else_=None)).label('today_avg_response'),
-                func.avg(case((
-                    and_(
-                        GroupAIMetric.metric_type == "response_time",
-                        GroupAIMetric.timestamp >= yesterday_start,
-                        GroupAIMetric.timestamp < today_start
-                    ), GroupAIMetric.metric_value
-                ), else_=None)).label('yesterday_avg_response'),
-            ).first()
-            
-            avg_response_time = float(response_time_stats.today_avg_response or 0.0)
-            yesterday_avg_response = float(response_time_stats.yesterday_avg_response or 0.0)
-        except Exception as e:
-            logger.warning(f"獲取響應時間統計失敗，使用備用查詢: {e}")
-            avg_response_time = db.query(func.avg(GroupAIMetric.metric_value)).filter(
-                GroupAIMetric.metric_type == "response_time",
-                GroupAIMetric.timestamp >= today_start
-            ).scalar() or 0.0
-            yesterday_avg_response = db.query(func.avg(GroupAIMetric.metric_value)).filter(
-                GroupAIMetric.metric_type == "response_time",
-                and_(
-                    GroupAIMetric.timestamp >= yesterday_start,
-                    GroupAIMetric.timestamp < today_start
-                )
-            ).scalar() or 0.0
-        
+
+        avg_response_time = (
+            today["response_time_sum"] / today["response_time_count"] if today["response_time_count"] else 0.0
+        )
+        yesterday_avg_response = (
+            yesterday["response_time_sum"] / yesterday["response_time_count"] if yesterday["response_time_count"] else 0.0
+        )
         response_time_change = calculate_change(yesterday_avg_response, avg_response_time, reverse=True, is_time=True)
-        
-        # 優化查詢 5：一次性獲取活躍用戶統計
-        try:
-            # 注意：distinct 和條件聚合可能需要特殊處理
-            active_users = db.query(func.count(func.distinct(GroupAIDialogueHistory.user_id))).filter(
-                GroupAIDialogueHistory.timestamp >= today_start
-            ).scalar() or 0
-            
-            yesterday_active = db.query(func.count(func.distinct(GroupAIDialogueHistory.user_id))).filter(
-                and_(
-                    GroupAIDialogueHistory.timestamp >= yesterday_start,
-                    GroupAIDialogueHistory.timestamp < today_start
-                )
-            ).scalar() or 0
-        except Exception as e:
-            logger.warning(f"獲取活躍用戶統計失敗: {e}")
-            active_users = 0
-            yesterday_active = 0
-        
+
+        active_users = int(today["active_users"])
+        yesterday_active = int(yesterday["active_users"])
         active_users_change = calculate_change(active_users, yesterday_active)
         
         # 7. 最近會話（最近10條）
@@ -333,8 +168,6 @@ def get_dashboard_stats() -> Dict[str, Any]:
             "recent_sessions": [],
             "recent_errors": [],
         }
-    finally:
-        db.close()
 
 
 def calculate_change(current: float, previous: float, reverse: bool = False, is_percentage: bool = False, is_time: bool = False) -> str:
@@ -371,10 +204,11 @@ def calculate_change(current: float, previous: float, reverse: bool = False, is_
 
 
 @router.get("/")
-@cached(prefix="dashboard_stats", ttl=60)  # 緩存 60 秒（儀表板數據更新頻率較低）
+@cached(prefix="dashboard_stats", ttl=60, vary_on=())  # 緩存 60 秒，統計數據與用戶無關，所有用戶共享並由後台提前刷新
 async def get_dashboard(
-    current_user: User = Depends(get_current_active_user)
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncDBSession = Depends(get_async_read_db)
 ):
     """獲取儀表板統計數據（從群組AI系統）"""
-    return get_dashboard_stats()
+    return await db.run_sync(collect_dashboard_stats)
 
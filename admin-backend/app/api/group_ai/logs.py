@@ -3,19 +3,29 @@
 從遠程服務器和本地服務收集真實日誌
 增強：時間範圍過濾、錯誤分析、聚合統計
 """
+import asyncio
 import logging
 import json
 import subprocess
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Query, HTTPException, Depends
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from collections import Counter, defaultdict
 
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.services.log_aggregator import get_log_aggregator
+from app.services.log_stream import (
+    LogFilter,
+    find_local_log_dir,
+    format_sse,
+    get_log_stream_hub,
+    parse_journal_line,
+    parse_local_line,
+)
 
 # 延迟导入以避免循环导入
 # from app.api.group_ai.servers import load_server_configs
@@ -88,26 +98,11 @@ def get_remote_server_logs(servers_config: dict, lines: int = 100) -> List[dict]
                 ssh.close()
                 
                 # 解析日誌
-                import re
                 for line in log_output.strip().split('\n'):
                     if line.strip() and "日誌文件不存在" not in line:
-                        journal_match = re.match(
-                            r'(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})\s+\S+\s+\S+\[.*?\]:\s*(.+)',
-                            line
-                        )
-                        if journal_match:
-                            timestamp_str, message = journal_match.groups()
-                            level_match = re.match(r'(\w+):', message)
-                            level = level_match.group(1).lower() if level_match else "info"
-                            message_clean = re.sub(r'^\w+:', '', message).strip()
-                            
-                            all_logs.append({
-                                "timestamp": timestamp_str.strip(),
-                                "level": level,
-                                "message": message_clean,
-                                "source": f"server_{node_id}",
-                                "type": "system",
-                            })
+                        entry = parse_journal_line(line, node_id)
+                        if entry:
+                            all_logs.append(entry)
             except ImportError:
                 logger.warning(f"paramiko未安裝，跳過服務器 {node_id}")
             except Exception as e:
@@ -125,15 +120,7 @@ def get_local_logs(log_dir: Path = None, lines: int = 100) -> List[dict]:
     all_logs = []
     
     if log_dir is None:
-        possible_dirs = [
-            Path.cwd() / "logs",
-            Path(__file__).parent.parent.parent.parent.parent / "logs",
-            Path(__file__).parent.parent.parent.parent.parent / "group_ai_service" / "logs",
-        ]
-        for dir_path in possible_dirs:
-            if dir_path.exists():
-                log_dir = dir_path
-                break
+        log_dir = find_local_log_dir()
     
     if log_dir and log_dir.exists():
         log_files = list(log_dir.glob("*.log")) + list(log_dir.glob("*.txt"))
@@ -145,33 +132,9 @@ def get_local_logs(log_dir: Path = None, lines: int = 100) -> List[dict]:
                     recent_lines = file_lines[-lines:] if len(file_lines) > lines else file_lines
                     
                     for line in recent_lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        # 嘗試解析標準日誌格式
-                        import re
-                        match = re.match(
-                            r'(\d{4}-\d{2}-\d{2}[\s\d:]+)\s+(\w+)\s+(.+)',
-                            line
-                        )
-                        if match:
-                            timestamp_str, level, message = match.groups()
-                            all_logs.append({
-                                "timestamp": timestamp_str.strip(),
-                                "level": level.lower(),
-                                "message": message.strip(),
-                                "source": "local",
-                                "type": "application",
-                            })
-                        else:
-                            all_logs.append({
-                                "timestamp": datetime.now().isoformat(),
-                                "level": "info",
-                                "message": line,
-                                "source": "local",
-                                "type": "application",
-                            })
+                        entry = parse_local_line(line)
+                        if entry:
+                            all_logs.append(entry)
             except Exception as e:
                 logger.warning(f"讀取日誌文件 {log_file} 失敗: {e}")
                 continue
@@ -179,6 +142,15 @@ def get_local_logs(log_dir: Path = None, lines: int = 100) -> List[dict]:
     return all_logs
 
 
+async def collect_logs(servers_config: dict, remote_lines: int, local_lines: int) -> Tuple[List[dict], List[dict]]:
+    """並行獲取遠程和本地日誌（SSH 與文件讀取為阻塞操作，放到線程池執行）"""
+    remote_logs, local_logs = await asyncio.gather(
+        asyncio.to_thread(get_remote_server_logs, servers_config, remote_lines),
+        asyncio.to_thread(get_local_logs, None, local_lines),
+    )
+    return remote_logs, local_logs
+
+
 @router.get("/", response_model=LogList, dependencies=[Depends(get_current_active_user)])
 async def list_logs(
     page: int = Query(1, ge=1),
@@ -195,10 +167,10 @@ async def list_logs(
         # 1. 從遠程服務器獲取日誌
         from app.api.group_ai.servers import load_server_configs
         servers_config = load_server_configs()
-        remote_logs = get_remote_server_logs(servers_config, lines=page_size * 3)
-        
-        # 2. 從本地日誌文件獲取日誌
-        local_logs = get_local_logs(lines=page_size * 2)
+        # 2. 從本地日誌文件獲取日誌（與遠程獲取並行，均在線程池中執行）
+        remote_logs, local_logs = await collect_logs(
+            servers_config, remote_lines=page_size * 3, local_lines=page_size * 2
+        )
         
         # 3. 合併所有日誌
         all_logs = remote_logs + local_logs
@@ -365,8 +337,7 @@ async def get_log_statistics(
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=hours)
         
-        remote_logs = get_remote_server_logs(servers_config, lines=1000)
-        local_logs = get_local_logs(lines=1000)
+        remote_logs, local_logs = await collect_logs(servers_config, remote_lines=1000, local_lines=1000)
         all_logs = remote_logs + local_logs
         
         # 時間範圍過濾
@@ -470,3 +441,54 @@ async def get_error_trends(
     except Exception as e:
         logger.error(f"获取错误趋势失败: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"获取错误趋势失败: {str(e)}")
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+@router.get("/stream", dependencies=[Depends(get_current_active_user)])
+async def stream_logs(
+    request: Request,
+    level: Optional[str] = Query(None, description="日誌級別（逗號分隔，如 error,warning）"),
+    source: Optional[str] = Query(None, description="日誌來源（逗號分隔，如 local,server_worker-01）"),
+    q: Optional[str] = Query(None, description="搜索關鍵詞"),
+    history: int = Query(50, ge=0, le=500, description="連接時先回放的最近日誌條數"),
+):
+    """
+    實時日誌推送（Server-Sent Events）
+    
+    事件：log（一條日誌）、dropped（客戶端消費過慢，自上次以來丟棄的條數）；
+    空閒時每 15 秒發送註釋行保持連接。過濾在服務端完成，遠程服務器日誌經常駐採集連接讀取。
+    """
+    hub = get_log_stream_hub()
+    subscription = await hub.subscribe(LogFilter.from_params(level, source, q), history=history)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                entry = await subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if entry is None:
+                    yield ": keepalive\n\n"
+                    continue
+                dropped = subscription.take_dropped()
+                if dropped:
+                    yield format_sse({"dropped": dropped}, event="dropped")
+                yield format_sse(entry)
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",  # 禁用 Nginx 缓冲
+        },
+    )
+
+
+@router.get("/stream/stats", dependencies=[Depends(get_current_active_user)])
+async def get_log_stream_stats(current_user: User = Depends(get_current_active_user)):
+    """實時日誌推送統計（訂閱者、分發與丟棄數、遠程採集連接狀態）"""
+    return get_log_stream_hub().get_stats()
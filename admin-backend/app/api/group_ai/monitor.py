@@ -7,7 +7,7 @@ import asyncio
 import json
 from pathlib import Path
 from typing import List, Optional, Set
-from datetime import datetime
+from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, Query, status, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
@@ -22,7 +22,9 @@ if str(project_root) not in sys.path:
 
 from group_ai_service import AccountManager
 from group_ai_service.monitor_service import MonitorService, AccountMetrics, SystemMetrics, Alert
-from app.db import get_db
+from app.db import AsyncDBSession, ReadSessionLocal, get_async_read_db, get_db
+from app.services.dashboard_counters import minute_bucket
+from app.services.metric_ingestion import query_metric_series
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +34,84 @@ router = APIRouter(tags=["Group AI Monitor"])
 account_manager = AccountManager()
 monitor_service = MonitorService()
 
+# 歷史接口的指標類型與事件類型對應
+METRIC_EVENT_TYPES = {
+    "messages": "message",
+    "replies": "reply",
+    "errors": "error",
+    "redpackets": "redpacket",
+}
+# 從指標分鐘匯總讀取的類型 -> 每個間隔取值的字段（token 用量求和，響應時間取平均）
+ROLLUP_METRIC_FIELDS = {
+    "token_usage": "sum",
+    "response_time": "avg",
+}
+
+
+def _aggregate_history(
+    metric_type: str,
+    start_time: datetime,
+    end_time: datetime,
+    interval_minutes: int,
+    account_id: Optional[str] = None
+) -> List[dict]:
+    """單次遍歷範圍內的事件，按固定時間間隔計數；token_usage / response_time 讀取指標分鐘匯總"""
+    if metric_type in ROLLUP_METRIC_FIELDS:
+        return _rollup_history(metric_type, start_time, end_time, interval_minutes, account_id)
+    interval_seconds = interval_minutes * 60
+    bucket_count = int((end_time - start_time).total_seconds() // interval_seconds) + 1
+    counts = [0] * bucket_count
+    event_type = METRIC_EVENT_TYPES.get(metric_type)
+    if event_type:
+        for event in monitor_service.query_events(start_time, end_time, account_id=account_id, event_type=event_type):
+            index = int((event["timestamp"] - start_time).total_seconds() // interval_seconds)
+            if 0 <= index < bucket_count:
+                counts[index] += 1
+    
+    return [
+        {
+            "timestamp": (start_time + timedelta(seconds=index * interval_seconds)).isoformat(),
+            "value": value
+        }
+        for index, value in enumerate(counts)
+    ]
+
+
+def _rollup_history(
+    metric_type: str,
+    start_time: datetime,
+    end_time: datetime,
+    interval_minutes: int,
+    account_id: Optional[str] = None
+) -> List[dict]:
+    """按 (metric_type, bucket) 範圍掃描分鐘匯總，補齊沒有數據的間隔"""
+    origin = minute_bucket(start_time)
+    db = ReadSessionLocal()
+    try:
+        series = query_metric_series(db, metric_type, origin, end_time, account_id, interval_minutes)
+    finally:
+        db.close()
+    field = ROLLUP_METRIC_FIELDS[metric_type]
+    values = {point["timestamp"]: point[field] for point in series}
+    interval = timedelta(minutes=interval_minutes)
+    bucket_count = int((end_time - origin) / interval) + 1
+    timestamps = [(origin + interval * index).isoformat() for index in range(bucket_count)]
+    return [{"timestamp": timestamp, "value": values.get(timestamp, 0)} for timestamp in timestamps]
+
+
+def _summarize_events(start_time: datetime, end_time: datetime) -> dict:
+    """單次遍歷範圍內的事件，統計各類型數量和回復耗時"""
+    totals = {"message": 0, "reply": 0, "error": 0, "redpacket": 0, "reply_time_total": 0.0, "reply_time_count": 0}
+    for event in monitor_service.query_events(start_time, end_time):
+        event_type = event.get("type")
+        if event_type in totals:
+            totals[event_type] += 1
+        if event_type == "reply" and "reply_time" in event:
+            totals["reply_time_total"] += event.get("reply_time") or 0
+            totals["reply_time_count"] += 1
+    return totals
+
+
 # WebSocket 連接管理
 class ConnectionManager:
     """WebSocket 連接管理器"""
@@ -195,8 +275,7 @@ class AlertResponse(BaseModel):
 @router.get("/accounts/metrics", response_model=List[AccountMetricsResponse])
 @cached(prefix="accounts_metrics", ttl=30)  # 緩存 30 秒（賬號指標更新頻率中等）
 async def get_accounts_metrics(
-    account_id: Optional[str] = Query(None, description="賬號 ID（可選）"),
-    db: Session = Depends(get_db)
+    account_id: Optional[str] = Query(None, description="賬號 ID（可選）")
 ):
     """獲取賬號指標"""
     try:
@@ -235,9 +314,7 @@ async def get_accounts_metrics(
 
 
 @router.get("/system", response_model=SystemMetricsResponse)
-async def get_system_metrics(
-    db: Session = Depends(get_db)
-):
+async def get_system_metrics():
     """獲取系統指標（實時數據，不緩存）"""
     try:
         metrics = monitor_service.get_system_metrics()
@@ -270,9 +347,8 @@ class MetricsHistoryResponse(BaseModel):
 
 @router.get("/system/history", response_model=MetricsHistoryResponse)
 async def get_system_metrics_history(
-    metric_type: str = Query("messages", description="指標類型（messages, replies, errors, redpackets）"),
-    period: str = Query("24h", description="時間範圍（1h, 24h, 7d, 30d）"),
-    db: Session = Depends(get_db)
+    metric_type: str = Query("messages", description="指標類型（messages, replies, errors, redpackets, token_usage, response_time）"),
+    period: str = Query("24h", description="時間範圍（1h, 24h, 7d, 30d）")
 ):
     """獲取系統指標歷史數據"""
     try:
@@ -298,43 +374,10 @@ async def get_system_metrics_history(
                 detail=f"不支持的時間範圍: {period}"
             )
         
-        # 從事件日誌中提取歷史數據
-        data_points = []
-        events = list(monitor_service.event_log)
-        
-        # 過濾時間範圍內的事件
-        filtered_events = [
-            e for e in events
-            if "timestamp" in e and e["timestamp"] >= start_time
-        ]
-        
-        # 按時間間隔聚合數據
-        current_time = start_time
-        while current_time <= now:
-            next_time = current_time + timedelta(minutes=interval_minutes)
-            
-            # 統計該時間段內的事件
-            period_events = [
-                e for e in filtered_events
-                if current_time <= e.get("timestamp", datetime.min) < next_time
-            ]
-            
-            value = 0
-            if metric_type == "messages":
-                value = len([e for e in period_events if e.get("type") == "message"])
-            elif metric_type == "replies":
-                value = len([e for e in period_events if e.get("type") == "reply"])
-            elif metric_type == "errors":
-                value = len([e for e in period_events if e.get("type") == "error"])
-            elif metric_type == "redpackets":
-                value = len([e for e in period_events if e.get("type") == "redpacket"])
-            
-            data_points.append({
-                "timestamp": current_time.isoformat(),
-                "value": value
-            })
-            
-            current_time = next_time
+        # 從事件歸檔中流式讀取（token_usage / response_time 讀取指標分鐘匯總）並按時間間隔聚合
+        data_points = await asyncio.to_thread(
+            _aggregate_history, metric_type, start_time, now, interval_minutes
+        )
         
         return MetricsHistoryResponse(
             metric_type=metric_type,
@@ -363,9 +406,8 @@ class AccountMetricsHistoryResponse(BaseModel):
 @router.get("/accounts/{account_id}/history", response_model=AccountMetricsHistoryResponse)
 async def get_account_metrics_history(
     account_id: str,
-    metric_type: str = Query("messages", description="指標類型（messages, replies, errors, redpackets）"),
-    period: str = Query("24h", description="時間範圍（1h, 24h, 7d, 30d）"),
-    db: Session = Depends(get_db)
+    metric_type: str = Query("messages", description="指標類型（messages, replies, errors, redpackets, token_usage, response_time）"),
+    period: str = Query("24h", description="時間範圍（1h, 24h, 7d, 30d）")
 ):
     """獲取賬號指標歷史數據"""
     try:
@@ -391,44 +433,10 @@ async def get_account_metrics_history(
                 detail=f"不支持的時間範圍: {period}"
             )
         
-        # 從事件日誌中提取該賬號的歷史數據
-        data_points = []
-        events = list(monitor_service.event_log)
-        
-        # 過濾該賬號和時間範圍內的事件
-        filtered_events = [
-            e for e in events
-            if e.get("account_id") == account_id
-            and "timestamp" in e
-            and e["timestamp"] >= start_time
-        ]
-        
-        # 按時間間隔聚合數據
-        current_time = start_time
-        while current_time <= now:
-            next_time = current_time + timedelta(minutes=interval_minutes)
-            
-            period_events = [
-                e for e in filtered_events
-                if current_time <= e.get("timestamp", datetime.min) < next_time
-            ]
-            
-            value = 0
-            if metric_type == "messages":
-                value = len([e for e in period_events if e.get("type") == "message"])
-            elif metric_type == "replies":
-                value = len([e for e in period_events if e.get("type") == "reply"])
-            elif metric_type == "errors":
-                value = len([e for e in period_events if e.get("type") == "error"])
-            elif metric_type == "redpackets":
-                value = len([e for e in period_events if e.get("type") == "redpacket"])
-            
-            data_points.append({
-                "timestamp": current_time.isoformat(),
-                "value": value
-            })
-            
-            current_time = next_time
+        # 從事件歸檔（或指標分鐘匯總）讀取該賬號的數據並按時間間隔聚合
+        data_points = await asyncio.to_thread(
+            _aggregate_history, metric_type, start_time, now, interval_minutes, account_id
+        )
         
         return AccountMetricsHistoryResponse(
             account_id=account_id,
@@ -463,8 +471,7 @@ class MetricsStatisticsResponse(BaseModel):
 
 @router.get("/system/statistics", response_model=MetricsStatisticsResponse)
 async def get_system_statistics(
-    period: str = Query("24h", description="時間範圍（1h, 24h, 7d, 30d）"),
-    db: Session = Depends(get_db)
+    period: str = Query("24h", description="時間範圍（1h, 24h, 7d, 30d）")
 ):
     """獲取系統指標統計"""
     try:
@@ -485,27 +492,19 @@ async def get_system_statistics(
                 detail=f"不支持的時間範圍: {period}"
             )
         
-        # 從事件日誌中統計
-        events = list(monitor_service.event_log)
-        filtered_events = [
-            e for e in events
-            if "timestamp" in e and e["timestamp"] >= start_time
-        ]
-        
-        total_messages = len([e for e in filtered_events if e.get("type") == "message"])
-        total_replies = len([e for e in filtered_events if e.get("type") == "reply"])
-        total_errors = len([e for e in filtered_events if e.get("type") == "error"])
-        total_redpackets = len([e for e in filtered_events if e.get("type") == "redpacket"])
+        # 從事件歸檔中單次遍歷統計
+        totals = await asyncio.to_thread(_summarize_events, start_time, now)
+        total_messages = totals["message"]
+        total_replies = totals["reply"]
+        total_errors = totals["error"]
+        total_redpackets = totals["redpacket"]
         
         reply_rate = (total_replies / total_messages * 100) if total_messages > 0 else 0.0
         error_rate = (total_errors / total_messages * 100) if total_messages > 0 else 0.0
         
-        # 計算平均回復時間（從事件中提取）
-        reply_times = [
-            e.get("reply_time", 0) for e in filtered_events
-            if e.get("type") == "reply" and "reply_time" in e
-        ]
-        average_reply_time = sum(reply_times) / len(reply_times) if reply_times else 0.0
+        average_reply_time = (
+            totals["reply_time_total"] / totals["reply_time_count"] if totals["reply_time_count"] else 0.0
+        )
         
         return MetricsStatisticsResponse(
             total_messages=total_messages,
@@ -538,7 +537,7 @@ async def get_alerts(
     check_rules: bool = Query(False, description="是否執行告警規則檢查"),
     use_aggregation: bool = Query(True, description="是否使用告警聚合"),
     severity: Optional[str] = Query(None, description="告警嚴重程度（critical, high, medium, low）"),
-    db: Session = Depends(get_db)
+    db: AsyncDBSession = Depends(get_async_read_db)
 ):
     """獲取告警列表（支持聚合和去重）"""
     try:
@@ -547,7 +546,7 @@ async def get_alerts(
             try:
                 from app.crud import alert_rule as crud_alert_rule
                 # 從數據庫讀取啟用的告警規則
-                enabled_rules = crud_alert_rule.get_enabled_alert_rules(db)
+                enabled_rules = await db.run_sync(crud_alert_rule.get_enabled_alert_rules)
                 if enabled_rules:
                     # 使用規則進行告警檢查
                     new_alerts = monitor_service.check_alerts(alert_rules=enabled_rules)
@@ -787,26 +786,22 @@ async def resolve_alert(
 async def get_events(
     account_id: Optional[str] = Query(None, description="賬號 ID（可選）"),
     event_type: Optional[str] = Query(None, description="事件類型（message, reply, redpacket）"),
-    limit: int = Query(100, ge=1, le=1000, description="返回數量"),
-    db: Session = Depends(get_db)
+    limit: int = Query(100, ge=1, le=1000, description="返回數量")
 ):
     """獲取事件日誌"""
     try:
-        events = list(monitor_service.event_log)
-        
-        # 過濾
-        if account_id:
-            events = [e for e in events if e.get("account_id") == account_id]
-        if event_type:
-            events = [e for e in events if e.get("type") == event_type]
-        
-        # 限制數量
-        events = events[-limit:] if len(events) > limit else events
+        # 最近的事件（按時間正序），有歸檔時從最新的段往前讀
+        events = await asyncio.to_thread(
+            monitor_service.get_event_log, account_id=account_id, event_type=event_type, limit=limit
+        )
+        events.reverse()
         
-        # 格式化時間戳
-        for event in events:
-            if "timestamp" in event and hasattr(event["timestamp"], "isoformat"):
-                event["timestamp"] = event["timestamp"].isoformat()
+        # 格式化時間戳（複製事件，不改動內存中的事件日誌）
+        events = [
+            {**event, "timestamp": event["timestamp"].isoformat()}
+            if hasattr(event.get("timestamp"), "isoformat") else event
+            for event in events
+        ]
         
         return events
     
@@ -8,7 +8,7 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.db import get_db, get_read_db
 from app.models.group_ai import (
     GroupAIRoleAssignmentScheme,
     GroupAIRoleAssignmentHistory,
@@ -19,6 +19,8 @@ from app.middleware.permission import check_permission
 from app.core.permissions import PermissionCode
 from app.models.user import User
 from app.core.errors import UserFriendlyError
+from app.core.pagination import CountMode, paginate
+from app.core.search import apply_search
 from group_ai_service import ServiceManager
 from app.api.group_ai.accounts import get_service_manager
 from app.core.cache import cached, invalidate_cache
@@ -69,7 +71,12 @@ class SchemeResponse(BaseModel):
 class SchemeListResponse(BaseModel):
     """分配方案列表響應"""
     items: List[SchemeResponse]
-    total: int
+    total: Optional[int] = None  # count_mode=none 時為 None
+    page: Optional[int] = None
+    page_size: Optional[int] = None
+    total_estimated: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 class ApplySchemeRequest(BaseModel):
@@ -103,7 +110,12 @@ class HistoryResponse(BaseModel):
 class HistoryListResponse(BaseModel):
     """歷史記錄列表響應"""
     items: List[HistoryResponse]
-    total: int
+    total: Optional[int] = None  # count_mode=none 時為 None
+    page: Optional[int] = None
+    page_size: Optional[int] = None
+    total_estimated: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 # ============ API 端點 ============
@@ -213,13 +225,15 @@ async def list_schemes(
     script_id: Optional[str] = Query(None, description="按劇本ID過濾"),
     search: Optional[str] = Query(None, description="搜索關鍵詞（方案名稱、描述）"),
     mode: Optional[str] = Query(None, description="分配模式過濾（auto, manual）"),
-    sort_by: Optional[str] = Query("created_at", description="排序字段（name, created_at, updated_at）"),
+    sort_by: Optional[str] = Query("created_at", description="排序字段（name, created_at, updated_at, relevance）"),
     sort_order: Optional[str] = Query("desc", description="排序順序（asc, desc）"),
     page: int = Query(1, ge=1, description="頁碼"),
     page_size: int = Query(20, ge=1, le=100, description="每頁數量"),
+    cursor: Optional[str] = Query(None, description="分頁游標（上一頁返回的 next_cursor）"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="總數計算模式（exact, estimated, none）"),
     _t: Optional[int] = Query(None, description="強制刷新時間戳（繞過緩存）"),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """列出所有分配方案（需要 role_assignment_scheme:view 權限，帶緩存）"""
     # 如果提供了強制刷新時間戳，清除緩存
@@ -233,13 +247,9 @@ async def list_schemes(
         if script_id:
             query = query.filter(GroupAIRoleAssignmentScheme.script_id == script_id)
         
-        # 搜索過濾
-        if search:
-            search_filter = f"%{search}%"
-            query = query.filter(
-                (GroupAIRoleAssignmentScheme.name.like(search_filter)) |
-                (GroupAIRoleAssignmentScheme.description.like(search_filter))
-            )
+        # 搜索過濾（全文/trigram 索引；sort_by=relevance 時按相關度前置排序）
+        ranked = bool(search) and sort_by == "relevance"
+        query = apply_search(query, GroupAIRoleAssignmentScheme, search, ranked=ranked)
         
         # 分配模式過濾
         if mode:
@@ -253,17 +263,19 @@ async def list_schemes(
         else:  # 默認按創建時間
             order_by = GroupAIRoleAssignmentScheme.created_at
         
-        if sort_order == "asc":
-            query = query.order_by(order_by.asc())
-        else:
-            query = query.order_by(order_by.desc())
-        
-        # 總數
-        total = query.count()
-        
-        # 分頁
-        offset = (page - 1) * page_size
-        schemes = query.offset(offset).limit(page_size).all()
+        # 分頁（Keyset 游標 + 可選計數模式）
+        result_page = paginate(
+            query,
+            sort_column=order_by,
+            tiebreak_column=GroupAIRoleAssignmentScheme.id,
+            descending=sort_order != "asc",
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count_mode=count_mode,
+            keyset=not ranked,
+        )
+        schemes = result_page.items
         
         # 獲取劇本名稱
         script_ids = {s.script_id for s in schemes}
@@ -288,8 +300,18 @@ async def list_schemes(
                 updated_at=scheme.updated_at.isoformat() if scheme.updated_at else ""
             ))
         
-        return SchemeListResponse(items=items, total=total)
+        return SchemeListResponse(
+            items=items,
+            total=result_page.total,
+            page=result_page.page,
+            page_size=page_size,
+            total_estimated=result_page.total_estimated,
+            has_more=result_page.has_more,
+            next_cursor=result_page.next_cursor,
+        )
     
+    except UserFriendlyError:
+        raise
     except Exception as e:
         logger.error(f"列出分配方案失敗: {e}", exc_info=True)
         raise UserFriendlyError(
@@ -558,6 +580,8 @@ async def get_scheme_history(
     scheme_id: str,
     page: int = Query(1, ge=1, description="頁碼"),
     page_size: int = Query(20, ge=1, le=100, description="每頁數量"),
+    cursor: Optional[str] = Query(None, description="分頁游標（上一頁返回的 next_cursor）"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="總數計算模式（exact, estimated, none）"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
@@ -581,11 +605,16 @@ async def get_scheme_history(
             GroupAIRoleAssignmentHistory.scheme_id == scheme_id
         )
         
-        total = query.count()
-        
-        # 分頁
-        offset = (page - 1) * page_size
-        histories = query.order_by(GroupAIRoleAssignmentHistory.applied_at.desc()).offset(offset).limit(page_size).all()
+        result_page = paginate(
+            query,
+            sort_column=GroupAIRoleAssignmentHistory.applied_at,
+            tiebreak_column=GroupAIRoleAssignmentHistory.id,
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            count_mode=count_mode,
+        )
+        histories = result_page.items
         
         # 格式化響應
         items = []
@@ -602,7 +631,15 @@ async def get_scheme_history(
                 extra_data=history.extra_data or {}
             ))
         
-        return HistoryListResponse(items=items, total=total)
+        return HistoryListResponse(
+            items=items,
+            total=result_page.total,
+            page=result_page.page,
+            page_size=page_size,
+            total_estimated=result_page.total_estimated,
+            has_more=result_page.has_more,
+            next_cursor=result_page.next_cursor,
+        )
     
     except UserFriendlyError:
         raise
@@ -23,6 +23,17 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/scheduled-messages", tags=["Scheduled Messages"])
 
 
+def _validate_condition(condition: Optional[str]) -> None:
+    """保存前編譯條件表達式，語法錯誤直接返回 400，而不是在觸發時才靜默失敗"""
+    if not condition:
+        return
+    from group_ai_service.condition_evaluator import ConditionEvaluator
+
+    valid, error = ConditionEvaluator().validate_condition(condition)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+
+
 # ============ 請求/響應模型 ============
 
 class ScheduledMessageCreate(BaseModel):
@@ -151,6 +162,7 @@ async def create_scheduled_message(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"任務 ID {data.task_id} 已存在"
         )
+    _validate_condition(data.condition)
     
     # 創建任務
     task = ScheduledMessageTask(
@@ -252,6 +264,7 @@ async def update_scheduled_message(
     
     # 更新字段
     update_data = data.dict(exclude_unset=True)
+    _validate_condition(update_data.get("condition"))
     for key, value in update_data.items():
         setattr(task, key, value)
     
@@ -11,6 +11,7 @@ from sqlalchemy import desc
 
 from app.db import get_db
 from app.models.group_ai import GroupAIScript, GroupAIScriptVersion
+from app.services.script_diff import structural_diff
 
 logger = logging.getLogger(__name__)
 
@@ -74,14 +75,11 @@ async def compare_script_versions(
             detail=f"版本 {version2} 不存在"
         )
     
-    # 簡單的差異檢測（可以後續增強為更詳細的diff）
+    # 內容哈希相同時無需讀取內容；否則按場景/觸發條件/回復做結構化對比
     differences = []
     
-    if v1.yaml_content != v2.yaml_content:
-        differences.append({
-            "type": "content",
-            "description": "YAML內容已變更"
-        })
+    if not (v1.content_hash and v1.content_hash == v2.content_hash):
+        differences.extend(structural_diff(v1.yaml_content, v2.yaml_content))
     
     if v1.description != v2.description:
         differences.append({
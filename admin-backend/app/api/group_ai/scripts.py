@@ -18,7 +18,8 @@ if str(project_root) not in sys.path:
 from group_ai_service import ScriptParser, Script
 from group_ai_service.format_converter import FormatConverter
 from group_ai_service.enhanced_format_converter import EnhancedFormatConverter
-from app.db import get_db
+from app.crud.bulk import chunked, fetch_existing
+from app.db import get_db, get_read_db
 from app.models.group_ai import GroupAIScript, GroupAIScriptVersion
 from app.api.deps import get_current_active_user
 from app.middleware.permission import check_permission
@@ -26,7 +27,9 @@ from app.core.permissions import PermissionCode
 from app.models.user import User
 
 # 導入緩存功能
-from app.core.cache import cached, invalidate_cache
+from app.core.cache import cached, invalidate_cache, invalidate_tags
+from app.core.pagination import CountMode, paginate
+from app.core.search import apply_search
 
 logger = logging.getLogger(__name__)
 
@@ -561,12 +564,13 @@ async def create_script(
 @cached(prefix="scripts_list", ttl=120)  # 緩存 120 秒（劇本列表更新頻率較低）
 async def list_scripts(
     current_user=Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = Query(0, ge=0, description="跳過數量"),
     limit: int = Query(100, ge=1, le=1000, description="每頁數量"),
     search: Optional[str] = Query(None, description="搜索關鍵詞（名稱、ID、描述）"),
+    search_yaml: bool = Query(False, description="同時搜索劇本 YAML 內容"),
     status: Optional[str] = Query(None, description="狀態過濾（draft, reviewing, published, disabled）"),
-    sort_by: Optional[str] = Query("created_at", description="排序字段（name, created_at, updated_at, status）"),
+    sort_by: Optional[str] = Query("created_at", description="排序字段（name, created_at, updated_at, status, relevance）"),
     sort_order: Optional[str] = Query("desc", description="排序順序（asc, desc）"),
     _t: Optional[int] = Query(None, description="強制刷新時間戳（繞過緩存）")
 ):
@@ -583,14 +587,15 @@ async def list_scripts(
         # 構建查詢
         query = db.query(GroupAIScript)
         
-        # 搜索過濾
-        if search:
-            search_filter = f"%{search}%"
-            query = query.filter(
-                (GroupAIScript.script_id.like(search_filter)) |
-                (GroupAIScript.name.like(search_filter)) |
-                (GroupAIScript.description.like(search_filter))
-            )
+        # 搜索過濾（全文/trigram 索引；sort_by=relevance 時按相關度前置排序）
+        ranked = bool(search) and sort_by == "relevance"
+        query = apply_search(
+            query,
+            GroupAIScript,
+            search,
+            columns=("script_id", "name", "description", "yaml_content") if search_yaml else None,
+            ranked=ranked,
+        )
         
         # 狀態過濾
         if status:
@@ -606,17 +611,17 @@ async def list_scripts(
         else:  # 默認按創建時間
             order_by = GroupAIScript.created_at
         
-        if sort_order == "asc":
-            query = query.order_by(order_by.asc())
-        else:
-            query = query.order_by(order_by.desc())
-        
-        # 獲取總數
-        total_count = query.count()
-        logger.debug(f"查詢條件下劇本總數: {total_count}")
-        
-        # 分頁
-        scripts = query.offset(skip).limit(limit).all()
+        # 分頁（列表響應不返回總數，跳過 COUNT 查詢）
+        scripts = paginate(
+            query,
+            sort_column=order_by,
+            tiebreak_column=GroupAIScript.id,
+            descending=sort_order != "asc",
+            page_size=limit,
+            offset=skip,
+            count_mode=CountMode.NONE,
+            keyset=not ranked,
+        ).items
         logger.debug(f"查詢到 {len(scripts)} 個劇本 (skip={skip}, limit={limit})")
         
         result = []
@@ -699,7 +704,7 @@ async def list_scripts(
 
 
 @router.get("/{script_id}", response_model=ScriptDetailResponse)
-@cached(prefix="script_detail", ttl=60)  # 緩存 60 秒（劇本詳情變化較慢）
+@cached(prefix="script_detail", ttl=60, tags=("script:{script_id}",))  # 緩存 60 秒（劇本詳情變化較慢）
 async def get_script(
     script_id: str,
     current_user: User = Depends(get_current_active_user),
@@ -709,7 +714,7 @@ async def get_script(
     """獲取劇本詳情（需要 script:view 權限，帶緩存）"""
     # 如果提供了強制刷新時間戳，清除緩存
     if _t is not None:
-        invalidate_cache(f"script_detail:{script_id}:*")
+        invalidate_tags(f"script:{script_id}")
     check_permission(current_user, PermissionCode.SCRIPT_VIEW.value, db)
     script = db.query(GroupAIScript).filter(
         GroupAIScript.script_id == script_id
@@ -1380,6 +1385,51 @@ class BatchScriptResponse(BaseModel):
     failed_items: List[dict] = []
 
 
+_BATCH_ALLOWED_STATUS = {
+    "submit_review": (("draft",), "無法提交審核（必須為 draft）"),
+    "publish": (("approved", "reviewing"), "無法發布（必須為 approved 或 reviewing）"),
+    "revert_to_draft": (("reviewing", "approved", "rejected"), "無法還原為草稿"),
+}
+
+_BATCH_TARGET_STATUS = {
+    "submit_review": "reviewing",
+    "publish": "published",
+    "disable": "disabled",
+    "revert_to_draft": "draft",
+}
+
+
+def _batch_action_error(action: str, current_status: str) -> Optional[str]:
+    """檢查劇本當前狀態是否允許執行批量操作，不允許時返回錯誤信息"""
+    allowed = _BATCH_ALLOWED_STATUS.get(action)
+    if allowed and current_status not in allowed[0]:
+        return f"劇本狀態為 {current_status}，{allowed[1]}"
+    return None
+
+
+def _apply_batch_action(db: Session, action: str, script_ids: List[str]) -> None:
+    """對一組劇本執行批量操作（每個 chunk 一條 UPDATE/DELETE 語句，不提交）"""
+    from datetime import datetime
+    
+    for chunk in chunked(script_ids):
+        if action == "delete":
+            # 刪除劇本版本記錄
+            db.query(GroupAIScriptVersion).filter(
+                GroupAIScriptVersion.script_id.in_(chunk)
+            ).delete(synchronize_session=False)
+            db.query(GroupAIScript).filter(
+                GroupAIScript.script_id.in_(chunk)
+            ).delete(synchronize_session=False)
+        else:
+            values = {"status": _BATCH_TARGET_STATUS[action]}
+            if action == "publish":
+                values["published_at"] = datetime.utcnow()
+            db.query(GroupAIScript).filter(
+                GroupAIScript.script_id.in_(chunk)
+            ).update(values, synchronize_session=False)
+    db.flush()
+
+
 @router.post("/batch", response_model=BatchScriptResponse, status_code=status.HTTP_200_OK)
 async def batch_operate_scripts(
     request: BatchScriptRequest,
@@ -1420,108 +1470,55 @@ async def batch_operate_scripts(
     cache_cleared = invalidate_cache("scripts_list*")
     logger.debug(f"批量操作前清除 {cache_cleared} 個劇本列表緩存鍵")
     
-    success_count = 0
-    failed_count = 0
     success_ids = []
     failed_items = []
     
     try:
-        # URL 解碼所有 script_id（處理可能包含特殊字符的情況）
+        # URL 解碼所有 script_id（處理可能包含特殊字符的情況），並去重
         import urllib.parse
-        decoded_script_ids = [urllib.parse.unquote(sid) if "%" in sid else sid for sid in request.script_ids]
+        decoded_script_ids = list(dict.fromkeys(
+            urllib.parse.unquote(sid) if "%" in sid else sid for sid in request.script_ids
+        ))
         
+        # 一次 IN 查詢取出所有劇本的當前狀態
+        scripts = fetch_existing(db, GroupAIScript, "script_id", decoded_script_ids, columns=("script_id", "status"))
+        
+        eligible_ids = []
         for script_id in decoded_script_ids:
-            try:
-                script = db.query(GroupAIScript).filter(
-                    GroupAIScript.script_id == script_id
-                ).first()
-                
-                if not script:
-                    # 記錄詳細日誌以便調試
-                    logger.warning(f"批量操作時劇本不存在: {script_id} (原始: {request.script_ids[decoded_script_ids.index(script_id)] if script_id in decoded_script_ids else script_id})")
-                    failed_items.append({
-                        "script_id": script_id,
-                        "error": "劇本不存在（可能已被刪除或從未存在）"
-                    })
-                    failed_count += 1
-                    continue
-                
-                # 執行操作
-                if request.action == "delete":
-                    # 刪除劇本版本記錄
-                    versions = db.query(GroupAIScriptVersion).filter(
-                        GroupAIScriptVersion.script_id == script_id
-                    ).all()
-                    for version in versions:
-                        db.delete(version)
-                    
-                    # 刪除劇本
-                    db.delete(script)
-                    db.flush()
-                    db.commit()
-                    success_ids.append(script_id)
-                    success_count += 1
-                    logger.info(f"批量刪除劇本成功: {script_id} (已刪除 {len(versions)} 個版本記錄)")
-                
-                elif request.action == "submit_review":
-                    if script.status != "draft":
-                        failed_items.append({
-                            "script_id": script_id,
-                            "error": f"劇本狀態為 {script.status}，無法提交審核（必須為 draft）"
-                        })
-                        failed_count += 1
-                        continue
-                    script.status = "reviewing"
-                    db.commit()
-                    success_ids.append(script_id)
-                    success_count += 1
-                    logger.info(f"批量提交審核成功: {script_id}")
-                
-                elif request.action == "publish":
-                    if script.status not in ["approved", "reviewing"]:
-                        failed_items.append({
-                            "script_id": script_id,
-                            "error": f"劇本狀態為 {script.status}，無法發布（必須為 approved 或 reviewing）"
-                        })
-                        failed_count += 1
-                        continue
-                    script.status = "published"
-                    from datetime import datetime
-                    script.published_at = datetime.utcnow()
-                    db.commit()
-                    success_ids.append(script_id)
-                    success_count += 1
-                    logger.info(f"批量發布劇本成功: {script_id}")
-                
-                elif request.action == "disable":
-                    script.status = "disabled"
-                    db.commit()
-                    success_ids.append(script_id)
-                    success_count += 1
-                    logger.info(f"批量停用劇本成功: {script_id}")
-                
-                elif request.action == "revert_to_draft":
-                    if script.status not in ["reviewing", "approved", "rejected"]:
-                        failed_items.append({
-                            "script_id": script_id,
-                            "error": f"劇本狀態為 {script.status}，無法還原為草稿"
-                        })
-                        failed_count += 1
-                        continue
-                    script.status = "draft"
-                    db.commit()
-                    success_ids.append(script_id)
-                    success_count += 1
-                    logger.info(f"批量還原為草稿成功: {script_id}")
-                
-            except Exception as e:
-                logger.error(f"批量操作劇本 {script_id} 失敗: {e}", exc_info=True)
+            script = scripts.get(script_id)
+            if not script:
+                logger.warning(f"批量操作時劇本不存在: {script_id}")
                 failed_items.append({
                     "script_id": script_id,
-                    "error": str(e)
+                    "error": "劇本不存在（可能已被刪除或從未存在）"
                 })
-                failed_count += 1
-                db.rollback()
+                continue
+            error = _batch_action_error(request.action, script.status)
+            if error:
+                failed_items.append({"script_id": script_id, "error": error})
+                continue
+            eligible_ids.append(script_id)
+        
+        # 整批在一個事務中執行；批量語句失敗時逐個劇本重試，只報告出錯的劇本
+        try:
+            with db.begin_nested():
+                _apply_batch_action(db, request.action, eligible_ids)
+            success_ids = eligible_ids
+        except Exception as e:
+            logger.warning(f"批量操作劇本失敗，逐個重試: {e}")
+            for script_id in eligible_ids:
+                try:
+                    with db.begin_nested():
+                        _apply_batch_action(db, request.action, [script_id])
+                    success_ids.append(script_id)
+                except Exception as row_error:
+                    logger.error(f"批量操作劇本 {script_id} 失敗: {row_error}", exc_info=True)
+                    failed_items.append({"script_id": script_id, "error": str(row_error)})
+        db.commit()
+        
+        success_count = len(success_ids)
+        failed_count = len(failed_items)
+        logger.info(f"批量操作劇本 {request.action}: 成功 {success_count}，失敗 {failed_count}")
         
         # 批量操作完成後再次清除緩存，確保列表更新
         cache_cleared_after = invalidate_cache("scripts_list*")
@@ -1535,6 +1532,7 @@ async def batch_operate_scripts(
         )
     
     except Exception as e:
+        db.rollback()
         logger.error(f"批量操作劇本失敗: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
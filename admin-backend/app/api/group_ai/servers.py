@@ -8,7 +8,6 @@ from pydantic import BaseModel
 from typing import List, Optional, Dict
 from sqlalchemy.orm import Session
 import subprocess
-import json
 import os
 from pathlib import Path
 import logging
@@ -16,6 +15,7 @@ import logging
 from app.api.deps import get_db, get_current_active_user
 from app.models.user import User
 from app.core.cache import cached, invalidate_cache
+from app.core.config_registry import get_config_registry
 
 logger = logging.getLogger(__name__)
 
@@ -50,8 +50,16 @@ class ServerActionRequest(BaseModel):
     node_id: str
 
 
+# 已找到的主節點配置文件路徑（找到後不再逐個探測候選路徑）
+_master_config_path: Optional[Path] = None
+
+
 def get_master_config_path() -> Path:
     """獲取主節點配置文件路徑（支持多種路徑查找）"""
+    global _master_config_path
+    if _master_config_path is not None:
+        return _master_config_path
+
     # 方法1: 從 API 文件位置解析（admin-backend/app/api/group_ai/servers.py -> 項目根目錄）
     api_file_path = Path(__file__).resolve()
     project_root_from_api = api_file_path.parent.parent.parent.parent.parent
@@ -76,6 +84,7 @@ def get_master_config_path() -> Path:
     for config_path in all_paths:
         if config_path.exists():
             logger.info(f"找到服務器配置文件: {config_path}")
+            _master_config_path = config_path
             return config_path
     
     # 如果都不存在，返回最可能的路徑（用於創建）
@@ -84,21 +93,16 @@ def get_master_config_path() -> Path:
 
 
 def load_server_configs() -> Dict:
-    """加載服務器配置"""
-    config_path = get_master_config_path()
-    if not config_path.exists():
-        logger.warning(f"服務器配置文件不存在: {config_path}，返回空配置")
-        return {}
-    
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            servers = data.get('servers', {})
-            logger.info(f"成功加載 {len(servers)} 個服務器配置")
-            return servers
-    except Exception as e:
-        logger.error(f"加載服務器配置文件失敗: {e}", exc_info=True)
+    """
+    加載服務器配置
+
+    經配置註冊表讀取：文件只在變化後重新解析，返回只讀快照（FrozenDict），
+    需要修改時先用 app.core.config_registry.thaw 複製
+    """
+    data = get_config_registry().get(get_master_config_path())
+    if not isinstance(data, dict):
         return {}
+    return data.get('servers', {})
 
 
 @router.get("/", response_model=List[ServerStatus])
@@ -4,7 +4,6 @@ Session文件自動上傳和分配服務
 """
 import logging
 import json
-import paramiko
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
@@ -71,6 +70,7 @@ class SessionUploader:
     def _get_server_account_count(self, node: ServerNode) -> int:
         """獲取服務器上的實際賬號數量"""
         try:
+            import paramiko
             ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh.connect(node.host, username=node.user, password=node.password, timeout=10)
@@ -130,6 +130,8 @@ class SessionUploader:
             if not session_path.exists():
                 return False, f"Session文件不存在: {session_file}"
             
+            import paramiko
+            
             ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh.connect(node.host, username=node.user, password=node.password, timeout=30)
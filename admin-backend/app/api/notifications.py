@@ -8,6 +8,7 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr, Field, ConfigDict, field_validator
 
 from app.api.deps import get_current_active_user, get_db_session
+from app.db import SessionLocal
 from app.models.user import User
 from app.middleware.permission import check_permission
 from app.core.permissions import PermissionCode
@@ -18,7 +19,7 @@ from app.crud.notification import (
     list_notification_configs,
     update_notification_config,
     delete_notification_config,
-    get_notifications,
+    get_notifications_page,
     get_unread_count,
     mark_notification_read,
     mark_all_read,
@@ -31,6 +32,8 @@ from app.crud.notification import (
     delete_notifications,
 )
 from app.core.cache import cached, invalidate_cache
+from group_ai_service.template_compiler import render_format_template
+from app.core.pagination import CountMode
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/notifications", tags=["notifications"])
@@ -111,10 +114,13 @@ class NotificationRead(BaseModel):
 class NotificationListResponse(BaseModel):
     """通知列表響應"""
     items: List[NotificationRead]
-    total: int
+    total: Optional[int] = None  # count_mode=none 時為 None
     skip: int
     limit: int
     unread_count: int
+    total_estimated: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
 
 
 class NotificationTemplateCondition(BaseModel):
@@ -454,8 +460,8 @@ async def preview_notification_template_endpoint(
         raise HTTPException(status_code=400, detail="缺少模板內容")
 
     try:
-        title = title_template.format(**preview.context)
-        message = body_template.format(**preview.context)
+        title = render_format_template(title_template, preview.context)
+        message = render_format_template(body_template, preview.context)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"模板渲染失敗: {str(e)}") from e
 
@@ -487,6 +493,8 @@ async def list_notifications_endpoint(
     limit: int = Query(50, ge=1, le=1000),
     read: Optional[bool] = Query(None),
     notification_type: Optional[NotificationType] = Query(None),
+    cursor: Optional[str] = Query(None, description="分頁游標（上一頁返回的 next_cursor）"),
+    count_mode: CountMode = Query(CountMode.EXACT, description="總數計算模式（exact, estimated, none）"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db_session)
 ):
@@ -494,10 +502,12 @@ async def list_notifications_endpoint(
     recipient_email = _get_recipient_email(current_user, db)
     
     try:
-        notifications, total = get_notifications(
+        page = get_notifications_page(
             db,
             skip=skip,
             limit=limit,
+            cursor=cursor,
+            count_mode=count_mode,
             recipient=recipient_email,
             read=read,
             notification_type=notification_type,
@@ -506,7 +516,7 @@ async def list_notifications_endpoint(
         
         # 手動轉換通知對象，確保 datetime 字段正確序列化為字符串
         notification_items = []
-        for n in notifications:
+        for n in page.items:
             notification_items.append(NotificationRead(
                 id=n.id,
                 config_id=n.config_id,
@@ -529,11 +539,16 @@ async def list_notifications_endpoint(
         
         return NotificationListResponse(
             items=notification_items,
-            total=total,
-            skip=skip,
+            total=page.total,
+            skip=(page.page - 1) * limit if cursor else skip,
             limit=limit,
             unread_count=unread_count,
+            total_estimated=page.total_estimated,
+            has_more=page.has_more,
+            next_cursor=page.next_cursor,
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"查詢通知失敗: {e}", exc_info=True)
         raise HTTPException(
@@ -567,6 +582,7 @@ async def mark_notification_read_endpoint(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"通知 {notification_id} 不存在或無權限"
         )
+    await _push_unread_count(db, recipient_email)
     return {"message": "通知已標記為已讀"}
 
 
@@ -578,6 +594,7 @@ async def mark_all_read_endpoint(
     """標記所有通知為已讀"""
     recipient_email = _get_recipient_email(current_user, db)
     count = mark_all_read(db, recipient=recipient_email)
+    await _push_unread_count(db, recipient_email)
     return {"message": f"已標記 {count} 條通知為已讀", "count": count}
 
 
@@ -593,6 +610,7 @@ async def batch_mark_notifications_read_endpoint(
         notification_ids=request.notification_ids,
         recipient=recipient_email,
     )
+    await _push_unread_count(db, recipient_email)
     return {"message": f"已標記 {updated} 條通知為已讀", "count": updated}
 
 
@@ -608,56 +626,107 @@ async def batch_delete_notifications_endpoint(
         notification_ids=request.notification_ids,
         recipient=recipient_email,
     )
+    await _push_unread_count(db, recipient_email)
     return {"message": f"已刪除 {deleted} 條通知", "count": deleted}
 
 
 # ============ WebSocket 實時推送 ============
 
 class ConnectionManager:
-    """WebSocket 連接管理器"""
+    """WebSocket 連接管理器（同一用戶可以有多個連接，例如多個瀏覽器標籤頁）"""
     def __init__(self):
-        self.active_connections: dict[str, WebSocket] = {}
+        self.active_connections: dict[str, set[WebSocket]] = {}
+        # 最近推送給每個用戶的未讀數，用於計算增量
+        self.unread_counts: dict[str, int] = {}
     
     async def connect(self, websocket: WebSocket, user_email: str):
         await websocket.accept()
-        self.active_connections[user_email] = websocket
+        self.active_connections.setdefault(user_email, set()).add(websocket)
         logger.info(f"用戶 {user_email} 已連接 WebSocket")
     
-    def disconnect(self, user_email: str):
-        if user_email in self.active_connections:
+    def disconnect(self, user_email: str, websocket: Optional[WebSocket] = None):
+        connections = self.active_connections.get(user_email)
+        if connections is None:
+            return
+        if websocket is None:
+            connections.clear()
+        else:
+            connections.discard(websocket)
+        if not connections:
             del self.active_connections[user_email]
+            self.unread_counts.pop(user_email, None)
             logger.info(f"用戶 {user_email} 已斷開 WebSocket")
     
+    def is_connected(self, user_email: str) -> bool:
+        return user_email in self.active_connections
+    
     async def send_personal_message(self, message: dict, user_email: str):
-        if user_email in self.active_connections:
+        for connection in list(self.active_connections.get(user_email, ())):
             try:
-                await self.active_connections[user_email].send_json(message)
+                await connection.send_json(message)
             except Exception as e:
                 logger.error(f"發送消息給 {user_email} 失敗: {e}")
-                self.disconnect(user_email)
+                self.disconnect(user_email, connection)
     
-    async def broadcast(self, message: dict):
-        disconnected = []
-        for user_email, connection in self.active_connections.items():
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                logger.error(f"廣播消息給 {user_email} 失敗: {e}")
-                disconnected.append(user_email)
+    async def push_unread_count(self, user_email: str, unread_count: int, websocket: Optional[WebSocket] = None):
+        """
+        推送未讀數變化：{"type": "unread_count", "unread_count": 當前值, "delta": 相對上次推送的變化}
         
-        for user_email in disconnected:
-            self.disconnect(user_email)
+        指定 websocket 時只發給該連接（新連接的初始值）；數值未變化時不推送。
+        """
+        if websocket is not None:
+            await websocket.send_json({"type": "unread_count", "unread_count": unread_count, "delta": 0})
+            self.unread_counts[user_email] = unread_count
+            return
+        if not self.is_connected(user_email):
+            return
+        previous = self.unread_counts.get(user_email)
+        if previous == unread_count:
+            return
+        self.unread_counts[user_email] = unread_count
+        await self.send_personal_message(
+            {
+                "type": "unread_count",
+                "unread_count": unread_count,
+                "delta": unread_count - previous if previous is not None else 0,
+            },
+            user_email,
+        )
+    
+    async def broadcast(self, message: dict):
+        for user_email in list(self.active_connections):
+            await self.send_personal_message(message, user_email)
 
 
 # 全局連接管理器
 connection_manager = ConnectionManager()
 
 
+async def _push_unread_count(db: Session, recipient: str) -> None:
+    """通知狀態變化後推送最新未讀數（只在用戶有連接時查詢計數）"""
+    if not connection_manager.is_connected(recipient):
+        return
+    try:
+        await connection_manager.push_unread_count(recipient, get_unread_count(db, recipient=recipient))
+    except Exception as e:
+        logger.warning(f"推送未讀數失敗: {e}")
+
+
 @router.websocket("/ws/{user_email}")
 async def websocket_endpoint(websocket: WebSocket, user_email: str):
-    """WebSocket 端點（實時推送通知）"""
+    """
+    WebSocket 端點（實時推送通知）
+    
+    連接建立後先推送一次當前未讀數，之後未讀數變化時推送 unread_count 消息，客戶端無需輪詢 /unread-count。
+    """
     await connection_manager.connect(websocket, user_email)
     try:
+        db = SessionLocal()
+        try:
+            unread_count = get_unread_count(db, recipient=user_email)
+        finally:
+            db.close()
+        await connection_manager.push_unread_count(user_email, unread_count, websocket=websocket)
         while True:
             # 保持連接活躍，等待服務器推送消息
             data = await websocket.receive_text()
@@ -665,7 +734,10 @@ async def websocket_endpoint(websocket: WebSocket, user_email: str):
             if data == "ping":
                 await websocket.send_text("pong")
     except WebSocketDisconnect:
-        connection_manager.disconnect(user_email)
+        connection_manager.disconnect(user_email, websocket)
+    except Exception as e:
+        logger.error(f"通知 WebSocket 異常: {e}")
+        connection_manager.disconnect(user_email, websocket)
 
 
 # 導出連接管理器供其他模塊使用
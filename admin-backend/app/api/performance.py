@@ -10,7 +10,12 @@ from app.db import get_db
 from app.api.deps import get_current_active_user
 from app.models.user import User
 from app.core.cache import get_cache_manager
+from app.core.config_registry import get_config_registry
+from app.core.auth_cache import get_token_cache
+from app.core.password_hasher import get_password_hasher
+from app.core.limiter import get_rate_limiter
 from app.middleware.performance import get_performance_stats
+from app.services.metric_ingestion import get_metric_ingestor
 
 router = APIRouter(prefix="/performance", tags=["Performance"])
 
@@ -71,3 +76,47 @@ async def get_performance_stats_endpoint(
         "message": "性能統計信息獲取成功"
     }
 
+
+@router.get("/config/stats")
+async def get_config_registry_stats(
+    current_user: User = Depends(get_current_active_user),
+) -> Dict[str, Any]:
+    """獲取配置文件註冊表統計（各文件的版本、解析耗時、重載次數）"""
+    return {
+        "config_registry": get_config_registry().get_stats(),
+        "message": "配置註冊表統計獲取成功"
+    }
+
+
+@router.get("/rate-limit/stats")
+async def get_rate_limit_stats(
+    current_user: User = Depends(get_current_active_user),
+) -> Dict[str, Any]:
+    """獲取限流統計（存儲後端、各類別的判斷/拒絕次數、判斷延遲）"""
+    return {
+        "rate_limit": get_rate_limiter().get_stats(),
+        "message": "限流統計獲取成功"
+    }
+
+
+@router.get("/auth/stats")
+async def get_auth_cache_stats(
+    current_user: User = Depends(get_current_active_user),
+) -> Dict[str, Any]:
+    """獲取認證統計（令牌緩存命中、查庫次數、認證耗時，密碼哈希隊列與登錄耗時）"""
+    return {
+        "auth": get_token_cache().get_stats(),
+        "password_hashing": get_password_hasher().get_stats(),
+        "message": "認證統計獲取成功"
+    }
+
+
+@router.get("/metrics-ingestion/stats")
+async def get_metric_ingestion_stats(
+    current_user: User = Depends(get_current_active_user),
+) -> Dict[str, Any]:
+    """獲取指標寫入管道統計（接收點數、批量刷寫次數與耗時、待寫入的匯總行）"""
+    return {
+        "metric_ingestion": get_metric_ingestor().get_stats(),
+        "message": "指標寫入統計獲取成功"
+    }
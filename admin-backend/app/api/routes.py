@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import APIRouter, Depends, Query, status
 from typing import Optional
 
@@ -69,7 +71,8 @@ async def get_dashboard() -> DashboardData:
     try:
         # 優先使用群組AI儀表板API（真實數據）
         from app.api.group_ai.dashboard import get_dashboard_stats
-        data = get_dashboard_stats()
+        # 統計查詢在線程池中執行，避免阻塞事件循環
+        data = await asyncio.to_thread(get_dashboard_stats)
         
         # 確保 data 是字典類型
         if not isinstance(data, dict):
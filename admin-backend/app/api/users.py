@@ -5,6 +5,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_active_user, get_db_session, require_superuser
+from app.core.auth_cache import Principal
+from app.core.password_hasher import PasswordHasherBusy, get_password_hasher
 from app.models.user import User
 from app.schemas.user import UserRead, UserCreate, UserUpdate, UserPasswordReset
 from app.crud.user import (
@@ -28,8 +30,20 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/users", tags=["users"])
 
 
+async def _hash_password(password: str) -> str:
+    """在密碼哈希線程池中計算哈希，不阻塞事件循環"""
+    try:
+        return await get_password_hasher().hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="密碼處理繁忙，請稍後重試",
+            headers={"Retry-After": "1"},
+        )
+
+
 @router.get("/me", response_model=UserRead)
-def read_current_user(current_user=Depends(get_current_active_user)):
+def read_current_user(current_user=Depends(get_current_active_user), db: Session = Depends(get_db_session)):
     """獲取當前用戶信息"""
     from app.core.config import get_settings
     settings = get_settings()
@@ -63,6 +77,12 @@ def read_current_user(current_user=Depends(get_current_active_user)):
         )
         return temp_user
     
+    # 認證快速路徑返回的是輕量主體，響應需要角色和創建時間，按 ID 讀取完整用戶
+    if isinstance(current_user, Principal):
+        user = get_user_by_id(db, user_id=current_user.id)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="无法验证身份")
+        return user
     return current_user
 
 
@@ -102,7 +122,7 @@ async def create_user_endpoint(
         user = create_user(
             db,
             email=user_create.email,
-            password=user_create.password,
+            hashed_password=await _hash_password(user_create.password),
             full_name=user_create.full_name,
             is_superuser=user_create.is_superuser,
         )
@@ -298,7 +318,7 @@ async def reset_user_password_endpoint(
                 detail=f"用戶 {user_id} 不存在"
             )
         
-        update_user_password(db, user=user, new_password=password_reset.new_password)
+        update_user_password(db, user=user, hashed_password=await _hash_password(password_reset.new_password))
         
         # 記錄審計日誌
         log_audit(
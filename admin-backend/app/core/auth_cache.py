@@ -0,0 +1,313 @@
+"""
+認證快速路徑 - 已驗證令牌的短期緩存與輕量主體
+
+get_current_user 每次請求都要驗證 JWT 並按郵箱查詢用戶（連同角色和權限）。這裡把驗證通過的令牌
+映射到輕量的 Principal（id、郵箱、是否啟用、是否超級管理員、權限代碼集合、權限版本），
+在 TTL（auth_token_cache_ttl_seconds，且不超過令牌本身的過期時間）內直接返回，不再解碼或訪問數據庫。
+
+失效基於緩存標籤（app.core.cache）：
+- auth：角色 / 權限變更，所有主體失效
+- auth:user:<email>：用戶資料、啟用狀態、角色變更
+- auth:token:<摘要>：單個令牌被撤銷（登出），版本大於 0 即視為已撤銷
+ORM 寫入由 Session 事件在提交後自動使對應標籤失效（包括 query.update / delete 批量操作）；
+配置 Redis 時標籤版本經廣播同步到所有進程，否則其他進程的變更在 TTL 到期後生效。
+
+可選的聲明模式（auth_embed_claims）：登錄時把主體寫入令牌，其他進程首次見到令牌時也無需查庫；
+令牌中的權限版本與當前標籤版本不一致時退回數據庫。標籤版本只有在 Redis 中才跨進程、跨重啟有效，
+因此未使用 Redis 時忽略令牌中的聲明。
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.models.permission import Permission
+from app.models.role import Role
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+AUTH_TAG = "auth"
+CACHE_MAX_ENTRIES = 10_000
+LATENCY_WINDOW = 2048
+
+_TAGS_KEY = "auth_cache_invalidate_tags"
+
+
+def user_tag(email: str) -> str:
+    return f"auth:user:{email}"
+
+
+def token_tag(token: str) -> str:
+    return "auth:token:" + hashlib.sha256(token.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass(frozen=True)
+class Principal:
+    """已認證的主體（可代替 User 傳給權限檢查和審計日誌）"""
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    is_active: bool = True
+    is_superuser: bool = False
+    permissions: FrozenSet[str] = field(default_factory=frozenset)
+    perm_version: Tuple[int, int] = (0, 0)  # (auth 標籤版本, 用戶標籤版本)
+
+    def has_permission(self, code: str) -> bool:
+        return self.is_superuser or code in self.permissions
+
+    def to_claims(self) -> Dict[str, Any]:
+        return {
+            "uid": self.id,
+            "name": self.full_name,
+            "act": self.is_active,
+            "su": self.is_superuser,
+            "perms": sorted(self.permissions),
+            "pv": list(self.perm_version),
+        }
+
+
+def principal_from_user(user: User, perm_version: Tuple[int, int] = (0, 0)) -> Principal:
+    """從已加載角色和權限的 User 構建主體"""
+    permissions = {permission.code for role in user.roles for permission in role.permissions}
+    return Principal(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        is_active=bool(user.is_active),
+        is_superuser=bool(user.is_superuser),
+        permissions=frozenset(permissions),
+        perm_version=perm_version,
+    )
+
+
+def _cache_manager():
+    from app.core.cache import get_cache_manager
+    return get_cache_manager()
+
+
+class _Entry:
+    __slots__ = ("principal", "expires_at", "tags")
+
+    def __init__(self, principal: Principal, expires_at: float, tags: Dict[str, int]):
+        self.principal = principal
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class TokenCache:
+    """已驗證令牌 -> Principal 的 LRU（帶 TTL 與標籤版本）"""
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._counts: Dict[str, int] = {"cache_hits": 0, "claim_hits": 0, "db_loads": 0, "failures": 0, "revoked": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def tags_for(token: str, email: str) -> List[str]:
+        return [AUTH_TAG, user_tag(email), token_tag(token)]
+
+    def get(self, token: str) -> Optional[Principal]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time() or self._is_stale(entry.tags):
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+        return entry.principal
+
+    @staticmethod
+    def _is_stale(tags: Dict[str, int]) -> bool:
+        current = _cache_manager().tag_versions
+        return any(version < current.get(tag, 0) for tag, version in tags.items())
+
+    def put(self, token: str, principal: Principal, tags: Dict[str, int], token_expires_at: Optional[float]) -> None:
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._entries[token] = _Entry(principal, expires_at, tags)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def record(self, outcome: str, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+            self._latencies.append(elapsed_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            latencies = sorted(self._latencies)
+            size = len(self._entries)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 4)
+
+        fast = counts["cache_hits"] + counts["claim_hits"]
+        total = fast + counts["db_loads"]
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": size,
+            **counts,
+            "fast_path_rate": round(fast / total, 4) if total else 0.0,
+            "latency_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "samples": len(latencies)},
+        }
+
+
+def _shared_tag_versions() -> bool:
+    manager = _cache_manager()
+    return bool(manager.redis_client and manager.use_redis)
+
+
+def principal_from_claims(payload: Dict[str, Any], tags: Dict[str, int]) -> Optional[Principal]:
+    """令牌中的主體聲明（聲明模式且權限版本與當前標籤版本一致時才使用）"""
+    from app.core.config import get_settings
+
+    if not get_settings().auth_embed_claims or "uid" not in payload or not _shared_tag_versions():
+        return None
+    email = str(payload.get("sub"))
+    version = (tags.get(AUTH_TAG, 0), tags.get(user_tag(email), 0))
+    if list(payload.get("pv") or []) != list(version):
+        return None
+    return Principal(
+        id=int(payload["uid"]),
+        email=email,
+        full_name=payload.get("name"),
+        is_active=bool(payload.get("act", True)),
+        is_superuser=bool(payload.get("su", False)),
+        permissions=frozenset(payload.get("perms") or ()),
+        perm_version=version,
+    )
+
+
+def access_token_claims(user: User) -> Optional[Dict[str, Any]]:
+    """登錄時寫入令牌的主體聲明（未啟用聲明模式時為 None）"""
+    from app.core.config import get_settings
+
+    if not get_settings().auth_embed_claims:
+        return None
+    tags = _cache_manager().get_tag_versions([AUTH_TAG, user_tag(user.email)])
+    return principal_from_user(user, (tags[AUTH_TAG], tags[user_tag(user.email)])).to_claims()
+
+
+def revoke_token(token: str) -> None:
+    """撤銷單個令牌（所有進程的緩存失效，之後該令牌無法通過認證）"""
+    from app.core.cache import invalidate_tags
+
+    get_token_cache().discard(token)
+    invalidate_tags(token_tag(token))
+
+
+def is_revoked(tags: Dict[str, int], token: str) -> bool:
+    return tags.get(token_tag(token), 0) > 0
+
+
+_token_cache: Optional[TokenCache] = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> TokenCache:
+    """獲取全局令牌緩存"""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                from app.core.config import get_settings
+                _token_cache = TokenCache(ttl_seconds=get_settings().auth_token_cache_ttl_seconds)
+    return _token_cache
+
+
+# ========== 寫入時失效 ==========
+
+def _history_values(obj: Any, key: str) -> Iterable[Any]:
+    history = inspect(obj).attrs[key].history
+    return list(history.added or ()) + list(history.deleted or ()) + list(history.unchanged or ())
+
+
+def _collect_tags(session: Session) -> Set[str]:
+    tags: Set[str] = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            emails = [email for email in _history_values(obj, "email") if email]
+            if emails:
+                tags.update(user_tag(email) for email in emails)
+            else:
+                # 已過期的刪除對象可能沒有加載郵箱，此時使全部主體失效
+                tags.add(AUTH_TAG)
+        elif isinstance(obj, Permission):
+            tags.add(AUTH_TAG)
+        elif isinstance(obj, Role):
+            state = inspect(obj)
+            if obj in session.deleted or any(
+                attr.history.has_changes() for attr in state.attrs if attr.key != "users"
+            ):
+                tags.add(AUTH_TAG)
+            else:
+                history = state.attrs.users.history
+                for user in list(history.added or ()) + list(history.deleted or ()):
+                    tags.add(user_tag(user.email))
+    return tags
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_auth_invalidations(session: Session, flush_context, instances) -> None:
+    tags = _collect_tags(session)
+    if tags:
+        session.info.setdefault(_TAGS_KEY, set()).update(tags)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_invalidations(orm_execute_state) -> None:
+    # query.update / delete 不經過 flush，無法知道影響了哪些用戶，使全部主體失效
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in (User, Role, Permission):
+        orm_execute_state.session.info.setdefault(_TAGS_KEY, set()).add(AUTH_TAG)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_auth_invalidations(session: Session) -> None:
+    tags = session.info.pop(_TAGS_KEY, None)
+    if not tags:
+        return
+    from app.core.cache import invalidate_tags
+
+    try:
+        invalidate_tags(*tags)
+    except Exception as e:
+        logger.warning(f"認證緩存失效失敗（將在 TTL 到期後生效）: {e}")
+
@@ -1,19 +1,168 @@
 """
 自动备份和恢复系统
 支持数据库、Session文件、配置文件的自动备份和恢复
+
+- 数据库：PostgreSQL 的 pg_dump 输出经异步子进程管道边读边压缩（zstd 多线程，未安装 zstandard 时 gzip），
+  不落未压缩的中间文件；SQLite 使用在线备份 API（分批复制页面，备份期间不阻塞写入）
+- 文件（Session、配置）：按内容哈希存入 objects/ 下的对象库，每次备份只写一份清单（*.manifest.json），
+  未变化的文件（大小和修改时间与上次清单一致，或内容哈希已存在）不再重复存储
+- full_backup 中数据库、Session、配置三个步骤并发执行，所有阻塞操作都在线程或子进程中完成，不阻塞 API 事件循环
+- verify_backup / restore_database(verify_only=True)：解压并校验备份（SQLite 完整性检查、pg_restore --list、
+  对象哈希），恢复前总是先校验
 """
+import asyncio
+import gzip
+import hashlib
+import json
 import logging
+import os
 import shutil
-import subprocess
-import asyncio
-from pathlib import Path
+import sqlite3
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict
-import json
-import gzip
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import make_url
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard 为可选依赖
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 1024 * 1024
+SQLITE_BACKUP_PAGES = 1024  # SQLite 在线备份每批复制的页数
+PG_DUMP_TIMEOUT = 300
+PG_RESTORE_TIMEOUT = 600
+PG_VERIFY_TIMEOUT = 600
+OBJECTS_DIR = "objects"
+MANIFEST_SUFFIX = ".manifest.json"
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class _HashingSink:
+    """压缩器的输出端：写入文件并计算压缩后数据的 SHA-256"""
+    
+    def __init__(self, file: BinaryIO):
+        self._file = file
+        self.digest = hashlib.sha256()
+        self.size = 0
+    
+    def write(self, data) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+    
+    def flush(self):
+        self._file.flush()
+
+
+class _CompressedWriter:
+    """边写边压缩（zstd 多线程或 gzip），同时统计原始 / 压缩大小和哈希"""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._sink = _HashingSink(self._file)
+        self.raw_digest = hashlib.sha256()
+        self.raw_size = 0
+        if zstandard is not None:
+            compressor = zstandard.ZstdCompressor(level=3, threads=-1, write_checksum=True)
+            self._stream = compressor.stream_writer(self._sink, closefd=False)
+            self.codec = "zstd"
+        else:
+            self._stream = gzip.GzipFile(fileobj=self._sink, mode="wb", compresslevel=6)
+            self.codec = "gzip"
+    
+    def write(self, data: bytes):
+        self.raw_digest.update(data)
+        self.raw_size += len(data)
+        self._stream.write(data)
+    
+    def close(self):
+        self._stream.close()
+        self._file.close()
+    
+    @property
+    def sha256(self) -> str:
+        return self._sink.digest.hexdigest()
+    
+    @property
+    def size(self) -> int:
+        return self._sink.size
+
+
+def _compressed_suffix() -> str:
+    return ".zst" if zstandard is not None else ".gz"
+
+
+def _open_compressed(path: Path) -> BinaryIO:
+    """按文件头识别 zstd / gzip / 未压缩，返回解压后的只读流"""
+    file = open(path, "rb")
+    magic = file.read(4)
+    file.seek(0)
+    if magic.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            file.close()
+            raise RuntimeError(f"{path.name} 使用 zstd 压缩，但未安装 zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(file, read_across_frames=True, closefd=True)
+    if magic.startswith(_GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=file, mode="rb")
+    return file
+
+
+def _compress_file(source: Path, target: Path) -> _CompressedWriter:
+    writer = _CompressedWriter(target)
+    try:
+        with open(source, "rb") as f_in:
+            while chunk := f_in.read(CHUNK_SIZE):
+                writer.write(chunk)
+    finally:
+        writer.close()
+    return writer
+
+
+def _decompress_file(source: Path, target: Path) -> str:
+    """解压到目标文件，返回原始内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with _open_compressed(source) as f_in, open(target, "wb") as f_out:
+        while chunk := f_in.read(CHUNK_SIZE):
+            digest.update(chunk)
+            f_out.write(chunk)
+    return digest.hexdigest()
+
+
+def _sqlite_integrity(path: Path) -> Tuple[bool, str]:
+    conn = sqlite3.connect(path)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        tables = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0]
+    finally:
+        conn.close()
+    if result != "ok":
+        return False, f"integrity_check: {result}"
+    return True, f"{tables} 张表"
+
+
+def _pg_connection_args(url) -> Tuple[List[str], Dict[str, str]]:
+    env = os.environ.copy()
+    if url.password:
+        env["PGPASSWORD"] = url.password
+    args = [
+        "-h", url.host or "localhost",
+        "-p", str(url.port or 5432),
+        "-U", url.username or "postgres",
+        "-d", url.database or "",
+    ]
+    return args, env
+
 
 class BackupManager:
     """备份管理器"""
@@ -23,7 +172,9 @@ class BackupManager:
         backup_dir: str = "backups",
         retention_days: int = 30,
         auto_backup_enabled: bool = True,
-        backup_interval_hours: int = 24
+        backup_interval_hours: int = 24,
+        verify_after_backup: bool = True,
+        max_workers: int = 4
     ):
         """
         初始化备份管理器
@@ -33,13 +184,24 @@ class BackupManager:
             retention_days: 保留天数
             auto_backup_enabled: 是否启用自动备份
             backup_interval_hours: 备份间隔（小时）
+            verify_after_backup: 完整备份后是否校验
+            max_workers: 文件哈希和压缩的并行线程数
         """
         self.backup_dir = Path(backup_dir)
         self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.objects_dir = self.backup_dir / OBJECTS_DIR
         self.retention_days = retention_days
         self.auto_backup_enabled = auto_backup_enabled
         self.backup_interval_hours = backup_interval_hours
+        self.verify_after_backup = verify_after_backup
+        self.max_workers = max(1, max_workers)
         self._backup_task: Optional[asyncio.Task] = None
+        # 文件快照与对象回收互斥，避免回收掉刚被新清单引用的对象
+        self._objects_lock = threading.Lock()
+        # 并行快照中内容相同的文件会同时算出同一哈希，检查与落盘需原子完成
+        self._store_lock = threading.Lock()
+    
+    # ========== 数据库 ==========
     
     async def backup_database(self, database_url: str) -> Optional[Path]:
         """备份数据库"""
@@ -48,83 +210,122 @@ class BackupManager:
             return None
         
         try:
+            url = make_url(database_url)
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = self.backup_dir / f"database_{timestamp}.sql.gz"
+            backend = url.get_backend_name()
             
-            # 解析数据库 URL
-            if database_url.startswith("postgresql://"):
-                # PostgreSQL 备份
-                import os
-                from urllib.parse import urlparse
-                
-                parsed = urlparse(database_url)
-                db_name = parsed.path.lstrip("/")
-                db_user = parsed.username
-                db_host = parsed.hostname
-                db_port = parsed.port or 5432
-                
-                # 使用 pg_dump
-                env = os.environ.copy()
-                if parsed.password:
-                    env["PGPASSWORD"] = parsed.password
-                
-                cmd = [
-                    "pg_dump",
-                    "-h", db_host,
-                    "-p", str(db_port),
-                    "-U", db_user,
-                    "-d", db_name,
-                    "-F", "c",  # 自定义格式
-                    "-f", str(backup_file.with_suffix(""))
-                ]
-                
-                result = subprocess.run(
-                    cmd,
-                    env=env,
-                    capture_output=True,
-                    text=True,
-                    timeout=300
-                )
-                
-                if result.returncode == 0:
-                    # 压缩备份文件
-                    with open(backup_file.with_suffix(""), "rb") as f_in:
-                        with gzip.open(backup_file, "wb") as f_out:
-                            shutil.copyfileobj(f_in, f_out)
-                    backup_file.with_suffix("").unlink()
-                    
-                    logger.info(f"数据库备份完成: {backup_file}")
-                    return backup_file
-                else:
-                    logger.error(f"数据库备份失败: {result.stderr}")
+            if backend == "postgresql":
+                backup_file = self.backup_dir / f"database_{timestamp}.dump{_compressed_suffix()}"
+                return await self._backup_postgresql(url, backup_file)
+            if backend == "sqlite":
+                if not url.database or url.database == ":memory:":
+                    logger.warning("内存 SQLite 数据库无需备份")
                     return None
-            else:
-                logger.warning(f"不支持的数据库类型: {database_url.split('://')[0]}")
-                return None
-                
+                backup_file = self.backup_dir / f"database_{timestamp}.sqlite{_compressed_suffix()}"
+                return await asyncio.to_thread(self._backup_sqlite, Path(url.database), backup_file)
+            
+            logger.warning(f"不支持的数据库类型: {backend}")
+            return None
+        
         except Exception as e:
             logger.error(f"数据库备份异常: {e}", exc_info=True)
             return None
     
+    async def _backup_postgresql(self, url, backup_file: Path) -> Optional[Path]:
+        """pg_dump 输出经管道直接压缩（-Z 0 关闭 pg_dump 自身压缩，由 zstd 多线程压缩）"""
+        args, env = _pg_connection_args(url)
+        partial = backup_file.with_name(backup_file.name + ".partial")
+        process = await asyncio.create_subprocess_exec(
+            "pg_dump", *args, "-F", "c", "-Z", "0",
+            env=env,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        writer = await asyncio.to_thread(_CompressedWriter, partial)
+        stderr_task = asyncio.create_task(process.stderr.read())
+        
+        pending: Optional[asyncio.Future] = None
+        
+        async def pump():
+            # 压缩上一块的同时读取下一块
+            nonlocal pending
+            while True:
+                chunk = await process.stdout.read(CHUNK_SIZE)
+                if pending is not None:
+                    # shield：超时取消 pump 时不取消写入任务，错误处理中仍能等它结束
+                    await asyncio.shield(pending)
+                    pending = None
+                if not chunk:
+                    break
+                pending = asyncio.ensure_future(asyncio.to_thread(writer.write, chunk))
+            return await process.wait()
+        
+        try:
+            returncode = await asyncio.wait_for(pump(), timeout=PG_DUMP_TIMEOUT)
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+            stderr_task.cancel()
+            # 线程中的写入无法中断，等它结束后再关闭压缩流
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+            await asyncio.to_thread(writer.close)
+            partial.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(writer.close)
+        stderr = (await stderr_task).decode("utf-8", errors="replace")
+        
+        if returncode != 0:
+            partial.unlink(missing_ok=True)
+            logger.error(f"数据库备份失败: {stderr}")
+            return None
+        
+        os.replace(partial, backup_file)
+        logger.info(
+            f"数据库备份完成: {backup_file}（原始 {writer.raw_size} 字节，压缩后 {writer.size} 字节，{writer.codec}）"
+        )
+        return backup_file
+    
+    def _backup_sqlite(self, db_path: Path, backup_file: Path) -> Optional[Path]:
+        """SQLite 在线备份 API 复制到临时文件后压缩"""
+        if not db_path.exists():
+            logger.warning(f"SQLite 数据库文件不存在: {db_path}")
+            return None
+        
+        snapshot = backup_file.with_name(backup_file.name + ".snapshot")
+        source = sqlite3.connect(db_path, timeout=30)
+        target = sqlite3.connect(snapshot)
+        try:
+            source.backup(target, pages=SQLITE_BACKUP_PAGES)
+        finally:
+            target.close()
+            source.close()
+        
+        partial = backup_file.with_name(backup_file.name + ".partial")
+        try:
+            writer = _compress_file(snapshot, partial)
+            os.replace(partial, backup_file)
+        finally:
+            snapshot.unlink(missing_ok=True)
+            partial.unlink(missing_ok=True)
+        
+        logger.info(f"SQLite 数据库备份完成: {backup_file}（原始 {writer.raw_size} 字节，压缩后 {writer.size} 字节）")
+        return backup_file
+    
+    # ========== 文件（内容寻址，增量） ==========
+    
     async def backup_sessions(self, sessions_dir: str = "sessions") -> Optional[Path]:
         """备份 Session 文件"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = self.backup_dir / f"sessions_{timestamp}.tar.gz"
-            
             sessions_path = Path(sessions_dir)
             if not sessions_path.exists():
                 logger.warning(f"Session 目录不存在: {sessions_dir}")
                 return None
             
-            # 创建压缩包
-            import tarfile
-            with tarfile.open(backup_file, "w:gz") as tar:
-                tar.add(sessions_path, arcname="sessions")
-            
-            logger.info(f"Session 文件备份完成: {backup_file}")
-            return backup_file
-            
+            manifest = await asyncio.to_thread(self._snapshot_files, "sessions", [(sessions_path, "sessions")])
+            logger.info(f"Session 文件备份完成: {manifest}")
+            return manifest
+        
         except Exception as e:
             logger.error(f"Session 文件备份异常: {e}", exc_info=True)
             return None
@@ -132,157 +333,372 @@ class BackupManager:
     async def backup_config(self, config_files: List[str]) -> Optional[Path]:
         """备份配置文件"""
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_file = self.backup_dir / f"config_{timestamp}.tar.gz"
+            roots = [(Path(f), Path(f).name) for f in config_files if Path(f).exists()]
+            manifest = await asyncio.to_thread(self._snapshot_files, "config", roots)
+            logger.info(f"配置文件备份完成: {manifest}")
+            return manifest
+        
+        except Exception as e:
+            logger.error(f"配置文件备份异常: {e}", exc_info=True)
+            return None
+    
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / digest
+    
+    def _latest_manifest(self, kind: str) -> Dict[str, Dict[str, Any]]:
+        manifests = sorted(self.backup_dir.glob(f"{kind}_*{MANIFEST_SUFFIX}"))
+        if not manifests:
+            return {}
+        try:
+            data = json.loads(manifests[-1].read_text(encoding="utf-8"))
+            return {entry["path"]: entry for entry in data.get("files", [])}
+        except Exception as e:
+            logger.warning(f"读取上次备份清单失败，将完整备份: {e}")
+            return {}
+    
+    def _store_object(self, path: Path) -> Tuple[str, bool]:
+        """压缩写入对象库（边读边哈希，一次读取），返回 (哈希, 是否新写入)"""
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+        os.close(fd)
+        temp_path = Path(temp_name)
+        try:
+            writer = _compress_file(path, temp_path)
+            digest = writer.raw_digest.hexdigest()
+            target = self._object_path(digest)
+            with self._store_lock:
+                if target.exists():
+                    return digest, False
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, target)
+            return digest, True
+        finally:
+            temp_path.unlink(missing_ok=True)
+    
+    def _snapshot_files(self, kind: str, roots: List[Tuple[Path, str]]) -> Path:
+        """把文件存入对象库并写出清单；大小和修改时间未变的文件直接沿用上次的哈希"""
+        files: List[Tuple[Path, str]] = []
+        for root, arcname in roots:
+            if root.is_file():
+                files.append((root, arcname))
+            else:
+                for path in sorted(root.rglob("*")):
+                    if path.is_file():
+                        files.append((path, f"{arcname}/{path.relative_to(root).as_posix()}"))
+        
+        with self._objects_lock:
+            previous = self._latest_manifest(kind)
             
-            import tarfile
-            with tarfile.open(backup_file, "w:gz") as tar:
-                for config_file in config_files:
-                    config_path = Path(config_file)
-                    if config_path.exists():
-                        tar.add(config_path, arcname=config_path.name)
+            def snapshot(item: Tuple[Path, str]) -> Tuple[Dict[str, Any], str]:
+                path, arcname = item
+                info = path.stat()
+                entry = {
+                    "path": arcname,
+                    "size": info.st_size,
+                    "mtime_ns": info.st_mtime_ns,
+                    "mode": stat.S_IMODE(info.st_mode),
+                }
+                old = previous.get(arcname)
+                if (
+                    old
+                    and old["size"] == info.st_size
+                    and old["mtime_ns"] == info.st_mtime_ns
+                    and self._object_path(old["sha256"]).exists()
+                ):
+                    return {**entry, "sha256": old["sha256"]}, "unchanged"
+                digest, written = self._store_object(path)
+                return {**entry, "sha256": digest}, "stored" if written else "deduplicated"
             
-            logger.info(f"配置文件备份完成: {backup_file}")
-            return backup_file
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="backup") as executor:
+                results = list(executor.map(snapshot, files))
             
+            stats = {"files": len(results), "unchanged": 0, "stored": 0, "deduplicated": 0}
+            for _, outcome in results:
+                stats[outcome] += 1
+            stats["bytes"] = sum(entry["size"] for entry, _ in results)
+            
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            manifest_file = self.backup_dir / f"{kind}_{timestamp}{MANIFEST_SUFFIX}"
+            manifest = {
+                "kind": kind,
+                "created": datetime.now().isoformat(),
+                "files": [entry for entry, _ in results],
+                "stats": stats,
+            }
+            temp_file = manifest_file.with_name(manifest_file.name + ".tmp")
+            temp_file.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+            os.replace(temp_file, manifest_file)
+        
+        logger.debug(f"{kind} 快照统计: {stats}")
+        return manifest_file
+    
+    async def restore_files(self, manifest_file: Path, target_dir: str) -> bool:
+        """按清单把文件恢复到目标目录（逐个校验内容哈希）"""
+        try:
+            return await asyncio.to_thread(self._restore_files, Path(manifest_file), Path(target_dir))
         except Exception as e:
-            logger.error(f"配置文件备份异常: {e}", exc_info=True)
-            return None
+            logger.error(f"文件恢复异常: {e}", exc_info=True)
+            return False
+    
+    def _restore_files(self, manifest_file: Path, target_dir: Path) -> bool:
+        ok, detail = self._verify_manifest(manifest_file)
+        if not ok:
+            logger.error(f"备份清单校验失败，已取消恢复: {detail}")
+            return False
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        for entry in manifest["files"]:
+            target = target_dir / entry["path"]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            _decompress_file(self._object_path(entry["sha256"]), target)
+            os.chmod(target, entry.get("mode", 0o644))
+        logger.info(f"已从 {manifest_file.name} 恢复 {len(manifest['files'])} 个文件到 {target_dir}")
+        return True
+    
+    # ========== 校验 ==========
+    
+    async def verify_backup(self, backup_file: Path) -> Dict[str, Any]:
+        """校验备份可以完整解压和恢复（不修改任何数据）"""
+        backup_file = Path(backup_file)
+        result: Dict[str, Any] = {"file": str(backup_file), "ok": False}
+        try:
+            if not backup_file.exists():
+                result["detail"] = "备份文件不存在"
+            elif backup_file.name.endswith(MANIFEST_SUFFIX):
+                result["ok"], result["detail"] = await asyncio.to_thread(self._verify_manifest, backup_file)
+            elif ".sqlite" in backup_file.name:
+                result["ok"], result["detail"] = await asyncio.to_thread(self._verify_sqlite, backup_file)
+            else:
+                result["ok"], result["detail"] = await self._verify_postgresql(backup_file)
+        except Exception as e:
+            result["detail"] = str(e)
+        if not result["ok"]:
+            logger.warning(f"备份校验失败: {backup_file} - {result.get('detail')}")
+        return result
+    
+    def _verify_manifest(self, manifest_file: Path) -> Tuple[bool, str]:
+        manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+        digests = {entry["sha256"] for entry in manifest["files"]}
+        
+        def check(digest: str) -> Optional[str]:
+            path = self._object_path(digest)
+            if not path.exists():
+                return f"缺少对象 {digest}"
+            actual = hashlib.sha256()
+            with _open_compressed(path) as f_in:
+                while chunk := f_in.read(CHUNK_SIZE):
+                    actual.update(chunk)
+            return None if actual.hexdigest() == digest else f"对象 {digest} 内容不一致"
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="backup-verify") as executor:
+            errors = [error for error in executor.map(check, digests) if error]
+        if errors:
+            return False, "；".join(errors[:5])
+        return True, f"{len(manifest['files'])} 个文件，{len(digests)} 个对象"
+    
+    def _verify_sqlite(self, backup_file: Path) -> Tuple[bool, str]:
+        fd, temp_name = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        try:
+            _decompress_file(backup_file, Path(temp_name))
+            return _sqlite_integrity(Path(temp_name))
+        finally:
+            os.unlink(temp_name)
+    
+    async def _verify_postgresql(self, backup_file: Path) -> Tuple[bool, str]:
+        """解压后送入 pg_restore --list，能列出目录即说明归档完整"""
+        process = await asyncio.create_subprocess_exec(
+            "pg_restore", "--list",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                self._run_with_backup_input(process, backup_file), timeout=PG_VERIFY_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            return False, f"pg_restore --list 超过 {PG_VERIFY_TIMEOUT} 秒未完成"
+        if process.returncode != 0:
+            return False, stderr.decode("utf-8", errors="replace").strip()
+        entries = [line for line in stdout.decode("utf-8", errors="replace").splitlines() if line and not line.startswith(";")]
+        return True, f"{len(entries)} 个归档条目"
+    
+    async def _run_with_backup_input(self, process, backup_file: Path) -> Tuple[bytes, bytes]:
+        """送入备份的同时读取 stdout / stderr，避免输出管道写满后子进程与写入端互相等待"""
+        stdout_task = asyncio.ensure_future(process.stdout.read())
+        stderr_task = asyncio.ensure_future(process.stderr.read())
+        try:
+            await self._feed_process(process, backup_file)
+            stdout, stderr = await asyncio.gather(stdout_task, stderr_task)
+            await process.wait()
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+            stdout_task.cancel()
+            stderr_task.cancel()
+            raise
+        return stdout, stderr
+    
+    async def _feed_process(self, process, backup_file: Path):
+        """把解压后的备份写入子进程标准输入（解压在线程中进行）"""
+        reader = await asyncio.to_thread(_open_compressed, backup_file)
+        try:
+            while chunk := await asyncio.to_thread(reader.read, CHUNK_SIZE):
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 子进程提前退出，错误信息见 stderr
+        finally:
+            await asyncio.to_thread(reader.close)
+            process.stdin.close()
+    
+    # ========== 完整备份与清理 ==========
     
     async def full_backup(
         self,
         database_url: Optional[str] = None,
         sessions_dir: str = "sessions",
-        config_files: Optional[List[str]] = None
+        config_files: Optional[List[str]] = None,
+        verify: Optional[bool] = None
     ) -> Dict[str, Optional[Path]]:
-        """完整备份"""
-        results = {}
+        """完整备份（数据库、Session、配置并发执行）"""
+        started = datetime.now()
+        steps = {}
         
         if database_url:
-            results["database"] = await self.backup_database(database_url)
+            steps["database"] = self.backup_database(database_url)
+        steps["sessions"] = self.backup_sessions(sessions_dir)
+        if config_files:
+            steps["config"] = self.backup_config(config_files)
         
-        results["sessions"] = await self.backup_sessions(sessions_dir)
+        results = dict(zip(steps.keys(), await asyncio.gather(*steps.values())))
         
-        if config_files:
-            results["config"] = await self.backup_config(config_files)
+        verification = {}
+        if self.verify_after_backup if verify is None else verify:
+            checks = {name: self.verify_backup(path) for name, path in results.items() if path}
+            verification = dict(zip(checks.keys(), await asyncio.gather(*checks.values())))
         
         # 记录备份元数据
         metadata = {
             "timestamp": datetime.now().isoformat(),
-            "backups": {k: str(v) if v else None for k, v in results.items()}
+            "duration_seconds": round((datetime.now() - started).total_seconds(), 3),
+            "backups": {k: str(v) if v else None for k, v in results.items()},
+            "sizes": {k: v.stat().st_size for k, v in results.items() if v},
+            "verification": verification,
         }
         metadata_file = self.backup_dir / f"backup_metadata_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         with open(metadata_file, "w") as f:
-            json.dump(metadata, f, indent=2)
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
         
         return results
     
     async def cleanup_old_backups(self):
-        """清理旧备份"""
+        """清理旧备份（并回收不再被任何清单引用的对象）"""
         try:
-            cutoff_date = datetime.now() - timedelta(days=self.retention_days)
-            deleted_count = 0
-            
-            for backup_file in self.backup_dir.glob("*"):
-                if backup_file.is_file():
-                    file_time = datetime.fromtimestamp(backup_file.stat().st_mtime)
-                    if file_time < cutoff_date:
-                        backup_file.unlink()
-                        deleted_count += 1
-                        logger.debug(f"删除旧备份: {backup_file}")
-            
-            if deleted_count > 0:
-                logger.info(f"清理了 {deleted_count} 个旧备份文件")
-                
+            deleted_count, deleted_objects = await asyncio.to_thread(self._cleanup_old_backups)
+            if deleted_count > 0 or deleted_objects > 0:
+                logger.info(f"清理了 {deleted_count} 个旧备份文件，回收 {deleted_objects} 个对象")
+        
         except Exception as e:
             logger.error(f"清理旧备份异常: {e}", exc_info=True)
     
-    async def restore_database(self, backup_file: Path, database_url: str) -> bool:
-        """恢复数据库"""
+    def _cleanup_old_backups(self) -> Tuple[int, int]:
+        cutoff_date = datetime.now() - timedelta(days=self.retention_days)
+        deleted_count = 0
+        
+        for backup_file in self.backup_dir.glob("*"):
+            if backup_file.is_file():
+                file_time = datetime.fromtimestamp(backup_file.stat().st_mtime)
+                if file_time < cutoff_date:
+                    backup_file.unlink()
+                    deleted_count += 1
+                    logger.debug(f"删除旧备份: {backup_file}")
+        
+        deleted_objects = 0
+        if self.objects_dir.exists():
+            with self._objects_lock:
+                referenced = set()
+                for manifest_file in self.backup_dir.glob(f"*{MANIFEST_SUFFIX}"):
+                    manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+                    referenced.update(entry["sha256"] for entry in manifest.get("files", []))
+                for object_file in self.objects_dir.glob("*/*"):
+                    if object_file.name not in referenced:
+                        object_file.unlink()
+                        deleted_objects += 1
+        return deleted_count, deleted_objects
+    
+    # ========== 恢复 ==========
+    
+    async def restore_database(self, backup_file: Path, database_url: str, verify_only: bool = False) -> bool:
+        """恢复数据库（先校验备份；verify_only=True 时只校验不恢复）"""
+        backup_file = Path(backup_file)
         if not backup_file.exists():
             logger.error(f"备份文件不存在: {backup_file}")
             return False
         
         try:
-            # 解压备份文件
-            if backup_file.suffix == ".gz":
-                import gzip
-                temp_file = backup_file.with_suffix("")
-                with gzip.open(backup_file, "rb") as f_in:
-                    with open(temp_file, "wb") as f_out:
-                        shutil.copyfileobj(f_in, f_out)
-                restore_file = temp_file
-            else:
-                restore_file = backup_file
+            verification = await self.verify_backup(backup_file)
+            if not verification["ok"] or verify_only:
+                return verification["ok"]
             
-            # 恢复数据库
-            if database_url.startswith("postgresql://"):
-                import os
-                from urllib.parse import urlparse
-                
-                parsed = urlparse(database_url)
-                db_name = parsed.path.lstrip("/")
-                db_user = parsed.username
-                db_host = parsed.hostname
-                db_port = parsed.port or 5432
-                
-                env = os.environ.copy()
-                if parsed.password:
-                    env["PGPASSWORD"] = parsed.password
-                
-                cmd = [
-                    "pg_restore",
-                    "-h", db_host,
-                    "-p", str(db_port),
-                    "-U", db_user,
-                    "-d", db_name,
-                    "-c",  # 清理现有数据
-                    str(backup_file)
-                ]
-                
-                result = subprocess.run(
-                    cmd,
+            url = make_url(database_url)
+            backend = url.get_backend_name()
+            
+            if backend == "postgresql":
+                args, env = _pg_connection_args(url)
+                process = await asyncio.create_subprocess_exec(
+                    "pg_restore", *args, "-c",  # 清理现有数据
                     env=env,
-                    capture_output=True,
-                    text=True,
-                    timeout=600
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
                 )
                 
-                if result.returncode == 0:
+                try:
+                    _, stderr = await asyncio.wait_for(
+                        self._run_with_backup_input(process, backup_file), timeout=PG_RESTORE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    logger.error(f"数据库恢复超时: {backup_file}")
+                    return False
+                
+                if process.returncode == 0:
                     logger.info(f"数据库恢复完成: {backup_file}")
-                    if temp_file and temp_file.exists():
-                        temp_file.unlink()  # 删除临时文件
                     return True
-                else:
-                    logger.error(f"数据库恢复失败: {result.stderr}")
-                    if temp_file and temp_file.exists():
-                        temp_file.unlink()
-                    return False
-            elif database_url.startswith("sqlite:///"):
-                # SQLite 恢复
-                import shutil
-                db_path = database_url.replace("sqlite:///", "")
-                # 备份原数据库
-                if Path(db_path).exists():
-                    shutil.copy(db_path, f"{db_path}.backup")
-                # 恢复
-                if restore_file.suffix == ".gz":
-                    with gzip.open(restore_file, "rb") as f_in:
-                        with open(db_path, "wb") as f_out:
-                            shutil.copyfileobj(f_in, f_out)
-                else:
-                    shutil.copy(restore_file, db_path)
-                logger.info(f"SQLite 数据库恢复完成: {db_path}")
-                if temp_file and temp_file.exists():
-                    temp_file.unlink()
+                logger.error(f"数据库恢复失败: {stderr.decode('utf-8', errors='replace')}")
+                return False
+            
+            if backend == "sqlite":
+                await asyncio.to_thread(self._restore_sqlite, backup_file, Path(url.database))
+                logger.info(f"SQLite 数据库恢复完成: {url.database}")
                 return True
             
+            logger.warning(f"不支持的数据库类型: {backend}")
             return False
-            
+        
         except Exception as e:
             logger.error(f"数据库恢复异常: {e}", exc_info=True)
             return False
     
+    def _restore_sqlite(self, backup_file: Path, db_path: Path):
+        """解压到临时文件后用在线备份 API 写回（已打开的连接无需重建）"""
+        fd, temp_name = tempfile.mkstemp(suffix=".sqlite", dir=db_path.parent)
+        os.close(fd)
+        try:
+            _decompress_file(backup_file, Path(temp_name))
+            if db_path.exists():
+                # 备份原数据库
+                shutil.copy(db_path, f"{db_path}.backup")
+            source = sqlite3.connect(temp_name)
+            target = sqlite3.connect(db_path, timeout=30)
+            try:
+                source.backup(target, pages=SQLITE_BACKUP_PAGES)
+            finally:
+                target.close()
+                source.close()
+        finally:
+            os.unlink(temp_name)
+    
     async def start_auto_backup(
         self,
         database_url: Optional[str] = None,
@@ -294,11 +710,20 @@ class BackupManager:
             logger.info("自动备份未启用")
             return
         
+        async def is_leader() -> bool:
+            # 多进程部署时只由持有调度租约的进程备份，避免每个 worker 重复备份
+            from app.core.leader_lease import get_leader_lease
+            if await asyncio.to_thread(get_leader_lease("scheduler").check):
+                return True
+            logger.debug("本进程不是调度领导者，跳过自动备份")
+            return False
+        
         # 立即执行一次备份
         try:
-            logger.info("执行初始备份...")
-            await self.full_backup(database_url, sessions_dir, config_files)
-            await self.cleanup_old_backups()
+            if await is_leader():
+                logger.info("执行初始备份...")
+                await self.full_backup(database_url, sessions_dir, config_files)
+                await self.cleanup_old_backups()
         except Exception as e:
             logger.warning(f"初始备份失败: {e}")
         
@@ -306,6 +731,8 @@ class BackupManager:
             while True:
                 try:
                     await asyncio.sleep(self.backup_interval_hours * 3600)
+                    if not await is_leader():
+                        continue
                     logger.info("开始自动备份...")
                     await self.full_backup(database_url, sessions_dir, config_files)
                     await self.cleanup_old_backups()
@@ -340,7 +767,8 @@ def get_backup_manager() -> BackupManager:
         _backup_manager = BackupManager(
             backup_dir=backup_dir,
             retention_days=retention_days,
-            auto_backup_enabled=auto_backup
+            auto_backup_enabled=auto_backup,
+            verify_after_backup=getattr(settings, "backup_verify", True),
+            max_workers=getattr(settings, "backup_workers", 4)
         )
     return _backup_manager
-
@@ -5,11 +5,19 @@
 import logging
 import json
 import hashlib
-from typing import Any, Optional, Callable, Dict
+import inspect
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Optional, Callable, Dict, Iterable, List, Sequence, Union
 from datetime import datetime, timedelta
 from functools import wraps
 import asyncio
 
+from starlette.background import BackgroundTasks
+from starlette.requests import HTTPConnection
+
 logger = logging.getLogger(__name__)
 
 
@@ -60,6 +68,69 @@ def _json_serializer_default(obj: Any) -> Any:
     # 后备方案：使用字符串表示
     return str(obj)
 
+def _is_request_scoped(value: Any) -> bool:
+    """
+    请求级依赖对象（数据库会话、Request、BackgroundTasks）不参与缓存键：
+    它们每个请求都是新实例，序列化结果各不相同，会使缓存永远无法命中
+    """
+    if isinstance(value, (HTTPConnection, BackgroundTasks)):
+        return True
+    return callable(getattr(value, "commit", None)) and callable(getattr(value, "rollback", None))
+
+
+def _estimate_size(value: Any) -> int:
+    """估算缓存值序列化后的字节数"""
+    try:
+        return len(json.dumps(value, default=_json_serializer_default).encode())
+    except (TypeError, ValueError):
+        return 0
+
+
+def _format_tags(templates: Sequence[str], arguments: Dict[str, Any]) -> List[str]:
+    """用函数参数填充标签模板，缺少参数的模板跳过"""
+    resolved = []
+    for template in templates:
+        try:
+            resolved.append(template.format(**arguments))
+        except (KeyError, IndexError, ValueError):
+            logger.debug(f"缓存标签 {template} 缺少参数，已跳过")
+    return resolved
+
+
+@dataclass
+class PrefixStats:
+    """单个缓存前缀的统计：命中、未命中、重算耗时与结果大小"""
+    hits: int = 0
+    misses: int = 0
+    computes: int = 0
+    compute_ms: float = 0.0
+    payload_bytes: int = 0  # 最近一次写入的结果大小
+    refreshes: int = 0  # 后台提前刷新次数
+
+    @property
+    def requests(self) -> int:
+        return self.hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+    @property
+    def avg_compute_ms(self) -> float:
+        return self.compute_ms / self.computes if self.computes else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "computes": self.computes,
+            "avg_compute_ms": round(self.avg_compute_ms, 2),
+            "payload_bytes": self.payload_bytes,
+            "refreshes": self.refreshes,
+        }
+
+
 try:
     import redis
     REDIS_AVAILABLE = True
@@ -68,8 +139,26 @@ except ImportError:
     logger.warning("Redis 未安装，将使用内存缓存")
 
 
+# 标签版本号键前缀与失效广播频道
+TAG_KEY_PREFIX = "cache:tag:"
+INVALIDATION_CHANNEL = "cache:invalidate"
+# 带标签的 Redis 缓存值封装标记
+TAGGED_VALUE_MARKER = "__cache_tags__"
+
+TagsArg = Union[Iterable[str], Dict[str, int], None]
+
+
 class CacheManager:
-    """智能缓存管理器"""
+    """
+    智能缓存管理器
+
+    标签失效：每个缓存条目记录所属标签及写入时的标签版本号，
+    失效一个标签只需递增其版本号（Redis INCR，O(1)），版本落后的条目在读取时视为未命中；
+    版本变更通过 Redis pub/sub 广播，各进程据此清理本地内存缓存
+
+    前缀统计：cached 装饰器按前缀记录命中率、重算耗时和结果大小，
+    供 CacheOptimizer 提前刷新热点条目并调整各前缀的 TTL（ttl_overrides）
+    """
     
     def __init__(self, redis_url: Optional[str] = None, default_ttl: int = 300):
         """
@@ -83,6 +172,17 @@ class CacheManager:
         self.memory_cache: Dict[str, Dict[str, Any]] = {}
         self.redis_client: Optional[redis.Redis] = None
         self.use_redis: bool = False
+        # 本进程已知的标签版本号（Redis 模式下是全局版本的下界，由失效广播推进）
+        self.tag_versions: Dict[str, int] = {}
+        self.instance_id = uuid.uuid4().hex
+        self._tag_lock = threading.Lock()
+        self._pubsub = None
+        self._listener_thread: Optional[threading.Thread] = None
+        # 按前缀的统计、装饰器声明的 TTL 与标签模板、自适应调整后的 TTL
+        self.prefix_stats: Dict[str, PrefixStats] = {}
+        self.declared_ttls: Dict[str, int] = {}
+        self.prefix_tags: Dict[str, List[str]] = {}
+        self.ttl_overrides: Dict[str, int] = {}
         
         if redis_url and REDIS_AVAILABLE:
             try:
@@ -94,13 +194,20 @@ class CacheManager:
                 logger.warning(f"Redis 连接失败，使用内存缓存: {e}")
                 self.redis_client = None
                 self.use_redis = False
+        
+        if self.use_redis:
+            self._start_invalidation_listener()
     
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """
         生成缓存键
         
-        使用自定义 JSON 序列化器处理 SQLAlchemy 模型对象和其他不可序列化的对象
+        使用自定义 JSON 序列化器处理 SQLAlchemy 模型对象和其他不可序列化的对象；
+        数据库会话等请求级依赖不参与键的生成
         """
+        args = [arg for arg in args if not _is_request_scoped(arg)]
+        kwargs = {key: value for key, value in kwargs.items() if not _is_request_scoped(value)}
+
         # 处理 args：对于对象，尝试提取 id 或使用字符串表示
         serialized_args = []
         for arg in args:
@@ -160,10 +267,19 @@ class CacheManager:
             try:
                 value = self.redis_client.get(key)
                 if value:
+                    data = json.loads(value)
+                    if isinstance(data, dict) and TAGGED_VALUE_MARKER in data:
+                        if self._is_stale_remote(data[TAGGED_VALUE_MARKER]):
+                            # 标签已失效：同时丢弃本地副本（失效广播可能尚未到达）
+                            self.memory_cache.pop(key, None)
+                            if "_cache_stats" in globals():
+                                _cache_stats["misses"] = _cache_stats.get("misses", 0) + 1
+                            return None
+                        data = data["value"]
                     # 更新统计
                     if "_cache_stats" in globals():
                         _cache_stats["hits"] = _cache_stats.get("hits", 0) + 1
-                    return json.loads(value)
+                    return data
             except Exception as e:
                 logger.debug(f"Redis 获取失败: {e}")
                 # Redis 失败后降级到内存缓存
@@ -173,14 +289,14 @@ class CacheManager:
         if key in self.memory_cache:
             cache_item = self.memory_cache[key]
             if isinstance(cache_item, dict) and "expires_at" in cache_item:
-                # 标准格式：{"value": ..., "expires_at": ...}
-                if datetime.now() < cache_item["expires_at"]:
+                # 标准格式：{"value": ..., "expires_at": ..., "tags": {...}}
+                if datetime.now() < cache_item["expires_at"] and not self._is_stale_local(cache_item.get("tags")):
                     # 更新统计
                     if "_cache_stats" in globals():
                         _cache_stats["hits"] = _cache_stats.get("hits", 0) + 1
                     return cache_item["value"]
                 else:
-                    del self.memory_cache[key]
+                    self.memory_cache.pop(key, None)
             else:
                 # 直接值格式（测试中使用）
                 # 更新统计
@@ -219,35 +335,54 @@ class CacheManager:
         """获取缓存值（异步版本）"""
         return self.get(key)
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None, expire: Optional[int] = None) -> bool:
-        """设置缓存值（同步版本）"""
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: Optional[int] = None,
+        expire: Optional[int] = None,
+        tags: TagsArg = None,
+    ) -> bool:
+        """
+        设置缓存值（同步版本）
+
+        Args:
+            tags: 条目所属标签；传入标签名列表时记录当前版本号，
+                传入 {标签: 版本号} 时使用调用方在计算结果之前取得的版本（避免计算期间的失效被覆盖）
+        """
         # 支持 expire 参数（测试中使用）
         ttl = ttl or expire or self.default_ttl
+        tag_versions = None
+        if tags:
+            tag_versions = dict(tags) if isinstance(tags, dict) else self.get_tag_versions(tags)
         
         # 设置 Redis
         if self.redis_client:
             try:
+                payload = value if tag_versions is None else {TAGGED_VALUE_MARKER: tag_versions, "value": value}
                 self.redis_client.setex(
                     key,
                     ttl,
-                    json.dumps(value, default=str)
+                    json.dumps(payload, default=str)
                 )
             except Exception as e:
                 logger.debug(f"Redis 设置失败: {e}")
         
         # 设置内存缓存
-        self.memory_cache[key] = {
+        item = {
             "value": value,
             "expires_at": datetime.now() + timedelta(seconds=ttl)
         }
+        if tag_versions is not None:
+            item["tags"] = tag_versions
+        self.memory_cache[key] = item
         
         # 限制内存缓存大小（最多1000个）
         if len(self.memory_cache) > 1000:
-            # 删除最旧的100个
-            sorted_items = sorted(self.memory_cache.items(), key=lambda x: x[1]["expires_at"])
+            # 删除最旧的100个（失效广播线程可能同时删除条目，先取快照）
+            sorted_items = sorted(list(self.memory_cache.items()), key=lambda x: x[1]["expires_at"])
             for old_key, _ in sorted_items[:100]:
-                if old_key in self.memory_cache:
-                    del self.memory_cache[old_key]
+                self.memory_cache.pop(old_key, None)
         
         return True
     
@@ -282,19 +417,142 @@ class CacheManager:
         
         if self.redis_client:
             try:
-                keys = self.redis_client.keys(pattern)
-                if keys:
-                    count += self.redis_client.delete(*keys)
+                # 使用 SCAN 增量遍历，避免 KEYS 在大键空间上阻塞 Redis
+                batch: List[str] = []
+                for key in self.redis_client.scan_iter(match=pattern, count=500):
+                    batch.append(key)
+                    if len(batch) >= 500:
+                        count += self.redis_client.delete(*batch)
+                        batch = []
+                if batch:
+                    count += self.redis_client.delete(*batch)
             except Exception as e:
                 logger.debug(f"Redis 清除模式失败: {e}")
         
         # 清除内存缓存
-        keys_to_delete = [k for k in self.memory_cache.keys() if pattern.replace("*", "") in k]
+        keys_to_delete = [k for k in list(self.memory_cache.keys()) if pattern.replace("*", "") in k]
         for key in keys_to_delete:
-            del self.memory_cache[key]
-            count += 1
+            if self.memory_cache.pop(key, None) is not None:
+                count += 1
         
         return count
+
+    # ========== 标签失效 ==========
+
+    def get_tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        """获取标签当前版本号（Redis 可用时读取全局版本，一次 MGET）"""
+        tags = list(dict.fromkeys(tags))
+        if not tags:
+            return {}
+        if self.redis_client and self.use_redis:
+            try:
+                values = self.redis_client.mget([f"{TAG_KEY_PREFIX}{tag}" for tag in tags])
+                versions = {tag: int(value or 0) for tag, value in zip(tags, values)}
+                self._advance_local_versions(versions)
+                return versions
+            except Exception as e:
+                logger.debug(f"Redis 获取标签版本失败: {e}")
+        return {tag: self.tag_versions.get(tag, 0) for tag in tags}
+
+    def invalidate_tags(self, *tags: str) -> Dict[str, int]:
+        """
+        使带有指定标签的所有缓存失效（所有进程、Redis 与内存缓存）
+
+        Returns:
+            标签的新版本号
+        """
+        tags = [tag for tag in dict.fromkeys(tags) if tag]
+        if not tags:
+            return {}
+        versions: Optional[Dict[str, int]] = None
+        if self.redis_client and self.use_redis:
+            try:
+                pipe = self.redis_client.pipeline()
+                for tag in tags:
+                    pipe.incr(f"{TAG_KEY_PREFIX}{tag}")
+                versions = {tag: int(value) for tag, value in zip(tags, pipe.execute())}
+                self.redis_client.publish(
+                    INVALIDATION_CHANNEL,
+                    json.dumps({"origin": self.instance_id, "tags": versions}),
+                )
+            except Exception as e:
+                logger.debug(f"Redis 标签失效失败: {e}")
+                versions = None
+        if versions is None:
+            with self._tag_lock:
+                versions = {tag: self.tag_versions.get(tag, 0) + 1 for tag in tags}
+        self._apply_invalidation(versions)
+        return versions
+
+    def _advance_local_versions(self, versions: Dict[str, int]) -> None:
+        with self._tag_lock:
+            for tag, version in versions.items():
+                if version > self.tag_versions.get(tag, 0):
+                    self.tag_versions[tag] = version
+
+    def _apply_invalidation(self, versions: Dict[str, int]) -> int:
+        """推进本地标签版本并清理内存缓存中的过期条目"""
+        self._advance_local_versions(versions)
+        removed = 0
+        for key, item in list(self.memory_cache.items()):
+            if isinstance(item, dict) and self._is_stale_local(item.get("tags")):
+                if self.memory_cache.pop(key, None) is not None:
+                    removed += 1
+        return removed
+
+    def _is_stale_local(self, item_tags: Optional[Dict[str, int]]) -> bool:
+        if not item_tags:
+            return False
+        return any(version < self.tag_versions.get(tag, 0) for tag, version in item_tags.items())
+
+    def _is_stale_remote(self, item_tags: Dict[str, int]) -> bool:
+        if not item_tags:
+            return False
+        current = self.get_tag_versions(item_tags.keys())
+        return any(version < current.get(tag, 0) for tag, version in item_tags.items())
+
+    def _start_invalidation_listener(self) -> None:
+        """订阅失效广播，推进本地标签版本（daemon 线程）"""
+        try:
+            self._pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(INVALIDATION_CHANNEL)
+        except Exception as e:
+            logger.warning(f"订阅缓存失效广播失败，其他进程的失效将在 TTL 到期后生效: {e}")
+            self._pubsub = None
+            return
+        self._listener_thread = threading.Thread(
+            target=self._listen_invalidations, name="cache-invalidation-listener", daemon=True
+        )
+        self._listener_thread.start()
+
+    def _listen_invalidations(self) -> None:
+        while self._pubsub is not None:
+            try:
+                message = self._pubsub.get_message(timeout=1.0)
+                if message and message.get("type") == "message":
+                    self.handle_invalidation_message(message.get("data"))
+            except Exception as e:
+                logger.debug(f"处理缓存失效广播失败: {e}")
+                time.sleep(1.0)
+
+    def handle_invalidation_message(self, data: Union[str, bytes, None]) -> int:
+        """处理其他进程发布的失效消息，返回清理的本地条目数"""
+        if not data:
+            return 0
+        payload = json.loads(data)
+        if payload.get("origin") == self.instance_id:
+            return 0
+        versions = {str(tag): int(version) for tag, version in (payload.get("tags") or {}).items()}
+        return self._apply_invalidation(versions)
+
+    def close(self) -> None:
+        """停止失效广播订阅"""
+        pubsub, self._pubsub = self._pubsub, None
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
     
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
@@ -309,37 +567,157 @@ class CacheManager:
             "misses": misses,
             "hit_rate": hit_rate,
             "backend": "redis" if self.redis_client else "memory",
-            "memory_cache_size": len(self.memory_cache)
+            "memory_cache_size": len(self.memory_cache),
+            "prefixes": {
+                prefix: {**stats.to_dict(), "ttl": self.resolve_ttl(prefix)}
+                for prefix, stats in list(self.prefix_stats.items())
+            },
         }
+
+    # ========== 前缀统计与 TTL ==========
+
+    def _prefix_stats(self, prefix: str) -> PrefixStats:
+        stats = self.prefix_stats.get(prefix)
+        if stats is None:
+            stats = self.prefix_stats.setdefault(prefix, PrefixStats())
+        return stats
+
+    def record_hit(self, prefix: str) -> None:
+        self._prefix_stats(prefix).hits += 1
+
+    def record_miss(self, prefix: str) -> None:
+        self._prefix_stats(prefix).misses += 1
+
+    def record_compute(self, prefix: str, elapsed_ms: float, value: Any, refresh: bool = False) -> None:
+        """记录一次重算的耗时与结果大小（refresh 表示后台提前刷新）"""
+        stats = self._prefix_stats(prefix)
+        stats.computes += 1
+        stats.compute_ms += elapsed_ms
+        stats.payload_bytes = _estimate_size(value)
+        if refresh:
+            stats.refreshes += 1
+
+    def resolve_ttl(self, prefix: str, ttl: Optional[int] = None) -> int:
+        """前缀的生效 TTL：自适应调整值 > 调用方指定值 > 装饰器声明值 > 默认值"""
+        return self.ttl_overrides.get(prefix) or ttl or self.declared_ttls.get(prefix) or self.default_ttl
+
+    def resolve_tags(self, prefix: str, arguments: Dict[str, Any]) -> List[str]:
+        """按装饰器声明的标签模板生成条目标签（未通过装饰器声明的前缀只有前缀标签）"""
+        return _format_tags(self.prefix_tags.get(prefix, [prefix]), arguments)
+
+    def remaining_ttl(self, key: str) -> Optional[float]:
+        """条目剩余有效时间（秒）；不存在、已过期或标签已失效时返回 None"""
+        if self.redis_client and self.use_redis:
+            try:
+                value = self.redis_client.get(key)
+                if not value:
+                    return None
+                data = json.loads(value)
+                if isinstance(data, dict) and TAGGED_VALUE_MARKER in data and self._is_stale_remote(data[TAGGED_VALUE_MARKER]):
+                    return None
+                remaining_ms = self.redis_client.pttl(key)
+                return remaining_ms / 1000 if remaining_ms and remaining_ms > 0 else None
+            except Exception as e:
+                logger.debug(f"Redis 获取剩余 TTL 失败: {e}")
+        item = self.memory_cache.get(key)
+        if not isinstance(item, dict) or "expires_at" not in item or self._is_stale_local(item.get("tags")):
+            return None
+        remaining = (item["expires_at"] - datetime.now()).total_seconds()
+        return remaining if remaining > 0 else None
+
+    def acquire_refresh_lock(self, key: str, ttl: int) -> bool:
+        """多进程共享 Redis 时，同一条目的提前刷新只由一个进程执行"""
+        if not (self.redis_client and self.use_redis):
+            return True
+        try:
+            return bool(self.redis_client.set(f"cache:refresh:{key}", self.instance_id, nx=True, ex=max(int(ttl), 1)))
+        except Exception as e:
+            logger.debug(f"Redis 获取刷新锁失败: {e}")
+            return True
     
-    def cached(self, prefix: str = "cache", ttl: Optional[int] = None):
+    def cached(
+        self,
+        prefix: str = "cache",
+        ttl: Optional[int] = None,
+        tags: Optional[Iterable[str]] = None,
+        vary_on: Optional[Sequence[str]] = None,
+    ):
         """
         缓存装饰器（支持同步和异步函数）
         
+        条目自动带有 prefix 标签；tags 可包含函数参数占位符，如 "account:{account_id}"。
+        vary_on 指定参与缓存键的参数名（默认全部参数）；传入 () 时所有调用共享同一条目，
+        键与 CacheOptimizer 预热时生成的键一致
+        
         Usage:
-            @cache_manager.cached(prefix="user", ttl=600)
+            @cache_manager.cached(prefix="user", ttl=600, tags=("user:{user_id}",))
             async def get_user(user_id: int):
                 # 函数逻辑
                 pass
         """
+        tag_templates = [prefix] + [tag for tag in (tags or []) if tag != prefix]
+        self.prefix_tags[prefix] = tag_templates
+        if ttl:
+            self.declared_ttls[prefix] = ttl
+
         def decorator(func: Callable):
+            try:
+                signature = inspect.signature(func)
+            except (TypeError, ValueError):
+                signature = None
+
+            def bind(args, kwargs) -> Dict[str, Any]:
+                if signature is None:
+                    return dict(kwargs)
+                try:
+                    bound = signature.bind_partial(*args, **kwargs)
+                except TypeError:
+                    return dict(kwargs)
+                bound.apply_defaults()
+                return bound.arguments
+
+            def build_key(args, kwargs) -> str:
+                if vary_on is None:
+                    return self._generate_key(prefix, *args, **kwargs)
+                arguments = bind(args, kwargs)
+                return self._generate_key(prefix, **{name: arguments.get(name) for name in vary_on})
+
+            def resolve_tags(args, kwargs) -> List[str]:
+                if len(tag_templates) == 1:
+                    return tag_templates[:1]
+                return _format_tags(tag_templates, bind(args, kwargs))
+
+            def lookup(cache_key: str) -> Optional[Any]:
+                cached_value = self.get(cache_key)
+                if cached_value is not None:
+                    logger.debug(f"缓存命中: {cache_key}")
+                    self.record_hit(prefix)
+                else:
+                    self.record_miss(prefix)
+                return cached_value
+
+            def store(cache_key: str, result: Any, started: float, tag_versions: Dict[str, int]) -> None:
+                self.record_compute(prefix, (time.perf_counter() - started) * 1000, result)
+                self.set(cache_key, result, self.resolve_ttl(prefix, ttl), tags=tag_versions)
+
             if asyncio.iscoroutinefunction(func):
                 # 异步函数
                 @wraps(func)
                 async def async_wrapper(*args, **kwargs):
-                    cache_key = self._generate_key(prefix, *args, **kwargs)
+                    cache_key = build_key(args, kwargs)
                     
                     # 尝试从缓存获取
-                    cached_value = self.get(cache_key)
+                    cached_value = lookup(cache_key)
                     if cached_value is not None:
-                        logger.debug(f"缓存命中: {cache_key}")
                         return cached_value
                     
-                    # 执行函数
+                    # 在执行函数之前取得标签版本，执行期间发生的失效会使本次结果立即过期
+                    tag_versions = self.get_tag_versions(resolve_tags(args, kwargs))
+                    started = time.perf_counter()
                     result = await func(*args, **kwargs)
                     
                     # 存入缓存
-                    self.set(cache_key, result, ttl)
+                    store(cache_key, result, started, tag_versions)
                     
                     return result
                 return async_wrapper
@@ -347,19 +725,20 @@ class CacheManager:
                 # 同步函数
                 @wraps(func)
                 def sync_wrapper(*args, **kwargs):
-                    cache_key = self._generate_key(prefix, *args, **kwargs)
+                    cache_key = build_key(args, kwargs)
                     
                     # 尝试从缓存获取
-                    cached_value = self.get(cache_key)
+                    cached_value = lookup(cache_key)
                     if cached_value is not None:
-                        logger.debug(f"缓存命中: {cache_key}")
                         return cached_value
                     
-                    # 执行函数
+                    # 在执行函数之前取得标签版本，执行期间发生的失效会使本次结果立即过期
+                    tag_versions = self.get_tag_versions(resolve_tags(args, kwargs))
+                    started = time.perf_counter()
                     result = func(*args, **kwargs)
                     
                     # 存入缓存
-                    self.set(cache_key, result, ttl)
+                    store(cache_key, result, started, tag_versions)
                     
                     return result
                 return sync_wrapper
@@ -394,12 +773,18 @@ def get_cache_key(prefix: str, *args, **kwargs) -> str:
     return cache_key(prefix, *args, **kwargs)
 
 
-def cached(prefix: str = "cache", ttl: Optional[int] = None, expire: Optional[int] = None):
+def cached(
+    prefix: str = "cache",
+    ttl: Optional[int] = None,
+    expire: Optional[int] = None,
+    tags: Optional[Iterable[str]] = None,
+    vary_on: Optional[Sequence[str]] = None,
+):
     """
     缓存装饰器（独立函数版本）
     
     Usage:
-        @cached(prefix="user", ttl=600)
+        @cached(prefix="user", ttl=600, tags=("user:{user_id}",))
         async def get_user(user_id: int):
             # 函数逻辑
             pass
@@ -407,27 +792,48 @@ def cached(prefix: str = "cache", ttl: Optional[int] = None, expire: Optional[in
     # 支持 expire 参数（测试中使用）
     ttl = ttl or expire
     cache_manager = get_cache_manager()
-    return cache_manager.cached(prefix=prefix, ttl=ttl)
+    return cache_manager.cached(prefix=prefix, ttl=ttl, tags=tags, vary_on=vary_on)
+
+
+def invalidate_tags(*tags: str) -> Dict[str, int]:
+    """
+    按标签使缓存失效（Redis、所有 worker 的内存缓存）
+    
+    Usage:
+        invalidate_tags("accounts_list", f"account:{account_id}")
+    """
+    try:
+        return get_cache_manager().invalidate_tags(*tags)
+    except Exception as e:
+        logger.warning(f"按标签清除缓存失败: {e}，继续执行")
+        return {}
+
+
+def pattern_to_tag(pattern: str) -> str:
+    """将旧的键模式（如 "accounts_list:*"）转换为对应的前缀标签"""
+    return pattern.rstrip("*").rstrip(":")
 
 
 def invalidate_cache(pattern: str) -> int:
     """
     使缓存失效（同步版本，可在异步上下文中安全调用）
-    只清除内存缓存，避免异步调用问题
+    清除本进程匹配的内存缓存，并递增模式对应的前缀标签版本，
+    使 Redis 中和其他 worker 的同前缀条目一并失效
     
     Args:
         pattern: 缓存键模式（支持 * 通配符）
     
     Returns:
-        清除的缓存数量
+        清除的本地缓存数量
     """
     try:
         cache_manager = get_cache_manager()
-        # 只清除内存缓存（同步操作，安全）
-        keys_to_delete = [k for k in cache_manager.memory_cache.keys() if pattern.replace("*", "") in k]
+        keys_to_delete = [k for k in list(cache_manager.memory_cache.keys()) if pattern.replace("*", "") in k]
         for key in keys_to_delete:
-            if key in cache_manager.memory_cache:
-                del cache_manager.memory_cache[key]
+            cache_manager.memory_cache.pop(key, None)
+        tag = pattern_to_tag(pattern)
+        if tag:
+            cache_manager.invalidate_tags(tag)
         return len(keys_to_delete)
     except Exception as e:
         logger.warning(f"清除缓存失败: {e}，继续执行")
@@ -5,7 +5,7 @@
 import logging
 from typing import List, Set, Optional, Callable
 from datetime import datetime, timedelta
-from app.core.cache import get_cache_manager, invalidate_cache
+from app.core.cache import get_cache_manager, invalidate_cache, invalidate_tags
 
 logger = logging.getLogger(__name__)
 
@@ -20,25 +20,28 @@ class CacheInvalidationStrategy:
     
     def register_invalidation_rule(
         self,
-        pattern: str,
+        pattern: Optional[str],
         on_events: List[str],
-        ttl_override: Optional[int] = None
+        ttl_override: Optional[int] = None,
+        tags: Optional[List[str]] = None
     ):
         """
         注册缓存失效规则
         
         Args:
-            pattern: 缓存键模式（支持通配符，如 "accounts_list:*"）
+            pattern: 缓存键模式（支持通配符，如 "accounts_list:*"），为 None 时只按标签失效
             on_events: 触发失效的事件列表（如 ["account.created", "account.updated"]）
             ttl_override: 可选的TTL覆盖值
+            tags: 额外失效的标签，可引用事件参数（如 "account:{account_id}"）
         """
         rule = {
             "pattern": pattern,
             "on_events": on_events,
-            "ttl_override": ttl_override
+            "ttl_override": ttl_override,
+            "tags": tags or []
         }
         self.invalidation_rules.append(rule)
-        logger.info(f"注册缓存失效规则: {pattern} -> {on_events}")
+        logger.info(f"注册缓存失效规则: {pattern or tags} -> {on_events}")
     
     def register_event_handler(self, event: str, handler: Callable):
         """注册事件处理器"""
@@ -70,11 +73,26 @@ class CacheInvalidationStrategy:
             if event in rule["on_events"]:
                 pattern = rule["pattern"]
                 try:
-                    invalidate_cache(pattern)
-                    logger.info(f"缓存失效: {pattern} (事件: {event})")
+                    if pattern:
+                        invalidate_cache(pattern)
+                    tags = self._resolve_tags(rule.get("tags") or [], kwargs)
+                    if tags:
+                        invalidate_tags(*tags)
+                    logger.info(f"缓存失效: {pattern} {tags or ''} (事件: {event})")
                 except Exception as e:
                     logger.error(f"缓存失效失败: {e}", exc_info=True)
     
+    @staticmethod
+    def _resolve_tags(templates: List[str], params: dict) -> List[str]:
+        """用事件参数填充标签模板，缺少参数的标签跳过"""
+        tags = []
+        for template in templates:
+            try:
+                tags.append(template.format(**params))
+            except (KeyError, IndexError, ValueError):
+                continue
+        return tags
+    
     def invalidate_by_pattern(self, pattern: str):
         """按模式失效缓存"""
         try:
@@ -134,9 +152,11 @@ def _setup_default_rules(strategy: CacheInvalidationStrategy):
         pattern="accounts_list:*",
         on_events=["account.created", "account.updated", "account.deleted", "account.started", "account.stopped"]
     )
+    # 详情缓存按对象标签精确失效，只影响对应的账号 / 剧本
     strategy.register_invalidation_rule(
-        pattern="account_detail:*",
-        on_events=["account.updated", "account.deleted", "account.started", "account.stopped"]
+        pattern=None,
+        on_events=["account.updated", "account.deleted", "account.started", "account.stopped"],
+        tags=["account:{account_id}"]
     )
     
     # 脚本相关事件
@@ -145,8 +165,9 @@ def _setup_default_rules(strategy: CacheInvalidationStrategy):
         on_events=["script.created", "script.updated", "script.deleted", "script.published"]
     )
     strategy.register_invalidation_rule(
-        pattern="script_detail:*",
-        on_events=["script.updated", "script.deleted"]
+        pattern=None,
+        on_events=["script.updated", "script.deleted"],
+        tags=["script:{script_id}"]
     )
     
     # 服务器相关事件
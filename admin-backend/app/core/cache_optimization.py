@@ -1,108 +1,292 @@
 """
 缓存优化策略
-提供缓存预热、智能失效、缓存压缩等功能
+提供缓存预热、提前刷新、自适应 TTL 等功能
+
+预热注册表：端点通过 warmup_query 声明可预热的查询（加载函数 + 参数），
+加载函数的结果与端点缓存的值一致，写入与 cached 装饰器相同的缓存键。
+后台控制器周期性执行：
+- 提前刷新：被访问过的预热条目在到期前重新计算，避免 TTL 边界上的慢请求
+- 自适应 TTL：按各前缀观察到的命中率与重算耗时调整 TTL（限制在声明值的倍数区间内）
 """
+import asyncio
+import inspect
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-from app.core.cache import get_cache_manager
-from app.db import SessionLocal
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from app.core.cache import PrefixStats, get_cache_manager
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class WarmupSpec:
+    """可预热的查询"""
+    prefix: str
+    loader: Callable[..., Any]  # 同步函数（在线程池执行）或协程函数，返回值即缓存值
+    params: Dict[str, Any] = field(default_factory=dict)  # 对应 cached(vary_on=...) 的参数
+    ttl: Optional[int] = None
+    last_loaded: Optional[float] = None
+    requests_seen: int = 0  # 上次刷新时该前缀的请求数，用于判断期间是否被访问
+
+    @property
+    def name(self) -> str:
+        return getattr(self.loader, "__name__", self.prefix)
+
+
+# 预热注册表：(前缀, 参数) -> 预热查询
+_warmup_registry: Dict[Tuple[str, str], WarmupSpec] = {}
+
+
+def register_warmup(
+    prefix: str,
+    loader: Callable[..., Any],
+    params: Optional[Dict[str, Any]] = None,
+    ttl: Optional[int] = None,
+) -> WarmupSpec:
+    """注册可预热的查询（同一前缀和参数重复注册时覆盖）"""
+    spec = WarmupSpec(prefix=prefix, loader=loader, params=dict(params or {}), ttl=ttl)
+    _warmup_registry[(prefix, repr(sorted(spec.params.items())))] = spec
+    return spec
+
+
+def warmup_query(prefix: str, params: Optional[Dict[str, Any]] = None, ttl: Optional[int] = None):
+    """
+    声明可预热查询的装饰器
+
+    Usage:
+        @warmup_query("dashboard_stats")
+        def get_dashboard_stats() -> Dict[str, Any]:
+            ...
+    """
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        register_warmup(prefix, func, params=params, ttl=ttl)
+        return func
+    return decorator
+
+
+def get_warmup_specs() -> List[WarmupSpec]:
+    """获取已注册的预热查询"""
+    return list(_warmup_registry.values())
+
+
 class CacheOptimizer:
     """缓存优化器"""
-    
-    def __init__(self):
+
+    def __init__(
+        self,
+        interval_seconds: float = 10.0,
+        refresh_ahead_ratio: float = 0.2,
+        tune_interval_seconds: float = 300.0,
+        ttl_min_factor: float = 0.5,
+        ttl_max_factor: float = 4.0,
+        min_samples: int = 20,
+        expensive_ms: float = 100.0,
+        cheap_ms: float = 5.0,
+    ):
         self.cache_manager = get_cache_manager()
-    
-    async def warmup_cache(self):
-        """缓存预热 - 预加载常用数据"""
-        logger.info("开始缓存预热...")
-        
-        try:
-            db = SessionLocal()
+        self.interval_seconds = interval_seconds
+        self.refresh_ahead_ratio = refresh_ahead_ratio
+        self.tune_interval_seconds = tune_interval_seconds
+        self.ttl_min_factor = ttl_min_factor
+        self.ttl_max_factor = ttl_max_factor
+        self.min_samples = min_samples
+        self.expensive_ms = expensive_ms
+        self.cheap_ms = cheap_ms
+        # 上次调整 TTL 时各前缀的统计快照，按时间窗口计算命中率
+        self._tune_snapshots: Dict[str, PrefixStats] = {}
+        self._last_tuned = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _load(self, spec: WarmupSpec) -> bool:
+        """计算预热查询并写入缓存"""
+        manager = self.cache_manager
+        key = manager._generate_key(spec.prefix, **spec.params)
+        ttl = manager.resolve_ttl(spec.prefix, spec.ttl)
+        tag_versions = manager.get_tag_versions(manager.resolve_tags(spec.prefix, spec.params))
+        started = time.perf_counter()
+        if inspect.iscoroutinefunction(spec.loader):
+            value = await spec.loader(**spec.params)
+        else:
+            value = await asyncio.to_thread(spec.loader, **spec.params)
+        manager.record_compute(spec.prefix, (time.perf_counter() - started) * 1000, value, refresh=spec.last_loaded is not None)
+        manager.set(key, value, ttl, tags=tag_versions)
+        spec.last_loaded = time.monotonic()
+        spec.requests_seen = manager._prefix_stats(spec.prefix).requests
+        return True
+
+    async def warmup_cache(self) -> int:
+        """缓存预热 - 执行所有已注册的预热查询，返回成功数量"""
+        specs = get_warmup_specs()
+        logger.info(f"开始缓存预热（{len(specs)} 个查询）...")
+        warmed = 0
+        for spec in specs:
             try:
-                # 预热1: 仪表板统计数据
-                from app.api.group_ai.dashboard import get_dashboard_stats
-                try:
-                    stats = get_dashboard_stats()
-                    logger.info("✓ 仪表板统计数据已预热")
-                except Exception as e:
-                    logger.warning(f"仪表板统计预热失败: {e}")
-                
-                # 预热2: 常用脚本列表
-                from app.api.group_ai.scripts import list_scripts
-                try:
-                    # 这里需要模拟请求参数，实际应该从数据库查询
-                    logger.info("✓ 脚本列表缓存已预热")
-                except Exception as e:
-                    logger.warning(f"脚本列表预热失败: {e}")
-                
-                # 预热3: 账号统计
-                from app.api.group_ai.monitor import get_accounts_metrics
-                try:
-                    # 预加载账号指标
-                    logger.info("✓ 账号指标缓存已预热")
-                except Exception as e:
-                    logger.warning(f"账号指标预热失败: {e}")
-                
-            finally:
-                db.close()
-            
-            logger.info("缓存预热完成")
-        except Exception as e:
-            logger.error(f"缓存预热失败: {e}", exc_info=True)
-    
+                await self._load(spec)
+                warmed += 1
+                logger.info(f"✓ {spec.prefix} 已预热（{spec.name}）")
+            except Exception as e:
+                logger.warning(f"{spec.prefix} 预热失败: {e}")
+        logger.info(f"缓存预热完成: {warmed}/{len(specs)}")
+        return warmed
+
+    async def refresh_ahead(self) -> int:
+        """
+        提前刷新即将到期的热点条目，返回刷新数量
+
+        自上次加载以来前缀被访问过才视为热点；剩余时间小于刷新窗口（TTL 的 refresh_ahead_ratio，
+        至少一个检查周期，至多 TTL 的一半）或条目已失效时重新计算
+        """
+        manager = self.cache_manager
+        refreshed = 0
+        for spec in get_warmup_specs():
+            if manager._prefix_stats(spec.prefix).requests <= spec.requests_seen and spec.last_loaded is not None:
+                continue
+            ttl = manager.resolve_ttl(spec.prefix, spec.ttl)
+            window = min(max(ttl * self.refresh_ahead_ratio, self.interval_seconds), ttl / 2)
+            key = manager._generate_key(spec.prefix, **spec.params)
+            remaining = manager.remaining_ttl(key)
+            if remaining is not None and remaining > window:
+                continue
+            if not manager.acquire_refresh_lock(key, int(window) or 1):
+                continue
+            try:
+                await self._load(spec)
+                refreshed += 1
+            except Exception as e:
+                logger.warning(f"{spec.prefix} 提前刷新失败: {e}")
+        return refreshed
+
+    def tune_ttls(self) -> Dict[str, int]:
+        """按上个窗口的命中率与重算耗时调整各前缀 TTL，返回发生变化的前缀及新 TTL"""
+        manager = self.cache_manager
+        changed: Dict[str, int] = {}
+        for prefix, stats in list(manager.prefix_stats.items()):
+            declared = manager.declared_ttls.get(prefix)
+            previous = self._tune_snapshots.get(prefix, PrefixStats())
+            window = PrefixStats(
+                hits=stats.hits - previous.hits,
+                misses=stats.misses - previous.misses,
+                computes=stats.computes - previous.computes,
+                compute_ms=stats.compute_ms - previous.compute_ms,
+            )
+            if not declared or window.requests < self.min_samples:
+                continue
+            self._tune_snapshots[prefix] = PrefixStats(**vars(stats))
+            current = manager.resolve_ttl(prefix)
+            compute_ms = window.avg_compute_ms if window.computes else stats.avg_compute_ms
+            new_ttl = self.optimize_cache_ttl(prefix, current, window.hit_rate, compute_ms)
+            new_ttl = int(min(max(new_ttl, declared * self.ttl_min_factor), declared * self.ttl_max_factor))
+            if new_ttl != current:
+                manager.ttl_overrides[prefix] = new_ttl
+                changed[prefix] = new_ttl
+                logger.info(
+                    f"缓存 TTL 调整: {prefix} {current}s -> {new_ttl}s"
+                    f"（命中率 {window.hit_rate:.0%}，平均重算 {compute_ms:.1f}ms）"
+                )
+        self._last_tuned = time.monotonic()
+        return changed
+
+    async def run_once(self) -> None:
+        """控制器单次检查：提前刷新，并按周期调整 TTL"""
+        await self.refresh_ahead()
+        if time.monotonic() - self._last_tuned >= self.tune_interval_seconds:
+            self.tune_ttls()
+
+    async def _run_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"缓存控制器检查失败: {e}", exc_info=True)
+
+    def start(self) -> None:
+        """启动后台控制器（提前刷新与自适应 TTL）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run_loop())
+
+    async def stop(self) -> None:
+        """停止后台控制器"""
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
     def analyze_cache_usage(self) -> Dict[str, Any]:
         """分析缓存使用情况"""
         stats = self.cache_manager.get_stats()
-        
+
         # 分析缓存命中率
         hit_rate = stats.get("hit_rate", 0.0)
-        
+
         analysis = {
             "hit_rate": hit_rate,
             "hits": stats.get("hits", 0),
             "misses": stats.get("misses", 0),
             "backend": stats.get("backend", "memory"),
             "memory_cache_size": stats.get("memory_cache_size", 0),
+            "prefixes": stats.get("prefixes", {}),
             "recommendations": []
         }
-        
+
         # 生成优化建议
         if hit_rate < 0.5:
             analysis["recommendations"].append("缓存命中率较低，建议增加缓存TTL或优化缓存键策略")
-        
+
         if stats.get("memory_cache_size", 0) > 1000:
             analysis["recommendations"].append("内存缓存条目过多，建议启用Redis或增加缓存清理频率")
-        
+
+        for prefix, prefix_stats in analysis["prefixes"].items():
+            requests = prefix_stats["hits"] + prefix_stats["misses"]
+            if requests >= self.min_samples and prefix_stats["hit_rate"] < 0.3 and prefix_stats["avg_compute_ms"] >= self.expensive_ms:
+                analysis["recommendations"].append(
+                    f"{prefix} 命中率 {prefix_stats['hit_rate']:.0%} 且平均重算 {prefix_stats['avg_compute_ms']:.0f}ms，"
+                    f"建议检查缓存键是否包含不必要的参数"
+                )
+
         return analysis
-    
-    def optimize_cache_ttl(self, endpoint: str, current_ttl: int, hit_rate: float) -> int:
+
+    def optimize_cache_ttl(
+        self,
+        endpoint: str,
+        current_ttl: int,
+        hit_rate: float,
+        compute_ms: Optional[float] = None,
+    ) -> int:
         """
         智能调整缓存TTL
-        
+
         Args:
             endpoint: API端点
             current_ttl: 当前TTL（秒）
             hit_rate: 缓存命中率
-        
+            compute_ms: 平均重算耗时（毫秒，可选）
+
         Returns:
             优化后的TTL
         """
+        # 重算很便宜时缓存收益有限，缩短TTL以保持数据新鲜度
+        if compute_ms is not None and compute_ms < self.cheap_ms:
+            new_ttl = max(int(current_ttl * 0.7), 30)
         # 如果命中率高，可以适当增加TTL
-        if hit_rate > 0.8:
+        elif hit_rate > 0.8:
             new_ttl = int(current_ttl * 1.5)
-        # 如果命中率低，减少TTL以保持数据新鲜度
+        # 如果命中率低：重算代价高时延长TTL减少重算，否则减少TTL以保持数据新鲜度
         elif hit_rate < 0.3:
-            new_ttl = max(int(current_ttl * 0.7), 30)  # 最少30秒
+            if compute_ms is not None and compute_ms >= self.expensive_ms:
+                new_ttl = int(current_ttl * 1.5)
+            else:
+                new_ttl = max(int(current_ttl * 0.7), 30)  # 最少30秒
         else:
             new_ttl = current_ttl
-        
+
         return new_ttl
-    
+
     async def cleanup_stale_cache(self):
         """清理过期缓存"""
         # 缓存管理器会自动处理过期，这里主要是日志记录
@@ -118,6 +302,13 @@ def get_cache_optimizer() -> CacheOptimizer:
     """获取缓存优化器实例"""
     global _optimizer
     if _optimizer is None:
-        _optimizer = CacheOptimizer()
+        from app.core.config import get_settings
+        settings = get_settings()
+        _optimizer = CacheOptimizer(
+            interval_seconds=settings.cache_refresh_interval_seconds,
+            refresh_ahead_ratio=settings.cache_refresh_ahead_ratio,
+            tune_interval_seconds=settings.cache_ttl_tune_interval_seconds,
+            ttl_min_factor=settings.cache_ttl_min_factor,
+            ttl_max_factor=settings.cache_ttl_max_factor,
+        )
     return _optimizer
-
@@ -1,6 +1,7 @@
 from functools import lru_cache
 import os
 from pathlib import Path
+from typing import Dict
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -32,6 +33,20 @@ class Settings(BaseSettings):
     database_pool_recycle: int = 3600
     database_pool_timeout: int = 30
     
+    # SQLite 連接配置（僅在 database_url 為 SQLite 時生效）
+    sqlite_pool_size: int = 8  # 常駐連接數（PRAGMA 只在建立連接時執行一次）
+    sqlite_busy_timeout_ms: int = 5000  # 寫鎖等待時間（毫秒），避免立即報 database is locked
+    sqlite_mmap_size: int = 268435456  # 內存映射大小（字節），0 表示禁用
+    sqlite_cache_size_kb: int = 64000  # 每個連接的頁緩存大小（KB）
+    
+    # 寫入隊列配置（後台服務的寫操作串行執行、批量提交）
+    db_write_queue_batch_size: int = 100  # 單批最多合併的寫操作數
+    db_write_queue_flush_ms: int = 20  # 湊批等待時間（毫秒）
+    
+    # 啟動配置
+    fast_start: bool = False  # 快速啟動：後台服務推遲到首個請求完成後再啟動（環境變量 FAST_START）
+    fast_start_max_defer_seconds: int = 60  # 快速啟動時最長推遲時間（秒），超時未收到請求也會啟動後台服務
+    
     # 通知服務配置（可選）
     email_enabled: bool = False
     smtp_host: str = "smtp.gmail.com"
@@ -49,14 +64,60 @@ class Settings(BaseSettings):
     # ========== Redis 缓存配置 ==========
     redis_url: str = ""  # Redis 连接 URL（可选）
     
+    # ========== 認證緩存配置 ==========
+    auth_token_cache_ttl_seconds: int = 30  # 已驗證令牌 -> 主體的緩存時間（秒），0 為關閉
+    auth_embed_claims: bool = False  # 登錄時把主體（權限、權限版本）寫入令牌，需要 Redis 同步標籤版本
+    
+    # ========== 密碼哈希配置 ==========
+    password_hash_scheme: str = "bcrypt"  # bcrypt 或 argon2（需安裝 argon2-cffi）；登錄成功時把舊方案/舊成本的哈希重新計算
+    password_bcrypt_rounds: int = 12  # bcrypt 成本（每加 1 耗時翻倍）
+    password_hash_workers: int = 2  # 密碼哈希專用線程數
+    password_hash_queue_limit: int = 32  # 等待哈希的請求上限，超出時登錄返回 503
+    
+    # ========== API 限流配置 ==========
+    rate_limit_enabled: bool = True  # 是否對 /api/v1 路由限流（額度見 app.core.limiter.RATE_LIMITS，按主體和類別分別計數）
+    rate_limit_storage: str = "auto"  # auto（有 Redis 用 Redis，否則進程內）, redis, local（僅進程內）
+    rate_limit_trusted_proxies: str = "127.0.0.1,::1"  # 受信任的反向代理（逗號分隔的 IP / CIDR），其請求按 X-Forwarded-For 識別客戶端
+    
+    # ========== 指標寫入配置 ==========
+    metrics_flush_interval_seconds: float = 5.0  # 指標在內存中按分鐘預聚合，每隔此秒數批量寫入
+    metrics_store_raw_points: bool = False  # 是否同時保存原始指標行（儀表板和趨勢只需分鐘匯總；error 指標始終保存，供最近錯誤列表）
+    metrics_max_buffered_raw_points: int = 10000  # 等待寫入的原始指標點上限，超出丟棄最舊的
+    metrics_raw_retention_days: int = 7  # 原始指標行保留天數
+    metrics_rollup_retention_days: int = 90  # 分鐘匯總保留天數
+    
     # ========== 自动备份配置 ==========
     auto_backup_enabled: bool = True  # 是否启用自动备份
     backup_dir: str = "backups"  # 备份目录
     backup_retention_days: int = 30  # 备份保留天数
     backup_interval_hours: int = 24  # 备份间隔（小时）
+    backup_verify: bool = True  # 完整备份后校验（SQLite 完整性检查、pg_restore --list、对象哈希）
+    backup_workers: int = 4  # 文件哈希、压缩和校验的并行线程数
+    
+    # ========== 任務調度配置 ==========
+    scheduler_job_store: str = "database"  # memory（僅單進程）, database（持久化，多進程共享）
+    scheduler_lease_backend: str = "auto"  # auto（有 Redis 用 Redis，否則用數據庫）, redis, database, none（單進程）
+    scheduler_lease_ttl_seconds: int = 30  # 領導者租約有效期（秒），每 1/3 有效期續約一次
+    scheduler_misfire_grace_seconds: int = 300  # 錯過觸發時間後仍允許補執行的寬限時間（秒）
+    scheduler_coalesce: bool = True  # 錯過的多次觸發合併為一次執行
+    scheduler_concurrency_limits: Dict[str, int] = {
+        "alert_check": 1,
+        "data_backup": 1,
+        "data_export": 2,
+        "script_review": 2,
+    }  # 按任務動作類型限制同時執行數，未列出的類型不限制
+
+    # ========== 数据导出配置 ==========
+    export_dir: str = "exports"  # 后台导出文件目录
+    export_retention_hours: int = 24  # 导出文件保留时间（小时）
     
     # ========== 缓存配置 ==========
     cache_default_ttl: int = 300  # 默认缓存时间（秒）
+    cache_refresh_interval_seconds: int = 10  # 提前刷新检查间隔（秒）
+    cache_refresh_ahead_ratio: float = 0.2  # 剩余时间小于 TTL 的该比例时提前刷新热点条目
+    cache_ttl_tune_interval_seconds: int = 300  # 自适应 TTL 调整间隔（秒）
+    cache_ttl_min_factor: float = 0.5  # 自适应 TTL 下限（声明 TTL 的倍数）
+    cache_ttl_max_factor: float = 4.0  # 自适应 TTL 上限（声明 TTL 的倍数，上下限均为 1 时关闭调整）
     
     # ========== 性能监控配置 ==========
     performance_check_interval: int = 60  # 性能检查间隔（秒）
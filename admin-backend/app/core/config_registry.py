@@ -0,0 +1,309 @@
+"""
+配置文件註冊表 - JSON / YAML 配置只解析一次，熱路徑讀取只是一次字典查找
+
+- 每個文件解析後保存為不可變快照（ConfigSnapshot），數據轉為只讀的 FrozenDict / tuple，
+  所有讀取方共用同一個對象，無需複製；需要修改時用 thaw() 取得可變副本
+- 變化檢測基於 stat 簽名（mtime_ns, size, inode）：監視線程運行時由線程定期檢查，讀取方不做任何 IO；
+  未啟動監視線程時讀取方最多每 check_interval 秒 stat 一次。檢測到變化後重新解析並整體替換快照，
+  解析失敗時保留舊數據並記錄錯誤
+- 訂閱者在快照替換後收到 callback(舊快照, 新快照)；綁定方法以弱引用保存，不延長訂閱者的生命週期。
+  回調在檢測到變化的線程中執行（監視線程或讀取方線程）
+- YAML 優先使用 libyaml 的 CSafeLoader
+- get_stats() 提供各文件的版本、解析耗時、重載次數與最近的錯誤
+"""
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import yaml
+    YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+except ImportError:  # pragma: no cover - 未安裝 PyYAML 時只支持 JSON
+    yaml = None
+    YAML_LOADER = None
+
+logger = logging.getLogger(__name__)
+
+PathLike = Union[str, os.PathLike]
+Parser = Callable[[str], Any]
+Subscriber = Callable[["ConfigSnapshot", "ConfigSnapshot"], None]
+# (mtime_ns, size, inode)；文件不存在時為 None
+Signature = Optional[Tuple[int, int, int]]
+
+DEFAULT_CHECK_INTERVAL = 1.0
+
+
+class FrozenDict(dict):
+    """只讀字典（dict 子類，可直接 JSON 序列化和傳給 pydantic）"""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("配置快照是只讀的，請使用 thaw() 取得可變副本")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    """遞歸轉換為只讀結構：dict -> FrozenDict，list -> tuple"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """freeze 的逆操作，返回可變的深拷貝"""
+    if isinstance(value, dict):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return value
+
+
+def load_yaml_text(text: str) -> Any:
+    """解析 YAML（優先使用 libyaml）"""
+    if yaml is None:
+        raise RuntimeError("未安裝 PyYAML，無法解析 YAML 配置")
+    return yaml.load(text, Loader=YAML_LOADER)
+
+
+def parser_for(path: PathLike) -> Parser:
+    """按擴展名選擇解析器：.yaml / .yml 為 YAML，其餘為 JSON"""
+    return load_yaml_text if str(path).lower().endswith((".yaml", ".yml")) else json.loads
+
+
+def _stat_signature(path: str) -> Signature:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """某一時刻的配置文件內容"""
+    path: str
+    data: Any  # 只讀數據；文件不存在或從未成功解析時為 None
+    version: int  # 每次成功解析後遞增
+    signature: Signature
+    loaded_at: float
+    parse_ms: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def exists(self) -> bool:
+        return self.signature is not None
+
+
+class _Entry:
+    __slots__ = ("path", "parser", "snapshot", "next_check", "subscribers", "loads", "failures", "parse_ms_total")
+
+    def __init__(self, path: str, parser: Parser):
+        self.path = path
+        self.parser = parser
+        self.snapshot = ConfigSnapshot(path=path, data=None, version=0, signature=None, loaded_at=0.0)
+        self.next_check = 0.0
+        self.subscribers: List[Any] = []
+        self.loads = 0
+        self.failures = 0
+        self.parse_ms_total = 0.0
+
+
+class ConfigRegistry:
+    """配置文件註冊表"""
+
+    def __init__(self, check_interval: float = DEFAULT_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.RLock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def _key(path: PathLike) -> str:
+        return os.path.abspath(os.fspath(path))
+
+    @property
+    def is_watching(self) -> bool:
+        return self._watcher is not None and self._watcher.is_alive()
+
+    def register(self, path: PathLike, parser: Optional[Parser] = None) -> ConfigSnapshot:
+        """註冊文件並完成首次解析（已註冊時直接返回當前快照）"""
+        key = self._key(path)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry.snapshot
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(key, parser or parser_for(key))
+                self._refresh(entry, force=True)
+                self._entries[key] = entry
+        return entry.snapshot
+
+    def snapshot(self, path: PathLike) -> ConfigSnapshot:
+        """當前快照（按需註冊；未啟動監視線程時順便檢查文件是否變化）"""
+        entry = self._entries.get(self._key(path))
+        if entry is None:
+            return self.register(path)
+        if not self.is_watching and time.monotonic() >= entry.next_check:
+            self._refresh(entry)
+        return entry.snapshot
+
+    def get(self, path: PathLike, default: Any = None) -> Any:
+        """配置數據（只讀）；文件不存在或無法解析時返回 default"""
+        data = self.snapshot(path).data
+        return default if data is None else data
+
+    def subscribe(self, path: PathLike, callback: Subscriber) -> Callable[[], None]:
+        """訂閱文件變化，返回取消訂閱的函數"""
+        self.register(path)
+        entry = self._entries[self._key(path)]
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        with self._lock:
+            entry.subscribers.append(ref)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if ref in entry.subscribers:
+                    entry.subscribers.remove(ref)
+        return unsubscribe
+
+    def reload(self, path: Optional[PathLike] = None) -> List[str]:
+        """立即檢查指定文件（None 為全部），返回內容發生變化的路徑"""
+        if path is None:
+            entries = list(self._entries.values())
+        else:
+            key = self._key(path)
+            if key not in self._entries:
+                self.register(path)
+                return [key]
+            entries = [self._entries[key]]
+        return [entry.path for entry in entries if self._refresh(entry)]
+
+    def _refresh(self, entry: _Entry, force: bool = False) -> bool:
+        """stat 簽名變化時重新解析並替換快照；返回數據是否變化"""
+        entry.next_check = time.monotonic() + self.check_interval
+        signature = _stat_signature(entry.path)
+        with self._lock:
+            old = entry.snapshot
+            if not force and signature == old.signature:
+                return False
+            new = self._parse(entry, signature, old)
+            entry.snapshot = new
+            subscribers = list(entry.subscribers) if new.version != old.version else []
+
+        for ref in subscribers:
+            callback = ref()
+            if callback is None:
+                with self._lock:
+                    if ref in entry.subscribers:
+                        entry.subscribers.remove(ref)
+                continue
+            try:
+                callback(old, new)
+            except Exception as e:
+                logger.error(f"配置變化回調失敗 ({entry.path}): {e}", exc_info=True)
+        return new.version != old.version
+
+    def _parse(self, entry: _Entry, signature: Signature, old: ConfigSnapshot) -> ConfigSnapshot:
+        now = time.time()
+        if signature is None:
+            if old.data is not None or old.version == 0:
+                logger.warning(f"配置文件不存在: {entry.path}")
+            version = old.version + 1 if old.data is not None else old.version
+            return ConfigSnapshot(path=entry.path, data=None, version=version, signature=None, loaded_at=now)
+
+        started = time.perf_counter()
+        try:
+            with open(entry.path, "r", encoding="utf-8") as f:
+                data = freeze(entry.parser(f.read()))
+        except Exception as e:
+            entry.failures += 1
+            logger.error(f"解析配置文件失敗，保留上一版本: {entry.path}: {e}")
+            return replace(old, signature=signature, error=str(e))
+        parse_ms = (time.perf_counter() - started) * 1000
+        entry.loads += 1
+        entry.parse_ms_total += parse_ms
+        if old.version:
+            logger.info(f"配置文件已重新加載: {entry.path}（{parse_ms:.1f}ms）")
+        return ConfigSnapshot(
+            path=entry.path,
+            data=data,
+            version=old.version + 1,
+            signature=signature,
+            loaded_at=now,
+            parse_ms=parse_ms,
+        )
+
+    def start_watching(self, interval: Optional[float] = None) -> None:
+        """啟動監視線程（之後讀取方不再 stat 文件）"""
+        if self.is_watching:
+            return
+        if interval is not None:
+            self.check_interval = interval
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, name="config-registry-watcher", daemon=True)
+        self._watcher.start()
+        logger.info(f"配置文件監視已啟動（間隔 {self.check_interval}s）")
+
+    def stop_watching(self) -> None:
+        if self._watcher is None:
+            return
+        self._stop_event.set()
+        self._watcher.join(timeout=self.check_interval + 1)
+        self._watcher = None
+
+    def _watch_loop(self) -> None:
+        while not self._stop_event.wait(self.check_interval):
+            for entry in list(self._entries.values()):
+                try:
+                    self._refresh(entry)
+                except Exception as e:
+                    logger.error(f"檢查配置文件失敗 ({entry.path}): {e}", exc_info=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        files = {}
+        for path, entry in list(self._entries.items()):
+            snapshot = entry.snapshot
+            files[path] = {
+                "exists": snapshot.exists,
+                "version": snapshot.version,
+                "loads": entry.loads,
+                "reloads": max(entry.loads - 1, 0),
+                "failures": entry.failures,
+                "last_parse_ms": round(snapshot.parse_ms, 3),
+                "total_parse_ms": round(entry.parse_ms_total, 3),
+                "loaded_at": snapshot.loaded_at,
+                "subscribers": len(entry.subscribers),
+                "error": snapshot.error,
+            }
+        return {
+            "watching": self.is_watching,
+            "check_interval": self.check_interval,
+            "yaml_loader": YAML_LOADER.__name__ if YAML_LOADER else None,
+            "files": files,
+        }
+
+
+_config_registry: Optional[ConfigRegistry] = None
+
+
+def get_config_registry() -> ConfigRegistry:
+    """獲取全局配置註冊表"""
+    global _config_registry
+    if _config_registry is None:
+        _config_registry = ConfigRegistry()
+    return _config_registry
@@ -67,7 +67,7 @@ class HealthChecker:
         """检查数据库连接"""
         start_time = time.time()
         try:
-            from app.db import SessionLocal
+            from app.db import SessionLocal, engine, get_pool_metrics
             from sqlalchemy import text
             
             db = SessionLocal()
@@ -82,7 +82,7 @@ class HealthChecker:
                     status=HealthStatus.HEALTHY,
                     message="数据库连接正常",
                     response_time_ms=response_time,
-                    details={"type": "sqlite"}  # 可以根据实际数据库类型设置
+                    details={"type": engine.dialect.name, "pools": get_pool_metrics()}
                 )
             finally:
                 db.close()
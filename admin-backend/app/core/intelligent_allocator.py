@@ -11,6 +11,7 @@ from pathlib import Path
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
+from app.core.config_registry import get_config_registry
 from app.core.server_monitor import ServerMonitor
 from app.core.load_balancer import LoadBalancer, AllocationStrategy, ServerMetrics
 from app.models.group_ai import GroupAIAccount, AllocationHistory
@@ -66,7 +67,7 @@ class IntelligentAllocator:
             master_config_path = project_root / "data" / "master_config.json"
         
         self.master_config_path = Path(master_config_path) if master_config_path else None
-        self.config = self._load_config()
+        self._load_config()
         
         self.server_monitor = ServerMonitor(
             master_config_path=self.master_config_path,
@@ -74,19 +75,26 @@ class IntelligentAllocator:
         )
         self.load_balancer = LoadBalancer()
         self.default_strategy = self._get_default_strategy()
+        if self.master_config_path:
+            get_config_registry().subscribe(self.master_config_path, self._on_config_changed)
     
-    def _load_config(self) -> dict:
-        """加载配置文件"""
-        import json
-        try:
-            if self.master_config_path and self.master_config_path.exists():
-                with open(self.master_config_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            else:
-                logger.warning(f"配置文件不存在: {self.master_config_path}，使用默认配置")
-        except Exception as e:
-            logger.warning(f"加载配置文件失败: {e}，使用默认配置")
-        return {}
+    def _load_config(self) -> None:
+        """注册配置文件（由配置注册表解析并在文件变化后自动重新加载）"""
+        if not self.master_config_path or not get_config_registry().register(self.master_config_path).exists:
+            logger.warning(f"配置文件不存在: {self.master_config_path}，使用默认配置")
+    
+    @property
+    def config(self) -> dict:
+        """当前配置（只读快照）"""
+        if not self.master_config_path:
+            return {}
+        data = get_config_registry().get(self.master_config_path)
+        return data if isinstance(data, dict) else {}
+    
+    def _on_config_changed(self, old, new) -> None:
+        """配置文件变化后更新默认分配策略"""
+        self.default_strategy = self._get_default_strategy()
+        logger.info(f"配置已重新加载，默认分配策略: {self.default_strategy.value}")
     
     def _get_default_strategy(self) -> AllocationStrategy:
         """获取默认分配策略"""
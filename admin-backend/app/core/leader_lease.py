@@ -0,0 +1,224 @@
+"""
+領導者租約
+
+多個 uvicorn worker / 多台主機同時運行時，定時任務、自動備份、定時告警檢查等
+只應由一個進程執行。持有租約的進程為領導者，需在租約到期前續約；
+進程退出或失聯後租約過期，其他進程在下一次檢查時接管。
+
+後端：
+- Redis：SET NX PX 獲取，Lua 腳本校驗持有者後續約 / 釋放
+- 數據庫：scheduler_leases 表，條件 UPDATE（持有者是自己或已過期）搶佔，不存在時 INSERT
+- none：單進程部署，始終為領導者
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import case, or_
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+logger = logging.getLogger(__name__)
+
+# 持有者匹配時才續約 / 刪除，避免延長或釋放其他進程已接管的租約
+_RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """
+    租約基類（單進程實現：始終為領導者）
+
+    acquire() 獲取或續約並返回是否為領導者；check() 在續約間隔內直接返回上次結果，
+    供週期任務在每次執行前低成本地判斷
+    """
+
+    backend = "none"
+
+    def __init__(self, name: str, ttl_seconds: float = 30.0, owner: Optional[str] = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.owner = owner or _default_owner()
+        self.is_leader = False
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def renew_interval(self) -> float:
+        """續約間隔：TTL 的三分之一，一次續約失敗後仍有時間重試"""
+        return self.ttl_seconds / 3
+
+    def _try_acquire(self) -> bool:
+        return True
+
+    def _release(self) -> None:
+        pass
+
+    def acquire(self) -> bool:
+        """獲取或續約租約；後端異常時視為未持有（寧可少執行一次也不重複執行）"""
+        with self._lock:
+            try:
+                held = self._try_acquire()
+            except Exception as e:
+                logger.warning(f"租約 {self.name} 續約失敗: {e}")
+                held = False
+            if held and not self.is_leader:
+                logger.info(f"已獲取租約 {self.name}（{self.backend}），本進程 {self.owner} 成為領導者")
+            elif not held and self.is_leader:
+                logger.warning(f"已失去租約 {self.name}，本進程 {self.owner} 停止執行定時任務")
+            self.is_leader = held
+            self._checked_at = time.monotonic()
+            return held
+
+    def check(self) -> bool:
+        """是否為領導者（超過續約間隔時重新獲取）"""
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.renew_interval:
+            return self.acquire()
+        return self.is_leader
+
+    def release(self) -> None:
+        """主動釋放租約，其他進程無需等待過期即可接管"""
+        with self._lock:
+            if self.is_leader:
+                try:
+                    self._release()
+                except Exception as e:
+                    logger.warning(f"釋放租約 {self.name} 失敗: {e}")
+            self.is_leader = False
+            self._checked_at = None
+
+    def get_status(self) -> Dict[str, object]:
+        return {
+            "name": self.name,
+            "backend": self.backend,
+            "owner": self.owner,
+            "is_leader": self.is_leader,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+class RedisLeaderLease(LeaderLease):
+    """基於 Redis 的租約"""
+
+    backend = "redis"
+
+    def __init__(self, name: str, redis_client, ttl_seconds: float = 30.0, owner: Optional[str] = None):
+        super().__init__(name, ttl_seconds, owner)
+        self.redis_client = redis_client
+        self.key = f"lease:{name}"
+
+    def _try_acquire(self) -> bool:
+        ttl_ms = int(self.ttl_seconds * 1000)
+        if self.redis_client.set(self.key, self.owner, nx=True, px=ttl_ms):
+            return True
+        return bool(self.redis_client.eval(_RENEW_SCRIPT, 1, self.key, self.owner, ttl_ms))
+
+    def _release(self) -> None:
+        self.redis_client.eval(_RELEASE_SCRIPT, 1, self.key, self.owner)
+
+
+class DatabaseLeaderLease(LeaderLease):
+    """基於數據庫表的租約（依賴各主機時鐘基本同步，偏差需遠小於 TTL）"""
+
+    backend = "database"
+
+    def __init__(self, name: str, engine: Optional[Engine] = None, ttl_seconds: float = 30.0, owner: Optional[str] = None):
+        super().__init__(name, ttl_seconds, owner)
+        if engine is None:
+            from app.db import engine as default_engine
+            engine = default_engine
+        self.engine = engine
+        self._table_ready = False
+
+    @property
+    def table(self):
+        from app.models.scheduler import SchedulerLease
+        return SchedulerLease.__table__
+
+    def _try_acquire(self) -> bool:
+        table = self.table
+        if not self._table_ready:
+            table.create(bind=self.engine, checkfirst=True)
+            self._table_ready = True
+
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        with self.engine.begin() as conn:
+            result = conn.execute(
+                table.update()
+                .where(table.c.name == self.name)
+                .where(or_(table.c.owner == self.owner, table.c.expires_at < now))
+                .values(
+                    owner=self.owner,
+                    expires_at=expires_at,
+                    acquired_at=case((table.c.owner == self.owner, table.c.acquired_at), else_=now),
+                )
+            )
+            if result.rowcount:
+                return True
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(table.insert().values(name=self.name, owner=self.owner, expires_at=expires_at, acquired_at=now))
+            return True
+        except IntegrityError:
+            # 其他進程持有未過期的租約
+            return False
+
+    def _release(self) -> None:
+        table = self.table
+        with self.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.name == self.name).where(table.c.owner == self.owner))
+
+
+# 全局租約實例（按名稱）
+_leases: Dict[str, LeaderLease] = {}
+_leases_lock = threading.Lock()
+
+
+def _create_lease(name: str) -> LeaderLease:
+    from app.core.config import get_settings
+    settings = get_settings()
+    backend = settings.scheduler_lease_backend
+    ttl = settings.scheduler_lease_ttl_seconds
+
+    if backend == "none":
+        return LeaderLease(name, ttl)
+    if backend in ("auto", "redis") and settings.redis_url:
+        try:
+            import redis
+            client = redis.from_url(settings.redis_url, decode_responses=True, socket_connect_timeout=2)
+            client.ping()
+            return RedisLeaderLease(name, client, ttl)
+        except Exception as e:
+            logger.warning(f"Redis 不可用，租約 {name} 使用數據庫: {e}")
+    return DatabaseLeaderLease(name, ttl_seconds=ttl)
+
+
+def get_leader_lease(name: str = "scheduler") -> LeaderLease:
+    """獲取租約實例（同一名稱在進程內共享）"""
+    lease = _leases.get(name)
+    if lease is None:
+        with _leases_lock:
+            lease = _leases.get(name)
+            if lease is None:
+                lease = _leases[name] = _create_lease(name)
+    return lease
@@ -1,15 +1,34 @@
 """
 API 限流配置
+
+請求按主體計數：已登錄用戶按 JWT 的 sub（令牌在認證緩存中時直接取主體，否則只驗證簽名、不查庫），
+Agent 按 API 密鑰，其餘按客戶端 IP（經受信任的反向代理轉發時取 X-Forwarded-For 中的真實地址）。
+簽名無效的令牌按 IP 計數，偽造的令牌不會得到獨立額度。
+
+每個（主體, 限流類別）一個 GCRA 令牌桶，容量與速率取 RATE_LIMITS 中該類別的配置，
+各類別互不佔用額度：例如註冊狀態輪詢不會耗盡同一用戶的 list / detail 額度。
+
+存儲：
+- redis：Lua 腳本原子地讀取並更新理論到達時間（TAT），時鐘取 Redis 服務器時間，多 worker / 多主機共享
+- memory：進程內字典（local 模式，單進程部署或測試）
+- auto：配置了 redis_url 時用 Redis，Redis 不可用時臨時退回內存並定期重試
 """
+import hashlib
+import ipaddress
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
 from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from fastapi import Request
 
-# 禁用 slowapi 的 .env 文件读取，仅使用环境变量（避免编码问题）
-# 使用不存在的文件名避免 slowapi 尝试读取 .env 文件
-# 注意：不删除 .env 文件，因为其他代码（如 config.py）需要读取它
-limiter = Limiter(key_func=get_remote_address, config_filename="__nonexistent__.env")
+logger = logging.getLogger(__name__)
 
 # 限流配置
 RATE_LIMITS = {
@@ -22,3 +41,408 @@ RATE_LIMITS = {
     "detail": "100/minute",       # 詳情查詢：每分鐘100次
 }
 
+# 按路徑前綴指定限流類別（未匹配時按方法推斷，見 route_rate_class）
+# 註冊狀態輪詢（GET /telegram-registration/status）是只讀的，按 detail 計
+ROUTE_RATE_CLASSES: Tuple[Tuple[str, str], ...] = (
+    ("/api/v1/auth", "auth"),
+    ("/api/v1/telegram-registration/start", "auth"),
+    ("/api/v1/telegram-registration/verify", "auth"),
+    ("/api/v1/group-ai/accounts/upload-session", "upload"),
+    ("/api/v1/group-ai/accounts/import", "upload"),
+    ("/api/v1/group-ai/accounts/batch-import", "upload"),
+    ("/api/v1/group-ai/scripts/upload", "upload"),
+    ("/api/v1/workers/{worker_id}/sessions/upload", "upload"),
+    ("/api/v1/group-ai/export", "heavy"),
+    ("/api/v1/group-ai/logs/export", "heavy"),
+    ("/api/v1/group-ai/sessions/export", "heavy"),
+    ("/api/v1/optimization", "heavy"),
+    ("/api/v1/performance", "light"),
+    ("/api/v1/notifications/unread-count", "light"),
+)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_RATE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d*)\s*(second|minute|hour|day)s?\s*$")
+
+# 延遲統計保留的最近決策數
+LATENCY_WINDOW = 2048
+# Redis 失敗後退回內存的時間（秒），之後再嘗試 Redis
+REDIS_RETRY_SECONDS = 30.0
+
+
+def parse_rate(rate: str) -> Tuple[int, float]:
+    """解析 "100/minute" 形式的速率，返回 (次數, 週期秒數)"""
+    match = _RATE_PATTERN.match(rate)
+    if not match:
+        raise ValueError(f"無法解析限流速率: {rate}")
+    count, multiplier, unit = match.groups()
+    return int(count), _PERIODS[unit] * (int(multiplier) if multiplier else 1)
+
+
+@dataclass(frozen=True)
+class RateLimitDecision:
+    """一次限流判斷的結果"""
+    allowed: bool
+    limit: int
+    remaining: int  # 該類別令牌桶的剩餘次數
+    retry_after: float  # 被拒絕時需要等待的秒數
+    reset_after: float  # 令牌桶恢復滿額需要的秒數
+    backend: str = "memory"
+
+
+def gcra(tat: Optional[float], now: float, emission_interval: float, burst: float, cost: float) -> Tuple[bool, float, float]:
+    """
+    GCRA 判斷，返回 (是否允許, 新的 TAT, 允許時為剩餘額度對應的秒數 / 拒絕時為需等待的秒數)
+
+    emission_interval 為單位成本的間隔，burst 為允許的突發量（秒，= 容量 * emission_interval）
+    """
+    tat = max(tat or now, now)
+    new_tat = tat + emission_interval * cost
+    diff = now - (new_tat - burst)
+    if diff < 0:
+        return False, tat, -diff
+    return True, new_tat, diff
+
+
+# 與 gcra() 相同的算法；時間取 Redis 服務器時鐘，保證多主機一致。浮點數以字符串返回，避免被截斷為整數
+_GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + emission * cost
+local diff = now - (new_tat - burst)
+if diff < 0 then
+    return {0, tostring(-diff), tostring(tat - now)}
+end
+redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.max(1, math.ceil((new_tat - now) * 1000)))
+return {1, tostring(diff), tostring(new_tat - now)}
+"""
+
+
+class MemoryRateLimitStore:
+    """進程內 TAT 存儲"""
+
+    backend = "memory"
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, emission_interval: float, burst: float, cost: float) -> Tuple[bool, float, float]:
+        now = time.monotonic()
+        with self._lock:
+            allowed, new_tat, value = gcra(self._tats.get(key), now, emission_interval, burst, cost)
+            reset_after = new_tat - now
+            if allowed:
+                self._tats[key] = new_tat
+                if len(self._tats) > self.max_keys:
+                    self._prune(now)
+        return allowed, value, reset_after
+
+    def _prune(self, now: float) -> None:
+        # 已恢復滿額的主體不需要保留
+        expired = [key for key, tat in self._tats.items() if tat <= now]
+        for key in expired:
+            del self._tats[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tats.clear()
+
+
+class RedisRateLimitStore:
+    """Redis TAT 存儲（Lua 腳本原子更新）"""
+
+    backend = "redis"
+
+    def __init__(self, client: Any, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_GCRA_SCRIPT)
+
+    async def hit(self, key: str, emission_interval: float, burst: float, cost: float) -> Tuple[bool, float, float]:
+        allowed, value, reset_after = await self._script(
+            keys=[self.prefix + key], args=[repr(emission_interval), repr(burst), repr(cost)]
+        )
+        return bool(int(allowed)), float(value), float(reset_after)
+
+
+class RateLimiter:
+    """按（主體, 限流類別）的 GCRA 限流器"""
+
+    def __init__(
+        self,
+        default_rate: Optional[str] = None,
+        rate_classes: Optional[Dict[str, str]] = None,
+        redis_store: Optional[RedisRateLimitStore] = None,
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.rates = dict(rate_classes or RATE_LIMITS)
+        if default_rate is not None:
+            self.rates["default"] = default_rate
+        self.rates.setdefault("default", RATE_LIMITS["default"])
+        # 類別 -> (次數, 單次間隔, 突發量)
+        self._buckets = {name: self._bucket(rate) for name, rate in self.rates.items()}
+        self.memory_store = MemoryRateLimitStore()
+        self.redis_store = redis_store
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._decisions: Dict[str, int] = defaultdict(int)
+        self._rejections: Dict[str, int] = defaultdict(int)
+        self._fallbacks = 0
+
+    @staticmethod
+    def _bucket(rate: str) -> Tuple[int, float, float]:
+        count, period = parse_rate(rate)
+        return count, period / count, period
+
+    def bucket_for(self, rate_class: str) -> Tuple[int, float, float]:
+        """類別的 (次數, 單次間隔, 突發量)；未知類別按 default"""
+        return self._buckets.get(rate_class) or self._buckets["default"]
+
+    async def hit(self, key: str, rate_class: str = "default") -> RateLimitDecision:
+        """在主體的 rate_class 令牌桶中扣除一次並返回判斷結果"""
+        limit, emission_interval, burst = self.bucket_for(rate_class)
+        bucket_key = f"{key}:{rate_class}"
+        started = time.perf_counter()
+        store = self.memory_store
+        if self.redis_store is not None and time.monotonic() >= self._redis_down_until:
+            store = self.redis_store
+        try:
+            allowed, value, reset_after = await store.hit(bucket_key, emission_interval, burst, 1.0)
+        except Exception as e:
+            # Redis 不可用時不阻斷請求：臨時按進程計數
+            with self._lock:
+                self._fallbacks += 1
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_SECONDS
+            logger.warning(f"Redis 限流不可用，{REDIS_RETRY_SECONDS:.0f} 秒內使用進程內計數: {e}")
+            store = self.memory_store
+            allowed, value, reset_after = await store.hit(bucket_key, emission_interval, burst, 1.0)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._latencies.append(elapsed_ms)
+            self._decisions[rate_class] += 1
+            if not allowed:
+                self._rejections[rate_class] += 1
+        return RateLimitDecision(
+            allowed=allowed,
+            limit=limit,
+            # 容差避免 59.4 / 0.6 之類的浮點誤差少算一次
+            remaining=int(value / emission_interval + 1e-9) if allowed else 0,
+            retry_after=0.0 if allowed else value,
+            reset_after=max(reset_after, 0.0),
+            backend=store.backend,
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            decisions = dict(self._decisions)
+            rejections = dict(self._rejections)
+            fallbacks = self._fallbacks
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 3)
+
+        redis_active = self.redis_store is not None and time.monotonic() >= self._redis_down_until
+        return {
+            "enabled": self.enabled,
+            "backend": "redis" if redis_active else "memory",
+            "limits": dict(self.rates),
+            "decisions": decisions,
+            "rejections": rejections,
+            "redis_fallbacks": fallbacks,
+            "latency_ms": {
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1], 3) if latencies else 0.0,
+                "samples": len(latencies),
+            },
+        }
+
+    def reset(self) -> None:
+        """清空進程內計數和統計（測試用）"""
+        self.memory_store.clear()
+        with self._lock:
+            self._latencies.clear()
+            self._decisions.clear()
+            self._rejections.clear()
+            self._fallbacks = 0
+
+
+def _trusted_proxies() -> Tuple[Any, ...]:
+    from app.core.config import get_settings
+
+    networks = []
+    for item in (get_settings().rate_limit_trusted_proxies or "").split(","):
+        item = item.strip()
+        if item:
+            try:
+                networks.append(ipaddress.ip_network(item, strict=False))
+            except ValueError:
+                logger.warning(f"無效的受信任代理地址: {item}")
+    return tuple(networks)
+
+
+_trusted_networks: Optional[Tuple[Any, ...]] = None
+
+
+def _is_trusted(host: str) -> bool:
+    global _trusted_networks
+    if _trusted_networks is None:
+        _trusted_networks = _trusted_proxies()
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks)
+
+
+def client_address(request: Request) -> str:
+    """客戶端 IP；直連地址是受信任的代理時，從 X-Forwarded-For 右側跳過代理取真實地址"""
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted(host):
+        return host
+    forwarded = [item.strip() for item in request.headers.get("x-forwarded-for", "").split(",") if item.strip()]
+    for candidate in reversed(forwarded):
+        if not _is_trusted(candidate):
+            return candidate
+    return request.headers.get("x-real-ip") or (forwarded[0] if forwarded else host)
+
+
+def _bearer_token(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def rate_limit_key(request: Request) -> str:
+    """限流主體：user:<sub> / apikey:<摘要> / ip:<地址>；令牌無效時按 IP"""
+    token = _bearer_token(request)
+    if token:
+        from app.core.auth_cache import get_token_cache
+        from app.core.security import decode_access_token
+
+        principal = get_token_cache().get(token)
+        if principal is not None:
+            return f"user:{principal.email}"
+        # 限流在認證依賴之前執行：只驗證簽名取 sub，查庫留給 get_current_user
+        subject = decode_access_token(token)
+        if subject and subject != "None":
+            return f"user:{subject}"
+    api_key = request.headers.get("x-api-key") or request.query_params.get("api_key")
+    if api_key:
+        return "apikey:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:24]
+    return f"ip:{client_address(request)}"
+
+
+_route_classes: Dict[Tuple[str, str], str] = {}
+
+
+def route_rate_class(request: Request) -> str:
+    """路由的限流類別：rate_limit_class 標記 > ROUTE_RATE_CLASSES 前綴 > 按方法推斷"""
+    route = request.scope.get("route")
+    path = getattr(route, "path", request.url.path)
+    cache_key = (request.method, path)
+    rate_class = _route_classes.get(cache_key)
+    if rate_class is not None:
+        return rate_class
+
+    rate_class = getattr(getattr(route, "endpoint", None), "__rate_limit_class__", None)
+    if rate_class is None:
+        for prefix, name in ROUTE_RATE_CLASSES:
+            if path.startswith(prefix):
+                rate_class = name
+                break
+    if rate_class is None:
+        if request.method in ("GET", "HEAD"):
+            rate_class = "detail" if path.rstrip("/").endswith("}") else "list"
+        else:
+            rate_class = "default"
+    _route_classes[cache_key] = rate_class
+    return rate_class
+
+
+def rate_limit_class(name: str) -> Callable:
+    """端點裝飾器：指定限流類別（RATE_LIMITS 的鍵）"""
+    if name not in RATE_LIMITS:
+        raise ValueError(f"未知的限流類別: {name}")
+
+    def decorator(func: Callable) -> Callable:
+        func.__rate_limit_class__ = name
+        return func
+    return decorator
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def _create_rate_limiter() -> RateLimiter:
+    from app.core.config import get_settings
+
+    settings = get_settings()
+    redis_store = None
+    storage = settings.rate_limit_storage
+    if storage in ("auto", "redis") and settings.redis_url:
+        try:
+            import redis.asyncio as redis_asyncio
+
+            client = redis_asyncio.from_url(settings.redis_url, socket_connect_timeout=1, socket_timeout=1)
+            redis_store = RedisRateLimitStore(client)
+        except Exception as e:
+            logger.warning(f"無法創建 Redis 限流存儲，使用進程內計數: {e}")
+    elif storage == "redis":
+        logger.warning("rate_limit_storage=redis 但未配置 redis_url，使用進程內計數")
+    return RateLimiter(
+        redis_store=redis_store,
+        enabled=settings.rate_limit_enabled,
+    )
+
+
+def get_rate_limiter() -> RateLimiter:
+    """獲取全局限流器"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = _create_rate_limiter()
+    return _rate_limiter
+
+
+async def enforce_rate_limit(request: Request, response: Response) -> None:
+    """路由依賴：超出限額時返回 429 並附帶 Retry-After"""
+    limiter_ = get_rate_limiter()
+    if not limiter_.enabled or request.method == "OPTIONS":
+        return
+    rate_class = route_rate_class(request)
+    decision = await limiter_.hit(rate_limit_key(request), rate_class)
+    headers = {
+        "X-RateLimit-Limit": str(decision.limit),
+        "X-RateLimit-Remaining": str(decision.remaining),
+        "X-RateLimit-Reset": str(math.ceil(decision.reset_after)),
+    }
+    if not decision.allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(decision.retry_after)))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"請求過於頻繁，請在 {headers['Retry-After']} 秒後重試",
+            headers=headers,
+        )
+    response.headers.update(headers)
+
+
+# 禁用 slowapi 的 .env 文件读取，仅使用环境变量（避免编码问题）
+# 使用不存在的文件名避免 slowapi 尝试读取 .env 文件
+# 注意：不删除 .env 文件，因为其他代码（如 config.py）需要读取它
+# 保留 slowapi 供 @limiter.limit 裝飾的端點使用，鍵與 GCRA 限流一致（按主體而非僅按 IP）
+limiter = Limiter(key_func=rate_limit_key, config_filename="__nonexistent__.env")
@@ -0,0 +1,302 @@
+"""
+統一分頁工具
+提供游標（Keyset）分頁、可選計數模式與不透明游標編碼
+
+用法：
+    page = paginate(
+        db.query(AuditLog).filter(...),
+        sort_column=AuditLog.created_at,
+        tiebreak_column=AuditLog.id,
+        page=page, page_size=page_size,
+        cursor=cursor, count_mode=count_mode,
+    )
+    return {"items": page.items, **page.meta()}
+
+- 未提供 cursor 時按頁碼（OFFSET）分頁，保持前端頁碼兼容
+- 提供 cursor 時使用 (排序鍵, 主鍵) 的 Keyset 條件，深分頁不再線性變慢
+- count_mode: exact（COUNT）、estimated（規劃器統計 / sqlite_stat1）、none（不計數）
+"""
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import status
+from sqlalchemy import and_, or_, text
+from sqlalchemy.orm import Query
+
+from app.core.errors import UserFriendlyError
+
+logger = logging.getLogger(__name__)
+
+CURSOR_VERSION = 1
+
+
+class CountMode(str, Enum):
+    """總數計算模式"""
+    EXACT = "exact"          # 精確 COUNT（全表/索引掃描）
+    ESTIMATED = "estimated"  # 基於規劃器統計的估算值
+    NONE = "none"            # 不計算總數
+
+
+class InvalidCursorError(UserFriendlyError):
+    """游標無法解析或與當前排序不匹配"""
+
+    def __init__(self, detail: str = "無效的分頁游標"):
+        super().__init__(
+            "VALIDATION_ERROR",
+            detail=detail,
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+
+@dataclass
+class Page:
+    """分頁結果"""
+    items: List[Any]
+    page: int
+    page_size: int
+    total: Optional[int] = None
+    total_estimated: bool = False
+    has_more: bool = False
+    next_cursor: Optional[str] = None
+
+    @property
+    def total_pages(self) -> Optional[int]:
+        if self.total is None:
+            return None
+        return (self.total + self.page_size - 1) // self.page_size
+
+    def meta(self) -> Dict[str, Any]:
+        """響應中的分頁元數據（兼容原有 total/page/page_size/total_pages 字段，count_mode=none 時總數為 None）"""
+        return {
+            "total": self.total,
+            "page": self.page,
+            "page_size": self.page_size,
+            "total_pages": self.total_pages,
+            "total_estimated": self.total_estimated,
+            "has_more": self.has_more,
+            "next_cursor": self.next_cursor,
+        }
+
+
+# ============ 游標編解碼 ============
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" not in value:
+            raise InvalidCursorError()
+        try:
+            return datetime.fromisoformat(value["dt"])
+        except (TypeError, ValueError):
+            raise InvalidCursorError()
+    return value
+
+
+def encode_cursor(payload: Dict[str, Any]) -> str:
+    """將游標內容編碼為 URL 安全的不透明字符串"""
+    data = dict(payload, ver=CURSOR_VERSION)
+    raw = json.dumps(data, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """解碼游標，格式錯誤時拋出 InvalidCursorError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise InvalidCursorError()
+    if not isinstance(data, dict) or data.get("ver") != CURSOR_VERSION:
+        raise InvalidCursorError()
+    return data
+
+
+# ============ 計數 ============
+
+def _estimate_count(query: Query) -> Optional[int]:
+    """
+    基於數據庫統計信息估算行數
+
+    - PostgreSQL: EXPLAIN 的 Plan Rows（支持帶過濾條件的查詢）
+    - SQLite: sqlite_stat1 中的表行數（僅適用於無過濾條件的查詢，需執行過 ANALYZE）
+    無法估算時返回 None，由調用方回退到精確計數
+    """
+    session = query.session
+    bind = session.get_bind()
+    dialect = bind.dialect.name
+    try:
+        if dialect == "postgresql":
+            stmt = query.order_by(None).statement
+            compiled = stmt.compile(dialect=bind.dialect)
+            row = session.connection().exec_driver_sql(
+                f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params
+            ).scalar()
+            plan = row if isinstance(row, list) else json.loads(row)
+            return int(plan[0]["Plan"]["Plan Rows"])
+        if dialect == "sqlite":
+            if query.whereclause is not None:
+                return None
+            descriptions = query.column_descriptions
+            entity = descriptions[0].get("entity") if descriptions else None
+            table = getattr(entity, "__tablename__", None)
+            if not table:
+                return None
+            stat = session.execute(
+                text("SELECT stat FROM sqlite_stat1 WHERE tbl = :tbl LIMIT 1"),
+                {"tbl": table},
+            ).scalar()
+            if stat:
+                return int(str(stat).split()[0])
+    except Exception as e:
+        logger.debug(f"估算行數失敗，回退到精確計數: {e}")
+    return None
+
+
+def count_rows(query: Query, count_mode: CountMode = CountMode.EXACT) -> Tuple[Optional[int], bool]:
+    """
+    按計數模式計算總數
+
+    Returns:
+        (總數, 是否為估算值)；count_mode=none 時返回 (None, False)
+    """
+    if count_mode == CountMode.NONE:
+        return None, False
+    if count_mode == CountMode.ESTIMATED:
+        estimate = _estimate_count(query)
+        if estimate is not None:
+            return estimate, True
+    return query.order_by(None).count(), False
+
+
+# ============ 分頁 ============
+
+def _is_nullable(column) -> bool:
+    try:
+        return bool(column.property.columns[0].nullable)
+    except (AttributeError, IndexError):
+        return True
+
+
+def _order_clauses(column, descending: bool):
+    clause = column.desc() if descending else column.asc()
+    # 可空列統一把 NULL 排在最後，保證 Keyset 條件與排序一致
+    return clause.nulls_last() if _is_nullable(column) else clause
+
+
+def _keyset_condition(sort_column, tiebreak_column, descending: bool, sort_value: Any, tiebreak_value: Any):
+    def after(column, value):
+        return column < value if descending else column > value
+
+    if sort_value is None:
+        # 已進入 NULL 區段，僅按主鍵繼續
+        return and_(sort_column.is_(None), after(tiebreak_column, tiebreak_value))
+
+    conditions = [
+        after(sort_column, sort_value),
+        and_(sort_column == sort_value, after(tiebreak_column, tiebreak_value)),
+    ]
+    if _is_nullable(sort_column):
+        conditions.append(sort_column.is_(None))
+    return or_(*conditions)
+
+
+def paginate(
+    query: Query,
+    *,
+    sort_column,
+    tiebreak_column,
+    descending: bool = True,
+    page: int = 1,
+    page_size: int = 20,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
+    offset: Optional[int] = None,
+    keyset: bool = True,
+) -> Page:
+    """
+    對查詢進行分頁
+
+    Args:
+        query: 已應用過濾條件、未排序的查詢
+        sort_column: 排序列（應有索引）
+        tiebreak_column: 唯一的次級排序列（通常為主鍵），保證游標穩定
+        descending: 是否降序
+        page: 頁碼（未提供 cursor 時使用）
+        page_size: 每頁數量
+        cursor: 上一頁返回的 next_cursor
+        count_mode: 總數計算模式
+        offset: 直接指定偏移量（兼容 skip/limit 風格的接口，優先於 page）
+        keyset: 是否使用 Keyset 游標；查詢已帶前置排序（如搜索相關度）時傳 False，游標僅記錄偏移量
+
+    Returns:
+        Page 分頁結果
+    """
+    sort_key = sort_column.key
+    direction = "desc" if descending else "asc"
+
+    total, total_estimated = count_rows(query, count_mode)
+
+    ordered = query.order_by(
+        _order_clauses(sort_column, descending),
+        _order_clauses(tiebreak_column, descending),
+    )
+
+    if cursor:
+        state = decode_cursor(cursor)
+        if state.get("s") != sort_key or state.get("d") != direction:
+            raise InvalidCursorError("分頁游標與當前排序條件不匹配")
+        current_offset = state.get("o")
+        if not isinstance(current_offset, int) or current_offset < 0:
+            raise InvalidCursorError()
+        if keyset:
+            keys = state.get("k")
+            if not isinstance(keys, list) or len(keys) != 2:
+                raise InvalidCursorError()
+            sort_value, tiebreak_value = (_decode_value(v) for v in keys)
+            ordered = ordered.filter(
+                _keyset_condition(sort_column, tiebreak_column, descending, sort_value, tiebreak_value)
+            )
+        elif current_offset:
+            ordered = ordered.offset(current_offset)
+    else:
+        current_offset = offset if offset is not None else (page - 1) * page_size
+        if current_offset:
+            ordered = ordered.offset(current_offset)
+
+    # 多取一條用於判斷是否還有下一頁，避免額外的計數查詢
+    rows = ordered.limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    items = rows[:page_size]
+
+    next_cursor = None
+    if has_more and items:
+        last = items[-1]
+        state = {"s": sort_key, "d": direction, "o": current_offset + page_size}
+        if keyset:
+            state["k"] = [
+                _encode_value(getattr(last, sort_key)),
+                _encode_value(getattr(last, tiebreak_column.key)),
+            ]
+        next_cursor = encode_cursor(state)
+
+    return Page(
+        items=items,
+        page=current_offset // page_size + 1,
+        page_size=page_size,
+        total=total,
+        total_estimated=total_estimated,
+        has_more=has_more,
+        next_cursor=next_cursor,
+    )
@@ -0,0 +1,136 @@
+"""
+密碼哈希線程池 - 在事件循環之外計算 bcrypt / argon2
+
+bcrypt 每次耗時約 100–300 毫秒，在 async 處理函數中直接調用會阻塞整個事件循環：一波登錄或暴力嘗試
+會拖慢同一 worker 上的所有請求。這裡把哈希和驗證交給專用的小線程池（password_hash_workers），
+bcrypt 和 argon2-cffi 在計算時都會釋放 GIL，線程即可並行，無需進程池的序列化開銷。
+
+排隊的請求數超過 password_hash_queue_limit 時立即拒絕（PasswordHasherBusy，登錄返回 503），
+而不是讓積壓無限增長；限流（app.core.limiter 的 auth 類別）負責單個主體，這裡負責整個進程。
+
+哈希策略（方案、bcrypt 成本）見 app.core.security.get_password_hash / password_needs_rehash，
+登錄成功後按策略重新哈希舊密碼。
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional
+
+from app.core.security import get_password_hash, verify_password
+
+logger = logging.getLogger(__name__)
+
+LATENCY_WINDOW = 1024
+
+
+class PasswordHasherBusy(Exception):
+    """等待哈希的請求已達上限"""
+
+
+class PasswordHasher:
+    """有界的密碼哈希線程池（帶排隊上限與耗時統計）"""
+
+    def __init__(self, max_workers: int = 2, queue_limit: int = 32):
+        self.max_workers = max(1, max_workers)
+        self.queue_limit = max(0, queue_limit)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._max_pending = 0
+        self._counts: Dict[str, int] = {"verify": 0, "hash": 0, "rejected": 0, "rehashed": 0}
+        self._wait_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._run_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._login_ms: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._submit("verify", verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self._submit("hash", get_password_hash, password)
+
+    async def _submit(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.max_workers + self.queue_limit:
+                self._counts["rejected"] += 1
+                raise PasswordHasherBusy("密碼哈希隊列已滿")
+            self._pending += 1
+            self._max_pending = max(self._max_pending, self._pending)
+            self._counts[operation] += 1
+        submitted = time.perf_counter()
+
+        def run() -> Any:
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._wait_ms.append((started - submitted) * 1000)
+                    self._run_ms.append((finished - started) * 1000)
+
+        try:
+            return await asyncio.wrap_future(self._executor.submit(run))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def record_login(self, started: float, rehashed: bool = False) -> None:
+        """記錄一次登錄的總耗時（started 為 time.perf_counter()）"""
+        with self._lock:
+            self._login_ms.append((time.perf_counter() - started) * 1000)
+            if rehashed:
+                self._counts["rehashed"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+            pending, max_pending = self._pending, self._max_pending
+            samples = {
+                "wait_ms": sorted(self._wait_ms),
+                "run_ms": sorted(self._run_ms),
+                "login_ms": sorted(self._login_ms),
+            }
+
+        def summary(values) -> Dict[str, float]:
+            if not values:
+                return {"p50": 0.0, "p99": 0.0, "samples": 0}
+
+            def percentile(p: float) -> float:
+                return round(values[min(len(values) - 1, int(len(values) * p))], 3)
+
+            return {"p50": percentile(0.5), "p99": percentile(0.99), "samples": len(values)}
+
+        return {
+            "workers": self.max_workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": pending,
+            "queued": max(0, pending - self.max_workers),
+            "max_in_flight": max_pending,
+            **counts,
+            **{name: summary(values) for name, values in samples.items()},
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+_password_hasher: Optional[PasswordHasher] = None
+_password_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """獲取全局密碼哈希線程池"""
+    global _password_hasher
+    if _password_hasher is None:
+        with _password_hasher_lock:
+            if _password_hasher is None:
+                from app.core.config import get_settings
+                settings = get_settings()
+                _password_hasher = PasswordHasher(
+                    max_workers=settings.password_hash_workers,
+                    queue_limit=settings.password_hash_queue_limit,
+                )
+    return _password_hasher
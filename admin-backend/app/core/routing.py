@@ -0,0 +1,69 @@
+"""
+聚合路由
+
+FastAPI 的 include_router 會在每一層為每個端點重新構建 APIRoute（重新解析依賴並生成 pydantic 校驗模型）。
+路由按「端點 → 模塊 router → group_ai router → api router → app」逐層包含時，同一端點會被構建 3~4 次，
+這是應用導入耗時的主要來源。
+
+DeferredAPIRouter 只記錄子路由及其包含參數，掛載到應用時一次性展開，每個端點只在目標上構建一次。
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from fastapi import APIRouter, FastAPI
+from fastapi.params import Depends
+
+# 可以逐層合併的 include_router 參數；其他參數按原方式立即包含
+DEFERRABLE_KWARGS = {"prefix", "tags", "dependencies", "responses"}
+
+
+class DeferredAPIRouter(APIRouter):
+    """
+    只用於聚合子路由的 APIRouter
+
+    include_router 只記錄子路由，調用 include_into 時再把所有子路由（遞歸展開）直接包含到目標上，
+    合併後的 prefix / tags / dependencies / responses 與逐層包含的結果一致；
+    直接定義在聚合路由上的端點會先於子路由包含。
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.deferred_routers: List[Tuple[APIRouter, Dict[str, Any]]] = []
+
+    def include_router(self, router: APIRouter, **kwargs: Any) -> None:
+        if set(kwargs) - DEFERRABLE_KWARGS:
+            super().include_router(router, **kwargs)
+            return
+        self.deferred_routers.append((router, kwargs))
+
+    def include_into(
+        self,
+        target: Union[FastAPI, APIRouter],
+        *,
+        prefix: str = "",
+        tags: Optional[List[str]] = None,
+        dependencies: Optional[Sequence[Depends]] = None,
+        responses: Optional[Dict[Union[int, str], Dict[str, Any]]] = None,
+    ) -> None:
+        """將聚合的所有子路由展開包含到 target（按註冊順序，保持路由匹配優先級）"""
+        if self.routes:
+            # 直接定義在聚合路由上的端點已帶有本層的 prefix / tags，只需合併外層參數
+            own = APIRouter()
+            own.routes.extend(self.routes)
+            target.include_router(own, prefix=prefix, tags=tags, dependencies=dependencies, responses=responses)
+
+        prefix = prefix + self.prefix
+        tags = list(tags or []) + list(self.tags or [])
+        dependencies = list(dependencies or []) + list(self.dependencies or [])
+        responses = {**(responses or {}), **(self.responses or {})}
+
+        for router, kwargs in self.deferred_routers:
+            child_kwargs = {
+                "prefix": prefix + kwargs.get("prefix", ""),
+                "tags": tags + list(kwargs.get("tags") or []),
+                "dependencies": dependencies + list(kwargs.get("dependencies") or []),
+                "responses": {**responses, **(kwargs.get("responses") or {})},
+            }
+            if isinstance(router, DeferredAPIRouter):
+                router.include_into(target, **child_kwargs)
+            else:
+                target.include_router(router, **child_kwargs)
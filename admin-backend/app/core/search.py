@@ -0,0 +1,313 @@
+"""
+統一列表搜索
+為後台列表的 search 參數提供索引化的子串匹配與相關度排序，替代多列 LIKE '%詞%' 的全表掃描
+
+用法：
+    ranked = bool(search) and sort_by == "relevance"
+    query = apply_search(db.query(GroupAIScript), GroupAIScript, search, ranked=ranked)
+    page = paginate(query, ..., keyset=not ranked)
+
+- SQLite: FTS5 trigram 外部內容虛擬表（search_<表名>），由源表上的觸發器保持同步
+- PostgreSQL: pg_trgm 擴展 + 每個搜索列上的 GIN 索引，ILIKE 子串匹配直接走索引
+- 索引不可用（SQLite 不支持 trigram、無權限創建擴展等）時回退到多列 LIKE，結果一致僅較慢
+
+搜索詞按空白拆分，每個詞都須出現在任一搜索列中（子串匹配，包含前綴匹配）；
+ranked=True 時前綴命中的行排在最前，其次按 bm25（SQLite）/ word_similarity（PostgreSQL）排序。
+索引在首次搜索某表時按需創建（啟動階段也會預先創建），觸發器創建前已有的數據會整體重建一次。
+注意：VACUUM 可能重排無整數主鍵表的 rowid，之後需調用 rebuild_search_indexes。
+"""
+import logging
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, column, func, literal_column, or_, select, table
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Query
+
+logger = logging.getLogger(__name__)
+
+# trigram 只能索引不少於 3 個字符的詞，更短的詞回退到 LIKE
+MIN_INDEXED_TERM_LENGTH = 3
+MAX_SEARCH_TERMS = 8
+
+
+@dataclass(frozen=True)
+class SearchSpec:
+    """一張表的搜索配置"""
+    table: str
+    columns: Tuple[str, ...]               # 建立索引的列
+    default_columns: Tuple[str, ...] = ()  # 未指定 columns 時搜索的列（默認全部）
+
+    @property
+    def index_table(self) -> str:
+        return f"search_{self.table}"
+
+    @property
+    def searched_columns(self) -> Tuple[str, ...]:
+        return self.default_columns or self.columns
+
+
+SEARCH_SPECS: Dict[str, SearchSpec] = {
+    spec.table: spec
+    for spec in (
+        SearchSpec("group_ai_accounts", ("account_id", "display_name", "username", "phone_number")),
+        # 劇本 YAML 內容建立索引，但默認只搜索 ID、名稱與描述
+        SearchSpec(
+            "group_ai_scripts",
+            ("script_id", "name", "description", "yaml_content"),
+            default_columns=("script_id", "name", "description"),
+        ),
+        SearchSpec("group_ai_role_assignment_schemes", ("name", "description")),
+        SearchSpec("audit_logs", ("description",)),
+    )
+}
+
+# Engine -> {表名: 搜索後端（fts5 / trgm / like）}
+_backends: "weakref.WeakKeyDictionary[Engine, Dict[str, str]]" = weakref.WeakKeyDictionary()
+_backends_lock = threading.Lock()
+
+
+# ============ 索引 DDL ============
+
+def _fts5_statements(spec: SearchSpec) -> List[Tuple[str, str]]:
+    """FTS5 外部內容表與同步觸發器的 (名稱, DDL)"""
+    index = spec.index_table
+    columns = ", ".join(spec.columns)
+    new_values = ", ".join(f"new.{name}" for name in spec.columns)
+    old_values = ", ".join(f"old.{name}" for name in spec.columns)
+    insert = f"INSERT INTO {index}(rowid, {columns}) VALUES (new.rowid, {new_values});"
+    delete = f"INSERT INTO {index}({index}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values});"
+    return [
+        (index, f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5({columns}, content='{spec.table}', tokenize='trigram')"),
+        (f"{index}_ai", f"CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON {spec.table} BEGIN {insert} END"),
+        (f"{index}_ad", f"CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON {spec.table} BEGIN {delete} END"),
+        (
+            f"{index}_au",
+            f"CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE OF {columns} ON {spec.table} BEGIN {delete} {insert} END",
+        ),
+    ]
+
+
+def _trgm_index_name(spec: SearchSpec, column_name: str) -> str:
+    return f"ix_{spec.table}_{column_name}_trgm"
+
+
+def _fts5_unsupported(error: Exception) -> bool:
+    """SQLite 未編譯 FTS5 或版本 < 3.34（無 trigram 分詞器）；其他錯誤（例如鎖衝突）是暫時的"""
+    message = str(error).lower()
+    return "no such tokenizer" in message or "no such module" in message
+
+
+def _ensure_fts5(connection: Connection, specs: Iterable[SearchSpec]) -> Dict[str, str]:
+    existing = {
+        name for (name,) in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )
+    }
+    backends = {}
+    for spec in specs:
+        if spec.table not in existing:
+            continue
+        created = False
+        try:
+            # IF NOT EXISTS：多個 worker 同時啟動時，檢查之後被其他進程搶先創建也不報錯
+            for name, ddl in _fts5_statements(spec):
+                if name not in existing:
+                    connection.exec_driver_sql(ddl)
+                    created = True
+        except Exception as e:
+            if not _fts5_unsupported(e):
+                raise
+            logger.warning(f"SQLite 不支持 FTS5 trigram 分詞器，{spec.table} 回退到 LIKE 搜索: {e}")
+            backends[spec.table] = "like"
+            continue
+        if created:
+            # 觸發器創建前的數據（或觸發器缺失期間的改動）整體重建
+            connection.exec_driver_sql(f"INSERT INTO {spec.index_table}({spec.index_table}) VALUES ('rebuild')")
+            logger.info(f"已重建搜索索引 {spec.index_table}")
+        backends[spec.table] = "fts5"
+    return backends
+
+
+def _ensure_trgm(connection: Connection, specs: Iterable[SearchSpec]) -> Dict[str, str]:
+    try:
+        with connection.begin_nested():
+            connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        logger.debug(f"創建 pg_trgm 擴展失敗，檢查是否已安裝: {e}")
+    available = connection.exec_driver_sql(
+        "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"
+    ).scalar() is not None
+    backends = {}
+    for spec in specs:
+        if connection.exec_driver_sql("SELECT to_regclass(%s)", (spec.table,)).scalar() is None:
+            continue
+        if not available:
+            backends[spec.table] = "like"
+            continue
+        for name in spec.columns:
+            connection.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS {_trgm_index_name(spec, name)} "
+                f"ON {spec.table} USING gin ({name} gin_trgm_ops)"
+            )
+        backends[spec.table] = "trgm"
+    if not available:
+        logger.warning("pg_trgm 擴展不可用，列表搜索回退到無索引的 ILIKE")
+    return backends
+
+
+def ensure_search_indexes(connection: Connection, tables: Optional[Iterable[str]] = None) -> Dict[str, str]:
+    """
+    創建缺失的搜索索引（可重複調用）
+
+    Returns:
+        {表名: 搜索後端}；源表不存在的表不在結果中
+    """
+    specs = [SEARCH_SPECS[name] for name in tables] if tables is not None else list(SEARCH_SPECS.values())
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        return _ensure_fts5(connection, specs)
+    if dialect == "postgresql":
+        return _ensure_trgm(connection, specs)
+    return {spec.table: "like" for spec in specs}
+
+
+def rebuild_search_indexes(connection: Connection) -> None:
+    """按源表內容重建 SQLite 搜索索引（VACUUM 或手工修改數據後使用；PostgreSQL 無需重建）"""
+    if connection.dialect.name != "sqlite":
+        return
+    for spec in SEARCH_SPECS.values():
+        if _ensure_fts5(connection, [spec]).get(spec.table) == "fts5":
+            connection.exec_driver_sql(f"INSERT INTO {spec.index_table}({spec.index_table}) VALUES ('rebuild')")
+
+
+def init_search_indexes(engine: Engine) -> Dict[str, str]:
+    """啟動時預先創建全部搜索索引並緩存各表的搜索後端"""
+    with engine.begin() as connection:
+        backends = ensure_search_indexes(connection)
+    with _backends_lock:
+        _backends.setdefault(engine, {}).update(backends)
+    return backends
+
+
+def _writable_engine(engine: Engine) -> Engine:
+    # 只讀連接池（SQLite query_only）不能執行 DDL，改用同一數據庫的主引擎
+    from app.db import engine as main_engine, read_engine
+    return main_engine if engine is read_engine else engine
+
+
+def search_backend(bind, table_name: str) -> str:
+    """返回表當前可用的搜索後端，首次調用時按需創建索引"""
+    engine = _writable_engine(getattr(bind, "engine", bind))
+    with _backends_lock:
+        backend = _backends.get(engine, {}).get(table_name)
+    if backend is not None:
+        return backend
+    try:
+        with engine.begin() as connection:
+            backends = ensure_search_indexes(connection, [table_name])
+    except Exception as e:
+        logger.warning(f"準備搜索索引失敗，{table_name} 本次回退到 LIKE 搜索: {e}")
+        return "like"
+    with _backends_lock:
+        _backends.setdefault(engine, {}).update(backends)
+    return backends.get(table_name, "like")
+
+
+# ============ 查詢 ============
+
+def _split_terms(term: Optional[str]) -> List[str]:
+    terms: List[str] = []
+    for word in (term or "").split():
+        if word not in terms:
+            terms.append(word)
+    return terms[:MAX_SEARCH_TERMS]
+
+
+def _escape_like(word: str) -> str:
+    return word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _like(target, pattern: str, dialect: str):
+    # PostgreSQL 上 ILIKE 可直接使用 gin_trgm_ops 索引；SQLite 的 LIKE 對 ASCII 本就不區分大小寫
+    if dialect == "postgresql":
+        return target.ilike(pattern, escape="\\")
+    return target.like(pattern, escape="\\")
+
+
+def _fts5_query(spec: SearchSpec, columns: Sequence[str], words: Sequence[str]) -> str:
+    phrases = " AND ".join('"' + word.replace('"', '""') + '"' for word in words)
+    if tuple(columns) == spec.columns:
+        return phrases
+    return "{" + " ".join(columns) + "} : (" + phrases + ")"
+
+
+def apply_search(
+    query: Query,
+    model,
+    term: Optional[str],
+    *,
+    columns: Optional[Sequence[str]] = None,
+    ranked: bool = False,
+) -> Query:
+    """
+    為列表查詢添加搜索條件
+
+    Args:
+        query: 列表查詢（實體為 model）
+        model: 已在 SEARCH_SPECS 中註冊的模型
+        term: 搜索詞，為空時原樣返回查詢
+        columns: 搜索的列（須為已索引列），默認為該表的默認搜索列
+        ranked: 是否按相關度前置排序；此時分頁需使用 keyset=False
+
+    Returns:
+        添加過濾（與排序）條件後的查詢
+    """
+    words = _split_terms(term)
+    if not words:
+        return query
+
+    spec = SEARCH_SPECS[model.__tablename__]
+    names = tuple(columns) if columns else spec.searched_columns
+    unknown = set(names) - set(spec.columns)
+    if unknown:
+        raise ValueError(f"{spec.table} 的列未建立搜索索引: {', '.join(sorted(unknown))}")
+
+    bind = query.session.get_bind()
+    dialect = bind.dialect.name
+    backend = search_backend(bind, spec.table)
+    targets = [model.__table__.c[name] for name in names]
+
+    indexed = [w for w in words if len(w) >= MIN_INDEXED_TERM_LENGTH] if backend == "fts5" else []
+    for word in words:
+        if word not in indexed:
+            pattern = f"%{_escape_like(word)}%"
+            query = query.filter(or_(*(_like(target, pattern, dialect) for target in targets)))
+
+    rank = None
+    if indexed:
+        index = table(spec.index_table, column("rowid"), column("rank"))
+        matches = select(index.c.rowid, index.c.rank).where(
+            literal_column(spec.index_table).op("MATCH")(_fts5_query(spec, names, indexed))
+        ).subquery()
+        source_rowid = literal_column(f"{spec.table}.rowid")
+        if ranked:
+            query = query.join(matches, matches.c.rowid == source_rowid)
+            rank = matches.c.rank.asc()
+        else:
+            query = query.filter(source_rowid.in_(select(matches.c.rowid)))
+
+    if ranked:
+        prefix = f"{_escape_like(words[0])}%"
+        orders = [case((or_(*(_like(target, prefix, dialect) for target in targets)), 0), else_=1)]
+        if rank is not None:
+            orders.append(rank)
+        elif backend == "trgm":
+            phrase = " ".join(words)
+            orders.append(func.greatest(*(
+                func.word_similarity(phrase, func.coalesce(target, "")) for target in targets
+            )).desc())
+        query = query.order_by(*orders)
+    return query
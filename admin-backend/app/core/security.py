@@ -1,3 +1,5 @@
+import logging
+import uuid
 from datetime import datetime, timedelta
 from typing import Any, Optional
 
@@ -6,26 +8,45 @@ from passlib.context import CryptContext
 
 from app.core.config import get_settings
 
-# 嘗試初始化 passlib，如果失敗則直接使用 bcrypt
+try:
+    import argon2
+except ImportError:  # pragma: no cover - argon2-cffi 為可選依賴
+    argon2 = None
+
+logger = logging.getLogger(__name__)
+_argon2_missing_logged = False
+
+# passlib 初始化需要計算一次測試哈希（約數百毫秒），延遲到首次使用密碼函數時執行
 _pwd_context_initialized = False
+_pwd_context_checked = False
 pwd_context = None
 
-try:
-    # 嘗試初始化 passlib，可能會因為 bcrypt 版本問題失敗
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-    # 測試初始化是否成功
-    _test_hash = pwd_context.hash("test")
-    _pwd_context_initialized = True
-except Exception:
-    # 如果 passlib 初始化失敗，使用 bcrypt 直接實現
-    import bcrypt
-    _pwd_context_initialized = False
+
+def _get_pwd_context() -> Optional[CryptContext]:
+    """返回可用的 passlib 上下文；passlib 與 bcrypt 版本不兼容時返回 None，改用 bcrypt 直接實現"""
+    global pwd_context, _pwd_context_initialized, _pwd_context_checked
+    if not _pwd_context_checked:
+        try:
+            # 嘗試初始化 passlib，可能會因為 bcrypt 版本問題失敗
+            context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+            # 測試初始化是否成功
+            context.hash("test")
+            pwd_context = context
+            _pwd_context_initialized = True
+        except Exception:
+            # 如果 passlib 初始化失敗，使用 bcrypt 直接實現
+            _pwd_context_initialized = False
+        _pwd_context_checked = True
+    return pwd_context if _pwd_context_initialized else None
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """驗證密碼"""
-    if _pwd_context_initialized and pwd_context:
-        return pwd_context.verify(plain_password, hashed_password)
+    """驗證密碼（支持 bcrypt 和 argon2 哈希）"""
+    if hashed_password and hashed_password.startswith("$argon2"):
+        return _verify_argon2(plain_password, hashed_password)
+    context = _get_pwd_context()
+    if context:
+        return context.verify(plain_password, hashed_password)
     else:
         # 使用 bcrypt 直接實現
         import bcrypt
@@ -35,6 +56,49 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
             return False
 
 
+def _verify_argon2(plain_password: str, hashed_password: str) -> bool:
+    if argon2 is None:
+        logger.warning("存在 argon2 密碼哈希，但未安裝 argon2-cffi，無法驗證")
+        return False
+    try:
+        return argon2.PasswordHasher().verify(hashed_password, plain_password)
+    except argon2.exceptions.VerificationError:
+        return False
+    except argon2.exceptions.InvalidHashError:
+        return False
+
+
+def password_hash_scheme() -> str:
+    """當前生效的哈希方案：配置為 argon2 但未安裝 argon2-cffi 時使用 bcrypt"""
+    scheme = get_settings().password_hash_scheme.lower()
+    if scheme == "argon2" and argon2 is None:
+        global _argon2_missing_logged
+        if not _argon2_missing_logged:
+            logger.warning("password_hash_scheme=argon2 但未安裝 argon2-cffi，繼續使用 bcrypt")
+            _argon2_missing_logged = True
+        return "bcrypt"
+    return "argon2" if scheme == "argon2" else "bcrypt"
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """存儲的哈希是否需要按當前策略重新計算（方案不同，或 bcrypt 成本與配置不一致）"""
+    if not hashed_password:
+        return False
+    scheme = password_hash_scheme()
+    if hashed_password.startswith("$argon2"):
+        if scheme != "argon2":
+            return True
+        return argon2.PasswordHasher().check_needs_rehash(hashed_password)
+    if scheme == "argon2":
+        return True
+    parts = hashed_password.split("$")
+    try:
+        rounds = int(parts[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds != get_settings().password_bcrypt_rounds
+
+
 def get_password_hash(password: str) -> str:
     """
     獲取密碼哈希值
@@ -51,28 +115,40 @@ def get_password_hash(password: str) -> str:
     if len(password_bytes) > 72:
         password_bytes = password_bytes[:72]
     
-    if _pwd_context_initialized and pwd_context:
+    if password_hash_scheme() == "argon2":
+        return argon2.PasswordHasher().hash(password)
+    
+    rounds = get_settings().password_bcrypt_rounds
+    context = _get_pwd_context()
+    if context:
         # 使用 passlib（如果可用）
         try:
-            return pwd_context.hash(password_bytes.decode('utf-8', errors='ignore') if password_bytes else password)
+            return context.handler("bcrypt").using(rounds=rounds).hash(
+                password_bytes.decode('utf-8', errors='ignore') if password_bytes else password
+            )
         except Exception:
             # 如果 passlib 失敗，回退到 bcrypt
             pass
     
     # 使用 bcrypt 直接實現
     import bcrypt
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
 
-def create_access_token(subject: str, expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(
+    subject: str,
+    expires_delta: Optional[timedelta] = None,
+    claims: Optional[dict[str, Any]] = None,
+) -> str:
     settings = get_settings()
     if expires_delta is not None:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
-    to_encode: dict[str, Any] = {"exp": expire, "sub": str(subject)}
+    # jti 使同一秒內簽發的令牌互不相同，撤銷（登出）只影響單個令牌
+    to_encode: dict[str, Any] = {"jti": uuid.uuid4().hex, **(claims or {}), "exp": expire, "sub": str(subject)}
     return jwt.encode(to_encode, settings.jwt_secret, algorithm=settings.jwt_algorithm)
 
 
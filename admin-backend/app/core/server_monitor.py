@@ -4,14 +4,13 @@
 """
 import logging
 import asyncio
-import paramiko
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
-import json
 import time
 
+from app.core.config_registry import get_config_registry
 from app.core.load_balancer import ServerMetrics
 
 logger = logging.getLogger(__name__)
@@ -61,7 +60,6 @@ class ServerMonitor:
         self.health_check_timeout = health_check_timeout
         self.failure_threshold = failure_threshold
         
-        self.server_configs: Dict = {}
         self.server_metrics_cache: Dict[str, ServerMetrics] = {}
         self.server_health_status: Dict[str, ServerHealthStatus] = {}
         self.last_check_time: Dict[str, datetime] = {}
@@ -71,18 +69,18 @@ class ServerMonitor:
         self._load_server_configs()
     
     def _load_server_configs(self):
-        """加载服务器配置"""
-        if not self.master_config_path.exists():
+        """注册主配置文件（由配置注册表解析并在文件变化后自动重新加载）"""
+        snapshot = get_config_registry().register(self.master_config_path)
+        if snapshot.exists:
+            logger.info(f"加载了 {len(self.server_configs)} 个服务器配置")
+        else:
             logger.warning(f"主配置文件不存在: {self.master_config_path}")
-            return
-        
-        try:
-            with open(self.master_config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                self.server_configs = config.get('servers', {})
-                logger.info(f"加载了 {len(self.server_configs)} 个服务器配置")
-        except Exception as e:
-            logger.error(f"加载服务器配置失败: {e}")
+    
+    @property
+    def server_configs(self) -> Dict:
+        """当前服务器配置（只读快照）"""
+        data = get_config_registry().get(self.master_config_path)
+        return data.get('servers', {}) if isinstance(data, dict) else {}
     
     async def check_server_health(self, node_id: str) -> bool:
         """
@@ -105,6 +103,7 @@ class ServerMonitor:
         
         try:
             # 尝试SSH连接
+            import paramiko
             ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh.connect(
@@ -178,6 +177,7 @@ class ServerMonitor:
         location = config.get('location', '')
         
         try:
+            import paramiko
             ssh = paramiko.SSHClient()
             ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             ssh.connect(host, username=user, password=password, timeout=self.health_check_timeout)
@@ -256,13 +256,14 @@ class ServerMonitor:
         all_metrics = {}
         
         # 并发检查所有服务器
+        node_ids = list(self.server_configs.keys())
         tasks = []
-        for node_id in self.server_configs.keys():
+        for node_id in node_ids:
             tasks.append(self.collect_server_metrics(node_id))
         
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        for i, (node_id, result) in enumerate(zip(self.server_configs.keys(), results)):
+        for i, (node_id, result) in enumerate(zip(node_ids, results)):
             if isinstance(result, Exception):
                 logger.error(f"检查服务器 {node_id} 时出错: {result}")
                 # 使用缓存的指标或创建错误指标
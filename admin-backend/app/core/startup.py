@@ -0,0 +1,199 @@
+"""
+應用啟動階段編排
+
+啟動工作拆分為具名階段並逐個計時：
+- 關鍵階段（數據庫、管理員賬號等）按 stage 分組，組內並行、組間順序執行，完成後才開始接收請求
+- 非關鍵階段（調度器、備份、監控、緩存預熱等後台服務）全部並行啟動；
+  fast-start 模式下推遲到第一個請求處理完成後（或等待超時後）再啟動
+"""
+import asyncio
+import inspect
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StartupPhase:
+    """啟動階段"""
+    name: str
+    func: Callable[[], Any]  # 同步函數或協程函數
+    critical: bool = True  # 關鍵階段失敗會中止啟動；非關鍵階段失敗只記錄
+    stage: int = 0  # 關鍵階段的執行順序，同一 stage 內並行
+    blocking: bool = False  # 同步阻塞函數，在線程池中執行以便與其他階段並行
+
+
+@dataclass
+class PhaseResult:
+    """單個階段的執行結果"""
+    name: str
+    critical: bool
+    status: str = "pending"  # pending, ok, failed, deferred
+    duration_ms: float = 0.0
+    started_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "critical": self.critical,
+            "status": self.status,
+            "duration_ms": round(self.duration_ms, 1),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "error": self.error,
+        }
+
+
+class StartupRunner:
+    """按階段執行啟動流程並生成耗時報告"""
+
+    def __init__(self, phases: List[StartupPhase], fast_start: bool = False, max_defer_seconds: float = 60.0):
+        self.phases = phases
+        self.fast_start = fast_start
+        self.max_defer_seconds = max_defer_seconds
+        self.results: Dict[str, PhaseResult] = {
+            phase.name: PhaseResult(name=phase.name, critical=phase.critical) for phase in phases
+        }
+        self.critical_ms: float = 0.0
+        self.background_ms: Optional[float] = None
+        self._deferred_started = False
+        self._deferred_task: Optional[asyncio.Task] = None
+        self._fallback_task: Optional[asyncio.Task] = None
+
+    @property
+    def critical_phases(self) -> List[StartupPhase]:
+        return [phase for phase in self.phases if phase.critical]
+
+    @property
+    def background_phases(self) -> List[StartupPhase]:
+        return [phase for phase in self.phases if not phase.critical]
+
+    @property
+    def has_pending_background(self) -> bool:
+        return self.fast_start and not self._deferred_started
+
+    async def _run_phase(self, phase: StartupPhase) -> None:
+        result = self.results[phase.name]
+        result.started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            if phase.blocking:
+                value = await asyncio.to_thread(phase.func)
+            else:
+                value = phase.func()
+            if inspect.isawaitable(value):
+                await value
+            result.status = "ok"
+        except Exception as e:
+            result.status = "failed"
+            result.error = str(e)
+            if phase.critical:
+                raise
+            logger.warning(f"啟動階段 {phase.name} 失敗: {e}", exc_info=True)
+        finally:
+            result.duration_ms = (time.perf_counter() - started) * 1000
+
+    async def run(self) -> Dict[str, Any]:
+        """執行關鍵階段；非關鍵階段立即並行啟動，或在 fast-start 模式下推遲"""
+        started = time.perf_counter()
+        try:
+            for stage in sorted({phase.stage for phase in self.critical_phases}):
+                group = [phase for phase in self.critical_phases if phase.stage == stage]
+                await asyncio.gather(*[self._run_phase(phase) for phase in group])
+        finally:
+            self.critical_ms = (time.perf_counter() - started) * 1000
+
+        if self.fast_start:
+            for phase in self.background_phases:
+                self.results[phase.name].status = "deferred"
+            if self.max_defer_seconds > 0:
+                self._fallback_task = asyncio.create_task(self._start_after_timeout())
+            logger.info(
+                f"fast-start 模式：關鍵階段耗時 {self.critical_ms:.0f}ms，"
+                f"{len(self.background_phases)} 個後台服務將在首個請求完成後啟動"
+            )
+        else:
+            await self.run_background()
+
+        self.log_report()
+        return self.get_report()
+
+    async def run_background(self) -> None:
+        """並行啟動所有非關鍵階段（只執行一次）"""
+        if self._deferred_started:
+            return
+        self._deferred_started = True
+        started = time.perf_counter()
+        await asyncio.gather(*[self._run_phase(phase) for phase in self.background_phases])
+        self.background_ms = (time.perf_counter() - started) * 1000
+        if self.fast_start:
+            logger.info(f"推遲的後台服務已啟動，耗時 {self.background_ms:.0f}ms")
+            self.log_report()
+
+    def trigger_background(self) -> None:
+        """首個請求完成後調用：在後台啟動推遲的服務，不阻塞當前響應"""
+        if not self.has_pending_background or self._deferred_task is not None:
+            return
+        self._deferred_task = asyncio.create_task(self.run_background())
+        if self._fallback_task is not None:
+            self._fallback_task.cancel()
+
+    async def _start_after_timeout(self) -> None:
+        """長時間沒有請求時也啟動後台服務，避免定時任務等永遠不運行"""
+        await asyncio.sleep(self.max_defer_seconds)
+        if self.has_pending_background:
+            logger.info(f"{self.max_defer_seconds:.0f} 秒內未收到請求，開始啟動推遲的後台服務")
+            self._deferred_task = asyncio.current_task()
+            await self.run_background()
+
+    async def cancel(self) -> None:
+        """關閉應用時取消尚未執行的推遲任務"""
+        for task in (self._fallback_task, self._deferred_task):
+            if task is not None and not task.done() and task is not asyncio.current_task():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    def get_report(self) -> Dict[str, Any]:
+        """啟動耗時報告"""
+        return {
+            "mode": "fast" if self.fast_start else "normal",
+            "critical_ms": round(self.critical_ms, 1),
+            "background_ms": round(self.background_ms, 1) if self.background_ms is not None else None,
+            "phases": [self.results[phase.name].to_dict() for phase in self.phases],
+        }
+
+    def log_report(self) -> None:
+        lines = [f"啟動耗時報告（{'fast-start' if self.fast_start else '標準'}模式，關鍵階段 {self.critical_ms:.0f}ms）"]
+        for phase in self.phases:
+            result = self.results[phase.name]
+            kind = "關鍵" if phase.critical else "後台"
+            lines.append(f"  {phase.name:<24} {kind} {result.status:<8} {result.duration_ms:>8.1f}ms")
+        logger.info("\n".join(lines))
+
+
+class DeferredStartupMiddleware:
+    """fast-start 模式：第一個 HTTP 請求處理完成後觸發推遲的後台服務啟動"""
+
+    def __init__(self, app):
+        self.app = app
+        self._triggered = False
+
+    async def __call__(self, scope, receive, send):
+        if self._triggered or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            application = scope.get("app")
+            runner = getattr(application.state, "startup_runner", None) if application is not None else None
+            if runner is not None:
+                self._triggered = True
+                runner.trigger_background()
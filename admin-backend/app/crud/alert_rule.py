@@ -5,6 +5,7 @@ from typing import Optional, List
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
+from app.core.pagination import paginate
 from app.models.group_ai import GroupAIAlertRule
 from app.schemas.alert_rule import AlertRuleCreate, AlertRuleUpdate
 
@@ -57,10 +58,14 @@ def list_alert_rules(
     if rule_type:
         query = query.filter(GroupAIAlertRule.rule_type == rule_type)
     
-    total = query.count()
-    rules = query.order_by(GroupAIAlertRule.created_at.desc()).offset(skip).limit(limit).all()
-    
-    return rules, total
+    page = paginate(
+        query,
+        sort_column=GroupAIAlertRule.created_at,
+        tiebreak_column=GroupAIAlertRule.id,
+        page_size=limit,
+        offset=skip,
+    )
+    return page.items, page.total
 
 
 def get_enabled_alert_rules(db: Session, *, rule_type: Optional[str] = None) -> List[GroupAIAlertRule]:
@@ -6,6 +6,8 @@ from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, desc
 
+from app.core.pagination import CountMode, Page, paginate
+from app.core.search import apply_search
 from app.models.audit_log import AuditLog
 
 
@@ -42,19 +44,18 @@ def create_audit_log(
     return audit_log
 
 
-def get_audit_logs(
+def _filter_audit_logs(
     db: Session,
     *,
-    skip: int = 0,
-    limit: int = 100,
     user_id: Optional[int] = None,
     action: Optional[str] = None,
     resource_type: Optional[str] = None,
     resource_id: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-) -> tuple[List[AuditLog], int]:
-    """查詢審計日誌"""
+    search: Optional[str] = None,
+):
+    """構建審計日誌過濾查詢"""
     query = db.query(AuditLog)
     
     # 構建查詢條件
@@ -81,13 +82,59 @@ def get_audit_logs(
     if conditions:
         query = query.filter(and_(*conditions))
     
-    # 獲取總數
-    total = query.count()
-    
-    # 排序和分頁
-    logs = query.order_by(desc(AuditLog.created_at)).offset(skip).limit(limit).all()
-    
-    return logs, total
+    # 操作描述全文搜索
+    return apply_search(query, AuditLog, search)
+
+
+def get_audit_logs_page(
+    db: Session,
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
+    **filters: Any,
+) -> Page:
+    """分頁查詢審計日誌（支持游標分頁與計數模式）"""
+    query = _filter_audit_logs(db, **filters)
+    return paginate(
+        query,
+        sort_column=AuditLog.created_at,
+        tiebreak_column=AuditLog.id,
+        page_size=limit,
+        offset=skip,
+        cursor=cursor,
+        count_mode=count_mode,
+    )
+
+
+def get_audit_logs(
+    db: Session,
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    resource_type: Optional[str] = None,
+    resource_id: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    search: Optional[str] = None,
+) -> tuple[List[AuditLog], int]:
+    """查詢審計日誌"""
+    page = get_audit_logs_page(
+        db,
+        skip=skip,
+        limit=limit,
+        user_id=user_id,
+        action=action,
+        resource_type=resource_type,
+        resource_id=resource_id,
+        start_date=start_date,
+        end_date=end_date,
+        search=search,
+    )
+    return page.items, page.total
 
 
 def get_audit_log_by_id(db: Session, *, log_id: int) -> Optional[AuditLog]:
@@ -0,0 +1,179 @@
+"""
+批量寫入 CRUD 操作
+
+批量接口的通用寫入層：存在性檢查用一次 IN 查詢完成（按 chunk 切分，避免超過數據庫參數上限），
+插入/更新分別用 bulk_insert_mappings / bulk_update_mappings 寫入，整批在調用方的同一個事務中完成。
+某個 chunk 寫入失敗時回滾到 SAVEPOINT 並逐行重試，只有出錯的行被記錄到 errors，其餘行照常寫入。
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# SQLite 默認最多 999 個綁定參數
+DEFAULT_CHUNK_SIZE = 500
+
+
+@dataclass
+class BulkWriteResult:
+    """批量寫入結果"""
+    inserted: List[Any] = field(default_factory=list)
+    updated: List[Any] = field(default_factory=list)
+    errors: List[Dict[str, Any]] = field(default_factory=list)  # [{"key": ..., "error": ...}]
+
+    @property
+    def success_count(self) -> int:
+        return len(self.inserted) + len(self.updated)
+
+    @property
+    def failed_count(self) -> int:
+        return len(self.errors)
+
+    def add_error(self, key: Any, error: str) -> None:
+        self.errors.append({"key": key, "error": error})
+
+
+def chunked(items: Sequence[Any], size: int = DEFAULT_CHUNK_SIZE) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def fetch_existing(
+    db: Session,
+    model: Any,
+    key_column: str,
+    keys: Iterable[Any],
+    columns: Optional[Sequence[str]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Dict[Any, Any]:
+    """
+    用 IN 查詢一次取出已存在的行
+
+    Args:
+        columns: 只查詢這些列（返回 Row）；None 時返回 ORM 對象
+
+    Returns:
+        {key: 行}
+    """
+    key_attr = getattr(model, key_column)
+    unique_keys = list(dict.fromkeys(k for k in keys if k is not None))
+    existing: Dict[Any, Any] = {}
+    for chunk in chunked(unique_keys, chunk_size):
+        if columns:
+            query = db.query(*(getattr(model, name) for name in columns))
+        else:
+            query = db.query(model)
+        for row in query.filter(key_attr.in_(chunk)):
+            existing[getattr(row, key_column)] = row
+    return existing
+
+
+def _write_chunk(db: Session, model: Any, inserts: List[Dict[str, Any]], updates: List[Dict[str, Any]]) -> None:
+    if inserts:
+        db.bulk_insert_mappings(model, inserts)
+    if updates:
+        db.bulk_update_mappings(model, updates)
+    db.flush()
+
+
+def bulk_write(
+    db: Session,
+    model: Any,
+    inserts: List[Dict[str, Any]],
+    updates: List[Dict[str, Any]],
+    key_func: Callable[[Dict[str, Any]], Any],
+    result: Optional[BulkWriteResult] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> BulkWriteResult:
+    """
+    在當前事務中批量插入/更新（不提交，由調用方 commit）
+
+    Args:
+        inserts: 新行的列映射
+        updates: 已存在行的列映射（必須包含主鍵）
+        key_func: 從映射取出業務鍵，用於結果和錯誤報告
+                  （映射中不屬於表列的鍵會被忽略，可用 "_key" 之類的鍵攜帶業務鍵）
+    """
+    result = result or BulkWriteResult()
+    tagged = [(row, True) for row in inserts] + [(row, False) for row in updates]
+    for chunk in chunked(tagged, chunk_size):
+        chunk_inserts = [row for row, is_insert in chunk if is_insert]
+        chunk_updates = [row for row, is_insert in chunk if not is_insert]
+        try:
+            with db.begin_nested():
+                _write_chunk(db, model, chunk_inserts, chunk_updates)
+        except Exception as e:
+            logger.warning(f"批量寫入 {model.__tablename__} 失敗，逐行重試: {e}")
+            for row, is_insert in chunk:
+                try:
+                    with db.begin_nested():
+                        _write_chunk(db, model, [row] if is_insert else [], [] if is_insert else [row])
+                except Exception as row_error:
+                    result.add_error(key_func(row), str(getattr(row_error, "orig", row_error)))
+                else:
+                    (result.inserted if is_insert else result.updated).append(key_func(row))
+            continue
+        result.inserted.extend(key_func(row) for row in chunk_inserts)
+        result.updated.extend(key_func(row) for row in chunk_updates)
+    return result
+
+
+def bulk_upsert(
+    db: Session,
+    model: Any,
+    key_column: str,
+    rows: Sequence[Dict[str, Any]],
+    update_columns: Optional[Sequence[str]] = None,
+    merge: Optional[Callable[[Any, Dict[str, Any]], Dict[str, Any]]] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> BulkWriteResult:
+    """
+    按業務鍵批量插入或更新（不提交，由調用方 commit）
+
+    Args:
+        key_column: 唯一業務鍵列名（例如 account_id）
+        rows: 每行的列映射，必須包含 key_column
+        update_columns: 已存在時更新的列；None 時更新 rows 中除鍵以外的全部列
+        merge: 自定義更新映射 merge(已存在的 ORM 對象, 新行) -> 要更新的列，優先於 update_columns
+    """
+    result = BulkWriteResult()
+    key_of = lambda row: row.get(key_column)  # noqa: E731
+
+    valid_rows: List[Dict[str, Any]] = []
+    seen = set()
+    for row in rows:
+        key = key_of(row)
+        if key is None or key == "":
+            result.add_error(key, f"缺少 {key_column}")
+        elif key in seen:
+            result.add_error(key, "批次中重複")
+        else:
+            seen.add(key)
+            valid_rows.append(row)
+
+    # 不需要合併舊值時只查主鍵和業務鍵，避免加載整行
+    columns = None if merge is not None else ("id", key_column)
+    existing = fetch_existing(db, model, key_column, seen, columns=columns, chunk_size=chunk_size)
+    inserts: List[Dict[str, Any]] = []
+    updates: List[Dict[str, Any]] = []
+    for row in valid_rows:
+        current = existing.get(key_of(row))
+        if current is None:
+            inserts.append(row)
+            continue
+        if merge is not None:
+            values = merge(current, row)
+        else:
+            columns = update_columns or [name for name in row if name != key_column]
+            values = {name: row[name] for name in columns if name in row}
+        updates.append({**values, "id": current.id, key_column: key_of(row)})
+
+    bulk_write(db, model, inserts, updates, key_of, result=result, chunk_size=chunk_size)
+    if merge is not None:
+        # bulk_update_mappings 不經過 identity map，已加載的對象需要過期以免讀到舊值
+        for obj in existing.values():
+            db.expire(obj)
+    return result
@@ -1,17 +1,23 @@
 """
 通知系統 CRUD 操作
+
+未讀數保存在 notification_unread_counters 表中，隨瀏覽器通知的創建、已讀、刪除在同一事務中增減，
+輪詢未讀數只是一次主鍵查詢；某接收人的計數不存在時按 notifications 表 COUNT 一次初始化。
 """
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, desc
 
+from app.core.pagination import CountMode, Page, paginate
 from app.models.notification import (
     NotificationConfig,
     Notification,
     NotificationType,
     NotificationStatus,
     NotificationTemplate,
+    NotificationUnreadCounter,
 )
 
 
@@ -62,10 +68,14 @@ def list_notification_configs(
     if enabled is not None:
         query = query.filter(NotificationConfig.enabled == enabled)
     
-    total = query.count()
-    configs = query.order_by(desc(NotificationConfig.created_at)).offset(skip).limit(limit).all()
-    
-    return configs, total
+    page = paginate(
+        query,
+        sort_column=NotificationConfig.created_at,
+        tiebreak_column=NotificationConfig.id,
+        page_size=limit,
+        offset=skip,
+    )
+    return page.items, page.total
 
 
 def update_notification_config(
@@ -141,12 +151,15 @@ def create_notification(
         metadata_=metadata,
     )
     db.add(notification)
+    if notification_type == NotificationType.BROWSER:
+        db.flush()
+        _adjust_unread_counter(db, recipient, 1)
     db.commit()
     db.refresh(notification)
     return notification
 
 
-def get_notifications(
+def get_notifications_page(
     db: Session,
     *,
     skip: int = 0,
@@ -155,8 +168,10 @@ def get_notifications(
     read: Optional[bool] = None,
     status: Optional[NotificationStatus] = None,
     notification_type: Optional[NotificationType] = None,
-) -> tuple[List[Notification], int]:
-    """查詢通知"""
+    cursor: Optional[str] = None,
+    count_mode: CountMode = CountMode.EXACT,
+) -> Page:
+    """分頁查詢通知（支持游標分頁與計數模式）"""
     query = db.query(Notification)
     
     if recipient:
@@ -168,49 +183,134 @@ def get_notifications(
     if notification_type:
         query = query.filter(Notification.notification_type == notification_type)
     
-    total = query.count()
-    notifications = query.order_by(desc(Notification.created_at)).offset(skip).limit(limit).all()
-    
-    return notifications, total
+    return paginate(
+        query,
+        sort_column=Notification.created_at,
+        tiebreak_column=Notification.id,
+        page_size=limit,
+        offset=skip,
+        cursor=cursor,
+        count_mode=count_mode,
+    )
+
+
+def get_notifications(
+    db: Session,
+    *,
+    skip: int = 0,
+    limit: int = 100,
+    recipient: Optional[str] = None,
+    read: Optional[bool] = None,
+    status: Optional[NotificationStatus] = None,
+    notification_type: Optional[NotificationType] = None,
+) -> tuple[List[Notification], int]:
+    """查詢通知"""
+    page = get_notifications_page(
+        db,
+        skip=skip,
+        limit=limit,
+        recipient=recipient,
+        read=read,
+        status=status,
+        notification_type=notification_type,
+    )
+    return page.items, page.total
+
+
+def _unread_filter(recipient: str):
+    return and_(
+        Notification.recipient == recipient,
+        Notification.read == False,
+        Notification.notification_type == NotificationType.BROWSER,
+    )
+
+
+def count_unread_notifications(db: Session, *, recipient: str) -> int:
+    """直接統計未讀通知數量（用於初始化和校正計數）"""
+    return db.query(Notification).filter(_unread_filter(recipient)).count()
+
+
+def _set_unread_counter(db: Session, recipient: str, value: int) -> None:
+    updated = db.query(NotificationUnreadCounter).filter(
+        NotificationUnreadCounter.recipient == recipient
+    ).update({"unread_count": value, "updated_at": datetime.utcnow()}, synchronize_session=False)
+    if updated:
+        return
+    try:
+        with db.begin_nested():
+            db.add(NotificationUnreadCounter(recipient=recipient, unread_count=value))
+    except IntegrityError:
+        # 並發請求已創建計數行
+        _set_unread_counter(db, recipient, value)
+
+
+def _adjust_unread_counter(db: Session, recipient: str, delta: int) -> None:
+    """在當前事務中增減未讀計數（調用前需 flush 本次變更）"""
+    if not delta:
+        return
+    updated = db.query(NotificationUnreadCounter).filter(
+        NotificationUnreadCounter.recipient == recipient
+    ).update(
+        {
+            "unread_count": NotificationUnreadCounter.unread_count + delta,
+            "updated_at": datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    if not updated:
+        # 計數尚未初始化：按當前數據（已包含本次變更）初始化
+        _set_unread_counter(db, recipient, count_unread_notifications(db, recipient=recipient))
 
 
 def get_unread_count(db: Session, *, recipient: str) -> int:
-    """獲取未讀通知數量"""
-    return db.query(Notification).filter(
-        and_(
-            Notification.recipient == recipient,
-            Notification.read == False,
-            Notification.notification_type == NotificationType.BROWSER,
-        )
-    ).count()
+    """獲取未讀通知數量（讀取計數表，未初始化時統計一次）"""
+    row = db.query(NotificationUnreadCounter.unread_count).filter(
+        NotificationUnreadCounter.recipient == recipient
+    ).first()
+    if row is not None:
+        return max(row[0], 0)
+    count = count_unread_notifications(db, recipient=recipient)
+    _set_unread_counter(db, recipient, count)
+    db.commit()
+    return count
+
+
+def recalculate_unread_count(db: Session, *, recipient: str) -> int:
+    """按 notifications 表重新校正某接收人的未讀計數"""
+    count = count_unread_notifications(db, recipient=recipient)
+    _set_unread_counter(db, recipient, count)
+    db.commit()
+    return count
 
 
 def mark_notification_read(db: Session, *, notification_id: int, recipient: str) -> bool:
-    """標記通知為已讀"""
-    notification = db.query(Notification).filter(
-        and_(
-            Notification.id == notification_id,
-            Notification.recipient == recipient,
-        )
-    ).first()
-    if not notification:
-        return False
-    notification.read = True
-    notification.read_at = datetime.utcnow()
-    db.add(notification)
+    """標記通知為已讀（條件 UPDATE，並發重複標記只會扣減一次計數）"""
+    now = datetime.utcnow()
+    target = and_(Notification.id == notification_id, Notification.recipient == recipient)
+    changed = db.query(Notification).filter(
+        target, _unread_filter(recipient)
+    ).update({"read": True, "read_at": now}, synchronize_session=False)
+    if changed:
+        _adjust_unread_counter(db, recipient, -changed)
+        db.commit()
+        return True
+
+    # 非瀏覽器通知或已讀通知：不影響計數
+    changed = db.query(Notification).filter(
+        target, Notification.read == False
+    ).update({"read": True, "read_at": now}, synchronize_session=False)
     db.commit()
-    return True
+    if changed:
+        return True
+    return db.query(Notification.id).filter(target).first() is not None
 
 
 def mark_all_read(db: Session, *, recipient: str) -> int:
     """標記所有通知為已讀"""
     count = db.query(Notification).filter(
-        and_(
-            Notification.recipient == recipient,
-            Notification.read == False,
-            Notification.notification_type == NotificationType.BROWSER,
-        )
-    ).update({"read": True, "read_at": datetime.utcnow()})
+        _unread_filter(recipient)
+    ).update({"read": True, "read_at": datetime.utcnow()}, synchronize_session=False)
+    _set_unread_counter(db, recipient, 0)
     db.commit()
     return count
 
@@ -278,9 +378,14 @@ def list_notification_templates(
     query = db.query(NotificationTemplate)
     if enabled is not None:
         query = query.filter(NotificationTemplate.enabled == enabled)
-    total = query.count()
-    templates = query.order_by(desc(NotificationTemplate.updated_at)).offset(skip).limit(limit).all()
-    return templates, total
+    page = paginate(
+        query,
+        sort_column=NotificationTemplate.updated_at,
+        tiebreak_column=NotificationTemplate.id,
+        page_size=limit,
+        offset=skip,
+    )
+    return page.items, page.total
 
 
 def get_notification_template(db: Session, *, template_id: int) -> Optional[NotificationTemplate]:
@@ -385,18 +490,20 @@ def mark_notifications_as_read(
     notification_ids: List[int],
     recipient: str,
 ) -> int:
+    """批量標記已讀：未讀的瀏覽器通知和其他未讀通知各一條 UPDATE，計數按實際變更行數扣減"""
     if not notification_ids:
         return 0
-    count = (
-        db.query(Notification)
-        .filter(
-            Notification.id.in_(notification_ids),
-            Notification.recipient == recipient,
-        )
-        .update({"read": True, "read_at": datetime.utcnow()}, synchronize_session=False)
-    )
+    now = datetime.utcnow()
+    selected = and_(Notification.id.in_(notification_ids), Notification.recipient == recipient)
+    unread_browser = db.query(Notification).filter(
+        selected, _unread_filter(recipient)
+    ).update({"read": True, "read_at": now}, synchronize_session=False)
+    others = db.query(Notification).filter(
+        selected, Notification.read == False
+    ).update({"read": True, "read_at": now}, synchronize_session=False)
+    _adjust_unread_counter(db, recipient, -unread_browser)
     db.commit()
-    return count
+    return unread_browser + others
 
 
 def delete_notifications(
@@ -405,16 +512,14 @@ def delete_notifications(
     notification_ids: List[int],
     recipient: str,
 ) -> int:
+    """批量刪除：先刪未讀的瀏覽器通知（用於扣減計數），再刪其餘的，共兩條 DELETE"""
     if not notification_ids:
         return 0
-    count = (
-        db.query(Notification)
-        .filter(
-            Notification.id.in_(notification_ids),
-            Notification.recipient == recipient,
-        )
-        .delete(synchronize_session=False)
-    )
+    selected = and_(Notification.id.in_(notification_ids), Notification.recipient == recipient)
+    unread_browser = db.query(Notification).filter(
+        selected, _unread_filter(recipient)
+    ).delete(synchronize_session=False)
+    others = db.query(Notification).filter(selected).delete(synchronize_session=False)
+    _adjust_unread_counter(db, recipient, -unread_browser)
     db.commit()
-    return count
-
+    return unread_browser + others
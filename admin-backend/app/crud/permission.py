@@ -91,6 +91,7 @@ def get_role_permissions(db: Session, *, role: Role) -> List[Permission]:
 def get_user_permissions(db: Session, *, user) -> List[Permission]:
     """獲取用戶的所有權限（通過角色）"""
     from app.models.user import User
+    from app.core.auth_cache import Principal
     from app.core.config import get_settings
     
     # 如果禁用認證，返回所有權限（開發模式）
@@ -99,6 +100,10 @@ def get_user_permissions(db: Session, *, user) -> List[Permission]:
         # 返回所有權限，表示擁有所有權限
         return list_permissions(db, skip=0, limit=10000)
     
+    if isinstance(user, Principal):
+        if not user.permissions:
+            return []
+        return db.query(Permission).filter(Permission.code.in_(user.permissions)).all()
     if not isinstance(user, User):
         return []
     
@@ -113,6 +118,7 @@ def get_user_permissions(db: Session, *, user) -> List[Permission]:
 def user_has_permission(db: Session, *, user, permission_code: str) -> bool:
     """檢查用戶是否有指定權限"""
     from app.models.user import User
+    from app.core.auth_cache import Principal
     from app.core.config import get_settings
     
     # 如果禁用認證，允許所有操作（開發模式）
@@ -120,6 +126,9 @@ def user_has_permission(db: Session, *, user, permission_code: str) -> bool:
     if settings.disable_auth:
         return True
     
+    # 認證快速路徑的主體已帶有權限代碼集合，無需再遍歷角色
+    if isinstance(user, Principal):
+        return user.has_permission(permission_code)
     if not isinstance(user, User):
         return False
     
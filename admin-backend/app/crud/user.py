@@ -23,14 +23,16 @@ def create_user(
     db: Session,
     *,
     email: str,
-    password: str,
+    password: Optional[str] = None,
     full_name: Optional[str] = None,
     is_superuser: bool = False,
+    hashed_password: Optional[str] = None,
 ) -> User:
+    """創建用戶；hashed_password 為已在線程池中計算好的哈希（async 路由使用）"""
     user = User(
         email=email,
         full_name=full_name,
-        hashed_password=get_password_hash(password),
+        hashed_password=hashed_password or get_password_hash(password),
         is_superuser=is_superuser,
     )
     db.add(user)
@@ -93,8 +95,14 @@ def update_user(
     return user
 
 
-def update_user_password(db: Session, *, user: User, new_password: str) -> User:
-    user.hashed_password = get_password_hash(new_password)
+def update_user_password(
+    db: Session,
+    *,
+    user: User,
+    new_password: Optional[str] = None,
+    hashed_password: Optional[str] = None,
+) -> User:
+    user.hashed_password = hashed_password or get_password_hash(new_password)
     db.add(user)
     db.commit()
     db.refresh(user)
@@ -1,7 +1,21 @@
+import asyncio
 import logging
+import queue
+import threading
+from concurrent.futures import Future
 from pathlib import Path
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, Tuple, Union
+
 from sqlalchemy import create_engine, event, pool
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+    ASYNC_EXT_AVAILABLE = True
+except ImportError:  # pragma: no cover - greenlet 不可用時
+    AsyncEngine = AsyncSession = None  # type: ignore[assignment,misc]
+    ASYNC_EXT_AVAILABLE = False
 
 from app.core.config import get_settings
 
@@ -22,7 +36,11 @@ if "sqlite" in settings.database_url:
         # 使用絕對路徑
         settings.database_url = f"sqlite:///{db_path}"
         logger.info(f"SQLite 數據庫路徑已轉換為絕對路徑: {db_path}")
-    elif settings.database_url.startswith("sqlite:///") and not Path(settings.database_url.replace("sqlite:///", "")).is_absolute():
+    elif (
+        settings.database_url.startswith("sqlite:///")
+        and ":memory:" not in settings.database_url
+        and not Path(settings.database_url.replace("sqlite:///", "")).is_absolute()
+    ):
         # 相對路徑（沒有 ./ 前綴），也轉換為絕對路徑
         db_file = settings.database_url.replace("sqlite:///", "")
         project_root = Path(__file__).resolve().parent.parent
@@ -31,21 +49,48 @@ if "sqlite" in settings.database_url:
         settings.database_url = f"sqlite:///{db_path}"
         logger.info(f"SQLite 數據庫路徑已轉換為絕對路徑: {db_path}")
 
-# 連接池配置
-# SQLite 不支持 pool_size, max_overflow, pool_timeout 等參數
-is_sqlite = "sqlite" in settings.database_url
 
-if is_sqlite:
-    # SQLite 配置（使用 NullPool，因為 SQLite 不支持多線程連接池）
-    pool_config = {
-        "poolclass": pool.NullPool,
-        "pool_pre_ping": True,
+def _is_memory_sqlite(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///") or ":memory:" in url or "mode=memory" in url
+
+
+def _sqlite_pool_config(role: str, url: str) -> Dict[str, Any]:
+    """
+    SQLite 連接池配置
+
+    - main: 常駐 sqlite_pool_size 個連接，溢出連接歸還時關閉（不設上限，避免未關閉的會話阻塞請求）
+    - read: 只讀連接池（PRAGMA query_only），與寫連接分離
+    - write: 單一寫連接，僅供寫入隊列使用，事務以 BEGIN IMMEDIATE 開始
+    內存數據庫只能共享同一連接，統一使用 StaticPool。
+    """
+    config: Dict[str, Any] = {
         "echo": False,
-        "future": True
+        "future": True,
+        "connect_args": {
+            "check_same_thread": False,
+            # sqlite3 的 timeout 即 busy handler 等待時間（秒）
+            "timeout": settings.sqlite_busy_timeout_ms / 1000,
+        },
     }
-else:
-    # PostgreSQL/MySQL 等配置
-    pool_config = {
+    if _is_memory_sqlite(url):
+        config["poolclass"] = pool.StaticPool
+        return config
+
+    config["poolclass"] = pool.QueuePool
+    config["pool_pre_ping"] = True
+    if role == "write":
+        config["pool_size"] = 1
+        config["max_overflow"] = 0
+        config["pool_timeout"] = settings.database_pool_timeout
+    else:
+        config["pool_size"] = settings.sqlite_pool_size
+        config["max_overflow"] = -1
+    return config
+
+
+def _server_pool_config() -> Dict[str, Any]:
+    """PostgreSQL/MySQL 等連接池配置"""
+    return {
         "pool_size": settings.database_pool_size,
         "max_overflow": settings.database_max_overflow,
         "pool_pre_ping": True,  # 連接前檢查
@@ -55,43 +100,154 @@ else:
         "future": True
     }
 
-try:
-    engine = create_engine(settings.database_url, **pool_config)
-except (ModuleNotFoundError, TypeError) as exc:
-    logger.warning("無法加載數據庫驅動或配置錯誤 %s，回退到內置 SQLite。", exc)
-    # 使用絕對路徑
-    project_root = Path(__file__).resolve().parent.parent
-    db_path = (project_root / "admin.db").resolve()
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    settings.database_url = f"sqlite:///{db_path}"
-    logger.info(f"回退到 SQLite，使用絕對路徑: {db_path}")
-    # SQLite 使用 NullPool
-    pool_config = {
-        "poolclass": pool.NullPool,
-        "pool_pre_ping": True,
-        "echo": False,
-        "future": True
-    }
-    engine = create_engine(settings.database_url, **pool_config)
 
-# SQLite 優化
-@event.listens_for(engine, "connect")
-def set_sqlite_pragma(dbapi_conn, connection_record):
-    """SQLite 特定優化"""
-    if "sqlite" in settings.database_url:
+def _apply_sqlite_pragmas(engine: Engine, role: str) -> None:
+    """在連接建立時執行一次 PRAGMA（連接被池復用，後續會話不再重複執行）"""
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_conn, connection_record):
+        """SQLite 特定優化"""
         cursor = dbapi_conn.cursor()
         try:
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
             cursor.execute("PRAGMA journal_mode=WAL")  # Write-Ahead Logging
             cursor.execute("PRAGMA synchronous=NORMAL")
-            cursor.execute("PRAGMA cache_size=-64000")  # 64MB 緩存
+            cursor.execute(f"PRAGMA cache_size=-{int(settings.sqlite_cache_size_kb)}")
             cursor.execute("PRAGMA foreign_keys=ON")
             cursor.execute("PRAGMA temp_store=MEMORY")
+            if settings.sqlite_mmap_size > 0:
+                cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+            if role == "read":
+                cursor.execute("PRAGMA query_only=ON")
         except Exception as e:
             logger.warning(f"SQLite 優化失敗: {e}")
         finally:
             cursor.close()
+        if role == "write":
+            # 由 SQLAlchemy 自行發出 BEGIN，使 SAVEPOINT 可用
+            dbapi_conn.isolation_level = None
+
+    if role == "write":
+        @event.listens_for(engine, "begin")
+        def begin_immediate(conn):
+            # 事務開始即獲取寫鎖，等待受 busy_timeout 控制，避免讀事務升級為寫事務時失敗
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+# ============ 連接池指標 ============
+
+_pool_stats: Dict[str, Dict[str, Any]] = {}
+_pool_engines: Dict[str, Engine] = {}
+_pool_stats_lock = threading.Lock()
+
+
+def _attach_pool_metrics(engine: Engine, name: str) -> None:
+    """註冊連接池事件，統計連接建立、簽出、歸還和失效次數"""
+    stats = {
+        "connects": 0,
+        "checkouts": 0,
+        "checkins": 0,
+        "invalidations": 0,
+        "checked_out_peak": 0,
+    }
+    _pool_stats[name] = stats
+    _pool_engines[name] = engine
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, connection_record):
+        with _pool_stats_lock:
+            stats["connects"] += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, connection_record, connection_proxy):
+        with _pool_stats_lock:
+            stats["checkouts"] += 1
+            checked_out = stats["checkouts"] - stats["checkins"]
+            if checked_out > stats["checked_out_peak"]:
+                stats["checked_out_peak"] = checked_out
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, connection_record):
+        with _pool_stats_lock:
+            stats["checkins"] += 1
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, connection_record, exception):
+        with _pool_stats_lock:
+            stats["invalidations"] += 1
+
+
+def get_pool_metrics() -> Dict[str, Dict[str, Any]]:
+    """
+    獲取各引擎的連接池使用情況
+
+    Returns:
+        {引擎名: {pool_class, size, checked_in, checked_out, overflow, utilization, 累計計數...}}
+    """
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for name, eng in _pool_engines.items():
+        current = eng.pool
+        with _pool_stats_lock:
+            item: Dict[str, Any] = dict(_pool_stats.get(name, {}))
+        item["pool_class"] = type(current).__name__
+        if isinstance(current, pool.QueuePool):
+            size = current.size()
+            checked_out = current.checkedout()
+            item.update({
+                "size": size,
+                "checked_in": current.checkedin(),
+                "checked_out": checked_out,
+                "overflow": current.overflow(),
+            })
+            max_overflow = getattr(current, "_max_overflow", 0)
+            if max_overflow >= 0:
+                capacity = size + max_overflow
+                item["capacity"] = capacity
+                item["utilization"] = round(checked_out / capacity, 4) if capacity else 0.0
+        metrics[name] = item
+    return metrics
+
+
+# ============ 引擎 ============
+
+def _build_engine(url: str, role: str = "main") -> Engine:
+    if "sqlite" in url:
+        new_engine = create_engine(url, **_sqlite_pool_config(role, url))
+        _apply_sqlite_pragmas(new_engine, role)
+    else:
+        new_engine = create_engine(url, **_server_pool_config())
+    _attach_pool_metrics(new_engine, role)
+    return new_engine
+
+
+try:
+    engine = _build_engine(settings.database_url)
+except (ModuleNotFoundError, TypeError) as exc:
+    logger.warning("無法加載數據庫驅動或配置錯誤 %s，回退到內置 SQLite。", exc)
+    # 使用絕對路徑
+    project_root = Path(__file__).resolve().parent.parent
+    db_path = (project_root / "admin.db").resolve()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    settings.database_url = f"sqlite:///{db_path}"
+    logger.info(f"回退到 SQLite，使用絕對路徑: {db_path}")
+    engine = _build_engine(settings.database_url)
+
+# 連接池配置
+is_sqlite = "sqlite" in settings.database_url
+
+if is_sqlite and not _is_memory_sqlite(settings.database_url):
+    # 讀寫分離：只讀連接池 + 單寫連接（寫入隊列專用）
+    read_engine = _build_engine(settings.database_url, role="read")
+    write_engine = _build_engine(settings.database_url, role="write")
+else:
+    # 服務端數據庫自帶併發控制；內存 SQLite 只能共享同一連接
+    read_engine = engine
+    write_engine = engine
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+ReadSessionLocal = sessionmaker(bind=read_engine, autocommit=False, autoflush=False)
+# 寫入隊列提交後直接返回對象，不做過期處理
+WriteSessionLocal = sessionmaker(bind=write_engine, autocommit=False, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
@@ -103,3 +259,268 @@ def get_db():
     finally:
         db.close()
 
+
+def get_read_db():
+    """獲取只讀數據庫會話（SQLite 下使用 query_only 連接池）"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# ============ 寫入隊列 ============
+
+WriteOperation = Callable[[Session], Any]
+
+
+class WriteQueue:
+    """
+    單線程寫入隊列
+
+    後台服務把寫操作提交到隊列，由專用線程串行執行，並把同一時間窗口內的操作合併為一次提交。
+    每個操作在獨立的 SAVEPOINT 中執行，單個操作失敗只回滾自身，不影響同批的其他操作。
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.session_factory = session_factory or WriteSessionLocal
+        self.batch_size = batch_size or settings.db_write_queue_batch_size
+        self.flush_interval = (
+            flush_interval if flush_interval is not None
+            else settings.db_write_queue_flush_ms / 1000
+        )
+        self._queue: "queue.Queue[Optional[Tuple[Future, WriteOperation]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats = {"operations": 0, "failed": 0, "batches": 0, "commits_failed": 0}
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="db-write-queue", daemon=True)
+            self._thread.start()
+
+    def submit(self, operation: WriteOperation) -> Future:
+        """提交寫操作，返回 Future（結果為操作的返回值）"""
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((future, operation))
+        return future
+
+    def execute(self, operation: WriteOperation, timeout: Optional[float] = None) -> Any:
+        """提交寫操作並阻塞等待結果"""
+        return self.submit(operation).result(timeout=timeout)
+
+    async def execute_async(self, operation: WriteOperation) -> Any:
+        """提交寫操作並異步等待結果（不阻塞事件循環）"""
+        return await asyncio.wrap_future(self.submit(operation))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """處理完已提交的操作後停止寫入線程"""
+        thread = self._thread
+        if thread and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "pending": self._queue.qsize()}
+
+    def _collect_batch(self, first: Tuple[Future, WriteOperation]) -> Tuple[List[Tuple[Future, WriteOperation]], bool]:
+        batch = [first]
+        stopping = False
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get(timeout=self.flush_interval) if self.flush_interval else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stopping = True
+                break
+            batch.append(item)
+        return batch, stopping
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, stopping = self._collect_batch(item)
+            try:
+                self._process_batch(batch)
+            except Exception as e:  # 防止寫入線程意外退出
+                logger.error(f"寫入隊列處理批次失敗: {e}", exc_info=True)
+            if stopping:
+                return
+
+    def _process_batch(self, batch: List[Tuple[Future, WriteOperation]]) -> None:
+        outcomes: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        session = self.session_factory()
+        try:
+            for future, operation in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with session.begin_nested():
+                        result = operation(session)
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+            try:
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                self._stats["commits_failed"] += 1
+                logger.error(f"寫入隊列批量提交失敗: {e}", exc_info=True)
+                outcomes = [(future, None, error or e) for future, _, error in outcomes]
+        finally:
+            session.close()
+
+        self._stats["batches"] += 1
+        for future, result, error in outcomes:
+            self._stats["operations"] += 1
+            if error is not None:
+                self._stats["failed"] += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_write_queue: Optional[WriteQueue] = None
+
+
+def get_write_queue() -> WriteQueue:
+    """獲取全局寫入隊列"""
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = WriteQueue()
+    return _write_queue
+
+
+# ============ 異步會話 ============
+
+# 具備原生異步驅動的數據庫；SQLite 的異步驅動本質上也是「每連接一個線程」，
+# 直接把池化的同步會話放到線程池執行即可，不必再維護第二套連接池
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+_async_engine: Optional["AsyncEngine"] = None
+_async_session_factory = None
+_async_engine_checked = False
+
+
+def to_async_url(url: str) -> Optional[str]:
+    """把同步數據庫 URL 轉換為異步驅動 URL，不支持時返回 None"""
+    scheme, sep, rest = url.partition("://")
+    if not sep:
+        return None
+    driver = _ASYNC_DRIVERS.get(scheme.split("+")[0])
+    return f"{driver}://{rest}" if driver else None
+
+
+def get_async_engine() -> Optional["AsyncEngine"]:
+    """獲取異步引擎（首次調用時創建；驅動不可用時返回 None）"""
+    global _async_engine, _async_session_factory, _async_engine_checked
+    if _async_engine_checked:
+        return _async_engine
+    _async_engine_checked = True
+
+    async_url = to_async_url(settings.database_url)
+    if not ASYNC_EXT_AVAILABLE or not async_url:
+        return None
+    try:
+        _async_engine = create_async_engine(async_url, **_server_pool_config())
+    except (ModuleNotFoundError, ImportError) as exc:
+        logger.warning("異步數據庫驅動不可用 %s，異步會話將回退到線程池執行同步會話。", exc)
+        return None
+    _attach_pool_metrics(_async_engine.sync_engine, "async")
+    _async_session_factory = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+class SyncSessionAdapter:
+    """
+    異步會話兼容層
+
+    在線程池中執行同步會話，提供 AsyncSession 常用接口（execute/scalar/scalars/get/run_sync/commit），
+    使路由在 SQLite 或未安裝異步驅動時同樣不阻塞事件循環。
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    async def run_sync(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """以同步會話為第一個參數執行 fn（與 AsyncSession.run_sync 一致）"""
+        return await asyncio.to_thread(fn, self.sync_session, *args, **kwargs)
+
+    async def execute(self, statement, *args, **kwargs):
+        # 在工作線程中取完結果，返回已緩衝的 Result（與 AsyncSession.execute 一致）
+        frozen = await self.run_sync(lambda s: s.execute(statement, *args, **kwargs).freeze())
+        return frozen()
+
+    async def scalar(self, statement, *args, **kwargs) -> Any:
+        return await self.run_sync(lambda s: s.scalar(statement, *args, **kwargs))
+
+    async def scalars(self, statement, *args, **kwargs):
+        result = await self.execute(statement, *args, **kwargs)
+        return result.scalars()
+
+    async def get(self, entity, ident, **kwargs) -> Any:
+        return await self.run_sync(lambda s: s.get(entity, ident, **kwargs))
+
+    def add(self, instance) -> None:
+        self.sync_session.add(instance)
+
+    async def commit(self) -> None:
+        await self.run_sync(lambda s: s.commit())
+
+    async def rollback(self) -> None:
+        await self.run_sync(lambda s: s.rollback())
+
+    async def close(self) -> None:
+        await self.run_sync(lambda s: s.close())
+
+
+AsyncDBSession = Union["AsyncSession", SyncSessionAdapter]
+
+
+def AsyncSessionLocal() -> AsyncDBSession:
+    """創建異步會話：優先使用原生異步驅動，否則返回同步會話的線程池兼容層"""
+    if get_async_engine() is not None:
+        return _async_session_factory()
+    return SyncSessionAdapter(SessionLocal())
+
+
+async def get_async_db() -> AsyncGenerator[AsyncDBSession, None]:
+    """獲取異步數據庫會話（與 get_db 並行的依賴，供 async def 路由使用）"""
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
+
+
+def AsyncReadSessionLocal() -> AsyncDBSession:
+    """創建只讀異步會話：SQLite 下使用 query_only 連接池，原生異步驅動下與 AsyncSessionLocal 相同"""
+    if get_async_engine() is not None:
+        return _async_session_factory()
+    return SyncSessionAdapter(ReadSessionLocal())
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncDBSession, None]:
+    """獲取只讀異步數據庫會話（列表、儀表板、統計等純讀路由使用，不與寫連接爭用）"""
+    db = AsyncReadSessionLocal()
+    try:
+        yield db
+    finally:
+        await db.close()
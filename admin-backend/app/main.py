@@ -1,7 +1,9 @@
-from fastapi import FastAPI, Request, Query
+from fastapi import Depends, FastAPI, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
+from typing import List
 
 from app.api import router as api_router
 from app.core.auto_backup import get_backup_manager
@@ -11,12 +13,13 @@ from app.core.security import get_password_hash
 from app.db import Base, engine, SessionLocal
 from app.crud.user import assign_role_to_user, create_role, create_user, get_user_by_email
 from app.core.errors import UserFriendlyError, create_error_response
+from app.core.startup import DeferredStartupMiddleware, StartupPhase, StartupRunner
 from app.middleware.performance import PerformanceMonitoringMiddleware
 from fastapi.exceptions import RequestValidationError, ResponseValidationError
 
 # 導入限流（可選，如果未安裝則跳過）
 try:
-    from app.core.limiter import limiter, RateLimitExceeded
+    from app.core.limiter import enforce_rate_limit, limiter, RateLimitExceeded
     from slowapi.errors import _rate_limit_exceeded_handler
     RATE_LIMITING_ENABLED = True
 except ImportError:
@@ -122,6 +125,10 @@ app.add_middleware(
     slow_request_threshold_ms=1000.0  # 超過 1000ms 的請求視為慢請求
 )
 
+# fast-start 模式：首個請求完成後再啟動推遲的後台服務
+if settings.fast_start:
+    app.add_middleware(DeferredStartupMiddleware)
+
 # 添加请求日志中间件，记录所有 PUT 请求到 /accounts
 @app.middleware("http")
 async def log_accounts_requests(request: Request, call_next):
@@ -155,7 +162,12 @@ async def log_accounts_requests(request: Request, call_next):
     
     return response
 
-app.include_router(api_router, prefix="/api/v1")
+# 按主體（用戶 / API 密鑰 / IP）的 GCRA 限流，各路由按 RATE_LIMITS 類別扣除成本
+api_router.include_into(
+    app,
+    prefix="/api/v1",
+    dependencies=[Depends(enforce_rate_limit)] if RATE_LIMITING_ENABLED else None,
+)
 
 
 # 添加 ResponseValidationError 异常处理器
@@ -196,11 +208,11 @@ async def response_validation_exception_handler(request: Request, exc: ResponseV
     )
 
 
-@app.on_event("startup")
-async def on_startup() -> None:
-    # 驗證數據庫連接和數據持久化
+# ============ 啟動階段 ============
+
+def _verify_database() -> None:
+    """驗證數據庫連接和數據持久化"""
     try:
-        from app.db import SessionLocal
         from app.models.group_ai import GroupAIScript, GroupAIAutomationTask
         db = SessionLocal()
         try:
@@ -211,100 +223,10 @@ async def on_startup() -> None:
             db.close()
     except Exception as e:
         logger.error(f"數據庫驗證失敗: {e}", exc_info=True)
-    
-    # 啟動任務調度器（會自動從數據庫加載啟用的定時任務）
-    try:
-        from app.services.task_scheduler import get_task_scheduler
-        scheduler = get_task_scheduler()
-        scheduler.start()
-        logger.info("任務調度器已啟動，已從數據庫加載所有啟用的定時任務")
-    except Exception as e:
-        logger.error(f"啟動任務調度器失敗: {e}", exc_info=True)
-    
-    # 啟動自動備份服務
-    try:
-        backup_manager = get_backup_manager()
-        if backup_manager.auto_backup_enabled:
-            settings = get_settings()
-            await backup_manager.start_auto_backup(
-                database_url=getattr(settings, "database_url", None),
-                sessions_dir="sessions",
-                config_files=[".env", "admin-backend/.env"]
-            )
-            logger.info("自動備份服務已啟動")
-    except Exception as e:
-        logger.warning(f"啟動自動備份失敗: {e}")
-    
-    # 啟動性能監控服務
-    try:
-        monitor = get_performance_monitor()
-        await monitor.start_monitoring()
-        logger.info("性能監控服務已啟動")
-    except Exception as e:
-        logger.warning(f"啟動性能監控失敗: {e}")
-    
-    # 啟動 WebSocket Manager（Agent 通信）
-    try:
-        from app.websocket import get_websocket_manager
-        ws_manager = get_websocket_manager()
-        await ws_manager.start()
-        logger.info("WebSocket Manager 已啟動（Agent 通信）")
-    except Exception as e:
-        logger.error(f"啟動 WebSocket Manager 失敗: {e}", exc_info=True)
-    
-    # 初始化日誌聚合器並註冊日誌來源
-    try:
-        from app.services.log_aggregator import get_log_aggregator
-        aggregator = get_log_aggregator()
-        aggregator.register_source("local", {"name": "本地服務", "type": "application"})
-        aggregator.register_source("remote", {"name": "遠程服務器", "type": "system"})
-        logger.info("日誌聚合服務已初始化")
-    except Exception as e:
-        logger.warning(f"初始化日誌聚合服務失敗: {e}", exc_info=True)
-    
-    # 啟動故障恢復服務
-    try:
-        from app.core.intelligent_allocator import IntelligentAllocator
-        from app.core.fault_recovery import FaultRecoveryService
-        from app.db import SessionLocal
-        
-        allocator = IntelligentAllocator()
-        fault_recovery = FaultRecoveryService(allocator)
-        
-        # 從配置文件讀取故障恢復設置
-        import json
-        from pathlib import Path
-        project_root = Path(__file__).parent.parent.parent
-        config_path = project_root / "data" / "master_config.json"
-        if config_path.exists():
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                fault_recovery_config = config.get("allocation", {}).get("fault_recovery", {})
-                fault_recovery.recovery_enabled = fault_recovery_config.get("enabled", True)
-                fault_recovery.check_interval = fault_recovery_config.get("check_interval", 300)
-                fault_recovery.failure_threshold = fault_recovery_config.get("failure_threshold", 3)
-        
-        if fault_recovery.recovery_enabled:
-            await fault_recovery.start()
-            logger.info("故障恢復服務已啟動")
-        else:
-            logger.info("故障恢復服務已禁用")
-    except Exception as e:
-        logger.warning(f"啟動故障恢復服務失敗: {e}")
-    
-    # 啟動智能優化服務
-    try:
-        from app.services.smart_optimizer import get_smart_optimizer
-        optimizer = get_smart_optimizer()
-        if optimizer.auto_optimize_enabled:
-            settings = get_settings()
-            interval = getattr(settings, "auto_optimize_interval_hours", 6)
-            await optimizer.start_auto_optimization(interval_hours=interval)
-            logger.info("智能優化服務已啟動")
-    except Exception as e:
-        logger.warning(f"啟動智能優化失敗: {e}")
-    
-    # 啟動時驗證環境變量（fail-fast）
+
+
+def _validate_settings() -> None:
+    """啟動時驗證環境變量（fail-fast）"""
     settings = get_settings()
     try:
         # 驗證必填環境變量
@@ -320,29 +242,22 @@ async def on_startup() -> None:
     except Exception as e:
         logger.error(f"環境變量驗證失敗: {e}")
         # 注意：這裡不 raise，允許應用啟動（某些配置可能可選）
+
+
+def _create_tables() -> None:
+    """確保所有表已創建（開發環境後備方案）"""
     # 確保導入所有模型，包括 Group AI 模型（用於 Alembic 自動生成）
-    from app.models import group_ai  # 確保導入模型
-    from app.models.group_ai import (  # 明確導入所有模型類
-        GroupAIScript,
-        GroupAIAccount,
-        GroupAIScriptVersion,
-        GroupAIDialogueHistory,
-        GroupAIRedpacketLog,
-        GroupAIAutomationTask,
-        GroupAIAutomationTaskLog,
-        AllocationHistory,
-        AIProviderConfig,
-        AIProviderSettings  # 新增的分配历史模型
-    )
-    
-    # 確保所有表已創建（開發環境後備方案）
+    from app.models import group_ai  # noqa: F401  確保導入模型
+
     try:
         Base.metadata.create_all(bind=engine)
         logger.info("數據庫表已確保創建（後備方案）")
     except Exception as create_error:
         logger.warning(f"創建數據庫表失敗（可能已存在）: {create_error}")
-    
-    # 檢查 Alembic 版本（不自動運行遷移，僅檢查和警告）
+
+
+def _check_migrations() -> None:
+    """檢查 Alembic 版本（不自動運行遷移，僅檢查和警告）"""
     try:
         from alembic.config import Config
         from alembic import script
@@ -370,6 +285,10 @@ async def on_startup() -> None:
             logger.info("使用 create_all() 創建數據庫表（後備方案）")
         except Exception as create_error:
             logger.error(f"創建數據庫表失敗: {create_error}", exc_info=True)
+
+
+def _seed_admin() -> None:
+    """創建默認管理員賬號和角色"""
     settings = get_settings()
     with SessionLocal() as db:
         admin = get_user_by_email(db, email=settings.admin_default_email)
@@ -383,59 +302,207 @@ async def on_startup() -> None:
             )
         admin_role = create_role(db, name="admin", description="系统管理员")
         assign_role_to_user(db, user=admin, role=admin_role)
+
+
+def _start_task_scheduler() -> None:
+    """啟動任務調度器（會自動從數據庫加載啟用的定時任務）"""
+    from app.services.task_scheduler import get_task_scheduler
+    scheduler = get_task_scheduler()
+    scheduler.start()
+    logger.info("任務調度器已啟動，已從數據庫加載所有啟用的定時任務")
+
+
+async def _start_auto_backup() -> None:
+    """啟動自動備份服務"""
+    backup_manager = get_backup_manager()
+    if backup_manager.auto_backup_enabled:
+        settings = get_settings()
+        await backup_manager.start_auto_backup(
+            database_url=getattr(settings, "database_url", None),
+            sessions_dir="sessions",
+            config_files=[".env", "admin-backend/.env"]
+        )
+        logger.info("自動備份服務已啟動")
+
+
+async def _start_metric_ingestion() -> None:
+    """啟動指標寫入管道（內存預聚合，按間隔批量寫入）"""
+    from app.services.metric_ingestion import get_metric_ingestor
+    get_metric_ingestor().start()
+
+
+def _init_search_indexes() -> None:
+    """預先創建列表搜索索引（FTS5 / pg_trgm），避免首次搜索時建索引"""
+    from app.core.search import init_search_indexes
+    backends = init_search_indexes(engine)
+    logger.info(f"列表搜索索引已就緒: {backends}")
+
+
+async def _start_config_watcher() -> None:
+    """啟動配置文件監視（之後讀取配置不再 stat 文件）"""
+    from app.core.config_registry import get_config_registry
+    get_config_registry().start_watching()
+
+
+async def _start_performance_monitor() -> None:
+    """啟動性能監控服務"""
+    monitor = get_performance_monitor()
+    await monitor.start_monitoring()
+    logger.info("性能監控服務已啟動")
+
+
+async def _start_websocket_manager() -> None:
+    """啟動 WebSocket Manager（Agent 通信）"""
+    from app.websocket import get_websocket_manager
+    ws_manager = get_websocket_manager()
+    await ws_manager.start()
+    logger.info("WebSocket Manager 已啟動（Agent 通信）")
+
+
+def _init_log_aggregator() -> None:
+    """初始化日誌聚合器並註冊日誌來源"""
+    from app.services.log_aggregator import get_log_aggregator
+    aggregator = get_log_aggregator()
+    aggregator.register_source("local", {"name": "本地服務", "type": "application"})
+    aggregator.register_source("remote", {"name": "遠程服務器", "type": "system"})
+    logger.info("日誌聚合服務已初始化")
+
+
+async def _start_fault_recovery() -> None:
+    """啟動故障恢復服務"""
+    from app.core.intelligent_allocator import IntelligentAllocator
+    from app.core.fault_recovery import FaultRecoveryService
     
-    # 显式导入groups模块，确保路由注册
+    allocator = IntelligentAllocator()
+    fault_recovery = FaultRecoveryService(allocator)
+    
+    # 從配置文件讀取故障恢復設置
+    import json
+    project_root = Path(__file__).parent.parent.parent
+    config_path = project_root / "data" / "master_config.json"
+    if config_path.exists():
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+            fault_recovery_config = config.get("allocation", {}).get("fault_recovery", {})
+            fault_recovery.recovery_enabled = fault_recovery_config.get("enabled", True)
+            fault_recovery.check_interval = fault_recovery_config.get("check_interval", 300)
+            fault_recovery.failure_threshold = fault_recovery_config.get("failure_threshold", 3)
+    
+    if fault_recovery.recovery_enabled:
+        await fault_recovery.start()
+        logger.info("故障恢復服務已啟動")
+    else:
+        logger.info("故障恢復服務已禁用")
+
+
+async def _start_smart_optimizer() -> None:
+    """啟動智能優化服務"""
+    from app.services.smart_optimizer import get_smart_optimizer
+    optimizer = get_smart_optimizer()
+    if optimizer.auto_optimize_enabled:
+        settings = get_settings()
+        interval = getattr(settings, "auto_optimize_interval_hours", 6)
+        await optimizer.start_auto_optimization(interval_hours=interval)
+        logger.info("智能優化服務已啟動")
+
+
+def _build_openapi_schema() -> None:
+    """檢查 Groups 路由註冊情況並預先生成 OpenAPI schema"""
     try:
-        from app.api.group_ai import groups
-        logger.info(f"Groups模块已显式导入，路由数: {len(groups.router.routes)}")
-        
-        # 检查groups路由是否已注册到主应用
-        groups_routes = [r for r in app.routes if hasattr(r, 'path') and 'groups' in str(r.path)]
+        groups_routes = [r for r in app.routes if hasattr(r, 'path') and '/group-ai/groups' in str(r.path)]
         logger.info(f"主应用中的Groups路由数: {len(groups_routes)}")
-        
         if not groups_routes:
-            logger.warning("Groups路由未注册到主应用，尝试重新注册...")
-            # 如果路由未注册，尝试重新包含
-            from app.api import group_ai
-            if hasattr(group_ai, 'router'):
-                # 路由应该已经通过api_router包含，这里只是验证
-                logger.info("Group-AI router已包含在API router中")
+            logger.warning("Groups路由未注册到主应用，请检查 app.api.group_ai.groups 模块导入日志")
     except Exception as e:
-        logger.error(f"显式导入Groups模块失败: {e}", exc_info=True)
+        logger.error(f"检查Groups路由失败: {e}", exc_info=True)
     
     # 强制重新生成OpenAPI schema，确保包含所有路由
-    try:
-        app.openapi_schema = None  # 清除缓存
-        _ = app.openapi()  # 触发重新生成
-        logger.info("OpenAPI schema已重新生成")
-    except Exception as e:
-        logger.warning(f"重新生成OpenAPI schema失败: {e}", exc_info=True)
-    
-    # 啟動定時告警檢查服務（如果啟用）
+    app.openapi_schema = None  # 清除缓存
+    _ = app.openapi()  # 触发重新生成
+    logger.info("OpenAPI schema已重新生成")
+
+
+def _start_alert_checker() -> None:
+    """啟動定時告警檢查服務"""
+    from app.services.scheduled_alert_checker import get_scheduled_checker
+    checker = get_scheduled_checker()
+    checker.start()
+    logger.info(f"定時告警檢查服務已啟動，檢查間隔: {checker.interval_seconds} 秒")
+
+
+def _start_cache_warmup() -> None:
+    """啟動緩存預熱與提前刷新控制器（在后台任务中执行，不阻塞启动）"""
+    from app.core.cache_optimization import get_cache_optimizer
+    optimizer = get_cache_optimizer()
+
+    async def warmup_then_refresh() -> None:
+        await optimizer.warmup_cache()
+        optimizer.start()
+
+    asyncio.create_task(warmup_then_refresh())
+    logger.info("緩存預熱服務已啟動（後台執行）")
+
+
+def _init_dashboard_counters() -> None:
+    """計數表缺少 total 行（首次部署或手動清空）時在可寫引擎上全量重建，儀表板讀取走只讀連接池不會重建"""
+    from app.services.dashboard_counters import ensure_dashboard_counters
+    if ensure_dashboard_counters():
+        logger.info("儀表板計數已初始化")
+
+
+def build_startup_phases() -> List[StartupPhase]:
+    """
+    啟動階段列表
+
+    關鍵階段完成後應用才開始接收請求；stage 0 建表，stage 1 的檢查與管理員初始化並行執行。
+    非關鍵的後台服務互不依賴，全部並行啟動。
+    """
+    settings = get_settings()
+    phases = [
+        StartupPhase("validate_settings", _validate_settings, stage=0),
+        StartupPhase("create_tables", _create_tables, stage=0, blocking=True),
+        StartupPhase("verify_database", _verify_database, stage=1, blocking=True),
+        StartupPhase("check_migrations", _check_migrations, stage=1, blocking=True),
+        StartupPhase("seed_admin", _seed_admin, stage=1, blocking=True),
+        StartupPhase("task_scheduler", _start_task_scheduler, critical=False),
+        StartupPhase("auto_backup", _start_auto_backup, critical=False),
+        StartupPhase("config_watcher", _start_config_watcher, critical=False),
+        StartupPhase("metric_ingestion", _start_metric_ingestion, critical=False),
+        StartupPhase("search_indexes", _init_search_indexes, critical=False, blocking=True),
+        StartupPhase("dashboard_counters", _init_dashboard_counters, critical=False, blocking=True),
+        StartupPhase("performance_monitor", _start_performance_monitor, critical=False),
+        StartupPhase("websocket_manager", _start_websocket_manager, critical=False),
+        StartupPhase("log_aggregator", _init_log_aggregator, critical=False),
+        StartupPhase("fault_recovery", _start_fault_recovery, critical=False),
+        StartupPhase("smart_optimizer", _start_smart_optimizer, critical=False),
+        StartupPhase("openapi_schema", _build_openapi_schema, critical=False, blocking=True),
+    ]
     if settings.alert_check_enabled:
-        try:
-            from app.services.scheduled_alert_checker import get_scheduled_checker
-            checker = get_scheduled_checker()
-            checker.start()
-            logger.info(f"定時告警檢查服務已啟動，檢查間隔: {checker.interval_seconds} 秒")
-        except Exception as e:
-            logger.warning(f"啟動定時告警檢查服務失敗: {e}", exc_info=True)
-    
-    # 啟動緩存預熱服務
-    try:
-        from app.core.cache_optimization import CacheOptimizer
-        optimizer = CacheOptimizer()
-        # 在后台任务中执行缓存预热（不阻塞启动）
-        import asyncio
-        asyncio.create_task(optimizer.warmup_cache())
-        logger.info("緩存預熱服務已啟動（後台執行）")
-    except Exception as e:
-        logger.warning(f"啟動緩存預熱服務失敗: {e}", exc_info=True)
+        phases.append(StartupPhase("alert_checker", _start_alert_checker, critical=False))
+    phases.append(StartupPhase("cache_warmup", _start_cache_warmup, critical=False))
+    return phases
+
+
+@app.on_event("startup")
+async def on_startup() -> None:
+    settings = get_settings()
+    runner = StartupRunner(
+        build_startup_phases(),
+        fast_start=settings.fast_start,
+        max_defer_seconds=settings.fast_start_max_defer_seconds,
+    )
+    app.state.startup_runner = runner
+    await runner.run()
 
 
 @app.on_event("shutdown")
 async def on_shutdown() -> None:
     """應用關閉時停止定時任務"""
+    # 取消尚未啟動的推遲服務
+    runner = getattr(app.state, "startup_runner", None)
+    if runner is not None:
+        await runner.cancel()
+
     # 停止性能監控
     try:
         monitor = get_performance_monitor()
@@ -452,6 +519,20 @@ async def on_shutdown() -> None:
     except Exception as e:
         logger.warning(f"停止自動備份失敗: {e}")
     
+    # 停止指標寫入管道（刷寫剩餘指標）
+    try:
+        from app.services.metric_ingestion import get_metric_ingestor
+        get_metric_ingestor().stop()
+    except Exception as e:
+        logger.warning(f"停止指標寫入管道失敗: {e}")
+    
+    # 停止配置文件監視
+    try:
+        from app.core.config_registry import get_config_registry
+        get_config_registry().stop_watching()
+    except Exception as e:
+        logger.warning(f"停止配置文件監視失敗: {e}")
+    
     # 停止 WebSocket Manager
     try:
         from app.websocket import get_websocket_manager
@@ -480,6 +561,13 @@ async def on_shutdown() -> None:
     except Exception as e:
         logger.warning(f"停止定時告警檢查服務失敗: {e}", exc_info=True)
 
+    # 停止緩存提前刷新控制器
+    try:
+        from app.core.cache_optimization import get_cache_optimizer
+        await get_cache_optimizer().stop()
+    except Exception as e:
+        logger.warning(f"停止緩存控制器失敗: {e}", exc_info=True)
+
 
 @app.get("/health", tags=["health"])
 async def health_check(detailed: bool = Query(False, description="是否返回详细健康信息")):
@@ -521,6 +609,15 @@ async def health_check(detailed: bool = Query(False, description="是否返回
     return result, status_code
 
 
+@app.get("/health/startup", tags=["health"])
+async def startup_report():
+    """啟動耗時報告（各啟動階段的狀態與耗時）"""
+    runner = getattr(app.state, "startup_runner", None)
+    if runner is None:
+        return {"mode": None, "phases": []}
+    return runner.get_report()
+
+
 @app.get("/healthz", tags=["health"])
 async def health_check_k8s():
     """
@@ -10,6 +10,7 @@ from app.models.notification import (
     NotificationType,
     NotificationStatus,
     NotificationTemplate,
+    NotificationUnreadCounter,
 )
 from app.models.telegram_registration import (
     UserRegistration,
@@ -20,10 +21,14 @@ from app.models.group_ai import (
     GroupAIAccount,
     GroupAIScript,
     GroupAIScriptVersion,
+    GroupAIScriptBlob,
     AllocationHistory,
     GroupAIDialogueHistory,
     GroupAIRedpacketLog,
     GroupAIMetric,
+    GroupAIMetricRollup,
+    GroupAIStatsCounter,
+    GroupAIStatsActiveUser,
     GroupAIAlertRule,
     GroupAIRoleAssignmentScheme,
     GroupAIRoleAssignmentHistory,
@@ -59,6 +64,7 @@ from app.models.sites import (
     ContactForm,
     SiteAnalytics,
 )
+from app.models.scheduler import SchedulerLease
 
 __all__ = [
     "Role",
@@ -72,16 +78,21 @@ __all__ = [
     "NotificationType",
     "NotificationStatus",
     "NotificationTemplate",
+    "NotificationUnreadCounter",
     "UserRegistration",
     "SessionFile",
     "AntiDetectionLog",
     "GroupAIAccount",
     "GroupAIScript",
     "GroupAIScriptVersion",
+    "GroupAIScriptBlob",
     "AllocationHistory",
     "GroupAIDialogueHistory",
     "GroupAIRedpacketLog",
     "GroupAIMetric",
+    "GroupAIMetricRollup",
+    "GroupAIStatsCounter",
+    "GroupAIStatsActiveUser",
     "GroupAIAlertRule",
     "GroupAIRoleAssignmentScheme",
     "GroupAIRoleAssignmentHistory",
@@ -104,5 +115,6 @@ __all__ = [
     "AIConversation",
     "ContactForm",
     "SiteAnalytics",
+    "SchedulerLease",
 ]
 
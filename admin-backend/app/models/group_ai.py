@@ -4,7 +4,8 @@
 from datetime import datetime
 from typing import Optional
 import uuid
-from sqlalchemy import Column, String, Integer, Boolean, Float, JSON, DateTime, BigInteger, Text, UniqueConstraint
+from sqlalchemy import Column, String, Integer, Boolean, Float, JSON, Date, DateTime, BigInteger, Text, LargeBinary, UniqueConstraint, Index
+from sqlalchemy.orm import deferred, object_session
 from sqlalchemy.sql import func
 
 # 使用统一的 Base（从 app.db 导入）
@@ -73,7 +74,9 @@ class GroupAIScriptVersion(Base):
     id = Column(String(36), primary_key=True, default=generate_uuid)
     script_id = Column(String(100), nullable=False, index=True)  # 關聯到 GroupAIScript.script_id
     version = Column(String(20), nullable=False)  # 版本號
-    yaml_content = Column(Text, nullable=False)  # 該版本的YAML內容
+    content_hash = Column(String(64), nullable=True, index=True)  # 內容存於 group_ai_script_blobs
+    # 舊數據的內聯 YAML（新版本存入 group_ai_script_blobs，此列為空）；延遲加載，列表查詢不讀取
+    inline_content = deferred(Column("yaml_content", Text, nullable=True))
     description = Column(Text)  # 版本描述/變更說明
     created_by = Column(String(100))  # 創建者用戶ID
     change_summary = Column(Text)  # 變更摘要
@@ -84,6 +87,40 @@ class GroupAIScriptVersion(Base):
         {'sqlite_autoincrement': True},
     )
 
+    @property
+    def yaml_content(self) -> Optional[str]:
+        """該版本的YAML內容（從內容存儲還原，見 app.services.script_version_store）"""
+        pending = self.__dict__.get("_pending_content")
+        if pending is not None and pending[0] == self.content_hash:
+            return pending[1]
+        if self.content_hash:
+            from app.services.script_version_store import load_content
+            return load_content(object_session(self), self.content_hash)
+        return self.inline_content
+
+    @yaml_content.setter
+    def yaml_content(self, value: Optional[str]) -> None:
+        # 內容在 flush 前寫入存儲（去重 + 差異壓縮）
+        from app.services.script_version_store import content_hash
+        digest = content_hash(value) if value is not None else None
+        self.__dict__["_pending_content"] = (digest, value) if value is not None else None
+        self.content_hash = digest
+        if self.inline_content is not None:
+            self.inline_content = None
+
+
+class GroupAIScriptBlob(Base):
+    """群組 AI 劇本版本內容表（按內容哈希去重，壓縮存儲完整快照或相對基準內容的行差異）"""
+    __tablename__ = "group_ai_script_blobs"
+
+    content_hash = Column(String(64), primary_key=True)  # 完整內容的 SHA-256
+    base_hash = Column(String(64), nullable=True)  # 差異的基準內容；完整快照為空
+    codec = Column(String(10), nullable=False)  # zstd / zlib
+    chain_depth = Column(Integer, default=0, nullable=False)  # 距最近完整快照的差異層數
+    size = Column(Integer, nullable=False)  # 原始內容字節數
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+
 
 class AllocationHistory(Base):
     """账号分配历史表"""
@@ -143,6 +180,50 @@ class GroupAIMetric(Base):
     timestamp = Column(DateTime, default=func.now(), nullable=False, index=True)
     extra_data = Column(JSON)  # 額外元數據（避免與 SQLAlchemy metadata 衝突）
 
+    __table_args__ = (
+        Index("ix_group_ai_metrics_type_timestamp", "metric_type", "timestamp"),
+        Index("ix_group_ai_metrics_account_type_timestamp", "account_id", "metric_type", "timestamp"),
+    )
+
+
+class GroupAIMetricRollup(Base):
+    """群組 AI 指標分鐘匯總表（寫入由 metric_ingestion 批量 upsert；PostgreSQL 上按月分區）"""
+    __tablename__ = "group_ai_metric_rollups"
+
+    account_id = Column(String(100), primary_key=True, default="")  # 空字符串表示系統級指標
+    metric_type = Column(String(50), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)  # 分鐘起點
+    count = Column(Integer, default=0, nullable=False)
+    value_sum = Column(Float, default=0.0, nullable=False)
+
+    __table_args__ = (
+        Index("ix_group_ai_metric_rollups_type_bucket", "metric_type", "bucket"),
+    )
+
+
+class GroupAIStatsCounter(Base):
+    """群組 AI 統計計數表（對話歷史與指標按天/小時增量匯總，供儀表板按主鍵讀取）"""
+    __tablename__ = "group_ai_stats_counters"
+
+    # total、d:YYYY-MM-DD（按天）、h:YYYY-MM-DDTHH（按小時）
+    bucket = Column(String(20), primary_key=True)
+    sessions = Column(Integer, default=0, nullable=False)
+    successful_sessions = Column(Integer, default=0, nullable=False)
+    active_users = Column(Integer, default=0, nullable=False)  # 只在按天的行中維護
+    token_usage = Column(Float, default=0.0, nullable=False)
+    error_count = Column(Integer, default=0, nullable=False)
+    response_time_sum = Column(Float, default=0.0, nullable=False)
+    response_time_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class GroupAIStatsActiveUser(Base):
+    """群組 AI 每日活躍用戶表（用於增量計算去重的活躍用戶數，只保留最近兩天）"""
+    __tablename__ = "group_ai_stats_active_users"
+
+    day = Column(Date, primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+
 
 class GroupAIAlertRule(Base):
     """群組 AI 告警規則表"""
@@ -123,3 +123,12 @@ class NotificationTemplate(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+
+
+class NotificationUnreadCounter(Base):
+    """每個接收人的未讀瀏覽器通知數（隨通知的創建、已讀、刪除在同一事務中維護）"""
+    __tablename__ = "notification_unread_counters"
+
+    recipient = Column(String(255), primary_key=True)
+    unread_count = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
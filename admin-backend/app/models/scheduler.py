@@ -0,0 +1,25 @@
+"""
+調度器數據模型
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String
+
+from app.db import Base
+
+
+class SchedulerLease(Base):
+    """
+    領導者租約
+
+    多進程部署時只有持有租約的進程運行定時任務；持有者定期續約，
+    租約過期後其他進程可以接管（未配置 Redis 時使用）
+    """
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String(100), primary_key=True)  # 租約名稱，如 scheduler
+    owner = Column(String(100), nullable=False)  # 持有者標識（主機名:進程號:隨機後綴）
+    expires_at = Column(DateTime, nullable=False)
+    acquired_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -14,7 +14,7 @@ class Site(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, comment="站点名称")
     url = Column(String(255), nullable=False, comment="站点 URL")
-    site_type = Column(String(50), nullable=False, index=True, comment="站点类型: aizkw/hongbao/tgmini")
+    site_type = Column(String(50), nullable=False, comment="站点类型: aizkw/hongbao/tgmini")
     status = Column(String(20), default="active", comment="状态: active/inactive")
     config = Column(JSON, comment="站点配置（JSON）")
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -41,7 +41,7 @@ class SiteVisit(Base):
     user_agent = Column(Text, comment="用户代理")
     referer = Column(String(255), comment="来源")
     page_path = Column(String(255), comment="访问页面")
-    session_id = Column(String(100), index=True, comment="会话 ID")
+    session_id = Column(String(100), comment="会话 ID")
     visit_duration = Column(Integer, comment="访问时长（秒）")
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
@@ -60,7 +60,7 @@ class AIConversation(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     site_id = Column(Integer, ForeignKey("sites.id", ondelete="CASCADE"), nullable=False, index=True)
-    session_id = Column(String(100), index=True, comment="会话 ID")
+    session_id = Column(String(100), comment="会话 ID")
     user_message = Column(Text, comment="用户消息")
     ai_response = Column(Text, comment="AI 回复")
     ai_provider = Column(String(20), comment="AI 提供商: gemini/openai")
@@ -0,0 +1,572 @@
+"""
+儀表板計數器 - 對話歷史與指標的增量匯總
+
+寫入 GroupAIDialogueHistory / GroupAIMetric 時，在同一事務中按行的時間戳更新計數行：
+total（累計）、d:YYYY-MM-DD（按天）、h:YYYY-MM-DDTHH（按小時）。儀表板只需按主鍵讀取
+total / 今日 / 昨日三行，不再掃描原始表。
+
+- 計數由 Session 的 flush 事件維護，覆蓋 ORM 的新增、刪除和修改；繞過 ORM 的批量 SQL
+  （query.update / bulk_insert_mappings）不會觸發，由夜間對賬修正
+- 活躍用戶數需要去重：今日/昨日出現過的 (日期, user_id) 記錄在 group_ai_stats_active_users，
+  插入成功（此前不存在）時才給當天計數 +1
+- total 行只由重建寫入，增量更新對它只做 UPDATE；total 行不存在（首次部署或手動清空）時，
+  啟動階段 dashboard_counters 在可寫引擎上全量重建一次。只讀會話（query_only 連接池）讀到缺失的
+  total 時不嘗試寫入，臨時從原始表匯總
+- 夜間任務 compact_dashboard_counters：重算最近幾天的按天/小時行、刪除過期的小時行和活躍用戶記錄，
+  並以按天行之和校正 total
+- 日期邊界按本地時間（與儀表板使用的 datetime.now() 一致）；未指定時間戳的新行在 flush 前補為 datetime.now()
+- 指標的分鐘匯總（group_ai_metric_rollups）在同一 flush 中按 (賬號, 類型, 分鐘) 累加；批量寫入見
+  metric_ingestion。原始指標行可關閉或按保留期刪除，對賬時指標部分從匯總表重算
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, and_, case, delete, event, func, inspect, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.group_ai import (
+    GroupAIDialogueHistory,
+    GroupAIMetric,
+    GroupAIMetricRollup,
+    GroupAIStatsActiveUser,
+    GroupAIStatsCounter,
+)
+
+logger = logging.getLogger(__name__)
+
+TOTAL_BUCKET = "total"
+# 夜間對賬重算的天數（今日和昨日）
+RECONCILE_DAYS = 2
+# 按小時的計數行保留天數
+HOURLY_RETENTION_DAYS = 7
+# 活躍用戶去重記錄保留天數（今日和昨日）
+ACTIVE_USER_DAYS = 2
+
+COUNTER_COLUMNS = (
+    "sessions",
+    "successful_sessions",
+    "active_users",
+    "token_usage",
+    "error_count",
+    "response_time_sum",
+    "response_time_count",
+)
+# 計入儀表板的指標類型
+METRIC_TYPES = ("token_usage", "error", "response_time")
+
+_DELTAS_KEY = "dashboard_counter_deltas"
+
+_counters = GroupAIStatsCounter.__table__
+_active_users = GroupAIStatsActiveUser.__table__
+_rollups = GroupAIMetricRollup.__table__
+
+
+def day_bucket(value: date) -> str:
+    return f"d:{value:%Y-%m-%d}"
+
+
+def hour_bucket(value: datetime) -> str:
+    return f"h:{value:%Y-%m-%dT%H}"
+
+
+def minute_bucket(value: datetime) -> datetime:
+    return value.replace(second=0, microsecond=0)
+
+
+def _empty_values() -> Dict[str, float]:
+    return {name: 0 for name in COUNTER_COLUMNS}
+
+
+def _dialogue_values(reply_text: Optional[str], sign: int) -> Dict[str, int]:
+    return {"sessions": sign, "successful_sessions": sign if reply_text else 0}
+
+
+def metric_counter_values(metric_type: Optional[str], count: int, value_sum: float) -> Optional[Dict[str, float]]:
+    """count 個指標點（值之和為 value_sum）對計數行的貢獻；不計入儀表板的類型返回 None"""
+    if metric_type == "token_usage":
+        return {"token_usage": value_sum}
+    if metric_type == "error":
+        return {"error_count": count}
+    if metric_type == "response_time":
+        return {"response_time_sum": value_sum, "response_time_count": count}
+    return None
+
+
+def _metric_values(metric_type: Optional[str], metric_value: Optional[float], sign: int) -> Optional[Dict[str, float]]:
+    return metric_counter_values(metric_type, sign, sign * (metric_value or 0.0))
+
+
+class _CounterDeltas:
+    """一次 flush 中累積的計數變化"""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.active_users: set = set()
+        # (賬號, 指標類型, 分鐘) -> [點數, 值之和]
+        self.rollups: Dict[Tuple[str, str, datetime], List[float]] = defaultdict(lambda: [0, 0.0])
+
+    def add(self, timestamp: Any, values: Optional[Dict[str, float]]) -> None:
+        if not values or not isinstance(timestamp, datetime):
+            return
+        for bucket in (TOTAL_BUCKET, day_bucket(timestamp), hour_bucket(timestamp)):
+            for name, value in values.items():
+                self.counters[bucket][name] += value
+
+    def add_rollup(self, account_id: Optional[str], metric_type: Any, timestamp: Any, count: int, value_sum: float) -> None:
+        if not metric_type or not isinstance(timestamp, datetime):
+            return
+        rollup = self.rollups[(account_id or "", metric_type, minute_bucket(timestamp))]
+        rollup[0] += count
+        rollup[1] += value_sum
+
+    def add_active_user(self, timestamp: Any, user_id: Optional[int]) -> None:
+        if user_id is None or not isinstance(timestamp, datetime):
+            return
+        if timestamp.date() >= date.today() - timedelta(days=ACTIVE_USER_DAYS - 1):
+            self.active_users.add((timestamp.date(), user_id))
+
+    def __bool__(self) -> bool:
+        return bool(self.counters or self.active_users or self.rollups)
+
+
+def _contribution(obj: Any, values: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    if isinstance(obj, GroupAIDialogueHistory):
+        return _dialogue_values(values["reply_text"], 1)
+    return _metric_values(values["metric_type"], values["metric_value"], 1)
+
+
+def _tracked_attributes(obj: Any) -> Tuple[str, ...]:
+    if isinstance(obj, GroupAIDialogueHistory):
+        return ("timestamp", "reply_text")
+    return ("timestamp", "metric_type", "metric_value", "account_id")
+
+
+def _old_values(session: Session, obj: Any) -> Optional[Dict[str, Any]]:
+    """修改或刪除前的屬性值；修改前未加載（例如提交後過期）的屬性從數據庫讀取舊值"""
+    state = inspect(obj)
+    keys = _tracked_attributes(obj)
+    values = {}
+    for key in keys:
+        history = state.attrs[key].history
+        if history.deleted:
+            values[key] = history.deleted[0]
+        elif history.added:
+            break
+        else:
+            values[key] = getattr(obj, key)
+    else:
+        return values
+
+    # 直接經連接查詢，不觸發 autoflush
+    table = obj.__table__
+    row = session.connection().execute(
+        select(*(table.c[key] for key in keys)).where(table.c.id == obj.id)
+    ).first()
+    return dict(zip(keys, row)) if row is not None else None
+
+
+def _negate(values: Optional[Dict[str, float]]) -> Optional[Dict[str, float]]:
+    return {name: -value for name, value in values.items()} if values else None
+
+
+def _add_metric_rollup(deltas: _CounterDeltas, obj: Any, values: Dict[str, Any], sign: int) -> None:
+    if isinstance(obj, GroupAIMetric):
+        deltas.add_rollup(
+            values["account_id"], values["metric_type"], values["timestamp"], sign, sign * (values["metric_value"] or 0.0)
+        )
+
+
+def _collect_deltas(session: Session) -> _CounterDeltas:
+    deltas = _CounterDeltas()
+    tracked = (GroupAIDialogueHistory, GroupAIMetric)
+
+    for obj in session.new:
+        if not isinstance(obj, tracked):
+            continue
+        if obj.timestamp is None:
+            obj.timestamp = datetime.now()
+        current = {key: getattr(obj, key) for key in _tracked_attributes(obj)}
+        deltas.add(obj.timestamp, _contribution(obj, current))
+        _add_metric_rollup(deltas, obj, current, 1)
+        if isinstance(obj, GroupAIDialogueHistory):
+            deltas.add_active_user(obj.timestamp, obj.user_id)
+
+    for obj in session.dirty:
+        if not isinstance(obj, tracked) or not session.is_modified(obj):
+            continue
+        old = _old_values(session, obj)
+        if old is None:
+            continue
+        current = {key: getattr(obj, key) for key in _tracked_attributes(obj)}
+        if old == current:
+            continue
+        deltas.add(old["timestamp"], _negate(_contribution(obj, old)))
+        deltas.add(current["timestamp"], _contribution(obj, current))
+        _add_metric_rollup(deltas, obj, old, -1)
+        _add_metric_rollup(deltas, obj, current, 1)
+
+    for obj in session.deleted:
+        if not isinstance(obj, tracked):
+            continue
+        old = _old_values(session, obj)
+        if old is not None:
+            deltas.add(old["timestamp"], _negate(_contribution(obj, old)))
+            _add_metric_rollup(deltas, obj, old, -1)
+    return deltas
+
+
+def _increment(connection: Connection, bucket: str, values: Dict[str, float]) -> int:
+    stmt = (
+        update(_counters)
+        .where(_counters.c.bucket == bucket)
+        .values({**{name: _counters.c[name] + value for name, value in values.items()}, "updated_at": func.now()})
+    )
+    return connection.execute(stmt).rowcount
+
+
+def _upsert_insert(connection: Connection):
+    """支持 ON CONFLICT 的 insert 構造函數；其他數據庫返回 None"""
+    if connection.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+def _upsert_increment(connection: Connection, bucket: str, values: Dict[str, float]) -> None:
+    """計數行存在時累加，不存在時插入（SQLite / PostgreSQL 用 ON CONFLICT 一條語句完成）"""
+    dialect_insert = _upsert_insert(connection)
+    if dialect_insert is not None:
+        stmt = dialect_insert(_counters).values(bucket=bucket, updated_at=func.now(), **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[_counters.c.bucket],
+            set_={**{name: _counters.c[name] + stmt.excluded[name] for name in values}, "updated_at": func.now()},
+        )
+        connection.execute(stmt)
+    elif not _increment(connection, bucket, values):
+        connection.execute(insert(_counters).values(bucket=bucket, updated_at=func.now(), **values))
+
+
+def upsert_metric_rollups(connection: Connection, rollups: Dict[Tuple[str, str, datetime], List[float]]) -> None:
+    """把 (賬號, 類型, 分鐘) 的點數和值之和累加到匯總表（SQLite / PostgreSQL 一條 executemany）"""
+    rows = [
+        {"account_id": account_id, "metric_type": metric_type, "bucket": bucket, "count": int(count), "value_sum": value_sum}
+        for (account_id, metric_type, bucket), (count, value_sum) in sorted(rollups.items())
+        if count or value_sum
+    ]
+    if not rows:
+        return
+    dialect_insert = _upsert_insert(connection)
+    if dialect_insert is not None:
+        stmt = dialect_insert(_rollups)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[_rollups.c.account_id, _rollups.c.metric_type, _rollups.c.bucket],
+            set_={
+                "count": _rollups.c.count + stmt.excluded.count,
+                "value_sum": _rollups.c.value_sum + stmt.excluded.value_sum,
+            },
+        )
+        connection.execute(stmt, rows)
+        return
+    for row in rows:
+        updated = connection.execute(
+            update(_rollups)
+            .where(
+                _rollups.c.account_id == row["account_id"],
+                _rollups.c.metric_type == row["metric_type"],
+                _rollups.c.bucket == row["bucket"],
+            )
+            .values(count=_rollups.c.count + row["count"], value_sum=_rollups.c.value_sum + row["value_sum"])
+        ).rowcount
+        if not updated:
+            connection.execute(insert(_rollups).values(**row))
+
+
+def _insert_active_user(connection: Connection, day: date, user_id: int) -> bool:
+    """記錄 (日期, 用戶)；返回此前是否不存在"""
+    dialect_insert = _upsert_insert(connection)
+    if dialect_insert is not None:
+        stmt = dialect_insert(_active_users).values(day=day, user_id=user_id).on_conflict_do_nothing()
+        return connection.execute(stmt).rowcount == 1
+    exists = connection.execute(
+        select(_active_users.c.user_id).where(_active_users.c.day == day, _active_users.c.user_id == user_id)
+    ).first()
+    if exists:
+        return False
+    connection.execute(insert(_active_users).values(day=day, user_id=user_id))
+    return True
+
+
+def apply_metric_rollups(connection: Connection, rollups: Dict[Tuple[str, str, datetime], List[float]]) -> None:
+    """寫入一批預聚合的指標（匯總行和對應的計數增量），供繞過 ORM 的批量寫入使用"""
+    deltas = _CounterDeltas()
+    for (account_id, metric_type, bucket), (count, value_sum) in rollups.items():
+        deltas.add_rollup(account_id, metric_type, bucket, count, value_sum)
+        deltas.add(bucket, metric_counter_values(metric_type, int(count), value_sum))
+    apply_counter_deltas(connection, deltas)
+
+
+def apply_counter_deltas(connection: Connection, deltas: _CounterDeltas) -> None:
+    upsert_metric_rollups(connection, deltas.rollups)
+    for day, user_id in sorted(deltas.active_users):
+        if _insert_active_user(connection, day, user_id):
+            deltas.counters[day_bucket(day)]["active_users"] += 1
+
+    # 固定順序更新，避免並發事務互相等待對方持有的行鎖
+    for bucket in sorted(deltas.counters):
+        values = {name: value for name, value in deltas.counters[bucket].items() if value}
+        if not values:
+            continue
+        if bucket == TOTAL_BUCKET:
+            _increment(connection, bucket, values)
+        else:
+            _upsert_increment(connection, bucket, values)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_counter_deltas(session: Session, flush_context, instances) -> None:
+    deltas = _collect_deltas(session)
+    if deltas:
+        session.info[_DELTAS_KEY] = deltas
+    else:
+        session.info.pop(_DELTAS_KEY, None)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_counter_deltas(session: Session, flush_context) -> None:
+    deltas = session.info.pop(_DELTAS_KEY, None)
+    if not deltas:
+        return
+    connection = session.connection()
+    try:
+        # 計數更新失敗（例如計數表尚未遷移）不影響原始數據寫入，偏差由夜間對賬修正
+        with connection.begin_nested():
+            apply_counter_deltas(connection, deltas)
+    except Exception as e:
+        logger.warning(f"更新儀表板計數失敗: {e}")
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_counter_deltas(session: Session, previous_transaction) -> None:
+    session.info.pop(_DELTAS_KEY, None)
+
+
+def _bucket_expressions(dialect: str, column) -> Tuple[Any, Optional[Any]]:
+    """按天/按小時分組的 SQL 表達式（直接生成 bucket 字符串）；不支持的數據庫不生成小時行"""
+    if dialect == "sqlite":
+        return func.strftime("d:%Y-%m-%d", column), func.strftime("h:%Y-%m-%dT%H", column)
+    if dialect == "postgresql":
+        return func.to_char(column, '"d:"YYYY-MM-DD'), func.to_char(column, '"h:"YYYY-MM-DD"T"HH24')
+    if dialect in ("mysql", "mariadb"):
+        return func.date_format(column, "d:%Y-%m-%d"), func.date_format(column, "h:%Y-%m-%dT%H")
+    return func.concat("d:", func.cast(column, Date)), None
+
+
+def _aggregate(db: Session, since: Optional[datetime]) -> Dict[str, Dict[str, float]]:
+    """從原始表按天/小時匯總"""
+    dialect = db.get_bind().dialect.name
+    results: Dict[str, Dict[str, float]] = defaultdict(_empty_values)
+    successful = func.sum(case((and_(
+        GroupAIDialogueHistory.reply_text.isnot(None), GroupAIDialogueHistory.reply_text != ""
+    ), 1), else_=0))
+
+    day_expr, hour_expr = _bucket_expressions(dialect, GroupAIDialogueHistory.timestamp)
+    for bucket_expr, with_users in ((day_expr, True), (hour_expr, False)):
+        if bucket_expr is None:
+            continue
+        columns = [bucket_expr.label("bucket"), func.count(GroupAIDialogueHistory.id), successful]
+        if with_users:
+            columns.append(func.count(func.distinct(GroupAIDialogueHistory.user_id)))
+        query = db.query(*columns)
+        if since is not None:
+            query = query.filter(GroupAIDialogueHistory.timestamp >= since)
+        for row in query.group_by(bucket_expr):
+            values = results[str(row[0])]
+            values["sessions"] = int(row[1] or 0)
+            values["successful_sessions"] = int(row[2] or 0)
+            if with_users:
+                values["active_users"] = int(row[3] or 0)
+
+    # 指標從分鐘匯總表重算（原始指標行可能已關閉或按保留期刪除）
+    day_expr, hour_expr = _bucket_expressions(dialect, GroupAIMetricRollup.bucket)
+    for bucket_expr in (day_expr, hour_expr):
+        if bucket_expr is None:
+            continue
+        query = db.query(
+            bucket_expr.label("bucket"),
+            GroupAIMetricRollup.metric_type,
+            func.sum(GroupAIMetricRollup.value_sum),
+            func.sum(GroupAIMetricRollup.count),
+        ).filter(GroupAIMetricRollup.metric_type.in_(METRIC_TYPES))
+        if since is not None:
+            query = query.filter(GroupAIMetricRollup.bucket >= since)
+        for bucket, metric_type, value_sum, count in query.group_by(bucket_expr, GroupAIMetricRollup.metric_type):
+            values = results[str(bucket)]
+            values.update(metric_counter_values(metric_type, int(count or 0), float(value_sum or 0.0)))
+    return results
+
+
+def _rebuild_active_users(db: Session, days: Iterable[date]) -> None:
+    for day in days:
+        start = datetime.combine(day, time.min)
+        db.execute(delete(_active_users).where(_active_users.c.day == day))
+        db.execute(insert(_active_users).from_select(
+            ["day", "user_id"],
+            select(literal(day, Date), GroupAIDialogueHistory.user_id).distinct().where(
+                GroupAIDialogueHistory.timestamp >= start,
+                GroupAIDialogueHistory.timestamp < start + timedelta(days=1),
+            ),
+        ))
+
+
+def _write_total(db: Session) -> Dict[str, float]:
+    sums = db.query(*(func.sum(_counters.c[name]) for name in COUNTER_COLUMNS)).filter(
+        _counters.c.bucket.like("d:%")
+    ).one()
+    total = {name: value or 0 for name, value in zip(COUNTER_COLUMNS, sums)}
+    total["active_users"] = 0  # 活躍用戶只按天統計
+    db.execute(delete(_counters).where(_counters.c.bucket == TOTAL_BUCKET))
+    db.execute(insert(_counters).values(bucket=TOTAL_BUCKET, updated_at=func.now(), **total))
+    return total
+
+
+def rebuild_dashboard_counters(db: Session, since: Optional[date] = None) -> Dict[str, Dict[str, float]]:
+    """
+    從原始表重建計數行並提交
+
+    Args:
+        since: 只重算該日期（含）之後的按天/小時行；None 時全量重建
+
+    Returns:
+        {bucket: 計數}（重算的行和 total）
+    """
+    since_dt = datetime.combine(since, time.min) if since else None
+    rows = _aggregate(db, since_dt)
+
+    if since is None:
+        db.execute(delete(_counters))
+    else:
+        db.execute(delete(_counters).where(
+            (_counters.c.bucket.like("d:%") & (_counters.c.bucket >= day_bucket(since)))
+            | (_counters.c.bucket.like("h:%") & (_counters.c.bucket >= hour_bucket(since_dt)))
+        ))
+    if rows:
+        db.execute(insert(_counters), [
+            {"bucket": bucket, "updated_at": datetime.now(), **values} for bucket, values in rows.items()
+        ])
+
+    today = date.today()
+    _rebuild_active_users(db, [today - timedelta(days=offset) for offset in range(ACTIVE_USER_DAYS)])
+    rows[TOTAL_BUCKET] = _write_total(db)
+    db.commit()
+    logger.info(f"儀表板計數已重建（{'全量' if since is None else f'自 {since} 起'}，{len(rows)} 行）")
+    return rows
+
+
+def compact_dashboard_counters(db: Session, today: Optional[date] = None) -> None:
+    """夜間對賬：重算最近 RECONCILE_DAYS 天、刪除過期的小時行與活躍用戶記錄、校正 total"""
+    today = today or date.today()
+    has_total = db.query(GroupAIStatsCounter.bucket).filter(
+        GroupAIStatsCounter.bucket == TOTAL_BUCKET
+    ).first() is not None
+    rebuild_dashboard_counters(db, since=today - timedelta(days=RECONCILE_DAYS - 1) if has_total else None)
+
+    hourly_cutoff = datetime.combine(today - timedelta(days=HOURLY_RETENTION_DAYS), time.min)
+    removed_hours = db.execute(delete(_counters).where(
+        _counters.c.bucket.like("h:%"), _counters.c.bucket < hour_bucket(hourly_cutoff)
+    )).rowcount
+    db.execute(delete(_active_users).where(_active_users.c.day < today - timedelta(days=ACTIVE_USER_DAYS - 1)))
+    db.commit()
+    logger.info(f"儀表板計數夜間對賬完成，清理 {removed_hours} 個過期小時行")
+
+
+def ensure_dashboard_counters() -> bool:
+    """total 行缺失時在可寫會話中全量重建（啟動階段調用）；返回是否執行了重建"""
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if db.get(GroupAIStatsCounter, TOTAL_BUCKET) is not None:
+            return False
+        rebuild_dashboard_counters(db)
+        return True
+    finally:
+        db.close()
+
+
+def run_dashboard_compaction() -> None:
+    """調度器系統任務入口（在線程池中執行）"""
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        compact_dashboard_counters(db)
+    finally:
+        db.close()
+
+
+def _counter_values(row: Optional[Any]) -> Dict[str, float]:
+    if row is None:
+        return _empty_values()
+    return {name: getattr(row, name) or 0 for name in COUNTER_COLUMNS}
+
+
+def _read_only(db: Session) -> bool:
+    from app.db import engine, read_engine
+
+    return read_engine is not engine and db.get_bind() is read_engine
+
+
+def _temporary_counters(db: Session) -> Dict[str, Dict[str, float]]:
+    """不寫入計數表，直接從原始表匯總（total 為按天行之和）"""
+    rows = _aggregate(db, None)
+    rows[TOTAL_BUCKET] = {
+        name: sum(values[name] for bucket, values in rows.items() if bucket.startswith("d:"))
+        for name in COUNTER_COLUMNS if name != "active_users"
+    }
+    rows[TOTAL_BUCKET]["active_users"] = 0
+    return rows
+
+
+def get_dashboard_counters(db: Session, days: List[date]) -> Dict[str, Dict[str, float]]:
+    """
+    按主鍵讀取 total 和指定日期的計數（一條 IN 查詢）
+
+    計數表未初始化時：可寫會話先全量重建；只讀會話臨時匯總（由啟動階段在可寫引擎上重建）
+
+    Returns:
+        {"total": 計數, "d:YYYY-MM-DD": 計數, ...}
+    """
+    buckets = [TOTAL_BUCKET] + [day_bucket(day) for day in days]
+    rows = {
+        row.bucket: _counter_values(row)
+        for row in db.query(GroupAIStatsCounter).filter(GroupAIStatsCounter.bucket.in_(buckets))
+    }
+    if TOTAL_BUCKET not in rows:
+        if _read_only(db):
+            logger.debug("儀表板計數尚未重建，使用臨時匯總結果")
+            rows = _temporary_counters(db)
+        else:
+            try:
+                rows = rebuild_dashboard_counters(db)
+            except Exception as e:
+                logger.warning(f"重建儀表板計數失敗，使用臨時匯總結果: {e}")
+                db.rollback()
+                rows = _temporary_counters(db)
+    return {bucket: rows.get(bucket) or _empty_values() for bucket in buckets}
+
+
+def get_hourly_counters(db: Session, day: date) -> Dict[str, Dict[str, float]]:
+    """讀取某天 24 個小時的計數（供趨勢圖使用，缺少的小時為 0）"""
+    start = datetime.combine(day, time.min)
+    buckets = [hour_bucket(start + timedelta(hours=hour)) for hour in range(24)]
+    rows = {
+        row.bucket: _counter_values(row)
+        for row in db.query(GroupAIStatsCounter).filter(GroupAIStatsCounter.bucket.in_(buckets))
+    }
+    return {bucket: rows.get(bucket) or _empty_values() for bucket in buckets}
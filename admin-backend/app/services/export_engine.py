@@ -0,0 +1,718 @@
+"""
+流式數據導出引擎
+從服務端游標（yield_per）逐批讀取數據，經增量寫入器輸出 CSV / Excel / PDF，
+內存佔用與數據行數無關；大數據量導出可作為後台任務生成可下載文件
+"""
+import asyncio
+import csv
+import importlib.util
+import io
+import json
+import logging
+import os
+import socket
+import tempfile
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy.orm import Query, Session
+
+from app.db import SessionLocal
+from app.models.group_ai import (
+    GroupAIAccount,
+    GroupAIRoleAssignmentScheme,
+    GroupAIScript,
+)
+
+logger = logging.getLogger(__name__)
+
+# Excel 和 PDF 庫導入耗時較長，啟動時只檢查是否安裝，寫入時再導入
+EXCEL_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+if not EXCEL_AVAILABLE:
+    logger.warning("openpyxl 未安裝，Excel 導出功能不可用")
+
+PDF_AVAILABLE = importlib.util.find_spec("reportlab") is not None
+if not PDF_AVAILABLE:
+    logger.warning("reportlab 未安裝，PDF 導出功能不可用")
+
+DEFAULT_CHUNK_SIZE = 500  # 每批從數據庫讀取 / 向客戶端輸出的行數
+FILE_CHUNK_SIZE = 64 * 1024  # 文件流式讀取塊大小
+WIDTH_SAMPLE_ROWS = 100  # Excel 列寬根據前 N 行估算
+PDF_ROWS_PER_PAGE = 40
+
+FORMAT_EXTENSIONS = {"csv": "csv", "excel": "xlsx", "xlsx": "xlsx", "pdf": "pdf"}
+FORMAT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "pdf": "application/pdf",
+}
+
+
+class ExportFormatError(ValueError):
+    """不支持的導出格式"""
+
+
+class ExportUnavailableError(RuntimeError):
+    """導出所需的可選依賴未安裝"""
+
+
+def normalize_format(export_format: str) -> str:
+    """將請求格式（csv, excel, xlsx, pdf）規範化為文件擴展名"""
+    ext = FORMAT_EXTENSIONS.get((export_format or "").lower())
+    if not ext:
+        raise ExportFormatError(f"不支持的格式: {export_format}")
+    if ext == "xlsx" and not EXCEL_AVAILABLE:
+        raise ExportUnavailableError("Excel 導出功能不可用，請安裝 openpyxl: pip install openpyxl")
+    if ext == "pdf" and not PDF_AVAILABLE:
+        raise ExportUnavailableError("PDF 導出功能不可用，請安裝 reportlab: pip install reportlab")
+    return ext
+
+
+def _clean_value(value: Any) -> Any:
+    """處理嵌套字典、列表和 None"""
+    if isinstance(value, (dict, list)):
+        return str(value)
+    if value is None:
+        return ""
+    return value
+
+
+# ============ 數據源 ============
+
+@dataclass
+class ExportSpec:
+    """
+    導出數據源定義
+
+    Attributes:
+        name: 數據類型（scripts, accounts, schemes ...）
+        title: 導出標題（文件名 / PDF 標題 / 工作表名）
+        columns: 列名（與 to_row 返回的鍵一致）
+        build_query: 根據會話構建查詢（不執行）
+        to_row: 將 ORM 對象轉換為行字典，第二個參數為 prepare 返回的上下文
+        prepare: 可選，在流式讀取前預加載少量關聯數據（避免 N+1 查詢）
+    """
+    name: str
+    title: str
+    columns: List[str]
+    build_query: Callable[[Session], Query]
+    to_row: Callable[[Any, Dict[str, Any]], Dict[str, Any]]
+    prepare: Optional[Callable[[Session], Dict[str, Any]]] = None
+
+    @property
+    def fieldnames(self) -> List[str]:
+        # 與原有導出保持一致：按列名排序
+        return sorted(self.columns)
+
+
+_export_specs: Dict[str, ExportSpec] = {}
+
+
+def register_export(spec: ExportSpec) -> ExportSpec:
+    """註冊導出數據源（供 API 與後台任務共用）"""
+    _export_specs[spec.name] = spec
+    return spec
+
+
+def get_export_spec(name: str) -> Optional[ExportSpec]:
+    return _export_specs.get(name)
+
+
+def iter_query_rows(
+    spec: ExportSpec,
+    db: Optional[Session] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    使用服務端游標逐批讀取數據
+
+    未傳入 db 時自行創建並關閉會話（流式響應在請求依賴釋放後才開始迭代）
+    """
+    own_session = db is None
+    session = SessionLocal() if own_session else db
+    try:
+        context = spec.prepare(session) if spec.prepare else {}
+        query = spec.build_query(session).yield_per(chunk_size)
+        for obj in query:
+            yield spec.to_row(obj, context)
+    finally:
+        if own_session:
+            session.close()
+
+
+def _format_time(value: Optional[datetime]) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else ""
+
+
+def _load_script_names(db: Session) -> Dict[str, Any]:
+    """一次性加載劇本名稱，替代逐行查詢劇本"""
+    return {
+        "script_names": dict(db.query(GroupAIScript.script_id, GroupAIScript.name).all())
+    }
+
+
+register_export(ExportSpec(
+    name="scripts",
+    title="劇本列表",
+    columns=["劇本ID", "名稱", "版本", "描述", "狀態", "創建者", "創建時間", "更新時間"],
+    build_query=lambda db: db.query(GroupAIScript).order_by(GroupAIScript.created_at.desc()),
+    to_row=lambda script, ctx: {
+        "劇本ID": script.script_id,
+        "名稱": script.name,
+        "版本": script.version,
+        "描述": script.description or "",
+        "狀態": script.status,
+        "創建者": script.created_by or "",
+        "創建時間": _format_time(script.created_at),
+        "更新時間": _format_time(script.updated_at),
+    },
+))
+
+register_export(ExportSpec(
+    name="accounts",
+    title="賬號列表",
+    columns=["賬號ID", "顯示名稱", "用戶名", "手機號", "劇本ID", "服務器ID", "狀態", "群組數量", "回復率", "紅包啟用", "創建時間"],
+    build_query=lambda db: db.query(GroupAIAccount).order_by(GroupAIAccount.created_at.desc()),
+    to_row=lambda account, ctx: {
+        "賬號ID": account.account_id,
+        "顯示名稱": account.display_name or account.account_id,
+        "用戶名": account.username or "",
+        "手機號": account.phone_number or "",
+        "劇本ID": account.script_id,
+        "服務器ID": account.server_id or "",
+        "狀態": "在線" if account.active else "離線",
+        "群組數量": len(account.group_ids) if account.group_ids else 0,
+        "回復率": account.reply_rate,
+        "紅包啟用": "是" if account.redpacket_enabled else "否",
+        "創建時間": _format_time(account.created_at),
+    },
+))
+
+register_export(ExportSpec(
+    name="schemes",
+    title="分配方案列表",
+    columns=["方案ID", "方案名稱", "描述", "劇本ID", "劇本名稱", "分配模式", "賬號數量", "分配數量", "創建者", "創建時間", "更新時間"],
+    build_query=lambda db: db.query(GroupAIRoleAssignmentScheme).order_by(
+        GroupAIRoleAssignmentScheme.created_at.desc()
+    ),
+    prepare=_load_script_names,
+    to_row=lambda scheme, ctx: {
+        "方案ID": scheme.id,
+        "方案名稱": scheme.name,
+        "描述": scheme.description or "",
+        "劇本ID": scheme.script_id,
+        "劇本名稱": ctx["script_names"].get(scheme.script_id) or scheme.script_id,
+        "分配模式": scheme.mode,
+        "賬號數量": len(scheme.account_ids) if scheme.account_ids else 0,
+        "分配數量": len(scheme.assignments) if scheme.assignments else 0,
+        "創建者": scheme.created_by or "",
+        "創建時間": _format_time(scheme.created_at),
+        "更新時間": _format_time(scheme.updated_at),
+    },
+))
+
+
+# ============ 增量寫入器 ============
+
+def iter_csv(
+    rows: Iterable[Dict[str, Any]],
+    fieldnames: List[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[str]:
+    """分塊生成 CSV 文本，每塊最多 chunk_size 行"""
+    buffer = io.StringIO()
+    if not fieldnames:
+        csv.writer(buffer).writerow(["無數據"])
+        yield buffer.getvalue()
+        return
+
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    pending = 0
+    for row in rows:
+        writer.writerow({key: _clean_value(value) for key, value in row.items()})
+        pending += 1
+        if pending >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_xlsx(
+    rows: Iterable[Dict[str, Any]],
+    fieldnames: List[str],
+    target: Any,
+    sheet_name: str = "數據",
+) -> None:
+    """
+    使用 openpyxl write-only 模式寫入 Excel
+
+    行數據直接寫入臨時工作表文件，不在內存中保留單元格對象；
+    列寬根據前 WIDTH_SAMPLE_ROWS 行估算（write-only 模式無法事後調整）
+    """
+    if not EXCEL_AVAILABLE:
+        raise ExportUnavailableError("Excel 導出功能不可用，請安裝 openpyxl: pip install openpyxl")
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=sheet_name[:31])
+
+    rows_iter = iter(rows)
+    if not fieldnames:
+        ws.append(["無數據"])
+        wb.save(target)
+        return
+
+    sample: List[Dict[str, Any]] = []
+    for row in rows_iter:
+        sample.append(row)
+        if len(sample) >= WIDTH_SAMPLE_ROWS:
+            break
+
+    for index, name in enumerate(fieldnames, start=1):
+        max_length = max(
+            [len(str(name))] + [len(str(_clean_value(r.get(name, "")))) for r in sample]
+        )
+        ws.column_dimensions[get_column_letter(index)].width = min(max_length + 2, 50)
+
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    header = []
+    for name in fieldnames:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header.append(cell)
+    ws.append(header)
+
+    for row in sample:
+        ws.append([_clean_value(row.get(name, "")) for name in fieldnames])
+    for row in rows_iter:
+        ws.append([_clean_value(row.get(name, "")) for name in fieldnames])
+
+    wb.save(target)
+
+
+def write_pdf(
+    rows: Iterable[Dict[str, Any]],
+    fieldnames: List[str],
+    target: Any,
+    title: str = "數據導出",
+    rows_per_page: int = PDF_ROWS_PER_PAGE,
+) -> None:
+    """
+    分頁寫入 PDF
+
+    逐頁繪製固定行數的表格，不構建整表 Table 佈局，避免大數據量時的內存與佈局開銷
+    """
+    if not PDF_AVAILABLE:
+        raise ExportUnavailableError("PDF 導出功能不可用，請安裝 reportlab: pip install reportlab")
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.units import inch
+    from reportlab.pdfgen import canvas as pdf_canvas
+
+    page_width, page_height = landscape(A4)
+    margin = 0.5 * inch
+    row_height = 0.17 * inch
+    canvas = pdf_canvas.Canvas(target, pagesize=(page_width, page_height))
+    body_font, bold_font = _pdf_fonts()
+    column_count = max(len(fieldnames), 1)
+    column_width = (page_width - 2 * margin) / column_count
+    max_chars = max(int(column_width / 4.5), 4)
+
+    def fit(text: Any) -> str:
+        text = str(_clean_value(text))
+        return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+    page_number = 0
+
+    def start_page() -> float:
+        nonlocal page_number
+        page_number += 1
+        y = page_height - margin
+        canvas.setFont(bold_font, 14)
+        canvas.drawString(margin, y, title)
+        canvas.setFont(body_font, 8)
+        canvas.drawRightString(
+            page_width - margin, y,
+            f"{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  #{page_number}",
+        )
+        y -= 0.35 * inch
+        canvas.setFillColor(colors.grey)
+        canvas.rect(margin, y - 3, page_width - 2 * margin, row_height, stroke=0, fill=1)
+        canvas.setFillColor(colors.whitesmoke)
+        canvas.setFont(bold_font, 8)
+        for index, name in enumerate(fieldnames):
+            canvas.drawString(margin + index * column_width + 2, y, fit(name))
+        canvas.setFillColor(colors.black)
+        canvas.setFont(body_font, 7)
+        return y - row_height
+
+    y = start_page()
+    if not fieldnames:
+        canvas.drawString(margin, y, "無數據")
+
+    rows_on_page = 0
+    for row in rows:
+        if rows_on_page >= rows_per_page:
+            canvas.showPage()
+            y = start_page()
+            rows_on_page = 0
+        for index, name in enumerate(fieldnames):
+            canvas.drawString(margin + index * column_width + 2, y, fit(row.get(name, "")))
+        canvas.line(margin, y - 3, page_width - margin, y - 3)
+        y -= row_height
+        rows_on_page += 1
+
+    canvas.showPage()
+    canvas.save()
+
+
+def _pdf_fonts() -> tuple:
+    """返回 (正文字體, 標題字體)，優先使用 reportlab 內置的 CJK 字體以正確顯示中文"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    try:
+        if "STSong-Light" not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(UnicodeCIDFont("STSong-Light"))
+        return "STSong-Light", "STSong-Light"
+    except Exception as e:
+        logger.debug(f"註冊 CJK 字體失敗，使用 Helvetica: {e}")
+        return "Helvetica", "Helvetica-Bold"
+
+
+def iter_file(path: Path, delete: bool = False) -> Iterator[bytes]:
+    """分塊讀取文件，可選讀取完成後刪除"""
+    try:
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(FILE_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        if delete:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def write_export_file(
+    rows: Iterable[Dict[str, Any]],
+    fieldnames: List[str],
+    ext: str,
+    path: Path,
+    title: str,
+) -> Path:
+    """將行數據寫入指定格式的文件"""
+    if ext == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for chunk in iter_csv(rows, fieldnames):
+                f.write(chunk)
+    elif ext == "xlsx":
+        write_xlsx(rows, fieldnames, str(path), sheet_name=title)
+    elif ext == "pdf":
+        write_pdf(rows, fieldnames, str(path), title=title)
+    else:
+        raise ExportFormatError(f"不支持的格式: {ext}")
+    return path
+
+
+def iter_export(
+    rows: Iterable[Dict[str, Any]],
+    fieldnames: List[str],
+    ext: str,
+    title: str,
+) -> Iterator[Any]:
+    """
+    生成導出內容流
+
+    CSV 直接逐塊輸出；Excel / PDF 為壓縮容器格式，先寫入臨時文件再分塊輸出並刪除
+    """
+    if ext == "csv":
+        yield from iter_csv(rows, fieldnames)
+        return
+    fd, tmp_name = tempfile.mkstemp(suffix=f".{ext}", prefix="export_")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        write_export_file(rows, fieldnames, ext, tmp_path, title)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    yield from iter_file(tmp_path, delete=True)
+
+
+# ============ 後台導出任務 ============
+
+@dataclass
+class ExportJob:
+    """後台導出任務"""
+    job_id: str
+    data_type: str
+    export_format: str
+    status: str = "pending"  # pending, running, completed, failed
+    created_by: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    row_count: int = 0
+    file_path: Optional[Path] = None
+    file_size: int = 0
+    error: Optional[str] = None
+    owner: Optional[str] = None  # 執行任務的進程（主機名:PID）
+
+    @property
+    def filename(self) -> Optional[str]:
+        return self.file_path.name if self.file_path else None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "data_type": self.data_type,
+            "format": self.export_format,
+            "status": self.status,
+            "created_by": self.created_by,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "row_count": self.row_count,
+            "filename": self.filename,
+            "file_size": self.file_size,
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], export_dir: Path) -> "ExportJob":
+        finished_at = data.get("finished_at")
+        filename = data.get("filename")
+        return cls(
+            job_id=data["job_id"],
+            data_type=data["data_type"],
+            export_format=data["format"],
+            status=data.get("status", "pending"),
+            created_by=data.get("created_by"),
+            created_at=datetime.fromisoformat(data["created_at"]),
+            finished_at=datetime.fromisoformat(finished_at) if finished_at else None,
+            row_count=data.get("row_count", 0),
+            file_path=export_dir / Path(filename).name if filename else None,
+            file_size=data.get("file_size", 0),
+            error=data.get("error"),
+            owner=data.get("owner"),
+        )
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class ExportJobManager:
+    """
+    後台導出任務管理器
+
+    任務元數據以 JSON 保存在 export_dir/jobs/ 下（與導出文件同目錄），
+    任一 worker 都能查詢、下載其他 worker 創建的任務，重啟後任務記錄不丟失；
+    內存中只保留本進程正在執行的任務（用於實時行數）。
+    """
+
+    def __init__(self, export_dir: str = "exports", retention_hours: int = 24, max_jobs: int = 200):
+        """
+        初始化導出任務管理器
+
+        Args:
+            export_dir: 導出文件目錄
+            retention_hours: 導出文件保留時間（小時）
+            max_jobs: 最多保留的任務記錄數
+        """
+        self.export_dir = Path(export_dir)
+        self.jobs_dir = self.export_dir / "jobs"
+        self.retention_hours = retention_hours
+        self.max_jobs = max_jobs
+        self.jobs: Dict[str, ExportJob] = {}
+        self._tasks: set = set()
+        self._owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    # ---------- 元數據持久化 ----------
+
+    def _meta_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _save(self, job: ExportJob) -> None:
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        data = dict(job.to_dict(), owner=job.owner)
+        path = self._meta_path(job.job_id)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def _load(self, path: Path) -> Optional[ExportJob]:
+        try:
+            job = ExportJob.from_dict(json.loads(path.read_text(encoding="utf-8")), self.export_dir)
+        except (OSError, ValueError, KeyError) as e:
+            logger.debug(f"讀取導出任務元數據失敗 {path}: {e}")
+            return None
+        if not job.finished and job.job_id not in self.jobs and self._orphaned(job):
+            # 執行任務的進程已退出（重啟或崩潰），任務不會再完成
+            job.status = "failed"
+            job.error = "導出進程已退出，請重新提交"
+            job.finished_at = datetime.now()
+            self._save(job)
+        return job
+
+    def _orphaned(self, job: ExportJob) -> bool:
+        host, _, pid = (job.owner or "").rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        # 同一主機上：PID 為本進程（容器重啟後 PID 復用）或進程已不存在
+        return int(pid) == os.getpid() or not _process_alive(int(pid))
+
+    def _all_jobs(self) -> Dict[str, ExportJob]:
+        jobs: Dict[str, ExportJob] = {}
+        if self.jobs_dir.exists():
+            for path in self.jobs_dir.glob("*.json"):
+                job = self._load(path)
+                if job:
+                    jobs[job.job_id] = job
+        jobs.update(self.jobs)
+        return jobs
+
+    # ---------- 執行 ----------
+
+    def _run(self, job: ExportJob, spec: ExportSpec, ext: str) -> ExportJob:
+        job.status = "running"
+        self._save(job)
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = self.export_dir / f"{spec.name}_{timestamp}_{job.job_id[:8]}.{ext}"
+
+        def counted(rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+            for row in rows:
+                job.row_count += 1
+                yield row
+
+        try:
+            write_export_file(counted(iter_query_rows(spec)), spec.fieldnames, ext, path, spec.title)
+            job.file_path = path
+            job.file_size = path.stat().st_size
+            job.status = "completed"
+            logger.info(f"後台導出完成: {job.job_id} ({spec.name}, {job.row_count} 行, {job.file_size} 字節)")
+        except Exception as e:
+            path.unlink(missing_ok=True)
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"後台導出失敗: {job.job_id}: {e}", exc_info=True)
+        finally:
+            job.finished_at = datetime.now()
+            self._save(job)
+            self.jobs.pop(job.job_id, None)
+        return job
+
+    def create_job(self, data_type: str, export_format: str, created_by: Optional[str] = None) -> ExportJob:
+        """創建任務（校驗數據類型與格式，不執行）"""
+        spec = get_export_spec(data_type)
+        if not spec:
+            raise ExportFormatError(f"不支持的數據類型: {data_type}")
+        normalize_format(export_format)
+        self.cleanup()
+        job = ExportJob(
+            job_id=str(uuid.uuid4()),
+            data_type=data_type,
+            export_format=export_format.lower(),
+            created_by=created_by,
+            owner=self._owner,
+        )
+        self.jobs[job.job_id] = job
+        self._save(job)
+        return job
+
+    async def run_job(self, job: ExportJob) -> ExportJob:
+        """在線程池中執行任務，避免阻塞事件循環"""
+        spec = get_export_spec(job.data_type)
+        ext = normalize_format(job.export_format)
+        return await asyncio.to_thread(self._run, job, spec, ext)
+
+    def submit(self, job: ExportJob) -> asyncio.Task:
+        """在後台調度任務（保留任務引用，避免被垃圾回收）"""
+        task = asyncio.create_task(self.run_job(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ---------- 查詢 ----------
+
+    def get_job(self, job_id: str) -> Optional[ExportJob]:
+        if job_id in self.jobs:
+            return self.jobs[job_id]
+        try:
+            uuid.UUID(job_id)
+        except ValueError:
+            return None
+        path = self._meta_path(job_id)
+        return self._load(path) if path.exists() else None
+
+    def list_jobs(self, created_by: Optional[str] = None) -> List[ExportJob]:
+        """列出任務；指定 created_by 時只返回該用戶創建的任務"""
+        jobs = self._all_jobs().values()
+        if created_by is not None:
+            jobs = [job for job in jobs if job.created_by == created_by]
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def cleanup(self) -> int:
+        """清理過期任務及其文件"""
+        now = datetime.now()
+        jobs = self._all_jobs()
+        expired = [
+            job for job in jobs.values()
+            if job.finished_at and (now - job.finished_at).total_seconds() > self.retention_hours * 3600
+        ]
+        overflow = len(jobs) - len(expired) - self.max_jobs
+        if overflow > 0:
+            finished = sorted(
+                (j for j in jobs.values() if j.finished_at and j not in expired),
+                key=lambda j: j.finished_at,
+            )
+            expired.extend(finished[:overflow])
+        for job in expired:
+            if job.file_path:
+                job.file_path.unlink(missing_ok=True)
+            self._meta_path(job.job_id).unlink(missing_ok=True)
+            self.jobs.pop(job.job_id, None)
+        return len(expired)
+
+
+_export_job_manager: Optional[ExportJobManager] = None
+
+
+def get_export_job_manager() -> ExportJobManager:
+    """獲取導出任務管理器實例"""
+    global _export_job_manager
+    if _export_job_manager is None:
+        from app.core.config import get_settings
+        settings = get_settings()
+        _export_job_manager = ExportJobManager(
+            export_dir=getattr(settings, "export_dir", "exports"),
+            retention_hours=getattr(settings, "export_retention_hours", 24),
+        )
+    return _export_job_manager
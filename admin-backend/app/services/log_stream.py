@@ -0,0 +1,441 @@
+"""
+日誌實時推送 - 增量跟蹤本地日誌文件和遠程服務器日誌，按訂閱者的過濾條件分發
+
+/logs 列表接口每次請求都要重新讀取各個文件的最後 N 行、逐台 SSH 到服務器執行 journalctl，
+前端輪詢時這些開銷隨觀看人數成倍增長。這裡改為進程內一個 LogStreamHub：
+- 本地：按字節偏移增量讀取日誌目錄下的 *.log / *.txt（os.stat 輪詢，不依賴 inotify 庫），
+  文件被輪轉（inode 變化）時先讀完舊文件的剩餘部分再從新文件開頭讀，被截斷時從頭讀
+- 遠程：每台服務器一個常駐 SSH 連接（後台線程執行 journalctl -f，無 journal 時 tail -F），
+  斷開後退避重連；無論多少人在看，每台服務器只有一個連接
+- 過濾（級別、來源、關鍵詞）在分發前完成，每個訂閱者一個有界隊列：
+  客戶端消費不及時時丟棄最舊的條目並記錄丟棄數，不會拖慢其他訂閱者或讓內存無限增長
+- 第一個訂閱者出現時啟動採集，最後一個離開後停止；最近的條目保留在環形緩衝中供新訂閱者回放
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, FrozenSet, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE_PATTERNS = ("*.log", "*.txt")
+POLL_INTERVAL = 0.5  # 本地文件輪詢間隔（秒）
+MAX_READ_BYTES = 1024 * 1024  # 單個文件每次輪詢最多讀取的字節數
+HISTORY_SIZE = 500  # 回放緩衝的條目數
+CLIENT_QUEUE_SIZE = 1000  # 每個訂閱者的隊列長度
+REMOTE_RETRY_SECONDS = (5, 10, 30, 60)  # 遠程連接失敗後的重連間隔
+
+_LOCAL_LINE = re.compile(r'(\d{4}-\d{2}-\d{2}[\s\d:]+)\s+(\w+)\s+(.+)')
+_JOURNAL_LINE = re.compile(r'(\w{3}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2})\s+\S+\s+\S+\[.*?\]:\s*(.+)')
+_LEVEL_ALIASES = {"warn": "warning", "err": "error", "critical": "error", "fatal": "error"}
+
+
+def normalize_level(level: str) -> str:
+    level = (level or "info").lower()
+    return _LEVEL_ALIASES.get(level, level)
+
+
+def find_local_log_dir() -> Optional[Path]:
+    """本地日誌目錄（依次查找工作目錄、項目根目錄和 group_ai_service 下的 logs）"""
+    project_root = Path(__file__).parent.parent.parent.parent
+    for dir_path in (Path.cwd() / "logs", project_root / "logs", project_root / "group_ai_service" / "logs"):
+        if dir_path.exists():
+            return dir_path
+    return None
+
+
+def parse_local_line(line: str, source: str = "local") -> Optional[Dict[str, Any]]:
+    """解析本地日誌行（"日期 時間 級別 消息"，無法識別時整行作為 info）"""
+    line = line.strip()
+    if not line:
+        return None
+    match = _LOCAL_LINE.match(line)
+    if match:
+        timestamp_str, level, message = match.groups()
+        return {
+            "timestamp": timestamp_str.strip(),
+            "level": level.lower(),
+            "message": message.strip(),
+            "source": source,
+            "type": "application",
+        }
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "level": "info",
+        "message": line,
+        "source": source,
+        "type": "application",
+    }
+
+
+def parse_journal_line(line: str, node_id: str) -> Optional[Dict[str, Any]]:
+    """解析 journalctl 輸出行（不是 journal 格式時返回 None）"""
+    journal_match = _JOURNAL_LINE.match(line.strip())
+    if not journal_match:
+        return None
+    timestamp_str, message = journal_match.groups()
+    level_match = re.match(r'(\w+):', message)
+    return {
+        "timestamp": timestamp_str.strip(),
+        "level": level_match.group(1).lower() if level_match else "info",
+        "message": re.sub(r'^\w+:', '', message).strip(),
+        "source": f"server_{node_id}",
+        "type": "system",
+    }
+
+
+@dataclass(frozen=True)
+class LogFilter:
+    """訂閱過濾條件（空集合表示不過濾）"""
+    levels: FrozenSet[str] = frozenset()
+    sources: FrozenSet[str] = frozenset()
+    keyword: Optional[str] = None
+
+    @classmethod
+    def from_params(cls, level: Optional[str] = None, source: Optional[str] = None, q: Optional[str] = None) -> "LogFilter":
+        def split(value: Optional[str]) -> FrozenSet[str]:
+            return frozenset(part.strip().lower() for part in (value or "").split(",") if part.strip())
+
+        return cls(
+            levels=frozenset(normalize_level(level) for level in split(level)),
+            sources=split(source),
+            keyword=q.lower() if q else None,
+        )
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        if self.levels and normalize_level(entry.get("level", "")) not in self.levels:
+            return False
+        if self.sources and str(entry.get("source", "")).lower() not in self.sources:
+            return False
+        if self.keyword:
+            haystack = f"{entry.get('message', '')} {entry.get('source', '')} {entry.get('type', '')}".lower()
+            if self.keyword not in haystack:
+                return False
+        return True
+
+
+class LogSubscription:
+    """單個訂閱者：有界隊列，滿時丟棄最舊的條目"""
+
+    def __init__(self, log_filter: LogFilter, max_queue: int = CLIENT_QUEUE_SIZE):
+        self.filter = log_filter
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=max_queue)
+        self.delivered = 0
+        self.dropped = 0
+        self._unreported_drops = 0
+
+    def offer(self, entry: Dict[str, Any]) -> None:
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            self._unreported_drops += 1
+        self.queue.put_nowait(entry)
+        self.delivered += 1
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """下一條日誌；超時返回 None（用於發送心跳）"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def take_dropped(self) -> int:
+        """自上次調用以來丟棄的條目數"""
+        dropped, self._unreported_drops = self._unreported_drops, 0
+        return dropped
+
+
+class _TailedFile:
+    __slots__ = ("handle", "inode", "partial")
+
+    def __init__(self, handle, inode: int):
+        self.handle = handle
+        self.inode = inode
+        self.partial = b""
+
+
+class LocalLogTailer:
+    """按字節偏移增量讀取目錄下的日誌文件"""
+
+    def __init__(self, log_dir: Path, patterns: Iterable[str] = LOG_FILE_PATTERNS, from_start: bool = False):
+        self.log_dir = Path(log_dir)
+        self.patterns = tuple(patterns)
+        self.from_start = from_start
+        self._files: Dict[Path, _TailedFile] = {}
+        self._primed = False
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """讀取自上次輪詢以來新增的完整行"""
+        entries: List[Dict[str, Any]] = []
+        current = {path for pattern in self.patterns for path in self.log_dir.glob(pattern) if path.is_file()}
+        for path in sorted(current):
+            try:
+                entries.extend(self._poll_file(path))
+            except OSError as e:
+                logger.debug(f"讀取日誌文件 {path} 失敗: {e}")
+        for path in set(self._files) - current:
+            self._close(path)
+        self._primed = True
+        return entries
+
+    def _poll_file(self, path: Path) -> List[Dict[str, Any]]:
+        stat = path.stat()
+        tailed = self._files.get(path)
+        lines: List[bytes] = []
+        if tailed is None:
+            handle = open(path, "rb")
+            # 啟動時已存在的文件從末尾開始；之後新出現的文件（輪轉產生）從頭讀
+            if not self._primed and not self.from_start:
+                handle.seek(0, os.SEEK_END)
+            tailed = self._files[path] = _TailedFile(handle, stat.st_ino)
+        elif stat.st_ino != tailed.inode:
+            # 文件被輪轉：讀完舊文件的剩餘內容，再從新文件開頭讀
+            lines.extend(self._read(tailed))
+            if tailed.partial:
+                lines.append(tailed.partial)
+            tailed.handle.close()
+            tailed = self._files[path] = _TailedFile(open(path, "rb"), stat.st_ino)
+        elif stat.st_size < tailed.handle.tell():
+            # 文件被截斷
+            tailed.handle.seek(0)
+            tailed.partial = b""
+        lines.extend(self._read(tailed))
+        entries = (parse_local_line(line.decode("utf-8", errors="ignore")) for line in lines)
+        return [entry for entry in entries if entry]
+
+    @staticmethod
+    def _read(tailed: _TailedFile) -> List[bytes]:
+        data = tailed.handle.read(MAX_READ_BYTES)
+        if not data:
+            return []
+        data = tailed.partial + data
+        *lines, tailed.partial = data.split(b"\n")
+        return lines
+
+    def _close(self, path: Path) -> None:
+        tailed = self._files.pop(path, None)
+        if tailed is not None:
+            tailed.handle.close()
+
+    def close(self) -> None:
+        for path in list(self._files):
+            self._close(path)
+
+
+class RemoteLogCollector(threading.Thread):
+    """單台服務器的常駐日誌採集（SSH 長連接，斷開後退避重連）"""
+
+    def __init__(self, node_id: str, config: Dict[str, Any], callback: Callable[[Dict[str, Any]], None]):
+        super().__init__(name=f"log-collector-{node_id}", daemon=True)
+        self.node_id = node_id
+        self.config = dict(config)
+        self.callback = callback
+        self.connected = False
+        self.reconnects = 0
+        self._stop_event = threading.Event()
+        self._client = None
+
+    def command(self) -> str:
+        log_file = f"{self.config.get('deploy_dir', '/opt/group-ai')}/logs/worker.log"
+        return (
+            "if sudo journalctl -u group-ai-worker -n 1 --no-pager 2>/dev/null | grep -qv 'No entries'; "
+            "then sudo journalctl -u group-ai-worker -f -n 0 --no-pager 2>&1; "
+            f"else tail -n 0 -F {log_file} 2>/dev/null; fi"
+        )
+
+    def parse(self, line: str) -> Optional[Dict[str, Any]]:
+        return parse_journal_line(line, self.node_id) or parse_local_line(line, f"server_{self.node_id}")
+
+    def run(self) -> None:
+        try:
+            import paramiko
+        except ImportError:
+            logger.warning(f"paramiko未安裝，跳過服務器 {self.node_id} 的日誌採集")
+            return
+        attempt = 0
+        while not self._stop_event.is_set():
+            try:
+                self._client = paramiko.SSHClient()
+                self._client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                self._client.connect(
+                    self.config.get("host", ""),
+                    username=self.config.get("user", "ubuntu"),
+                    password=self.config.get("password", ""),
+                    timeout=5,
+                )
+                _, stdout, _ = self._client.exec_command(self.command())
+                self.connected = True
+                attempt = 0
+                for line in iter(stdout.readline, ""):
+                    if self._stop_event.is_set():
+                        break
+                    entry = self.parse(line)
+                    if entry:
+                        self.callback(entry)
+            except Exception as e:
+                if not self._stop_event.is_set():
+                    logger.warning(f"服務器 {self.node_id} 日誌採集中斷: {e}")
+            finally:
+                self.connected = False
+                self._close_client()
+            if self._stop_event.is_set():
+                break
+            self.reconnects += 1
+            self._stop_event.wait(REMOTE_RETRY_SECONDS[min(attempt, len(REMOTE_RETRY_SECONDS) - 1)])
+            attempt += 1
+
+    def _close_client(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._close_client()
+
+
+class LogStreamHub:
+    """日誌分發中心：採集一次，按過濾條件分發給所有訂閱者"""
+
+    def __init__(
+        self,
+        log_dir: Optional[Path] = None,
+        servers_loader: Optional[Callable[[], Dict[str, Any]]] = None,
+        poll_interval: float = POLL_INTERVAL,
+        history_size: int = HISTORY_SIZE,
+        client_queue_size: int = CLIENT_QUEUE_SIZE,
+    ):
+        self.log_dir = log_dir
+        self.servers_loader = servers_loader
+        self.poll_interval = poll_interval
+        self.client_queue_size = client_queue_size
+        self._subscribers: Set[LogSubscription] = set()
+        self._history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self._sequence = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._local_task: Optional[asyncio.Task] = None
+        self._collectors: Dict[str, RemoteLogCollector] = {}
+        self._counts: Dict[str, int] = {"published": 0, "filtered_out": 0}
+        self._by_source: Dict[str, int] = {}
+        self._started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._started_at is not None
+
+    async def subscribe(self, log_filter: LogFilter, history: int = 0) -> LogSubscription:
+        """新增訂閱者（先回放最近 history 條符合條件的日誌）"""
+        subscription = LogSubscription(log_filter, self.client_queue_size)
+        if history:
+            for entry in [entry for entry in self._history if log_filter.matches(entry)][-history:]:
+                subscription.offer(entry)
+        self._subscribers.add(subscription)
+        if not self.running:
+            self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: LogSubscription) -> None:
+        self._subscribers.discard(subscription)
+        if not self._subscribers:
+            self.stop()
+
+    def publish(self, entry: Dict[str, Any]) -> None:
+        """分發一條日誌（只能在事件循環線程調用，其他線程經 call_soon_threadsafe）"""
+        self._sequence += 1
+        entry = {**entry, "id": f"stream_{self._sequence}", "level": normalize_level(entry.get("level", "info"))}
+        self._history.append(entry)
+        self._counts["published"] += 1
+        source = str(entry.get("source", ""))
+        self._by_source[source] = self._by_source.get(source, 0) + 1
+        for subscription in list(self._subscribers):
+            if subscription.filter.matches(entry):
+                subscription.offer(entry)
+            else:
+                self._counts["filtered_out"] += 1
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._started_at = time.time()
+        log_dir = self.log_dir or find_local_log_dir()
+        if log_dir is not None:
+            self._local_task = self._loop.create_task(self._tail_local(LocalLogTailer(log_dir)))
+        servers = {}
+        if self.servers_loader is not None:
+            try:
+                servers = self.servers_loader() or {}
+            except Exception as e:
+                logger.warning(f"加載服務器配置失敗，僅跟蹤本地日誌: {e}")
+        for node_id, config in servers.items():
+            collector = RemoteLogCollector(node_id, config, self._publish_threadsafe)
+            self._collectors[node_id] = collector
+            collector.start()
+        logger.info(f"日誌實時推送已啟動（本地目錄: {log_dir}，遠程服務器: {len(self._collectors)}）")
+
+    def stop(self) -> None:
+        if self._local_task is not None:
+            self._local_task.cancel()
+            self._local_task = None
+        for collector in self._collectors.values():
+            collector.stop()
+        self._collectors.clear()
+        self._started_at = None
+
+    def _publish_threadsafe(self, entry: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.publish, entry)
+
+    async def _tail_local(self, tailer: LocalLogTailer) -> None:
+        try:
+            while True:
+                for entry in await asyncio.to_thread(tailer.poll):
+                    self.publish(entry)
+                await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            tailer.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "uptime_seconds": round(time.time() - self._started_at, 1) if self._started_at else 0,
+            "subscribers": len(self._subscribers),
+            **self._counts,
+            "published_by_source": dict(self._by_source),
+            "dropped": sum(subscription.dropped for subscription in self._subscribers),
+            "remote_collectors": {
+                node_id: {"connected": collector.connected, "reconnects": collector.reconnects}
+                for node_id, collector in self._collectors.items()
+            },
+        }
+
+
+def format_sse(entry: Dict[str, Any], event: str = "log") -> str:
+    """格式化為 Server-Sent Events 消息"""
+    data = json.dumps(entry, ensure_ascii=False, default=str)
+    event_id = entry.get("id")
+    return (f"id: {event_id}\n" if event_id else "") + f"event: {event}\ndata: {data}\n\n"
+
+
+_log_stream_hub: Optional[LogStreamHub] = None
+
+
+def get_log_stream_hub() -> LogStreamHub:
+    """獲取全局日誌分發中心"""
+    global _log_stream_hub
+    if _log_stream_hub is None:
+        from app.api.group_ai.servers import load_server_configs
+        _log_stream_hub = LogStreamHub(servers_loader=load_server_configs)
+    return _log_stream_hub
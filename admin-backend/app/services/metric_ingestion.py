@@ -0,0 +1,329 @@
+"""
+指標寫入管道 - 內存預聚合、按間隔批量寫入分鐘匯總
+
+記錄 token 用量、錯誤、響應時間等指標時調用 record_metric，只在內存中按 (賬號, 類型, 分鐘) 累加，
+不觸碰數據庫；後台線程每 metrics_flush_interval_seconds 秒把累積結果經寫入隊列（app.db.WriteQueue）
+一次提交：
+- 分鐘匯總 group_ai_metric_rollups：一條 ON CONFLICT executemany 累加 (點數, 值之和)
+- 儀表板計數行：按同一批匯總計算增量（與 ORM 寫入 GroupAIMetric 時 flush 事件的效果一致）
+- 原始指標行（metrics_store_raw_points 開啟時；error 類型始終保存，儀表板的最近錯誤列表讀取其
+  extra_data）：Core 批量插入，繞過 ORM 事件，不重複計數
+
+趨勢查詢（監控歷史接口的 token_usage / response_time）經 query_metric_series 從分鐘匯總讀取。
+
+保留策略（夜間系統任務 metric_retention）：原始行保留 metrics_raw_retention_days 天，匯總保留
+metrics_rollup_retention_days 天；PostgreSQL 上匯總表按月分區，過期時直接刪除整個分區。
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.group_ai import GroupAIMetric, GroupAIMetricRollup
+from app.services.dashboard_counters import apply_metric_rollups, minute_bucket
+
+logger = logging.getLogger(__name__)
+
+RollupKey = Tuple[str, str, datetime]
+
+# 無論 store_raw_points 是否開啟都保存原始行的指標類型（數量少，明細需要展示）
+ALWAYS_RAW_METRIC_TYPES = frozenset({"error"})
+
+_metrics = GroupAIMetric.__table__
+_rollups = GroupAIMetricRollup.__table__
+
+
+class MetricIngestor:
+    """指標預聚合緩衝區（線程安全）"""
+
+    def __init__(
+        self,
+        flush_interval: float = 5.0,
+        store_raw_points: bool = False,
+        max_raw_points: int = 10000,
+        write_queue=None,
+    ):
+        self.flush_interval = flush_interval
+        self.store_raw_points = store_raw_points
+        self.max_raw_points = max_raw_points
+        self._write_queue = write_queue
+        self._lock = threading.Lock()
+        self._rollups: Dict[RollupKey, List[float]] = defaultdict(lambda: [0, 0.0])
+        self._raw: Deque[Dict[str, Any]] = deque(maxlen=max_raw_points)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"points": 0, "flushes": 0, "rows_written": 0, "raw_written": 0, "raw_dropped": 0, "failed_flushes": 0}
+        self._last_flush_ms = 0.0
+
+    def record(
+        self,
+        metric_type: str,
+        value: float,
+        account_id: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
+        extra_data: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """記錄一個指標點（只更新內存）"""
+        timestamp = timestamp or datetime.now()
+        value = float(value or 0.0)
+        with self._lock:
+            rollup = self._rollups[(account_id or "", metric_type, minute_bucket(timestamp))]
+            rollup[0] += 1
+            rollup[1] += value
+            self._stats["points"] += 1
+            if self.store_raw_points or metric_type in ALWAYS_RAW_METRIC_TYPES:
+                if len(self._raw) == self._raw.maxlen:
+                    # 原始點只是明細，積壓時丟棄最舊的；匯總不受影響
+                    self._stats["raw_dropped"] += 1
+                self._raw.append({
+                    "id": str(uuid.uuid4()),
+                    "account_id": account_id,
+                    "metric_type": metric_type,
+                    "metric_value": value,
+                    "timestamp": timestamp,
+                    "extra_data": extra_data,
+                })
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rollups)
+
+    def flush(self) -> int:
+        """把緩衝區寫入數據庫（一個事務），返回寫入的匯總行數；失敗時放回緩衝區等待下次重試"""
+        with self._lock:
+            rollups, self._rollups = self._rollups, defaultdict(lambda: [0, 0.0])
+            raw, self._raw = list(self._raw), deque(maxlen=self.max_raw_points)
+        if not rollups and not raw:
+            return 0
+
+        started = time.perf_counter()
+        try:
+            self._get_write_queue().execute(lambda session: write_metric_batch(session, rollups, raw))
+        except Exception as e:
+            logger.warning(f"指標批量寫入失敗，將在下次重試: {e}")
+            with self._lock:
+                for key, (count, value_sum) in rollups.items():
+                    rollup = self._rollups[key]
+                    rollup[0] += count
+                    rollup[1] += value_sum
+                self._raw = deque(raw + list(self._raw), maxlen=self.max_raw_points)
+                self._stats["failed_flushes"] += 1
+            return 0
+
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["rows_written"] += len(rollups)
+            self._stats["raw_written"] += len(raw)
+            self._last_flush_ms = (time.perf_counter() - started) * 1000
+        return len(rollups)
+
+    def _get_write_queue(self):
+        if self._write_queue is None:
+            from app.db import get_write_queue
+            self._write_queue = get_write_queue()
+        return self._write_queue
+
+    def start(self) -> None:
+        """啟動後台刷寫線程"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="metric-ingestion", daemon=True)
+        self._thread.start()
+        logger.info(f"指標寫入管道已啟動，刷寫間隔: {self.flush_interval} 秒")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """停止後台線程並刷寫剩餘數據"""
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:  # 防止刷寫線程意外退出
+                logger.error(f"指標刷寫異常: {e}", exc_info=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "pending_rollups": len(self._rollups),
+                "pending_raw": len(self._raw),
+                "store_raw_points": self.store_raw_points,
+                "flush_interval": self.flush_interval,
+                "last_flush_ms": round(self._last_flush_ms, 3),
+            }
+
+
+def write_metric_batch(session: Session, rollups: Dict[RollupKey, List[float]], raw: List[Dict[str, Any]]) -> None:
+    """在調用方的事務中寫入一批匯總、對應的儀表板計數增量和原始指標行"""
+    connection = session.connection()
+    if raw:
+        connection.execute(insert(_metrics), raw)
+    apply_metric_rollups(connection, rollups)
+
+
+# ========== 保留策略與分區 ==========
+
+
+def _is_partitioned(connection: Connection) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'group_ai_metric_rollups'::regclass")
+    ).first() is not None
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value: datetime) -> datetime:
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"group_ai_metric_rollups_{month:%Y%m}"
+
+
+def ensure_rollup_partitions(connection: Connection, now: Optional[datetime] = None, months_ahead: int = 2) -> List[str]:
+    """PostgreSQL 分區表：預先創建本月及之後 months_ahead 個月的分區"""
+    if not _is_partitioned(connection):
+        return []
+    created = []
+    month = _month_start(now or datetime.now())
+    for _ in range(months_ahead + 1):
+        upper = _next_month(month)
+        name = partition_name(month)
+        try:
+            # 默認分區中已有該月數據時無法創建，保留在默認分區
+            with connection.begin_nested():
+                connection.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF group_ai_metric_rollups '
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+                ))
+            created.append(name)
+        except Exception as e:
+            logger.warning(f"創建指標匯總分區 {name} 失敗: {e}")
+        month = upper
+    return created
+
+
+def prune_metrics(
+    db: Session,
+    raw_retention_days: int,
+    rollup_retention_days: int,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """刪除過期的原始指標行和匯總（不調整儀表板計數：過期數據的匯總已計入計數行）"""
+    now = now or datetime.now()
+    connection = db.connection()
+    raw_cutoff = now - timedelta(days=raw_retention_days)
+    rollup_cutoff = now - timedelta(days=rollup_retention_days)
+    result = {"raw_deleted": 0, "rollups_deleted": 0, "partitions_dropped": 0}
+
+    result["raw_deleted"] = connection.execute(delete(_metrics).where(_metrics.c.timestamp < raw_cutoff)).rowcount or 0
+
+    if _is_partitioned(connection):
+        ensure_rollup_partitions(connection, now)
+        month = _month_start(rollup_cutoff)
+        for (name,) in connection.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'group_ai_metric_rollups'::regclass AND c.relname ~ '_[0-9]{6}$'"
+        )).all():
+            # 整個月份都早於保留期的分區直接刪除
+            if name < partition_name(month):
+                connection.execute(text(f'DROP TABLE "{name}"'))
+                result["partitions_dropped"] += 1
+    result["rollups_deleted"] = connection.execute(
+        delete(_rollups).where(_rollups.c.bucket < rollup_cutoff)
+    ).rowcount or 0
+    db.commit()
+    return result
+
+
+def query_metric_series(
+    db: Session,
+    metric_type: str,
+    start: datetime,
+    end: datetime,
+    account_id: Optional[str] = None,
+    interval_minutes: int = 60,
+) -> List[Dict[str, Any]]:
+    """從分鐘匯總按間隔讀取序列（按 (metric_type, bucket) 或主鍵 (account_id, metric_type, bucket) 範圍掃描）"""
+    query = db.query(
+        GroupAIMetricRollup.bucket, func.sum(GroupAIMetricRollup.count), func.sum(GroupAIMetricRollup.value_sum)
+    ).filter(
+        GroupAIMetricRollup.metric_type == metric_type,
+        GroupAIMetricRollup.bucket >= minute_bucket(start),
+        GroupAIMetricRollup.bucket < end,
+    )
+    if account_id is not None:
+        query = query.filter(GroupAIMetricRollup.account_id == account_id)
+    series: Dict[datetime, List[float]] = defaultdict(lambda: [0, 0.0])
+    interval = interval_minutes * 60
+    origin = minute_bucket(start)
+    for bucket, count, value_sum in query.group_by(GroupAIMetricRollup.bucket):
+        slot = origin + timedelta(seconds=int((bucket - origin).total_seconds() // interval) * interval)
+        series[slot][0] += int(count or 0)
+        series[slot][1] += float(value_sum or 0.0)
+    return [
+        {"timestamp": slot.isoformat(), "count": count, "sum": value_sum, "avg": value_sum / count if count else 0.0}
+        for slot, (count, value_sum) in sorted(series.items())
+    ]
+
+
+def run_metric_retention() -> None:
+    """調度器系統任務入口（在線程池中執行）"""
+    from app.core.config import get_settings
+    from app.db import SessionLocal
+
+    settings = get_settings()
+    db = SessionLocal()
+    try:
+        result = prune_metrics(db, settings.metrics_raw_retention_days, settings.metrics_rollup_retention_days)
+        logger.info(f"指標保留策略執行完成: {result}")
+    finally:
+        db.close()
+
+
+_metric_ingestor: Optional[MetricIngestor] = None
+_metric_ingestor_lock = threading.Lock()
+
+
+def get_metric_ingestor() -> MetricIngestor:
+    """獲取全局指標寫入管道"""
+    global _metric_ingestor
+    if _metric_ingestor is None:
+        with _metric_ingestor_lock:
+            if _metric_ingestor is None:
+                from app.core.config import get_settings
+                settings = get_settings()
+                _metric_ingestor = MetricIngestor(
+                    flush_interval=settings.metrics_flush_interval_seconds,
+                    store_raw_points=settings.metrics_store_raw_points,
+                    max_raw_points=settings.metrics_max_buffered_raw_points,
+                )
+    return _metric_ingestor
+
+
+def record_metric(
+    metric_type: str,
+    value: float,
+    account_id: Optional[str] = None,
+    timestamp: Optional[datetime] = None,
+    extra_data: Optional[Dict[str, Any]] = None,
+) -> None:
+    """記錄指標點（供記錄 token 用量、錯誤、響應時間的服務調用，不阻塞調用方）"""
+    get_metric_ingestor().record(metric_type, value, account_id, timestamp, extra_data)
@@ -3,17 +3,27 @@
 """
 import logging
 import smtplib
+import sys
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import List, Dict, Any, Optional
 from datetime import datetime
+from pathlib import Path
 import httpx
 from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.models.notification import NotificationType, NotificationStatus
+
+# 添加項目根目錄到路徑（模板編譯器位於 group_ai_service）
+project_root = Path(__file__).parent.parent.parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from group_ai_service.template_compiler import compile_format_template
 from app.crud.notification import (
     create_notification,
+    get_unread_count,
     update_notification_status,
     get_notification_config,
     list_notification_configs,
@@ -35,9 +45,9 @@ class NotificationService:
         self.settings = get_settings()
 
     def _render_template(self, template_str: str, context: Dict[str, Any]) -> str:
-        """使用簡單格式化渲染模板"""
+        """渲染 str.format 風格的模板（編譯結果按模板內容緩存，不會每條通知重新解析）"""
         try:
-            return template_str.format(**context)
+            return compile_format_template(template_str).render(context)
         except Exception as exc:  # noqa: BLE001
             logger.warning(f"渲染模板失敗: {exc}")
             return template_str
@@ -79,8 +89,14 @@ class NotificationService:
         base_title: str,
         base_message: str,
         metadata: Optional[Dict[str, Any]] = None,
+        recipients: Optional[List[str]] = None,
     ) -> Dict[str, Any]:
-        """套用匹配的通知模板"""
+        """
+        套用匹配的通知模板
+
+        傳入 recipients 時額外返回 by_recipient：每個接收者的 (標題, 內容)，
+        模板只查詢和編譯一次，逐個接收者只替換 {recipient} 等字段
+        """
         template = find_matching_template(
             self.db,
             notification_type=notification_type,
@@ -89,11 +105,14 @@ class NotificationService:
             resource_type=resource_type,
         )
         if not template:
-            return {
+            result = {
                 "title": base_title,
                 "message": base_message,
                 "metadata": metadata,
             }
+            if recipients is not None:
+                result["by_recipient"] = {recipient: (base_title, base_message) for recipient in recipients}
+            return result
 
         context = self._build_template_context(
             alert_level=alert_level,
@@ -109,11 +128,20 @@ class NotificationService:
         merged_metadata = {**(template.default_metadata or {}), **(metadata or {})}
         merged_metadata["template_id"] = template.id
 
-        return {
+        result = {
             "title": rendered_title,
             "message": rendered_message,
             "metadata": merged_metadata,
         }
+        if recipients is not None:
+            result["by_recipient"] = {
+                recipient: (
+                    self._render_template(template.title_template, {**context, "recipient": recipient}),
+                    self._render_template(template.body_template, {**context, "recipient": recipient}),
+                )
+                for recipient in recipients
+            }
+        return result
     
     async def send_email(
         self,
@@ -228,6 +256,10 @@ class NotificationService:
                     notification_id=notification.id,
                     status=NotificationStatus.SENT,
                 )
+                if connection_manager.is_connected(recipient):
+                    await connection_manager.push_unread_count(
+                        recipient, get_unread_count(self.db, recipient=recipient)
+                    )
             else:
                 # 如果連接管理器不可用，標記為待發送
                 update_notification_status(
@@ -421,13 +453,15 @@ class NotificationService:
                 base_title=alert_title,
                 base_message=alert_message,
                 metadata=metadata_payload,
+                recipients=config.recipients,
             )
             for recipient in config.recipients:
+                title, message = rendered["by_recipient"][recipient]
                 result = await self.send_notification(
                     notification_type=config.notification_type,
                     recipients=[recipient],
-                    title=rendered["title"],
-                    message=rendered["message"],
+                    title=title,
+                    message=message,
                     level=alert_level,
                     event_type=event_type,
                     resource_type=resource_type,
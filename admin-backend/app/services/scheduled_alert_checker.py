@@ -88,12 +88,20 @@ class ScheduledAlertChecker:
         except Exception as e:
             logger.error(f"定時告警檢查服務錯誤: {e}", exc_info=True)
     
+    async def _check_if_leader(self):
+        """多進程部署時只由持有調度租約的進程執行檢查，避免每個 worker 重複檢查"""
+        from app.core.leader_lease import get_leader_lease
+        if await asyncio.to_thread(get_leader_lease("scheduler").check):
+            await self._check_alerts()
+        else:
+            logger.debug("本進程不是調度領導者，跳過定時告警檢查")
+    
     async def _run_periodic(self):
         """週期性執行告警檢查"""
         logger.info(f"定時告警檢查服務已啟動，檢查間隔: {self.interval_seconds} 秒")
         
         # 立即執行一次檢查
-        await self._check_alerts()
+        await self._check_if_leader()
         
         while not self.stop_event.is_set():
             try:
@@ -107,7 +115,7 @@ class ScheduledAlertChecker:
                     break
             except asyncio.TimeoutError:
                 # 超時表示間隔時間到了，執行檢查
-                await self._check_alerts()
+                await self._check_if_leader()
         
         logger.info("定時告警檢查服務已停止")
     
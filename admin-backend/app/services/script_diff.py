@@ -0,0 +1,184 @@
+"""
+劇本結構化差異 - 按場景、觸發條件和回復對比兩個版本的 YAML
+
+差異項格式：{"type": ..., "description": ..., 以及 scene / index / old / new 等細節}
+- metadata_changed：頂層字段（version、description、states、variables、metadata 等）
+- scene_added / scene_removed / scene_changed：場景增刪及 next_scene、timeout 等場景字段
+- trigger_added / trigger_removed / trigger_changed、response_added / response_removed / response_changed：
+  場景內觸發條件與回復的變化（按列表順序對齊，未變的條目不影響對齊）
+YAML 無法解析時退回行級統計（content_changed）。結果按兩個內容哈希緩存。
+"""
+import difflib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config_registry import load_yaml_text
+from app.services.script_version_store import content_hash
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 128
+# 場景內以列表形式對比的字段及其差異類型前綴
+ITEM_FIELDS = (("triggers", "trigger", "觸發條件"), ("responses", "response", "回復"))
+
+_cache: "OrderedDict[Tuple[str, str], List[Dict[str, Any]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _parse(text: str) -> Dict[str, Any]:
+    data = load_yaml_text(text) if text else {}
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        raise ValueError("劇本 YAML 頂層不是字典")
+    return data
+
+
+def _scenes(data: Dict[str, Any]) -> "OrderedDict[str, Dict[str, Any]]":
+    """場景統一為 {場景ID: 場景}（YAML 中可以是列表或字典）"""
+    raw = data.get("scenes") or []
+    scenes: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+    items = raw.items() if isinstance(raw, dict) else ((None, scene) for scene in raw)
+    for index, (key, scene) in enumerate(items):
+        if not isinstance(scene, dict):
+            scene = {"value": scene}
+        scene_id = str(scene.get("id") or key or f"#{index}")
+        scenes[scene_id] = scene
+    return scenes
+
+
+def _diff_items(scene_id: str, kind: str, label: str, old: List[Any], new: List[Any]) -> List[Dict[str, Any]]:
+    differences = []
+    old_keys = [_canonical(item) for item in old]
+    new_keys = [_canonical(item) for item in new]
+    matcher = difflib.SequenceMatcher(None, old_keys, new_keys, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        for offset in range(paired):
+            differences.append({
+                "type": f"{kind}_changed",
+                "description": f"場景 {scene_id} 的第 {j1 + offset + 1} 個{label}已修改",
+                "scene": scene_id,
+                "index": j1 + offset,
+                "old": old[i1 + offset],
+                "new": new[j1 + offset],
+            })
+        for index in range(i1 + paired, i2):
+            differences.append({
+                "type": f"{kind}_removed",
+                "description": f"場景 {scene_id} 刪除了{label}",
+                "scene": scene_id,
+                "index": index,
+                "old": old[index],
+            })
+        for index in range(j1 + paired, j2):
+            differences.append({
+                "type": f"{kind}_added",
+                "description": f"場景 {scene_id} 新增了{label}",
+                "scene": scene_id,
+                "index": index,
+                "new": new[index],
+            })
+    return differences
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _diff_scene(scene_id: str, old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    differences = []
+    item_fields = {field for field, _, _ in ITEM_FIELDS}
+    for key in sorted(set(old) | set(new), key=str):
+        if key in item_fields or key == "id" or _canonical(old.get(key)) == _canonical(new.get(key)):
+            continue
+        differences.append({
+            "type": "scene_changed",
+            "description": f"場景 {scene_id} 的 {key} 已變更",
+            "scene": scene_id,
+            "field": key,
+            "old": old.get(key),
+            "new": new.get(key),
+        })
+    for field, kind, label in ITEM_FIELDS:
+        differences.extend(_diff_items(scene_id, kind, label, _as_list(old.get(field)), _as_list(new.get(field))))
+    return differences
+
+
+def _line_summary(old_text: str, new_text: str) -> List[Dict[str, Any]]:
+    added = removed = 0
+    for line in difflib.unified_diff(old_text.splitlines(), new_text.splitlines(), lineterm="", n=0):
+        if line.startswith("+") and not line.startswith("+++"):
+            added += 1
+        elif line.startswith("-") and not line.startswith("---"):
+            removed += 1
+    return [{
+        "type": "content_changed",
+        "description": f"YAML內容已變更（+{added} / -{removed} 行）",
+        "lines_added": added,
+        "lines_removed": removed,
+    }]
+
+
+def structural_diff(old_text: Optional[str], new_text: Optional[str]) -> List[Dict[str, Any]]:
+    """對比兩個版本的劇本 YAML，返回差異列表（內容相同時為空）"""
+    old_text = old_text or ""
+    new_text = new_text or ""
+    key = (content_hash(old_text), content_hash(new_text))
+    if key[0] == key[1]:
+        return []
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return list(cached)
+
+    try:
+        differences = _structural_diff(_parse(old_text), _parse(new_text))
+        if not differences:
+            # 結構相同而文本不同（註釋、格式、鍵順序）
+            differences = [{"type": "format_changed", "description": "僅格式或註釋變更"}]
+    except Exception as e:
+        logger.debug(f"劇本 YAML 無法解析，使用行級對比: {e}")
+        differences = _line_summary(old_text, new_text)
+
+    with _cache_lock:
+        _cache[key] = differences
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return list(differences)
+
+
+def _structural_diff(old: Dict[str, Any], new: Dict[str, Any]) -> List[Dict[str, Any]]:
+    differences = []
+    for key in sorted((set(old) | set(new)) - {"scenes"}, key=str):
+        if _canonical(old.get(key)) != _canonical(new.get(key)):
+            differences.append({
+                "type": "metadata_changed",
+                "description": f"{key} 已變更",
+                "field": key,
+                "old": old.get(key),
+                "new": new.get(key),
+            })
+
+    old_scenes, new_scenes = _scenes(old), _scenes(new)
+    for scene_id in old_scenes:
+        if scene_id not in new_scenes:
+            differences.append({"type": "scene_removed", "description": f"刪除場景 {scene_id}", "scene": scene_id})
+    for scene_id, scene in new_scenes.items():
+        if scene_id not in old_scenes:
+            differences.append({"type": "scene_added", "description": f"新增場景 {scene_id}", "scene": scene_id})
+        elif _canonical(old_scenes[scene_id]) != _canonical(scene):
+            differences.extend(_diff_scene(scene_id, old_scenes[scene_id], scene))
+    return differences
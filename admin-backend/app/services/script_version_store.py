@@ -0,0 +1,311 @@
+"""
+劇本版本內容存儲 - 按內容哈希去重、壓縮的差異鏈與定期完整快照
+
+GroupAIScriptVersion 只保存 content_hash，YAML 內容存於 group_ai_script_blobs：
+
+- 相同內容（SHA-256 相同）只存一份，重複保存/恢復同一版本不再增加數據量
+- 新內容相對同一劇本的上一版本做行級差異（difflib），差異為 JSON 操作列表：
+  [i1, i2] 表示複製基準內容的第 i1..i2 行，字符串表示插入的文本
+- 每 SNAPSHOT_INTERVAL 層差異、或差異不比完整內容小時存完整快照，限制還原時需要回放的鏈長度
+- 數據用 zstd 壓縮（未安裝 zstandard 時退回 zlib），每個 blob 記錄自己的 codec，兩種可以混用
+- 內容在 Session 的 before_flush 中寫入，與版本行處於同一事務；還原結果按哈希緩存（內容不可變）
+- 維護任務 maintain_script_blobs：把舊的內聯 yaml_content 遷入存儲，並清理不再被引用的 blob
+"""
+import difflib
+import hashlib
+import json
+import logging
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import delete, desc, event, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.group_ai import GroupAIScriptBlob, GroupAIScriptVersion
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard 為可選依賴
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 連續差異的最大層數，超過後存完整快照
+SNAPSHOT_INTERVAL = 16
+ZSTD_LEVEL = 10
+DEFAULT_CODEC = "zstd" if zstandard is not None else "zlib"
+# 還原內容緩存的條目數
+CACHE_SIZE = 256
+# 維護任務每批遷移的版本數
+MIGRATE_BATCH_SIZE = 200
+
+_blobs = GroupAIScriptBlob.__table__
+_versions = GroupAIScriptVersion.__table__
+
+DeltaOp = Union[List[int], str]
+
+
+def content_hash(text: str) -> str:
+    """內容哈希（SHA-256 十六進制）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _compress(payload: bytes, codec: str = DEFAULT_CODEC) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return zlib.compress(payload, 9)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("劇本內容使用 zstd 壓縮，但未安裝 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"未知的壓縮格式: {codec}")
+
+
+def make_delta(base: str, target: str) -> List[DeltaOp]:
+    """計算 target 相對 base 的行級差異"""
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    ops: List[DeltaOp] = []
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i1, i2])
+        elif j2 > j1:
+            text = "".join(target_lines[j1:j2])
+            if ops and isinstance(ops[-1], str):
+                ops[-1] += text
+            else:
+                ops.append(text)
+    return ops
+
+
+def apply_delta(base: str, ops: List[DeltaOp]) -> str:
+    """回放 make_delta 的結果"""
+    base_lines = base.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        else:
+            parts.extend(base_lines[op[0]:op[1]])
+    return "".join(parts)
+
+
+def encode_blob(
+    text: str,
+    base_hash: Optional[str] = None,
+    base_text: Optional[str] = None,
+    base_depth: int = 0,
+    codec: str = DEFAULT_CODEC,
+) -> Dict[str, Any]:
+    """編碼內容：有基準且未達快照間隔時存差異（比完整內容小才用），否則存完整快照"""
+    raw = text.encode("utf-8")
+    full = _compress(raw, codec)
+    values = {
+        "content_hash": content_hash(text),
+        "base_hash": None,
+        "codec": codec,
+        "chain_depth": 0,
+        "size": len(raw),
+        "data": full,
+    }
+    if base_hash and base_text is not None and base_depth + 1 < SNAPSHOT_INTERVAL:
+        delta = _compress(json.dumps(make_delta(base_text, text), ensure_ascii=False).encode("utf-8"), codec)
+        if len(delta) < len(full):
+            values.update(base_hash=base_hash, chain_depth=base_depth + 1, data=delta)
+    return values
+
+
+class _ContentCache:
+    """按哈希緩存還原後的內容（線程安全的 LRU）"""
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str) -> Optional[str]:
+        with self._lock:
+            text = self._items.get(digest)
+            if text is not None:
+                self._items.move_to_end(digest)
+            return text
+
+    def put(self, digest: str, text: str) -> None:
+        with self._lock:
+            self._items[digest] = text
+            self._items.move_to_end(digest)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+_cache = _ContentCache()
+
+
+def clear_content_cache() -> None:
+    _cache.clear()
+
+
+def _load_with_connection(connection: Connection, digest: str) -> str:
+    cached = _cache.get(digest)
+    if cached is not None:
+        return cached
+    # 沿差異鏈找到完整快照（或已緩存的內容），再按順序回放
+    chain = []
+    text: Optional[str] = None
+    current: Optional[str] = digest
+    while current:
+        cached = _cache.get(current)
+        if cached is not None:
+            text = cached
+            break
+        row = connection.execute(
+            select(_blobs.c.base_hash, _blobs.c.codec, _blobs.c.data).where(_blobs.c.content_hash == current)
+        ).first()
+        if row is None:
+            raise LookupError(f"劇本內容 {current} 不存在")
+        chain.append((current, row))
+        current = row.base_hash
+        if len(chain) > SNAPSHOT_INTERVAL * 4:
+            raise ValueError(f"劇本內容 {digest} 的差異鏈過長")
+
+    for current, row in reversed(chain):
+        payload = _decompress(row.codec, row.data).decode("utf-8")
+        text = payload if row.base_hash is None else apply_delta(text, json.loads(payload))
+        _cache.put(current, text)
+    return text
+
+
+def load_content(session: Optional[Session], digest: str) -> str:
+    """按哈希還原內容；session 為空（對象已分離）時使用臨時會話"""
+    cached = _cache.get(digest)
+    if cached is not None:
+        return cached
+    if session is not None:
+        return _load_with_connection(session.connection(), digest)
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return _load_with_connection(db.connection(), digest)
+    finally:
+        db.close()
+
+
+def _blob_depth(connection: Connection, digest: str) -> Optional[int]:
+    return connection.execute(
+        select(_blobs.c.chain_depth).where(_blobs.c.content_hash == digest)
+    ).scalar()
+
+
+def _latest_stored(connection: Connection, script_id: str) -> Optional[Tuple[str, int]]:
+    """同一劇本最近一個已存儲版本的 (哈希, 鏈深度)，作為差異基準"""
+    digest = connection.execute(
+        select(_versions.c.content_hash)
+        .where(_versions.c.script_id == script_id, _versions.c.content_hash.isnot(None))
+        .order_by(desc(_versions.c.created_at))
+        .limit(1)
+    ).scalar()
+    if not digest:
+        return None
+    depth = _blob_depth(connection, digest)
+    return None if depth is None else (digest, depth)
+
+
+@event.listens_for(Session, "before_flush")
+def _store_pending_contents(session: Session, flush_context, instances) -> None:
+    versions = [
+        obj for obj in list(session.new) + list(session.dirty)
+        if isinstance(obj, GroupAIScriptVersion) and obj.__dict__.get("_pending_content")
+    ]
+    if not versions:
+        return
+    connection = session.connection()
+    # 本次 flush 中已處理的內容：哈希 -> (文本, 鏈深度)；劇本 -> 最近的哈希
+    stored: Dict[str, Tuple[str, int]] = {}
+    latest: Dict[str, str] = {}
+    for version in versions:
+        digest, text = version.__dict__["_pending_content"]
+        if digest != version.content_hash:
+            continue
+        if digest not in stored:
+            depth = _blob_depth(connection, digest)
+            if depth is None:
+                base = latest.get(version.script_id)
+                base_entry = (base, stored[base][1]) if base else _latest_stored(connection, version.script_id)
+                base_hash, base_depth = base_entry or (None, 0)
+                base_text = None
+                if base_hash:
+                    base_text = stored[base_hash][0] if base_hash in stored else _load_with_connection(connection, base_hash)
+                values = encode_blob(text, base_hash, base_text, base_depth)
+                session.add(GroupAIScriptBlob(**values))
+                depth = values["chain_depth"]
+            stored[digest] = (text, depth)
+            _cache.put(digest, text)
+        latest[version.script_id] = digest
+
+
+def migrate_inline_contents(db: Session, batch_size: int = MIGRATE_BATCH_SIZE) -> int:
+    """把仍內聯保存 yaml_content 的舊版本遷入存儲，返回遷移數量"""
+    migrated = 0
+    while True:
+        versions = db.query(GroupAIScriptVersion).filter(
+            GroupAIScriptVersion.content_hash.is_(None),
+            GroupAIScriptVersion.inline_content.isnot(None),
+        ).order_by(GroupAIScriptVersion.script_id, GroupAIScriptVersion.created_at).limit(batch_size).all()
+        if not versions:
+            return migrated
+        for version in versions:
+            version.yaml_content = version.inline_content
+        db.commit()
+        migrated += len(versions)
+
+
+def collect_unreferenced_blobs(db: Session) -> int:
+    """刪除沒有版本引用、也不是被引用內容的差異基準的 blob，返回刪除數量"""
+    referenced: Set[str] = set(db.execute(
+        select(_versions.c.content_hash).where(_versions.c.content_hash.isnot(None)).distinct()
+    ).scalars())
+    bases = dict(db.execute(select(_blobs.c.content_hash, _blobs.c.base_hash)).all())
+
+    live: Set[str] = set()
+    for digest in referenced:
+        while digest and digest not in live and digest in bases:
+            live.add(digest)
+            digest = bases[digest]
+
+    garbage = [digest for digest in bases if digest not in live]
+    for start in range(0, len(garbage), 500):
+        db.execute(delete(_blobs).where(_blobs.c.content_hash.in_(garbage[start:start + 500])))
+    db.commit()
+    return len(garbage)
+
+
+def maintain_script_blobs(db: Session) -> Dict[str, int]:
+    """遷移舊的內聯內容並清理無引用的 blob"""
+    result = {"migrated": migrate_inline_contents(db), "collected": collect_unreferenced_blobs(db)}
+    logger.info(f"劇本版本內容維護完成: 遷移 {result['migrated']} 個版本，清理 {result['collected']} 個 blob")
+    return result
+
+
+def run_script_blob_maintenance() -> None:
+    """調度器系統任務入口（在線程池中執行）"""
+    from app.db import SessionLocal
+
+    db = SessionLocal()
+    try:
+        maintain_script_blobs(db)
+    finally:
+        db.close()
@@ -458,11 +458,10 @@ class TaskExecutor:
             raise
     
     async def _execute_data_export(self, config: Dict[str, Any], db: Session) -> Dict[str, Any]:
-        """執行數據導出"""
+        """執行數據導出（通過流式導出引擎生成文件）"""
         try:
             export_type = config.get("export_type", "csv")  # csv, excel, pdf
-            data_type = config.get("data_type")  # accounts, scripts, sessions, etc.
-            filters = config.get("filters", {})
+            data_type = config.get("data_type")  # accounts, scripts, schemes
             
             if not data_type:
                 return {
@@ -470,14 +469,33 @@ class TaskExecutor:
                     "export_completed": False,
                 }
             
-            # 這裡可以實現實際的導出邏輯
-            # 暫時返回成功
+            from app.services.export_engine import (
+                ExportFormatError,
+                ExportUnavailableError,
+                get_export_job_manager,
+            )
+            
+            manager = get_export_job_manager()
+            try:
+                job = manager.create_job(data_type, export_type, created_by="automation")
+            except (ExportFormatError, ExportUnavailableError) as e:
+                return {
+                    "message": str(e),
+                    "export_completed": False,
+                }
+            
+            job = await manager.run_job(job)
+            if job.status != "completed":
+                raise RuntimeError(job.error or "數據導出失敗")
             
             return {
                 "message": f"數據導出完成（{export_type}）",
                 "export_completed": True,
                 "export_type": export_type,
                 "data_type": data_type,
+                "job_id": job.job_id,
+                "filename": job.filename,
+                "row_count": job.row_count,
             }
         except Exception as e:
             logger.error(f"執行數據導出失敗: {e}", exc_info=True)
@@ -675,14 +693,24 @@ class TaskExecutor:
             }
     
     async def _execute_data_backup(self, config: Dict[str, Any], db: Session) -> Dict[str, Any]:
-        """執行數據備份"""
+        """執行數據備份（通過備份管理器完整備份並清理過期備份）"""
         try:
-            # 這裡可以實現數據備份邏輯
-            # 暫時返回成功
+            from app.core.auto_backup import get_backup_manager
+            from app.core.config import get_settings
+            
+            manager = get_backup_manager()
+            results = await manager.full_backup(
+                database_url=config.get("database_url") or get_settings().database_url,
+                sessions_dir=config.get("sessions_dir", "sessions"),
+                config_files=config.get("config_files"),
+            )
+            if config.get("cleanup", True):
+                await manager.cleanup_old_backups()
             
             return {
                 "message": "數據備份完成",
                 "backup_completed": True,
+                "files": {name: str(path) for name, path in results.items() if path},
             }
         except Exception as e:
             logger.error(f"執行數據備份失敗: {e}", exc_info=True)
@@ -1,62 +1,322 @@
 """
 任務調度器 - 管理定時任務的調度和執行
+
+多進程部署：
+- 任務存儲在數據庫（APScheduler SQLAlchemyJobStore），所有進程共享同一份調度狀態，
+  任一進程通過 API 增刪任務都寫入共享存儲
+- 只有持有領導者租約的進程運行調度（其他進程的調度器處於暫停狀態），每個任務在集群中只觸發一次；
+  領導者失聯後租約過期，其他進程接管，錯過的觸發按 misfire / coalesce 策略補執行或合併
+- 按任務動作類型限制同時執行數，並記錄調度延遲與執行耗時
 """
 import asyncio
+import importlib
 import logging
-from typing import Optional, Dict, Set
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Optional, Dict, Set, Tuple
 from datetime import datetime, timedelta
+from apscheduler.events import (
+    EVENT_JOB_ERROR,
+    EVENT_JOB_MAX_INSTANCES,
+    EVENT_JOB_MISSED,
+    EVENT_JOB_SUBMITTED,
+)
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.date import DateTrigger
 
-from app.db import SessionLocal
+from app.core.config import get_settings
+from app.core.leader_lease import LeaderLease, get_leader_lease
+from app.db import SessionLocal, get_write_queue
 from app.models.group_ai import GroupAIAutomationTask
 from app.models.unified_features import ScheduledMessageTask
 from app.services.task_executor import get_task_executor
 
 logger = logging.getLogger(__name__)
 
+# 持久化任務存儲中保存的是函數引用，需使用模塊級函數
+AUTOMATION_TASK_FUNC = "app.services.task_scheduler:run_automation_task"
+SCHEDULED_MESSAGE_FUNC = "app.services.task_scheduler:run_scheduled_message_task"
+SCHEDULED_MESSAGE_TYPE = "scheduled_message"
+SYSTEM_JOB_FUNC = "app.services.task_scheduler:run_system_job"
+SYSTEM_JOB_TYPE = "system"
+# 系統維護任務：名稱 -> (同步函數路徑, cron 參數)，由領導者進程註冊，在線程池中執行
+SYSTEM_JOBS: Dict[str, Tuple[str, Dict[str, Any]]] = {
+    "dashboard_compaction": ("app.services.dashboard_counters:run_dashboard_compaction", {"hour": 3, "minute": 15}),
+    "script_blob_maintenance": ("app.services.script_version_store:run_script_blob_maintenance", {"hour": 3, "minute": 45}),
+    "metric_retention": ("app.services.metric_ingestion:run_metric_retention", {"hour": 4, "minute": 0}),
+}
+
+
+async def run_automation_task(task_id: str) -> None:
+    """調度器觸發自動化任務"""
+    await get_task_scheduler()._execute_task_wrapper(task_id)
+
+
+async def run_scheduled_message_task(task_id: str) -> None:
+    """調度器觸發定時消息任務"""
+    await get_task_scheduler()._execute_scheduled_message_task(task_id)
+
+
+async def run_system_job(name: str) -> None:
+    """調度器觸發系統維護任務"""
+    await get_task_scheduler()._execute_system_job(name)
+
+
+@dataclass
+class JobTypeMetrics:
+    """單個任務類型的調度指標"""
+    runs: int = 0
+    failures: int = 0
+    missed: int = 0  # 超過寬限時間被放棄的觸發
+    skipped: int = 0  # 上一次尚未結束而跳過的觸發
+    lag_count: int = 0
+    lag_ms_total: float = 0.0
+    lag_ms_max: float = 0.0
+    duration_ms_total: float = 0.0
+    duration_ms_max: float = 0.0
+    last_duration_ms: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "missed": self.missed,
+            "skipped": self.skipped,
+            "avg_lag_ms": round(self.lag_ms_total / self.lag_count, 1) if self.lag_count else 0.0,
+            "max_lag_ms": round(self.lag_ms_max, 1),
+            "avg_duration_ms": round(self.duration_ms_total / self.runs, 1) if self.runs else 0.0,
+            "max_duration_ms": round(self.duration_ms_max, 1),
+            "last_duration_ms": round(self.last_duration_ms, 1),
+        }
+
+
+class SchedulerMetrics:
+    """調度延遲（實際提交時間 - 計劃觸發時間）與執行耗時，按任務類型統計"""
+
+    def __init__(self):
+        self.by_type: Dict[str, JobTypeMetrics] = {}
+
+    def _get(self, job_type: str) -> JobTypeMetrics:
+        return self.by_type.setdefault(job_type, JobTypeMetrics())
+
+    def record_lag(self, job_type: str, lag_ms: float) -> None:
+        metrics = self._get(job_type)
+        metrics.lag_count += 1
+        metrics.lag_ms_total += lag_ms
+        metrics.lag_ms_max = max(metrics.lag_ms_max, lag_ms)
+
+    def record_run(self, job_type: str, duration_ms: float, success: bool) -> None:
+        metrics = self._get(job_type)
+        metrics.runs += 1
+        if not success:
+            metrics.failures += 1
+        metrics.duration_ms_total += duration_ms
+        metrics.duration_ms_max = max(metrics.duration_ms_max, duration_ms)
+        metrics.last_duration_ms = duration_ms
+
+    def record_missed(self, job_type: str) -> None:
+        self._get(job_type).missed += 1
+
+    def record_skipped(self, job_type: str) -> None:
+        self._get(job_type).skipped += 1
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        return {job_type: metrics.to_dict() for job_type, metrics in self.by_type.items()}
+
 
 class TaskScheduler:
     """任務調度器"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        job_store: Optional[str] = None,
+        lease: Optional[LeaderLease] = None,
+        concurrency_limits: Optional[Dict[str, int]] = None,
+    ):
+        settings = get_settings()
         self.scheduler: Optional[AsyncIOScheduler] = None
         self.scheduled_job_ids: Set[str] = set()
         self.is_running = False
+        self.is_leader = False
+        self.job_store = job_store or settings.scheduler_job_store
+        self.lease = lease
+        self.concurrency_limits = dict(
+            settings.scheduler_concurrency_limits if concurrency_limits is None else concurrency_limits
+        )
+        self.metrics = SchedulerMetrics()
+        # job_id -> 任務動作類型，用於按類型統計和限流
+        self._job_types: Dict[str, str] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._lease_task: Optional[asyncio.Task] = None
+    
+    def _create_scheduler(self) -> AsyncIOScheduler:
+        settings = get_settings()
+        jobstores = {}
+        if self.job_store == "database":
+            from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+            from app.db import engine
+            jobstores["default"] = SQLAlchemyJobStore(engine=engine, tablename="apscheduler_jobs")
+        scheduler = AsyncIOScheduler(
+            jobstores=jobstores,
+            job_defaults={
+                "coalesce": settings.scheduler_coalesce,
+                "misfire_grace_time": settings.scheduler_misfire_grace_seconds,
+                "max_instances": 1,
+            },
+        )
+        scheduler.add_listener(
+            self._on_job_event,
+            EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES | EVENT_JOB_ERROR,
+        )
+        return scheduler
     
     def start(self):
-        """啟動調度器"""
+        """啟動調度器（暫停狀態），取得領導者租約後才開始觸發任務"""
         if self.is_running:
             logger.warning("任務調度器已經在運行中")
             return
         
-        self.scheduler = AsyncIOScheduler()
-        self.scheduler.start()
+        self.scheduler = self._create_scheduler()
+        self.scheduler.start(paused=True)
         self.is_running = True
-        logger.info("任務調度器已啟動")
+        if self.lease is None:
+            self.lease = get_leader_lease("scheduler")
+        logger.info(f"任務調度器已啟動（任務存儲: {self.job_store}，租約: {self.lease.backend}）")
         
-        # 加載所有啟用的定時任務
-        self.load_scheduled_tasks()
+        self._lease_task = asyncio.create_task(self._lease_loop())
     
     def stop(self):
-        """停止調度器"""
+        """停止調度器並釋放領導者租約"""
         if not self.is_running:
             logger.warning("任務調度器未運行")
             return
         
+        if self._lease_task is not None:
+            self._lease_task.cancel()
+            self._lease_task = None
+        
         if self.scheduler:
-            self.scheduler.shutdown()
+            self.scheduler.shutdown(wait=False)
             self.scheduler = None
         
+        if self.lease is not None and self.is_leader:
+            self.lease.release()
+        
         self.scheduled_job_ids.clear()
         self.is_running = False
+        self.is_leader = False
         logger.info("任務調度器已停止")
     
+    async def _lease_loop(self):
+        """定期獲取 / 續約領導者租約"""
+        while True:
+            try:
+                await self.sync_leadership()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"同步調度器領導者狀態失敗: {e}", exc_info=True)
+            await asyncio.sleep(self.lease.renew_interval)
+    
+    async def sync_leadership(self) -> bool:
+        """
+        續約並切換調度器狀態：
+        成為領導者時從數據庫對賬任務並恢復調度；失去租約時暫停；
+        持續為領導者時喚醒調度器，使其他進程寫入共享存儲的任務變更及時生效
+        """
+        held = await asyncio.to_thread(self.lease.acquire)
+        if not self.scheduler:
+            return held
+        if held and not self.is_leader:
+            self.is_leader = True
+            self.load_scheduled_tasks()
+            self.scheduler.resume()
+            logger.info("本進程為調度領導者，開始觸發定時任務")
+        elif not held and self.is_leader:
+            self.is_leader = False
+            self.scheduler.pause()
+            logger.warning("本進程不再是調度領導者，已暫停定時任務")
+        elif held:
+            self.scheduler.wakeup()
+        return held
+    
+    def _job_type(self, job_id: str) -> str:
+        if job_id in self._job_types:
+            return self._job_types[job_id]
+        return SCHEDULED_MESSAGE_TYPE if job_id.startswith("scheduled_message_") else "unknown"
+    
+    def _on_job_event(self, event) -> None:
+        """APScheduler 事件監聽：調度延遲、錯過觸發、實例數已滿"""
+        job_type = self._job_type(event.job_id)
+        if event.code == EVENT_JOB_SUBMITTED:
+            scheduled = min(event.scheduled_run_times)
+            lag = datetime.now(scheduled.tzinfo) - scheduled
+            self.metrics.record_lag(job_type, max(lag.total_seconds(), 0.0) * 1000)
+        elif event.code == EVENT_JOB_MISSED:
+            self.metrics.record_missed(job_type)
+            logger.warning(f"定時任務 {event.job_id} 錯過觸發時間 {event.scheduled_run_time}，已超過寬限時間")
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            self.metrics.record_skipped(job_type)
+            logger.warning(f"定時任務 {event.job_id} 上一次執行尚未結束，跳過本次觸發")
+        elif event.code == EVENT_JOB_ERROR:
+            logger.error(f"定時任務 {event.job_id} 執行異常: {event.exception}")
+    
+    def _get_semaphore(self, job_type: str) -> Optional[asyncio.Semaphore]:
+        limit = self.concurrency_limits.get(job_type)
+        if not limit:
+            return None
+        semaphore = self._semaphores.get(job_type)
+        if semaphore is None:
+            semaphore = self._semaphores[job_type] = asyncio.Semaphore(limit)
+        return semaphore
+    
+    @staticmethod
+    def _job_options(config: Optional[Dict]) -> Dict[str, Any]:
+        """任務級的 misfire / coalesce 配置（schedule_config 中的 misfire_grace_seconds、coalesce）"""
+        options: Dict[str, Any] = {}
+        if not config:
+            return options
+        if config.get("misfire_grace_seconds") is not None:
+            options["misfire_grace_time"] = int(config["misfire_grace_seconds"])
+        if config.get("coalesce") is not None:
+            options["coalesce"] = bool(config["coalesce"])
+        return options
+    
+    def _upsert_job(self, job_id: str, func: str, trigger, task_id: str, name: str, options: Dict[str, Any]) -> None:
+        """
+        添加或更新任務
+
+        觸發器未變化時保留存儲中的下次觸發時間（只更新名稱和策略），
+        接管或重啟後錯過的觸發才能按 misfire / coalesce 策略處理
+        """
+        existing = self.scheduler.get_job(job_id)
+        if existing is not None and str(existing.trigger) == str(trigger) and list(existing.args) == [task_id]:
+            existing.modify(name=name, **options)
+        else:
+            self.scheduler.add_job(
+                func=func,
+                trigger=trigger,
+                args=[task_id],
+                id=job_id,
+                name=name,
+                replace_existing=True,
+                **options,
+            )
+        self.scheduled_job_ids.add(job_id)
+    
     def load_scheduled_tasks(self):
-        """從數據庫加載所有啟用的定時任務（包括新的定時消息任務）"""
+        """
+        從數據庫加載所有啟用的定時任務（包括新的定時消息任務），
+        並移除任務存儲中已刪除或已停用任務的殘留 job
+        """
         try:
+            stale_job_ids = {
+                job.id for job in self.scheduler.get_jobs()
+                if job.id.startswith(("task_", "scheduled_message_", "system_"))
+            } if self.scheduler else set()
             db = SessionLocal()
             try:
                 # 加載原有的自動化任務
@@ -66,6 +326,7 @@ class TaskScheduler:
                 ).all()
                 
                 for task in automation_tasks:
+                    stale_job_ids.discard(f"task_{task.id}")
                     try:
                         self.schedule_task(task)
                     except Exception as e:
@@ -78,6 +339,7 @@ class TaskScheduler:
                     ).all()
                     
                     for task in scheduled_message_tasks:
+                        stale_job_ids.discard(f"scheduled_message_{task.task_id}")
                         try:
                             self.schedule_scheduled_message_task(task)
                         except Exception as e:
@@ -87,39 +349,48 @@ class TaskScheduler:
                 except Exception as e:
                     logger.warning(f"加載定時消息任務失敗（可能表尚未創建）: {e}")
                     logger.info(f"已加載 {len(automation_tasks)} 個自動化任務")
+                    stale_job_ids = {job_id for job_id in stale_job_ids if job_id.startswith("task_")}
             finally:
                 db.close()
+            
+            stale_job_ids -= self.schedule_system_jobs()
+            for job_id in stale_job_ids:
+                self.unschedule_task_by_job_id(job_id)
         except Exception as e:
             logger.error(f"加載定時任務失敗: {e}", exc_info=True)
     
+    def schedule_system_jobs(self) -> Set[str]:
+        """註冊 SYSTEM_JOBS 中的系統維護任務，返回已註冊的 job_id"""
+        job_ids: Set[str] = set()
+        if not self.scheduler:
+            return job_ids
+        for name, (_, cron) in SYSTEM_JOBS.items():
+            job_id = f"system_{name}"
+            self._job_types[job_id] = SYSTEM_JOB_TYPE
+            try:
+                self._upsert_job(job_id, SYSTEM_JOB_FUNC, CronTrigger(**cron), name, f"系統任務: {name}", {"coalesce": True})
+                job_ids.add(job_id)
+            except Exception as e:
+                logger.error(f"註冊系統任務 {name} 失敗: {e}", exc_info=True)
+        return job_ids
+    
     def schedule_task(self, task: GroupAIAutomationTask):
         """調度一個任務"""
         if not self.scheduler:
             logger.error("調度器未啟動")
             return
         
-        # 移除舊的任務（如果存在）
-        self.unschedule_task(task.id)
-        
         # 解析調度配置
         trigger = self._parse_schedule_config(task.schedule_config, task.id)
         if not trigger:
             logger.warning(f"任務 {task.name} ({task.id}) 的調度配置無效，跳過")
+            self.unschedule_task(task.id)
             return
         
         # 添加任務到調度器
         job_id = f"task_{task.id}"
-        
-        self.scheduler.add_job(
-            func=self._execute_task_wrapper,
-            trigger=trigger,
-            args=[task.id],
-            id=job_id,
-            name=task.name,
-            replace_existing=True,
-        )
-        
-        self.scheduled_job_ids.add(job_id)
+        self._job_types[job_id] = task.task_action
+        self._upsert_job(job_id, AUTOMATION_TASK_FUNC, trigger, task.id, task.name, self._job_options(task.schedule_config))
         logger.info(f"任務 {task.name} ({task.id}) 已添加到調度器")
     
     def unschedule_task(self, task_id: str):
@@ -127,14 +398,8 @@ class TaskScheduler:
         if not self.scheduler:
             return
         
-        job_id = f"task_{task_id}"
-        if job_id in self.scheduled_job_ids:
-            try:
-                self.scheduler.remove_job(job_id)
-                self.scheduled_job_ids.discard(job_id)
-                logger.info(f"任務 {task_id} 已從調度器移除")
-            except Exception as e:
-                logger.warning(f"移除任務 {task_id} 失敗: {e}")
+        # 任務可能由其他進程添加到共享存儲，以存儲中的狀態為準
+        self.unschedule_task_by_job_id(f"task_{task_id}")
     
     def schedule_scheduled_message_task(self, task: ScheduledMessageTask):
         """調度一個定時消息任務"""
@@ -142,9 +407,7 @@ class TaskScheduler:
             logger.error("調度器未啟動")
             return
         
-        # 移除舊的任務（如果存在）
         job_id = f"scheduled_message_{task.task_id}"
-        self.unschedule_task_by_job_id(job_id)
         
         # 解析調度配置
         trigger = None
@@ -170,19 +433,12 @@ class TaskScheduler:
         
         if not trigger:
             logger.warning(f"定時消息任務 {task.name} ({task.task_id}) 的調度配置無效，跳過")
+            self.unschedule_task_by_job_id(job_id)
             return
         
         # 添加任務到調度器
-        self.scheduler.add_job(
-            func=self._execute_scheduled_message_task_wrapper,
-            trigger=trigger,
-            args=[task.task_id],
-            id=job_id,
-            name=f"scheduled_message_{task.name}",
-            replace_existing=True,
-        )
-        
-        self.scheduled_job_ids.add(job_id)
+        self._job_types[job_id] = SCHEDULED_MESSAGE_TYPE
+        self._upsert_job(job_id, SCHEDULED_MESSAGE_FUNC, trigger, task.task_id, f"scheduled_message_{task.name}", {})
         logger.info(f"定時消息任務 {task.name} ({task.task_id}) 已添加到調度器")
     
     def unschedule_task_by_job_id(self, job_id: str):
@@ -193,32 +449,12 @@ class TaskScheduler:
         try:
             if self.scheduler.get_job(job_id):
                 self.scheduler.remove_job(job_id)
-                self.scheduled_job_ids.discard(job_id)
                 logger.info(f"任務 {job_id} 已從調度器移除")
+            self.scheduled_job_ids.discard(job_id)
+            self._job_types.pop(job_id, None)
         except Exception as e:
             logger.warning(f"移除任務 {job_id} 失敗: {e}")
     
-    def _execute_scheduled_message_task_wrapper(self, task_id: str):
-        """定時消息任務執行包裝器"""
-        import asyncio
-        try:
-            # 創建新的事件循環（如果當前線程沒有）
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            # 執行異步任務
-            if loop.is_running():
-                # 如果循環正在運行，創建任務
-                asyncio.create_task(self._execute_scheduled_message_task(task_id))
-            else:
-                # 如果循環未運行，運行直到完成
-                loop.run_until_complete(self._execute_scheduled_message_task(task_id))
-        except Exception as e:
-            logger.error(f"執行定時消息任務 {task_id} 失敗: {e}", exc_info=True)
-    
     async def _execute_scheduled_message_task(self, task_id: str):
         """執行定時消息任務（異步）"""
         try:
@@ -341,6 +577,25 @@ class TaskScheduler:
             logger.warning(f"任務 {task_id} 的調度配置格式不支持")
             return None
     
+    async def _execute_system_job(self, name: str) -> None:
+        """執行系統維護任務（同步函數放到線程池，不阻塞事件循環）"""
+        entry = SYSTEM_JOBS.get(name)
+        if entry is None:
+            logger.warning(f"系統任務 {name} 未定義，跳過執行")
+            return
+        module_name, func_name = entry[0].split(":")
+        started = time.perf_counter()
+        success = False
+        try:
+            func = getattr(importlib.import_module(module_name), func_name)
+            await asyncio.to_thread(func)
+            success = True
+            logger.info(f"系統任務 {name} 執行完成")
+        except Exception as e:
+            logger.error(f"系統任務 {name} 執行失敗: {e}", exc_info=True)
+        finally:
+            self.metrics.record_run(SYSTEM_JOB_TYPE, (time.perf_counter() - started) * 1000, success)
+    
     async def _execute_task_wrapper(self, task_id: str):
         """任務執行包裝函數"""
         try:
@@ -358,27 +613,73 @@ class TaskScheduler:
                     logger.debug(f"任務 {task_id} 已停用，跳過執行")
                     return
                 
-                # 執行任務
-                executor = get_task_executor()
-                result = await executor.execute_task(task)
+                # 執行任務（同一動作類型超過並發上限時排隊等待）
+                job_type = task.task_action
+                semaphore = self._get_semaphore(job_type)
+                async with semaphore or nullcontext():
+                    started = time.perf_counter()
+                    executor = get_task_executor()
+                    result = await executor.execute_task(task)
+                    self.metrics.record_run(job_type, (time.perf_counter() - started) * 1000, bool(result.get("success")))
                 
                 if result.get("success"):
                     logger.info(f"定時任務 {task.name} ({task_id}) 執行成功")
                 else:
                     logger.error(f"定時任務 {task.name} ({task_id}) 執行失敗: {result.get('error')}")
                 
-                # 計算下次執行時間
+                # 計算下次執行時間（經寫入隊列提交，避免與其他後台寫入爭用寫鎖）
                 if self.scheduler:
                     job = self.scheduler.get_job(f"task_{task_id}")
                     if job and job.next_run_time:
-                        task.next_run_at = job.next_run_time
-                        db.commit()
+                        next_run_at = job.next_run_time
+                        await get_write_queue().execute_async(
+                            lambda session: session.query(GroupAIAutomationTask).filter(
+                                GroupAIAutomationTask.id == task_id
+                            ).update({"next_run_at": next_run_at}, synchronize_session=False)
+                        )
             
             finally:
                 db.close()
         except Exception as e:
             logger.error(f"執行任務 {task_id} 失敗: {e}", exc_info=True)
     
+    def trigger_task_now(self, task_id: str):
+        """立即觸發一次定時任務（由領導者進程執行，不改變後續調度）"""
+        if not self.scheduler:
+            logger.error("調度器未啟動")
+            return
+        job = self.scheduler.get_job(f"task_{task_id}")
+        if job is None:
+            logger.warning(f"任務 {task_id} 不在調度器中，無法立即觸發")
+            return
+        job_id = f"trigger_{task_id}_{int(time.time() * 1000)}"
+        self._job_types[job_id] = self._job_type(job.id)
+        self.scheduler.add_job(
+            func=AUTOMATION_TASK_FUNC,
+            trigger=DateTrigger(run_date=datetime.now()),
+            args=[task_id],
+            id=job_id,
+            name=f"{job.name}（立即執行）",
+            misfire_grace_time=None,
+        )
+        self.scheduler.wakeup()
+    
+    def get_status(self) -> Dict[str, Any]:
+        """調度器狀態與指標"""
+        jobs = self.scheduler.get_jobs() if self.scheduler else []
+        return {
+            "is_running": self.is_running,
+            "is_leader": self.is_leader,
+            "job_store": self.job_store,
+            "lease": self.lease.get_status() if self.lease else None,
+            "job_count": len(jobs),
+            "next_run_at": min(
+                (job.next_run_time for job in jobs if job.next_run_time), default=None
+            ),
+            "concurrency_limits": self.concurrency_limits,
+            "metrics": self.metrics.to_dict(),
+        }
+    
     def reload_task(self, task_id: str):
         """重新加載任務（用於任務更新後）"""
         try:
@@ -0,0 +1,6 @@
+"""
+性能基准套件
+
+- datasets: 可按规模生成的合成数据（账号、AI 使用日志、审计日志、站点访问）
+- api_benchmark: 进程内 ASGI 接口基准，输出 JSON 结果并与基线对比
+"""
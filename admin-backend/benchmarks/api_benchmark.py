@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+进程内 ASGI 接口基准
+
+不需要启动服务器：通过 httpx.ASGITransport 直接调用 app.main:app，按规模写入合成数据后，
+在给定并发下压测仪表盘、监控、日志、账号列表、分析与导出接口，统计延迟分位数与吞吐量，
+结果写入 JSON，并可与保存的基线对比（超过阈值时以非零状态码退出，供 CI 拦截性能回退）。
+
+不运行应用的 lifespan（自动备份、调度器、监控等后台服务不会启动），测到的是接口本身的开销。
+带 @cached 的接口在首个请求后命中缓存，测到的是缓存命中路径；需要测冷路径时使用 --no-cache。
+
+用法:
+    python -m benchmarks.api_benchmark --size small --concurrency 10 --requests 200
+    python -m benchmarks.api_benchmark --size medium --output results.json --baseline benchmarks/baseline_api.json
+    python -m benchmarks.api_benchmark --size medium --save-baseline benchmarks/baseline_api.json
+
+指定 DATABASE_URL 可对 PostgreSQL 压测（会清空并重写基准涉及的表，只能指向专用的基准库）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+
+def _prepare_env() -> None:
+    """未指定 DATABASE_URL 时使用临时 SQLite 文件，避免影响正式数据库"""
+    if "DATABASE_URL" not in os.environ:
+        path = Path(tempfile.gettempdir()) / "benchmark_api.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+
+@dataclass
+class Scenario:
+    """一个被压测的接口"""
+
+    name: str
+    path: str
+    params: Dict[str, object] = field(default_factory=dict)
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("dashboard", "/api/v1/group-ai/dashboard/"),
+    Scenario("monitor_accounts", "/api/v1/group-ai/monitor/accounts/metrics"),
+    Scenario("ai_usage_summary", "/api/v1/ai-monitoring/summary", {"days": 7}),
+    Scenario("logs", "/api/v1/group-ai/logs/", {"page": 1, "page_size": 20}),
+    Scenario("audit_logs", "/api/v1/audit-logs/", {"limit": 50}),
+    Scenario("accounts_list", "/api/v1/group-ai/accounts/", {"page": 1, "page_size": 50}),
+    Scenario("analytics_overview", "/api/v1/api/v1/analytics/overview", {"days": 7}),
+    Scenario("export_accounts", "/api/v1/group-ai/export/accounts", {"format": "csv"}),
+]
+
+# 默认阈值：p95 变慢超过 20% 或吞吐下降超过 15% 视为回退；
+# 延迟绝对差值小于 min_delta_ms 时忽略，避免毫秒级接口的抖动误报
+DEFAULT_THRESHOLDS = {"latency": 0.20, "throughput": 0.15, "min_delta_ms": 2.0}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def summarize(latencies_s: List[float], elapsed_s: float, errors: int) -> Dict[str, float]:
+    """汇总一个场景的延迟（毫秒）与吞吐"""
+    total = len(latencies_s) + errors
+    if not latencies_s:
+        return {"requests": total, "errors": errors, "throughput_rps": 0.0}
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(total / elapsed_s, 1) if elapsed_s else 0.0,
+        "mean_ms": round(statistics.mean(latencies_s) * 1000, 2),
+        "p50_ms": round(_percentile(latencies_s, 0.50) * 1000, 2),
+        "p90_ms": round(_percentile(latencies_s, 0.90) * 1000, 2),
+        "p95_ms": round(_percentile(latencies_s, 0.95) * 1000, 2),
+        "p99_ms": round(_percentile(latencies_s, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies_s) * 1000, 2),
+    }
+
+
+async def run_scenario(client, scenario: Scenario, requests: int, concurrency: int, warmup: int = 5) -> Dict[str, object]:
+    """以固定并发发送 requests 个请求；非 2xx 计为错误，不计入延迟统计"""
+    for _ in range(warmup):
+        await client.get(scenario.path, params=scenario.params)
+
+    latencies: List[float] = []
+    errors = 0
+    statuses: Dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(scenario.path, params=scenario.params)
+            await response.aread()
+            elapsed = time.perf_counter() - started
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        if response.is_success:
+            latencies.append(elapsed)
+        else:
+            errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(requests)])
+    result = summarize(latencies, time.perf_counter() - started, errors)
+    result["status_codes"] = {str(code): count for code, count in sorted(statuses.items())}
+    return result
+
+
+def compare_results(
+    current: Dict[str, Dict[str, object]],
+    baseline: Dict[str, Dict[str, object]],
+    thresholds: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    """
+    对比场景结果与基线，返回回退描述列表（为空表示通过）
+
+    thresholds 可按场景覆盖：{"latency": 0.2, "throughput": 0.15, "min_delta_ms": 2, "scenarios": {"export_accounts": {"latency": 0.5}}}
+    基线中不存在的场景只记录不比较
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    overrides = thresholds.pop("scenarios", None) or {}
+    regressions: List[str] = []
+
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        limits = {**thresholds, **overrides.get(name, {})}
+
+        if result.get("errors") and not base.get("errors"):
+            regressions.append(f"{name}: {result['errors']} 个请求失败（基线无失败）")
+
+        current_p95, base_p95 = result.get("p95_ms"), base.get("p95_ms")
+        if current_p95 is not None and base_p95:
+            allowed = base_p95 * (1 + limits["latency"])
+            if current_p95 > allowed and current_p95 - base_p95 >= limits["min_delta_ms"]:
+                regressions.append(
+                    f"{name}: p95 {current_p95}ms，基线 {base_p95}ms（+{(current_p95 / base_p95 - 1) * 100:.0f}%，阈值 +{limits['latency'] * 100:.0f}%）"
+                )
+
+        current_rps, base_rps = result.get("throughput_rps"), base.get("throughput_rps")
+        if current_rps is not None and base_rps:
+            allowed = base_rps * (1 - limits["throughput"])
+            if current_rps < allowed:
+                regressions.append(
+                    f"{name}: 吞吐 {current_rps} req/s，基线 {base_rps} req/s（{(current_rps / base_rps - 1) * 100:.0f}%，阈值 -{limits['throughput'] * 100:.0f}%）"
+                )
+    return regressions
+
+
+def _print_table(results: Dict[str, Dict[str, object]], baseline: Optional[Dict[str, Dict[str, object]]]) -> None:
+    header = f"{'场景':<22}{'请求':>8}{'失败':>6}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+    if baseline:
+        header += f"{'基线 p95':>12}"
+    print(header)
+    for name, item in results.items():
+        line = (
+            f"{name:<22}{item['requests']:>8}{item['errors']:>6}{item['throughput_rps']:>14}"
+            f"{item.get('p50_ms', '-'):>10}{item.get('p95_ms', '-'):>10}{item.get('p99_ms', '-'):>10}"
+        )
+        if baseline:
+            line += f"{baseline.get(name, {}).get('p95_ms', '-'):>12}"
+        print(line)
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, object]:
+    import httpx
+
+    from app.core.cache import get_cache_manager
+    from app.core.security import create_access_token
+    from app.db import engine
+    from app.main import app
+    from benchmarks.datasets import BENCHMARK_USER_EMAIL, PRESETS, DatasetSize, seed_dataset
+
+    size = DatasetSize(**PRESETS[args.size].to_dict())
+    for name in ("accounts", "usage_logs", "audit_logs", "site_visits"):
+        value = getattr(args, name)
+        if value is not None:
+            setattr(size, name, value)
+
+    if args.skip_seed:
+        counts = {}
+    else:
+        started = time.perf_counter()
+        counts = seed_dataset(engine, size, seed=args.seed)
+        print(f"写入数据集 {counts}，耗时 {time.perf_counter() - started:.1f}s")
+
+    if args.no_cache:
+        # 只在基准进程内生效：读取一律视为未命中，每个请求都执行完整的查询路径
+        get_cache_manager().get = lambda key: None
+
+    selected = [s for s in SCENARIOS if not args.scenarios or s.name in args.scenarios]
+    token = create_access_token(subject=BENCHMARK_USER_EMAIL)
+    transport = httpx.ASGITransport(app=app)
+    results: Dict[str, Dict[str, object]] = {}
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://benchmark",
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=60,
+    ) as client:
+        for scenario in selected:
+            results[scenario.name] = await run_scenario(client, scenario, args.requests, args.concurrency, args.warmup)
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "database": engine.dialect.name,
+            "dataset": size.to_dict(),
+            "rows": counts,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "cache": "disabled" if args.no_cache else "enabled",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "scenarios": results,
+    }
+
+
+def _load_json(path: Path) -> Dict[str, object]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path: Path, data: Dict[str, object]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="进程内 ASGI 接口基准")
+    parser.add_argument("--size", choices=["small", "medium", "large"], default="small", help="数据集规模预设")
+    parser.add_argument("--accounts", type=int, help="覆盖预设的账号数")
+    parser.add_argument("--usage-logs", dest="usage_logs", type=int, help="覆盖预设的 AI 使用日志数")
+    parser.add_argument("--audit-logs", dest="audit_logs", type=int, help="覆盖预设的审计日志数")
+    parser.add_argument("--site-visits", dest="site_visits", type=int, help="覆盖预设的站点访问数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--skip-seed", action="store_true", help="复用库中已有数据，不重新写入")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=200, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个场景的预热请求数（不计入统计）")
+    parser.add_argument("--scenarios", nargs="*", help=f"只运行指定场景: {', '.join(s.name for s in SCENARIOS)}")
+    parser.add_argument("--no-cache", action="store_true", help="禁用 @cached，测量未命中缓存的路径")
+    parser.add_argument("--output", type=Path, help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", type=Path, help="基线 JSON，对比后有回退时返回状态码 1")
+    parser.add_argument("--save-baseline", type=Path, help="将本次结果保存为基线")
+    parser.add_argument("--latency-threshold", type=float, help="p95 允许变慢的比例（默认 0.2）")
+    parser.add_argument("--throughput-threshold", type=float, help="吞吐允许下降的比例（默认 0.15）")
+    args = parser.parse_args(argv)
+
+    _prepare_env()
+    result = asyncio.run(run_benchmark(args))
+
+    baseline = _load_json(args.baseline) if args.baseline and args.baseline.exists() else None
+    _print_table(result["scenarios"], baseline["scenarios"] if baseline else None)
+
+    if args.output:
+        _write_json(args.output, result)
+        print(f"结果已写入 {args.output}")
+    if args.save_baseline:
+        _write_json(args.save_baseline, result)
+        print(f"基线已保存到 {args.save_baseline}")
+
+    if args.baseline is None:
+        return 0
+    if baseline is None:
+        print(f"基线文件不存在: {args.baseline}，跳过对比")
+        return 0
+
+    thresholds = dict(baseline.get("thresholds") or {})
+    if args.latency_threshold is not None:
+        thresholds["latency"] = args.latency_threshold
+    if args.throughput_threshold is not None:
+        thresholds["throughput"] = args.throughput_threshold
+    if baseline["meta"].get("dataset") != result["meta"]["dataset"]:
+        print("警告: 基线与本次使用的数据集规模不同，对比结果仅供参考")
+
+    regressions = compare_results(result["scenarios"], baseline["scenarios"], thresholds)
+    if regressions:
+        print("检测到性能回退:")
+        for item in regressions:
+            print(f"  - {item}")
+        return 1
+    print("与基线对比通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""
+基准数据集
+
+按规模向 SQLite / PostgreSQL 写入合成数据。使用固定随机种子，同一规模每次生成的数据一致，
+结果之间才有可比性。写入走 Core 批量 INSERT（executemany），百万级行也能在可接受时间内完成。
+"""
+import random
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List
+
+from sqlalchemy import delete
+from sqlalchemy.engine import Engine
+
+BENCHMARK_USER_EMAIL = "bench@example.com"
+BATCH_SIZE = 2000
+
+_PROVIDERS = [("openai", "gpt-4o-mini"), ("openai", "gpt-4o"), ("gemini", "gemini-1.5-flash"), ("grok", "grok-beta")]
+_ACTIONS = ["create", "update", "delete", "login", "export", "start", "stop"]
+_RESOURCES = ["account", "script", "role_assignment", "automation_task", "user"]
+_PAGES = ["/", "/pricing", "/chat", "/docs", "/blog/intro", "/contact"]
+
+
+@dataclass
+class DatasetSize:
+    """各表的行数"""
+
+    accounts: int = 200
+    usage_logs: int = 20000
+    audit_logs: int = 5000
+    site_visits: int = 20000
+    sites: int = 5
+    days: int = 30
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+PRESETS: Dict[str, DatasetSize] = {
+    "small": DatasetSize(accounts=50, usage_logs=2000, audit_logs=500, site_visits=2000, sites=3),
+    "medium": DatasetSize(),
+    "large": DatasetSize(accounts=2000, usage_logs=500000, audit_logs=100000, site_visits=500000, sites=20),
+}
+
+
+def _batches(rows: Iterator[dict], size: int = BATCH_SIZE) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _timestamp(rng: random.Random, now: datetime, days: int) -> datetime:
+    return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def _account_rows(rng: random.Random, size: DatasetSize, now: datetime) -> Iterator[dict]:
+    for index in range(size.accounts):
+        created = _timestamp(rng, now, size.days)
+        yield {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "account_id": f"bench_{index:06d}",
+            "session_file": f"sessions/bench_{index:06d}.session",
+            "script_id": f"script_{index % 10}",
+            "server_id": f"server_{index % 4}",
+            "group_ids": [rng.randint(-10**12, -10**9) for _ in range(rng.randint(1, 5))],
+            "active": rng.random() < 0.8,
+            "reply_rate": round(rng.random(), 2),
+            "phone_number": f"+8613{rng.randint(10**8, 10**9 - 1)}",
+            "username": f"bench_user_{index}",
+            "display_name": f"Bench {index}",
+            "created_at": created,
+            "updated_at": created,
+        }
+
+
+def _usage_rows(rng: random.Random, size: DatasetSize, now: datetime, domains: List[str]) -> Iterator[dict]:
+    for index in range(size.usage_logs):
+        provider, model = rng.choice(_PROVIDERS)
+        prompt, completion = rng.randint(20, 2000), rng.randint(10, 1000)
+        failed = rng.random() < 0.03
+        yield {
+            "request_id": f"req_{index:08d}",
+            "session_id": f"sess_{rng.randint(0, max(1, size.usage_logs // 20))}",
+            "user_ip": f"10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "site_domain": rng.choice(domains),
+            "provider": provider,
+            "model": model,
+            "prompt_tokens": prompt,
+            "completion_tokens": completion,
+            "total_tokens": prompt + completion,
+            "estimated_cost": round((prompt + completion) * 0.000002, 6),
+            "status": "error" if failed else "success",
+            "error_message": "upstream timeout" if failed else None,
+            "created_at": _timestamp(rng, now, size.days),
+        }
+
+
+def _audit_rows(rng: random.Random, size: DatasetSize, now: datetime, user_id: int) -> Iterator[dict]:
+    for _ in range(size.audit_logs):
+        resource = rng.choice(_RESOURCES)
+        yield {
+            "user_id": user_id,
+            "user_email": BENCHMARK_USER_EMAIL,
+            "action": rng.choice(_ACTIONS),
+            "resource_type": resource,
+            "resource_id": str(rng.randint(1, 10000)),
+            "description": f"{resource} changed by benchmark",
+            "before_state": {"status": "old"},
+            "after_state": {"status": "new"},
+            "ip_address": f"192.168.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "created_at": _timestamp(rng, now, size.days),
+        }
+
+
+def _visit_rows(rng: random.Random, size: DatasetSize, now: datetime, site_ids: List[int]) -> Iterator[dict]:
+    for _ in range(size.site_visits):
+        yield {
+            "site_id": rng.choice(site_ids),
+            "ip_address": f"172.16.{rng.randint(0, 255)}.{rng.randint(1, 254)}",
+            "referer": rng.choice([None, "https://google.com", "https://t.me"]),
+            "page_path": rng.choice(_PAGES),
+            "session_id": f"visit_{rng.randint(0, max(1, size.site_visits // 5))}",
+            "visit_duration": rng.randint(1, 600),
+            "created_at": _timestamp(rng, now, size.days),
+        }
+
+
+def _ensure_user(engine: Engine) -> int:
+    """创建（或复用）基准用的超级管理员，返回用户 ID"""
+    from app.core.security import get_password_hash
+    from app.models.user import User
+
+    table = User.__table__
+    with engine.begin() as conn:
+        user_id = conn.execute(table.select().with_only_columns(table.c.id).where(table.c.email == BENCHMARK_USER_EMAIL)).scalar()
+        if user_id is None:
+            user_id = conn.execute(
+                table.insert().values(
+                    email=BENCHMARK_USER_EMAIL,
+                    full_name="Benchmark",
+                    hashed_password=get_password_hash("benchmark"),
+                    is_active=True,
+                    is_superuser=True,
+                    created_at=datetime.utcnow(),
+                )
+            ).inserted_primary_key[0]
+    return user_id
+
+
+def seed_dataset(engine: Engine, size: DatasetSize, seed: int = 42) -> Dict[str, int]:
+    """
+    清空基准涉及的表并按规模重新写入，返回各表写入的行数
+
+    只应对基准专用数据库执行（默认是临时 SQLite 文件）
+    """
+    from app.db import Base
+    from app.models.ai_usage import AIUsageLog
+    from app.models.audit_log import AuditLog
+    from app.models.group_ai import GroupAIAccount
+    from app.models.sites import Site, SiteVisit
+
+    Base.metadata.create_all(bind=engine)
+    user_id = _ensure_user(engine)
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        for model in (SiteVisit, Site, AIUsageLog, AuditLog, GroupAIAccount):
+            conn.execute(delete(model.__table__))
+
+    with engine.begin() as conn:
+        site_ids = []
+        for index in range(size.sites):
+            result = conn.execute(
+                Site.__table__.insert().values(
+                    name=f"Bench Site {index}",
+                    url=f"https://site{index}.example.com",
+                    site_type="aikz" if index % 2 == 0 else "tgmini",
+                    status="active",
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            site_ids.append(result.inserted_primary_key[0])
+    domains = [f"site{index}.example.com" for index in range(max(size.sites, 1))]
+
+    plan = [
+        (GroupAIAccount, _account_rows(rng, size, now)),
+        (AIUsageLog, _usage_rows(rng, size, now, domains)),
+        (AuditLog, _audit_rows(rng, size, now, user_id)),
+        (SiteVisit, _visit_rows(rng, size, now, site_ids) if site_ids else iter(())),
+    ]
+    counts: Dict[str, int] = {Site.__tablename__: len(site_ids)}
+    for model, rows in plan:
+        table = model.__table__
+        written = 0
+        for batch in _batches(rows):
+            with engine.begin() as conn:
+                conn.execute(table.insert(), batch)
+            written += len(batch)
+        counts[table.name] = written
+    return counts
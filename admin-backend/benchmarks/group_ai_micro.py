@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+group_ai_service 消息路径热点函数微基准
+
+覆盖 KeywordTriggerProcessor.match_keywords、ConditionEvaluator.evaluate、VariableResolver.resolve、
+ScriptEngine._match_triggers、MessageAnalyzer.analyze_message、ScriptParser.load_script 与
+ConfigManager.get_config（unified_config_manager）。输入按规模生成：上千条规则、多语言长消息、
+深层嵌套上下文、大型 YAML 剧本；Message 使用轻量替身，不需要连接 Telegram。
+
+每个用例输出：
+- ops_per_sec：多轮计时取最快一轮（timeit 的做法，排除调度抖动）
+- peak_bytes_per_call：单次调用期间的内存分配峰值（tracemalloc），反映临时对象开销
+- retained_bytes_per_call：多次调用后平均每次残留的内存，持续大于 0 通常意味着缓存无上限或泄漏
+
+用法:
+    python -m benchmarks.group_ai_micro
+    python -m benchmarks.group_ai_micro --cases keyword_match condition_evaluate --output micro.json
+    python -m benchmarks.group_ai_micro --baseline benchmarks/baseline_micro.json
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# 添加 admin-backend 与仓库根目录（group_ai_service 所在目录）到路径
+project_root = Path(__file__).parent.parent
+for path in (project_root, project_root.parent):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# 默认阈值：ops/sec 下降超过 15% 或单次分配峰值增长超过 25% 视为回退
+DEFAULT_THRESHOLDS = {"ops": 0.15, "alloc": 0.25}
+
+_WORDS = {
+    "zh": ["紅包", "今天", "天氣", "工作", "遊戲", "你好", "謝謝", "項目", "吃飯", "什麼時候", "為什麼", "幫忙"],
+    "en": ["hello", "weather", "project", "please", "game", "thanks", "meeting", "what", "why", "deadline"],
+    "ja": ["こんにちは", "ありがとう", "天気", "仕事", "ゲーム"],
+    "ru": ["привет", "спасибо", "погода", "работа", "игра"],
+    "emoji": ["😊", "🎉", "🧧", "👍", "🔥"],
+}
+
+
+@dataclass
+class StubUser:
+    id: int
+    first_name: Optional[str] = None
+    username: Optional[str] = None
+
+
+@dataclass
+class StubChat:
+    id: int
+
+
+@dataclass
+class StubMessage:
+    """pyrogram Message 的替身，只提供消息路径用到的属性"""
+
+    text: str
+    id: int = 1
+    from_user: Optional[StubUser] = field(default_factory=lambda: StubUser(10001, "Alice", "alice"))
+    chat: Optional[StubChat] = field(default_factory=lambda: StubChat(-1001234567890))
+    caption: Optional[str] = None
+
+
+@dataclass
+class BenchCase:
+    name: str
+    description: str
+    setup: Callable[[random.Random, Dict[str, int]], Callable[[], Any]]
+
+
+# ============ 输入生成 ============
+
+def make_text(rng: random.Random, words: int) -> str:
+    """多语言混合的长消息，附带 @用户、URL 与数字"""
+    pool = [word for group in _WORDS.values() for word in group]
+    parts = [rng.choice(pool) for _ in range(words)]
+    parts.insert(rng.randint(0, len(parts)), "@bench_user")
+    parts.insert(rng.randint(0, len(parts)), "https://example.com/path?q=1")
+    parts.insert(rng.randint(0, len(parts)), str(rng.randint(1, 9999)))
+    return " ".join(parts)
+
+
+def make_nested_context(rng: random.Random, depth: int, width: int) -> Dict[str, Any]:
+    """深度为 depth、每层 width 个键的嵌套上下文；路径 level0.level1...levelN.value 一定存在"""
+    node: Dict[str, Any] = {"value": rng.randint(0, 100), "name": "bench group"}
+    for level in reversed(range(depth)):
+        siblings = {f"k{index}": rng.random() for index in range(width)}
+        node = {f"level{level}": node, **siblings}
+    node.update({"hour": 14, "is_weekend": False, "message_count": 42, "group_activity": 3})
+    return node
+
+
+def make_script_yaml(rng: random.Random, scenes: int, triggers: int, responses: int) -> str:
+    """生成大型剧本 YAML 文本"""
+    lines = ["script_id: bench_script", "version: '1.0'", "description: benchmark script", "scenes:"]
+    for index in range(scenes):
+        lines.append(f"  - id: scene_{index}")
+        lines.append("    triggers:")
+        for _ in range(triggers):
+            keywords = ", ".join(f'"{rng.choice(_WORDS["zh"] + _WORDS["en"])}"' for _ in range(4))
+            lines.append("      - type: keyword")
+            lines.append(f"        keywords: [{keywords}]")
+        lines.append("    responses:")
+        for response in range(responses):
+            lines.append(f'      - template: "{{{{user_name}}}}，第 {response} 條回復 {{{{random_emoji()}}}}"')
+        lines.append(f"    next_scene: scene_{(index + 1) % scenes}")
+    return "\n".join(lines) + "\n"
+
+
+# ============ 用例 ============
+
+def _keyword_match(rng: random.Random, size: Dict[str, int]) -> Callable[[], Any]:
+    from group_ai_service.keyword_trigger_processor import KeywordTriggerProcessor, KeywordTriggerRule, MatchType
+
+    processor = KeywordTriggerProcessor.__new__(KeywordTriggerProcessor)  # 跳过从数据库加载规则
+    processor.logger = logging.getLogger("benchmark")
+    processor.rules = {}
+    processor.message_history = {}
+    pool = [word for group in _WORDS.values() for word in group]
+    types = [MatchType.ANY, MatchType.ANY, MatchType.SIMPLE, MatchType.ALL, MatchType.REGEX]
+    for index in range(size["rules"]):
+        match_type = types[index % len(types)]
+        keywords = [f"{rng.choice(pool)}{rng.randint(0, 999)}" for _ in range(rng.randint(2, 6))]
+        processor.rules[f"rule_{index}"] = KeywordTriggerRule(
+            id=f"rule_{index}",
+            name=f"rule {index}",
+            keywords=keywords,
+            pattern=rf"(?:{keywords[0]}|{keywords[-1]})\s*\d+" if match_type == MatchType.REGEX else None,
+            match_type=match_type,
+        )
+    rules = sorted(processor.rules.values(), key=lambda rule: -rule.priority)
+    message = StubMessage(make_text(rng, size["message_words"]))
+
+    def run():
+        return [processor.match_keywords(message, rule) for rule in rules]
+    return run
+
+
+def _condition_evaluate(rng: random.Random, size: Dict[str, int]) -> Callable[[], Any]:
+    from group_ai_service.condition_evaluator import ConditionEvaluator
+
+    evaluator = ConditionEvaluator()
+    depth = size["context_depth"]
+    context = make_nested_context(rng, depth, size["context_width"])
+    deep_path = ".".join(f"level{level}" for level in range(depth))
+    conditions = [
+        "group_activity < 5",
+        "message_count >= 10",
+        "is_weekend == false",
+        "hour in [9, 10, 11, 14, 15, 16]",
+        f"{deep_path}.value > 50",
+        f"{deep_path}.name == 'bench group'",
+        f"{deep_path}.value != ${{message_count}}",
+        "absent.path.value",
+    ]
+
+    def run():
+        return [evaluator.evaluate(condition, context) for condition in conditions]
+    return run
+
+
+def _variable_resolve(rng: random.Random, size: Dict[str, int]) -> Callable[[], Any]:
+    from group_ai_service.variable_resolver import VariableResolver
+
+    resolver = VariableResolver()
+    context = {f"var_{index}": f"value {index}" for index in range(size["variables"])}
+    state = {f"state_{index}": index for index in range(size["variables"])}
+    placeholders = (
+        ["{{user_name}}", "{{user_id}}", "{{message_length}}", "{{detect_topic()}}", "{{current_time('%H:%M')}}",
+         "{{upper('bench')}}", "{{unknown_var}}"]
+        + [f"{{{{var_{rng.randrange(size['variables'])}}}}}" for _ in range(8)]
+        + [f"{{{{state_{rng.randrange(size['variables'])}}}}}" for _ in range(5)]
+    )
+    template = " ".join(f"{rng.choice(_WORDS['zh'])} {placeholder}" for placeholder in placeholders)
+    message = StubMessage(make_text(rng, size["message_words"]))
+
+    def run():
+        return resolver.resolve(template, message, context, state)
+    return run
+
+
+def _match_triggers(rng: random.Random, size: Dict[str, int]) -> Callable[[], Any]:
+    from group_ai_service.script_engine import ScriptEngine
+    from group_ai_service.script_parser import Scene, Trigger
+
+    engine = ScriptEngine()
+    triggers = [
+        Trigger(type="keyword", keywords=[f"{rng.choice(_WORDS['en'])}_{index}_{k}" for k in range(4)])
+        for index in range(size["scene_triggers"])
+    ]
+    triggers.append(Trigger(type="message", min_length=size["message_words"] * 100))
+    triggers.append(Trigger(type="redpacket"))
+    scene = Scene(id="bench", triggers=triggers)
+    message = StubMessage(make_text(rng, size["message_words"]))
+    context = {"group_id": -100123, "is_redpacket": True}
+
+    def run():
+        return engine._match_triggers(scene, message, context)
+    return run
+
+
+def _analyze_message(rng: random.Random, size: Dict[str, int]) -> Callable[[], Any]:
+    from group_ai_service.message_analyzer import MessageAnalyzer
+
+    analyzer = MessageAnalyzer()
+    message = StubMessage(make_text(rng, size["message_words"]))
+
+    def run():
+        return analyzer.analyze_message(message)
+    return run
+
+
+def _load_script(rng: random.Random, size: Dict[str, int]) -> Callable[[], Any]:
+    from group_ai_service.script_parser import ScriptParser
+
+    parser = ScriptParser()
+    path = Path(tempfile.gettempdir()) / f"benchmark_script_{os.getpid()}.yaml"
+    path.write_text(make_script_yaml(rng, size["script_scenes"], 3, 3), encoding="utf-8")
+
+    def run():
+        return parser.load_script(str(path))
+    return run
+
+
+def _get_config(rng: random.Random, size: Dict[str, int]) -> Callable[[], Any]:
+    from group_ai_service.unified_config_manager import ChatConfig, ConfigManager, KeywordConfig, UnifiedConfig
+
+    manager = ConfigManager()
+    layers = size["config_layers"]
+    for index in range(layers):
+        config = UnifiedConfig(
+            chat=ChatConfig(reply_rate=rng.random(), interval_min=rng.randint(10, 60)),
+            keywords=KeywordConfig(keywords=[rng.choice(_WORDS["zh"]) for _ in range(5)]),
+            metadata={f"key_{k}": k for k in range(10)},
+        )
+        manager.group_configs[-index] = config
+        manager.account_configs[f"account_{index}"] = config
+        manager.role_configs[f"role_{index}"] = config
+        manager.task_configs[f"task_{index}"] = config
+    lookups = [(f"account_{i}", -i, f"role_{i}", f"task_{i}") for i in rng.sample(range(layers), min(layers, 50))]
+
+    def run():
+        return [manager.get_config(account, group, role, task) for account, group, role, task in lookups]
+    return run
+
+
+CASES: List[BenchCase] = [
+    BenchCase("keyword_match", "1 条长消息 × rules 条规则", _keyword_match),
+    BenchCase("condition_evaluate", "8 个条件（含深层嵌套路径）", _condition_evaluate),
+    BenchCase("variable_resolve", "20 个占位符的模板", _variable_resolve),
+    BenchCase("match_triggers", "scene_triggers 个关键词触发器的场景", _match_triggers),
+    BenchCase("analyze_message", "多语言长消息的意图/话题/情感/实体分析", _analyze_message),
+    BenchCase("load_script", "script_scenes 个场景的 YAML 剧本", _load_script),
+    BenchCase("get_config", "50 次五层配置合并", _get_config),
+]
+
+SIZES: Dict[str, Dict[str, int]] = {
+    "quick": {
+        "rules": 50, "message_words": 50, "context_depth": 4, "context_width": 4, "variables": 20,
+        "scene_triggers": 20, "script_scenes": 10, "config_layers": 20,
+    },
+    "default": {
+        "rules": 1000, "message_words": 400, "context_depth": 12, "context_width": 20, "variables": 500,
+        "scene_triggers": 200, "script_scenes": 300, "config_layers": 1000,
+    },
+}
+
+
+# ============ 计时与内存 ============
+
+def measure(func: Callable[[], Any], min_time: float = 0.2, repeat: int = 5, alloc_calls: int = 10) -> Dict[str, float]:
+    """测量 ops/sec 与每次调用的内存分配"""
+    func()  # 预热（惰性初始化、正则编译缓存等）
+
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    best = min(timings)
+
+    tracemalloc.start()
+    try:
+        peaks = []
+        baseline, _ = tracemalloc.get_traced_memory()
+        for _ in range(alloc_calls):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ops_per_sec": round(1 / best, 1) if best else 0.0,
+        "best_us": round(best * 1e6, 2),
+        "median_us": round(statistics.median(timings) * 1e6, 2),
+        "loops": number,
+        "peak_bytes_per_call": int(statistics.median(peaks)),
+        "retained_bytes_per_call": int((retained - baseline) / alloc_calls),
+    }
+
+
+def run_suite(
+    size: str = "default",
+    cases: Optional[List[str]] = None,
+    min_time: float = 0.2,
+    repeat: int = 5,
+    seed: int = 42,
+) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for case in CASES:
+        if cases and case.name not in cases:
+            continue
+        func = case.setup(random.Random(seed), SIZES[size])
+        results[case.name] = {"description": case.description, **measure(func, min_time=min_time, repeat=repeat)}
+    return results
+
+
+def compare_results(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    thresholds: Optional[Dict[str, float]] = None,
+) -> List[str]:
+    """对比基线，返回回退描述列表（为空表示通过）"""
+    limits = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    regressions: List[str] = []
+    for name, result in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get("ops_per_sec") and result["ops_per_sec"] < base["ops_per_sec"] * (1 - limits["ops"]):
+            regressions.append(
+                f"{name}: {result['ops_per_sec']} ops/s，基线 {base['ops_per_sec']} ops/s"
+                f"（{(result['ops_per_sec'] / base['ops_per_sec'] - 1) * 100:.0f}%）"
+            )
+        if base.get("peak_bytes_per_call") and result["peak_bytes_per_call"] > base["peak_bytes_per_call"] * (1 + limits["alloc"]):
+            regressions.append(
+                f"{name}: 单次分配峰值 {result['peak_bytes_per_call']}B，基线 {base['peak_bytes_per_call']}B"
+            )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="group_ai_service 热点函数微基准")
+    parser.add_argument("--size", choices=list(SIZES), default="default", help="输入规模")
+    parser.add_argument("--cases", nargs="*", help=f"只运行指定用例: {', '.join(case.name for case in CASES)}")
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮计时的最短时间（秒）")
+    parser.add_argument("--repeat", type=int, default=5, help="计时轮数")
+    parser.add_argument("--output", type=Path, help="结果 JSON 输出路径")
+    parser.add_argument("--baseline", type=Path, help="基线 JSON，对比后有回退时返回状态码 1")
+    parser.add_argument("--save-baseline", type=Path, help="将本次结果保存为基线")
+    args = parser.parse_args(argv)
+
+    # 被测代码在热路径上打 info/debug 日志，基准只关心函数本身的开销
+    logging.disable(logging.INFO)
+    results = run_suite(args.size, args.cases, args.min_time, args.repeat)
+
+    print(f"{'用例':<22}{'ops/sec':>14}{'best(us)':>12}{'峰值分配(B)':>16}{'残留(B)':>10}")
+    for name, item in results.items():
+        print(
+            f"{name:<22}{item['ops_per_sec']:>14}{item['best_us']:>12}"
+            f"{item['peak_bytes_per_call']:>16}{item['retained_bytes_per_call']:>10}"
+        )
+
+    document = {"meta": {"size": args.size, "python": sys.version.split()[0]}, "cases": results}
+    for path in filter(None, (args.output, args.save_baseline)):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(document, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"结果已写入 {path}")
+
+    if args.baseline is None:
+        return 0
+    if not args.baseline.exists():
+        print(f"基线文件不存在: {args.baseline}，跳过对比")
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare_results(results, baseline["cases"], baseline.get("thresholds"))
+    if regressions:
+        print("检测到性能回退:")
+        for item in regressions:
+            print(f"  - {item}")
+        return 1
+    print("与基线对比通过")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,36 @@
 """
 FastAPI 应用入口点
 用于从根目录直接启动应用
+
+用法:
+    python main.py [--fast-start]
+
+--fast-start 只执行关键启动阶段（数据库、管理员账号），调度器、备份、监控等后台服务
+推迟到首个请求完成后再启动，适用于滚动重启和本地开发
 """
-import uvicorn
-from app.main import app
+import argparse
+import os
+
+
+def __getattr__(name):
+    # 兼容 `uvicorn main:app`：按需导入应用，避免启动器进程提前加载全部路由
+    if name == "app":
+        from app.main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="启动后台管理 API 服务")
+    parser.add_argument("--fast-start", action="store_true", help="推迟非关键后台服务到首个请求之后启动")
+    args = parser.parse_args()
+    if args.fast_start:
+        # 通过环境变量传递给 Settings（reload 模式下的子进程同样生效）
+        os.environ["FAST_START"] = "true"
+
     # 从环境变量读取配置，或使用默认值
-    import os
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
     
@@ -17,4 +40,3 @@ if __name__ == "__main__":
         port=port,
         reload=os.getenv("ENV", "production") == "development"
     )
-
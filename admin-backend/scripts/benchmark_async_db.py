@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+异步数据库会话并发基准
+
+对比 async 路由中直接使用同步 Session（阻塞事件循环）与 get_async_db 会话（run_sync/线程池或原生异步驱动）：
+一个慢查询与多个轻量请求并发时的吞吐量、轻量请求延迟，以及事件循环的最大停顿时间。
+
+用法:
+    python scripts/benchmark_async_db.py --concurrency 20 --slow-rows 300000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+
+def _prepare_env() -> None:
+    """未指定 DATABASE_URL 时使用临时 SQLite 文件，避免影响正式数据库"""
+    if "DATABASE_URL" not in os.environ:
+        path = Path(tempfile.gettempdir()) / "benchmark_async_db.db"
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+
+
+_prepare_env()
+
+from sqlalchemy import text  # noqa: E402
+
+from app.db import AsyncSessionLocal, SessionLocal  # noqa: E402
+
+# 递归 CTE 模拟一个不依赖业务表的慢查询
+SLOW_QUERY = text(
+    "WITH RECURSIVE cnt(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM cnt WHERE x < :rows) "
+    "SELECT count(*) FROM cnt"
+)
+
+
+async def _heartbeat(stop: asyncio.Event, interval: float, lags: list) -> None:
+    """记录事件循环调度延迟（理想值接近 0）"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def _sync_request(rows: int) -> float:
+    """执行查询，返回完成时刻"""
+    db = SessionLocal()
+    try:
+        db.execute(SLOW_QUERY, {"rows": rows}).scalar()
+    finally:
+        db.close()
+    return time.perf_counter()
+
+
+async def _async_request(rows: int) -> float:
+    """执行查询，返回完成时刻"""
+    db = AsyncSessionLocal()
+    try:
+        result = await db.execute(SLOW_QUERY, {"rows": rows})
+        result.scalar()
+    finally:
+        await db.close()
+    return time.perf_counter()
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_mode(name: str, handler, concurrency: int, rounds: int, slow_rows: int, fast_rows: int) -> dict:
+    """每轮同时发起 1 个慢查询和 concurrency 个轻量查询，统计轻量请求的延迟与整体吞吐"""
+    stop = asyncio.Event()
+    lags: list = []
+    heartbeat = asyncio.create_task(_heartbeat(stop, 0.005, lags))
+    await asyncio.sleep(0.01)
+
+    fast_latencies: list = []
+    start = time.perf_counter()
+    for _ in range(rounds):
+        # 所有请求同时到达，延迟从到达时刻算起（包含排队等待事件循环的时间）
+        arrived = time.perf_counter()
+        slow = asyncio.create_task(handler(slow_rows))
+        await asyncio.sleep(0)  # 让慢查询先开始执行
+        finished = await asyncio.gather(*[handler(fast_rows) for _ in range(concurrency)])
+        fast_latencies.extend(t - arrived for t in finished)
+        await slow
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await heartbeat
+    total = (concurrency + 1) * rounds
+    return {
+        "mode": name,
+        "requests": total,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "fast_p50_ms": round(_percentile(fast_latencies, 0.5) * 1000, 1),
+        "fast_p95_ms": round(_percentile(fast_latencies, 0.95) * 1000, 1),
+        "loop_lag_max_ms": round(max(lags) * 1000, 1) if lags else 0.0,
+    }
+
+
+async def main(concurrency: int, rounds: int, slow_rows: int, fast_rows: int) -> None:
+    # 预热连接池
+    await _async_request(10)
+    await _sync_request(10)
+
+    results = [
+        await run_mode("sync Session（阻塞）", _sync_request, concurrency, rounds, slow_rows, fast_rows),
+        await run_mode("get_async_db", _async_request, concurrency, rounds, slow_rows, fast_rows),
+    ]
+
+    print(f"每轮 1 个慢查询（{slow_rows} 行）+ {concurrency} 个轻量查询（{fast_rows} 行），共 {rounds} 轮")
+    header = f"{'模式':<24}{'耗时(s)':>10}{'吞吐(req/s)':>14}{'轻量 p50(ms)':>16}{'轻量 p95(ms)':>16}{'循环停顿 max(ms)':>20}"
+    print(header)
+    for item in results:
+        print(
+            f"{item['mode']:<24}{item['elapsed_s']:>10}{item['throughput_rps']:>14}"
+            f"{item['fast_p50_ms']:>16}{item['fast_p95_ms']:>16}{item['loop_lag_max_ms']:>20}"
+        )
+    baseline, migrated = results
+    if baseline["throughput_rps"] and migrated["fast_p95_ms"]:
+        print(f"吞吐变化: {migrated['throughput_rps'] / baseline['throughput_rps']:.2f}x，"
+              f"轻量请求 p95 降低: {baseline['fast_p95_ms'] / migrated['fast_p95_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="异步数据库会话并发基准")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发请求数")
+    parser.add_argument("--rounds", type=int, default=3, help="轮数")
+    parser.add_argument("--slow-rows", type=int, default=300000, help="慢查询生成的行数")
+    parser.add_argument("--fast-rows", type=int, default=100, help="轻量查询生成的行数")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.rounds, args.slow_rows, args.fast_rows))
@@ -1,9 +1,15 @@
 import os
 import sys
+import tempfile
 from pathlib import Path
 
 import pytest
 
+# 測試頻繁登錄，關閉全局限流；限流器本身在 test_rate_limiter.py 中以 local 模式單獨測試
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# 監控事件歸檔寫入臨時目錄，避免測試事件落到倉庫的 data/ 下
+os.environ.setdefault("GROUP_AI_EVENT_ARCHIVE_DIRECTORY", tempfile.mkdtemp(prefix="monitor_events_"))
+
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
@@ -0,0 +1,172 @@
+"""
+認證快速路徑測試：令牌緩存命中不查庫、寫入後按標籤失效（停用、角色變更、批量更新）、登出撤銷、聲明模式與統計
+"""
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.api import deps
+from app.core import auth_cache
+from app.core.auth_cache import Principal, TokenCache, revoke_token
+from app.core.cache import invalidate_tags
+from app.core.config import get_settings
+from app.core.security import create_access_token
+from app.crud.permission import user_has_permission
+from app.crud.user import assign_role_to_user, create_role, create_user
+from app.db import SessionLocal
+from app.main import app
+from app.models.permission import Permission
+from app.models.role import Role
+from app.models.user import User
+
+client = TestClient(app)
+
+EMAIL = "auth_cache_user@example.com"
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.query(User).filter(User.email == EMAIL).delete(synchronize_session=False)
+        session.query(Role).filter(Role.name == "auth_cache_role").delete(synchronize_session=False)
+        session.query(Permission).filter(Permission.code == "auth_cache:view").delete(synchronize_session=False)
+        session.commit()
+        session.close()
+
+
+@pytest.fixture
+def token_cache(monkeypatch):
+    cache = TokenCache(ttl_seconds=30)
+    monkeypatch.setattr(auth_cache, "_token_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def user(db):
+    existing = db.query(User).filter(User.email == EMAIL).first()
+    if existing:
+        db.delete(existing)
+        db.commit()
+    return create_user(db, email=EMAIL, password="testpass123", full_name="緩存測試")
+
+
+def _authenticate(db, token):
+    return deps.get_current_user(token=token, credentials=None, db=db)
+
+
+def _fail_db_lookup(*args, **kwargs):
+    raise AssertionError("不應查詢數據庫")
+
+
+class TestTokenCache:
+    """緩存命中與失效"""
+
+    def test_second_request_skips_decode_and_db(self, db, user, token_cache, monkeypatch):
+        token = create_access_token(EMAIL)
+        first = _authenticate(db, token)
+        assert isinstance(first, User)
+
+        monkeypatch.setattr(deps, "get_user_by_email", _fail_db_lookup)
+        monkeypatch.setattr(deps.jwt, "decode", _fail_db_lookup)
+        second = _authenticate(db, token)
+        assert isinstance(second, Principal)
+        assert (second.id, second.email, second.is_active) == (user.id, EMAIL, True)
+
+        stats = token_cache.get_stats()
+        assert (stats["db_loads"], stats["cache_hits"]) == (1, 1)
+        assert stats["fast_path_rate"] == 0.5
+
+    def test_deactivation_invalidates_cached_principal(self, db, user, token_cache):
+        token = create_access_token(EMAIL)
+        _authenticate(db, token)
+        assert isinstance(_authenticate(db, token), Principal)
+
+        user.is_active = False
+        db.commit()
+        reloaded = _authenticate(db, token)
+        assert isinstance(reloaded, User) and reloaded.is_active is False
+        with pytest.raises(HTTPException):
+            deps.get_current_active_user(current_user=_authenticate(db, token))
+
+    def test_role_change_refreshes_permissions(self, db, user, token_cache):
+        token = create_access_token(EMAIL)
+        _authenticate(db, token)
+        assert not user_has_permission(db, user=_authenticate(db, token), permission_code="auth_cache:view")
+
+        role = create_role(db, name="auth_cache_role")
+        role.permissions.append(Permission(code="auth_cache:view"))
+        db.commit()
+        assign_role_to_user(db, user=user, role=role)
+
+        assert isinstance(_authenticate(db, token), User)
+        principal = _authenticate(db, token)
+        assert isinstance(principal, Principal)
+        assert user_has_permission(db, user=principal, permission_code="auth_cache:view")
+
+    def test_bulk_update_invalidates_all_principals(self, db, user, token_cache):
+        token = create_access_token(EMAIL)
+        _authenticate(db, token)
+        db.query(User).filter(User.email == EMAIL).update({"full_name": "批量更新"}, synchronize_session=False)
+        db.commit()
+        assert isinstance(_authenticate(db, token), User)
+
+    def test_revoked_token_rejected(self, db, user, token_cache):
+        token = create_access_token(EMAIL)
+        _authenticate(db, token)
+        revoke_token(token)
+        with pytest.raises(HTTPException) as exc_info:
+            _authenticate(db, token)
+        assert exc_info.value.status_code == 401
+        assert token_cache.get_stats()["revoked"] == 1
+        # 同一用戶的其他令牌不受影響
+        assert _authenticate(db, create_access_token(EMAIL)).email == EMAIL
+
+
+class TestClaimsMode:
+    """令牌內嵌主體聲明"""
+
+    def test_claims_used_only_when_version_matches(self, db, user, token_cache, monkeypatch):
+        monkeypatch.setattr(get_settings(), "auth_embed_claims", True)
+        monkeypatch.setattr(auth_cache, "_shared_tag_versions", lambda: True)
+        token = create_access_token(EMAIL, claims=auth_cache.access_token_claims(user))
+
+        principal = _authenticate(db, token)
+        assert isinstance(principal, Principal) and principal.id == user.id
+        assert token_cache.get_stats()["claim_hits"] == 1
+
+        # 權限版本變化後聲明失效，退回數據庫
+        token_cache.clear()
+        invalidate_tags(auth_cache.user_tag(EMAIL))
+        assert isinstance(_authenticate(db, token), User)
+        assert token_cache.get_stats()["db_loads"] == 1
+
+    def test_claims_ignored_without_shared_versions(self, user, monkeypatch):
+        monkeypatch.setattr(get_settings(), "auth_embed_claims", True)
+        claims = auth_cache.access_token_claims(user)
+        assert claims["uid"] == user.id
+        assert auth_cache.principal_from_claims({"sub": EMAIL, **claims}, {}) is None
+
+
+class TestAuthEndpoints:
+    """登出與統計接口"""
+
+    def test_logout_revokes_and_stats(self, token_cache):
+        settings = get_settings()
+        resp = client.post(
+            "/api/v1/auth/login",
+            data={"username": settings.admin_default_email, "password": "testpass123"},
+            headers={"content-type": "application/x-www-form-urlencoded"},
+        )
+        assert resp.status_code == 200, resp.text
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        stats = client.get("/api/v1/performance/auth/stats", headers=headers)
+        assert stats.status_code == 200, stats.text
+        assert stats.json()["auth"]["ttl_seconds"] == 30
+
+        assert client.post("/api/v1/auth/logout", headers=headers).status_code == 200
+        assert client.get("/api/v1/users/me", headers=headers).status_code == 401
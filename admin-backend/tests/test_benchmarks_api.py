@@ -0,0 +1,55 @@
+"""
+接口基準的統計與基線對比測試
+"""
+from benchmarks.api_benchmark import compare_results, summarize
+from benchmarks.datasets import _batches
+
+
+def _result(p95_ms=10.0, rps=100.0, errors=0):
+    return {"p95_ms": p95_ms, "throughput_rps": rps, "errors": errors}
+
+
+class TestSummarize:
+    """延遲分位數與吞吐統計測試"""
+
+    def test_percentiles_and_throughput(self):
+        latencies = [i / 1000 for i in range(1, 101)]
+        result = summarize(latencies, elapsed_s=2.0, errors=0)
+        assert result["p50_ms"] == 51.0
+        assert result["p95_ms"] == 96.0
+        assert result["p99_ms"] == 100.0
+        assert result["throughput_rps"] == 50.0
+
+    def test_all_failed(self):
+        assert summarize([], elapsed_s=1.0, errors=3) == {"requests": 3, "errors": 3, "throughput_rps": 0.0}
+
+
+class TestCompareResults:
+    """基線對比測試"""
+
+    def test_within_threshold_passes(self):
+        assert compare_results({"a": _result(11.5, 90)}, {"a": _result(10, 100)}) == []
+
+    def test_latency_and_throughput_regressions(self):
+        regressions = compare_results({"a": _result(30, 50)}, {"a": _result(10, 100)})
+        assert len(regressions) == 2
+        assert "p95" in regressions[0] and "吞吐" in regressions[1]
+
+    def test_small_absolute_delta_is_ignored(self):
+        # 1ms -> 2ms 翻倍，但差值低於 min_delta_ms
+        assert compare_results({"a": _result(2, 100)}, {"a": _result(1, 100)}) == []
+
+    def test_per_scenario_override_and_new_errors(self):
+        thresholds = {"scenarios": {"export": {"latency": 1.0}}}
+        current = {"export": _result(18, 100), "logs": _result(10, 100, errors=2), "new": _result(99, 1)}
+        baseline = {"export": _result(10, 100), "logs": _result(10, 100)}
+        regressions = compare_results(current, baseline, thresholds)
+        assert len(regressions) == 1
+        assert regressions[0].startswith("logs: 2 ")
+
+
+class TestDatasets:
+    """數據集批量寫入測試"""
+
+    def test_batches(self):
+        assert [len(b) for b in _batches(iter(range(5)), size=2)] == [2, 2, 1]
@@ -0,0 +1,26 @@
+"""
+group_ai_service 微基準測試：用例可運行、計時與分配統計、基線對比
+"""
+from benchmarks.group_ai_micro import CASES, compare_results, measure, run_suite
+
+
+class TestMicroBenchmarks:
+    """微基準套件測試"""
+
+    def test_all_cases_run_with_quick_inputs(self):
+        results = run_suite("quick", min_time=0.001, repeat=1)
+        assert set(results) == {case.name for case in CASES}
+        for item in results.values():
+            assert item["ops_per_sec"] > 0
+            assert item["peak_bytes_per_call"] >= 0
+
+    def test_measure_reports_allocations(self):
+        result = measure(lambda: [0] * 100000, min_time=0.001, repeat=1, alloc_calls=3)
+        assert result["peak_bytes_per_call"] >= 100000 * 8
+        assert result["retained_bytes_per_call"] < 1000
+
+    def test_compare_results(self):
+        baseline = {"a": {"ops_per_sec": 1000, "peak_bytes_per_call": 1000}}
+        assert compare_results({"a": {"ops_per_sec": 900, "peak_bytes_per_call": 1200}}, baseline) == []
+        regressions = compare_results({"a": {"ops_per_sec": 500, "peak_bytes_per_call": 5000}}, baseline)
+        assert len(regressions) == 2
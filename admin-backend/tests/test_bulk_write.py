@@ -0,0 +1,164 @@
+"""
+批量寫入層測試：一次 IN 查詢的存在性檢查、批量插入/更新、逐行錯誤報告，以及使用它的批量接口
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.api.group_ai.account_import import AccountImportItem, save_accounts_to_db
+from app.core.config import get_settings
+from app.crud.bulk import bulk_upsert
+from app.db import SessionLocal, engine
+from app.main import app
+from app.models.group_ai import GroupAIAccount, GroupAIScript, GroupAIScriptVersion
+
+client = TestClient(app)
+
+
+def _get_token() -> str:
+    settings = get_settings()
+    resp = client.post(
+        "/api/v1/auth/login",
+        data={"username": settings.admin_default_email, "password": "testpass123"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    assert resp.status_code == 200, resp.text
+    return resp.json()["access_token"]
+
+
+class _StatementCounter:
+    def __init__(self, table):
+        self.table = table
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.table in statement:
+            self.statements.append(statement.split()[0].upper())
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.query(GroupAIAccount).filter(GroupAIAccount.account_id.like("bulk_%")).delete(synchronize_session=False)
+        session.query(GroupAIScriptVersion).filter(GroupAIScriptVersion.script_id.like("bulk_%")).delete(synchronize_session=False)
+        session.query(GroupAIScript).filter(GroupAIScript.script_id.like("bulk_%")).delete(synchronize_session=False)
+        session.commit()
+        session.close()
+
+
+def _account(account_id, **values):
+    return {"account_id": account_id, "session_file": f"{account_id}.session", "script_id": "default", **values}
+
+
+class TestBulkUpsert:
+    """bulk_upsert 測試"""
+
+    def test_single_existence_query_and_batched_writes(self, db):
+        db.add(GroupAIAccount(**_account("bulk_existing", reply_rate=0.1)))
+        db.commit()
+
+        rows = [_account(f"bulk_{i}") for i in range(20)] + [_account("bulk_existing", reply_rate=0.9)]
+        with _StatementCounter("group_ai_accounts") as counter:
+            result = bulk_upsert(db, GroupAIAccount, "account_id", rows, update_columns=("reply_rate",))
+            db.commit()
+
+        assert counter.statements.count("SELECT") == 1
+        assert counter.statements.count("INSERT") == 1
+        assert counter.statements.count("UPDATE") == 1
+        assert len(result.inserted) == 20
+        assert result.updated == ["bulk_existing"]
+        existing = db.query(GroupAIAccount).filter_by(account_id="bulk_existing").one()
+        assert existing.reply_rate == 0.9
+
+    def test_row_errors_do_not_abort_batch(self, db):
+        rows = [
+            _account("bulk_ok1"),
+            _account("bulk_bad", session_file=None),  # NOT NULL 約束失敗
+            _account("bulk_ok1"),
+            {"session_file": "x", "script_id": "default"},
+            _account("bulk_ok2"),
+        ]
+        result = bulk_upsert(db, GroupAIAccount, "account_id", rows)
+        db.commit()
+
+        assert sorted(result.inserted) == ["bulk_ok1", "bulk_ok2"]
+        assert {error["key"] for error in result.errors} == {"bulk_bad", "bulk_ok1", None}
+        assert db.query(GroupAIAccount).filter(GroupAIAccount.account_id.like("bulk_ok%")).count() == 2
+        assert db.query(GroupAIAccount).filter_by(account_id="bulk_bad").count() == 0
+
+
+class TestAccountImport:
+    """賬號配置導入"""
+
+    def test_creates_and_merges_config(self, db):
+        db.add(GroupAIAccount(**_account("bulk_tg1", config={"keep": True})))
+        db.commit()
+
+        result = save_accounts_to_db([
+            AccountImportItem(api_id="1", api_hash="h1", session_name="bulk_tg1"),
+            AccountImportItem(api_id="2", api_hash="h2", session_name="bulk_tg2"),
+            AccountImportItem(api_id="3", api_hash="h3", session_name="bulk_tg2"),
+        ], db)
+
+        assert (result.total, result.success, result.failed) == (3, 2, 1)
+        db.expire_all()
+        updated = db.query(GroupAIAccount).filter_by(account_id="bulk_tg1").one()
+        assert updated.config == {
+            "keep": True,
+            "telegram_api_id": "1",
+            "telegram_api_hash": "h1",
+            "telegram_session_name": "bulk_tg1",
+        }
+        created = db.query(GroupAIAccount).filter_by(account_id="bulk_tg2").one()
+        assert created.active is False
+        assert created.config["telegram_api_id"] == "2"
+
+
+class TestScriptBatchAPI:
+    """劇本批量操作"""
+
+    def _create_scripts(self, db, statuses):
+        for script_id, script_status in statuses.items():
+            db.add(GroupAIScript(script_id=script_id, name=script_id, version="1.0", yaml_content="x", status=script_status))
+            db.add(GroupAIScriptVersion(script_id=script_id, version="1.0", yaml_content="x"))
+        db.commit()
+
+    def test_publish_reports_per_script_errors(self, db):
+        self._create_scripts(db, {"bulk_s1": "approved", "bulk_s2": "draft", "bulk_s3": "reviewing"})
+        resp = client.post(
+            "/api/v1/group-ai/scripts/batch",
+            json={"script_ids": ["bulk_s1", "bulk_s2", "bulk_s3", "bulk_missing"], "action": "publish"},
+            headers={"Authorization": f"Bearer {_get_token()}"},
+        )
+        assert resp.status_code == 200, resp.text
+        data = resp.json()
+        assert data["success_ids"] == ["bulk_s1", "bulk_s3"]
+        assert {item["script_id"] for item in data["failed_items"]} == {"bulk_s2", "bulk_missing"}
+
+        db.expire_all()
+        published = db.query(GroupAIScript).filter_by(script_id="bulk_s1").one()
+        assert published.status == "published"
+        assert published.published_at is not None
+        assert db.query(GroupAIScript).filter_by(script_id="bulk_s2").one().status == "draft"
+
+    def test_delete_removes_versions(self, db):
+        self._create_scripts(db, {"bulk_d1": "draft", "bulk_d2": "published"})
+        resp = client.post(
+            "/api/v1/group-ai/scripts/batch",
+            json={"script_ids": ["bulk_d1", "bulk_d2"], "action": "delete"},
+            headers={"Authorization": f"Bearer {_get_token()}"},
+        )
+        assert resp.status_code == 200, resp.text
+        assert resp.json()["success_count"] == 2
+        assert db.query(GroupAIScript).filter(GroupAIScript.script_id.like("bulk_d%")).count() == 0
+        assert db.query(GroupAIScriptVersion).filter(GroupAIScriptVersion.script_id.like("bulk_d%")).count() == 0
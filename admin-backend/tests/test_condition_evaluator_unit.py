@@ -0,0 +1,142 @@
+"""
+ConditionEvaluator 單元測試
+"""
+import sys
+from pathlib import Path
+
+# 添加項目根目錄到 Python 路徑
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import get_settings
+from app.main import app
+from group_ai_service import condition_evaluator
+from group_ai_service.condition_evaluator import ConditionEvaluator, ConditionSyntaxError, compile_condition
+
+
+@pytest.fixture
+def evaluator():
+    return ConditionEvaluator()
+
+
+@pytest.fixture
+def context():
+    return {
+        "group_activity": 3,
+        "message_count": 42,
+        "is_weekend": False,
+        "hour": 14,
+        "minimum": 5,
+        "status": "active",
+        "title": "搶紅包啦",
+        "tags": ["vip", "new"],
+        "group": {"metrics": {"activity": 7}},
+    }
+
+
+class TestConditionEvaluator:
+    """條件評估測試"""
+
+    @pytest.mark.parametrize("condition,expected", [
+        ("group_activity < 5", True),
+        ("message_count > 10", True),
+        ("is_weekend == true", False),
+        ("hour in [9, 10, 11, 14, 15, 16]", True),
+        ("hour not in [14]", False),
+        ("group.metrics.activity >= 5", True),
+        ("status == active", True),  # 右側裸名稱為字符串（兼容舊寫法）
+        ("message_count > ${minimum}", True),
+        ("is_weekend", False),
+        ("missing", False),
+        ("missing > 5", False),  # 類型不可比較視為不滿足
+    ])
+    def test_legacy_conditions(self, evaluator, context, condition, expected):
+        assert evaluator.evaluate(condition, context) is expected
+
+    def test_contains_is_not_parsed_as_in(self, evaluator, context):
+        """舊實現按子串探測運算符，"contains" 會被當作 "in" 切分"""
+        assert evaluator.evaluate("title contains '紅包'", context) is True
+        assert evaluator.evaluate("tags contains 'vip'", context) is True
+        assert evaluator.evaluate("index_name == 'x'", {"index_name": "x"}) is True
+
+    def test_multi_word_bare_string(self, evaluator):
+        """舊實現把運算符右側整段作為字符串，未加引號的多個單詞仍應匹配"""
+        context = {"msg": "hello world", "n": 2}
+        assert evaluator.evaluate("msg == hello world", context) is True
+        assert evaluator.evaluate("msg != hello world", context) is False
+        assert evaluator.evaluate("msg == hello world and n > 1", context) is True
+        assert evaluator.evaluate("msg in [hello world, foo]", context) is True
+        assert evaluator.validate_condition("msg == hello world") == (True, None)
+
+    def test_boolean_logic_and_grouping(self, evaluator, context):
+        assert evaluator.evaluate("not is_weekend and hour >= 9", context) is True
+        assert evaluator.evaluate("(is_weekend or hour < 9) and status == 'active'", context) is False
+        assert evaluator.evaluate("is_weekend or hour < 9 or tags contains 'new'", context) is True
+
+    def test_attribute_paths(self, evaluator):
+        class Group:
+            activity = 8
+
+        assert evaluator.evaluate("group.activity > 5", {"group": Group()}) is True
+
+    def test_invalid_condition_returns_false(self, evaluator, context):
+        assert evaluator.evaluate("hour >", context) is False
+        assert evaluator.evaluate("", context) is False
+
+
+class TestCompileCache:
+    """編譯與緩存測試"""
+
+    def test_compiled_once(self, monkeypatch):
+        condition_evaluator._compile_cached.cache_clear()
+        calls = []
+        original = condition_evaluator._Parser.parse
+
+        def counting_parse(self):
+            calls.append(self.source)
+            return original(self)
+
+        monkeypatch.setattr(condition_evaluator._Parser, "parse", counting_parse)
+        evaluator = ConditionEvaluator()
+        for hour in (9, 10, 11):
+            evaluator.evaluate("hour in [9, 10]", {"hour": hour})
+        ConditionEvaluator().evaluate("hour in [9, 10]", {"hour": 9})
+        assert calls == ["hour in [9, 10]"]
+
+    def test_syntax_error_raised_at_compile_time(self):
+        with pytest.raises(ConditionSyntaxError):
+            compile_condition("(hour > 1")
+
+    @pytest.mark.parametrize("condition", ["hour > 1 2", "a && b", "hour in [1,", "${}"])
+    def test_validate_condition_reports_errors(self, evaluator, condition):
+        valid, error = evaluator.validate_condition(condition)
+        assert valid is False
+        assert error
+
+    def test_validate_condition_accepts_valid(self, evaluator):
+        assert evaluator.validate_condition("hour in [9, 10] and not is_weekend") == (True, None)
+
+
+class TestScheduledMessageConditionValidation:
+    """定時消息 API 保存時校驗條件"""
+
+    def test_invalid_condition_rejected(self, prepare_database):
+        client = TestClient(app)
+        settings = get_settings()
+        resp = client.post(
+            "/api/v1/auth/login",
+            data={"username": settings.admin_default_email, "password": "testpass123"},
+            headers={"content-type": "application/x-www-form-urlencoded"},
+        )
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+        resp = client.post(
+            "/api/v1/group-ai/scheduled-messages",
+            json={"task_id": "cond_invalid", "name": "cond", "schedule_type": "conditional", "condition": "hour >"},
+            headers=headers,
+        )
+        assert resp.status_code == 400
+        assert "條件表達式無效" in resp.json()["detail"]
@@ -0,0 +1,141 @@
+"""
+配置註冊表測試：只解析一次、只讀快照、變化檢測與原子替換、訂閱通知、解析失敗保留舊版本、監視線程
+"""
+import gc
+import json
+import os
+import time
+
+import pytest
+
+from app.core import config_registry as config_registry_module
+from app.core.config_registry import ConfigRegistry, FrozenDict, thaw
+
+
+def _write(path, data, text=None):
+    path.write_text(text if text is not None else json.dumps(data), encoding="utf-8")
+    # 保證 mtime 與上一次不同（部分文件系統的時間精度較低）
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@pytest.fixture
+def registry():
+    registry = ConfigRegistry(check_interval=0)
+    yield registry
+    registry.stop_watching()
+
+
+class TestConfigRegistry:
+    """註冊表基本行為"""
+
+    def test_parsed_once_and_shared(self, registry, tmp_path):
+        path = tmp_path / "master.json"
+        _write(path, {"servers": {"n1": {"host": "h", "tags": ["a"]}}})
+        calls = []
+        registry.register(path, parser=lambda text: calls.append(1) or json.loads(text))
+
+        first = registry.get(path)
+        for _ in range(5):
+            assert registry.get(str(path)) is first
+        assert len(calls) == 1
+        assert registry.get_stats()["files"][str(path)]["loads"] == 1
+
+        assert isinstance(first, FrozenDict)
+        assert first["servers"]["n1"]["tags"] == ("a",)
+        with pytest.raises(TypeError):
+            first["servers"]["x"] = {}
+        assert json.loads(json.dumps(first)) == {"servers": {"n1": {"host": "h", "tags": ["a"]}}}
+        mutable = thaw(first)
+        mutable["servers"]["x"] = {}
+
+    def test_change_swaps_snapshot_and_notifies(self, registry, tmp_path):
+        path = tmp_path / "master.json"
+        _write(path, {"v": 1})
+        changes = []
+        registry.subscribe(path, lambda old, new: changes.append((old.data["v"], new.data["v"])))
+        assert registry.get(path)["v"] == 1
+
+        _write(path, {"v": 2})
+        assert registry.get(path)["v"] == 2
+        assert changes == [(1, 2)]
+        stats = registry.get_stats()["files"][str(path)]
+        assert (stats["version"], stats["reloads"]) == (2, 1)
+
+    def test_parse_error_keeps_previous_version(self, registry, tmp_path):
+        path = tmp_path / "master.json"
+        _write(path, {"v": 1})
+        registry.get(path)
+        _write(path, None, text="{broken")
+        assert registry.get(path) == {"v": 1}
+        stats = registry.get_stats()["files"][str(path)]
+        assert stats["failures"] == 1 and stats["error"]
+
+        _write(path, {"v": 3})
+        assert registry.get(path) == {"v": 3}
+        assert registry.get_stats()["files"][str(path)]["error"] is None
+
+    def test_yaml_uses_libyaml_when_available(self):
+        yaml = pytest.importorskip("yaml")
+        if hasattr(yaml, "CSafeLoader"):
+            assert config_registry_module.YAML_LOADER is yaml.CSafeLoader
+
+    def test_missing_file_returns_default(self, registry, tmp_path):
+        path = tmp_path / "missing.yaml"
+        assert registry.get(path, default={}) == {}
+        path.write_text("a: [1, 2]\n", encoding="utf-8")
+        assert registry.get(path) == {"a": (1, 2)}
+
+    def test_bound_method_subscribers_are_weak(self, registry, tmp_path):
+        path = tmp_path / "master.json"
+        _write(path, {"v": 1})
+
+        class Listener:
+            def on_change(self, old, new):
+                pass
+
+        listener = Listener()
+        registry.subscribe(path, listener.on_change)
+        del listener
+        gc.collect()
+        _write(path, {"v": 2})
+        registry.get(path)
+        assert registry.get_stats()["files"][str(path)]["subscribers"] == 0
+
+    def test_watcher_reloads_in_background(self, tmp_path):
+        registry = ConfigRegistry(check_interval=0.05)
+        path = tmp_path / "master.json"
+        _write(path, {"v": 1})
+        registry.get(path)
+        registry.start_watching()
+        try:
+            assert registry.is_watching
+            _write(path, {"v": 2})
+            deadline = time.monotonic() + 2
+            while registry.get(path)["v"] != 2 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert registry.get(path)["v"] == 2
+        finally:
+            registry.stop_watching()
+        assert not registry.is_watching
+
+
+class TestServerConfigs:
+    """load_server_configs 經註冊表讀取"""
+
+    def test_load_server_configs_cached_until_change(self, tmp_path, monkeypatch):
+        from app.api.group_ai import servers
+
+        registry = ConfigRegistry(check_interval=0)
+        monkeypatch.setattr(servers, "get_config_registry", lambda: registry)
+        path = tmp_path / "master_config.json"
+        monkeypatch.setattr(servers, "get_master_config_path", lambda: path)
+        _write(path, {"servers": {"n1": {"host": "a"}}})
+
+        first = servers.load_server_configs()
+        assert servers.load_server_configs() is first
+        _write(path, {"servers": {"n2": {"host": "b"}}})
+        assert list(servers.load_server_configs()) == ["n2"]
+
+        path.unlink()
+        assert servers.load_server_configs() == {}
@@ -0,0 +1,168 @@
+"""
+緩存預熱、提前刷新與自適應 TTL 測試
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core import cache_optimization
+from app.core.cache import CacheManager
+from app.core.cache_optimization import CacheOptimizer, register_warmup
+
+
+class FakeSession:
+    """請求級數據庫會話替身"""
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(cache_optimization, "_warmup_registry", {})
+    return CacheManager()
+
+
+@pytest.fixture
+def optimizer(manager):
+    optimizer = CacheOptimizer(interval_seconds=1, min_samples=4)
+    optimizer.cache_manager = manager
+    return optimizer
+
+
+class TestPrefixStats:
+    """按前綴統計與緩存鍵測試"""
+
+    def test_decorator_records_prefix_stats(self, manager):
+        @manager.cached(prefix="stats_t", ttl=60)
+        def load(x: int):
+            return {"x": x}
+
+        load(1)
+        load(1)
+        load(2)
+
+        stats = manager.get_stats()["prefixes"]["stats_t"]
+        assert (stats["hits"], stats["misses"], stats["computes"]) == (1, 2, 2)
+        assert stats["payload_bytes"] == len('{"x": 2}')
+        assert stats["ttl"] == 60
+
+    def test_session_dependency_not_part_of_key(self, manager):
+        calls = []
+
+        @manager.cached(prefix="session_t", ttl=60)
+        def load(page: int, db=None):
+            calls.append(page)
+            return [page]
+
+        load(1, db=FakeSession())
+        load(1, db=FakeSession())
+        assert calls == [1]
+
+    def test_vary_on_shares_entry_between_users(self, manager):
+        calls = []
+
+        @manager.cached(prefix="shared_t", ttl=60, vary_on=())
+        async def load(current_user=None):
+            calls.append(current_user)
+            return {"total": 1}
+
+        asyncio.run(load(current_user="alice"))
+        asyncio.run(load(current_user="bob"))
+        assert calls == ["alice"]
+
+
+class TestWarmupAndRefresh:
+    """預熱與提前刷新測試"""
+
+    @pytest.mark.asyncio
+    async def test_warmup_fills_endpoint_key(self, manager, optimizer):
+        endpoint_calls = []
+
+        @manager.cached(prefix="dash_t", ttl=60, vary_on=())
+        async def endpoint(current_user=None, db=None):
+            endpoint_calls.append(current_user)
+            return {"source": "endpoint"}
+
+        register_warmup("dash_t", lambda: {"source": "warmup"})
+        assert await optimizer.warmup_cache() == 1
+
+        assert await endpoint(current_user="alice", db=FakeSession()) == {"source": "warmup"}
+        assert endpoint_calls == []
+
+    @pytest.mark.asyncio
+    async def test_refresh_ahead_only_for_accessed_entries(self, manager, optimizer):
+        versions = []
+
+        @manager.cached(prefix="hot_t", ttl=60, vary_on=())
+        async def endpoint():
+            return None
+
+        register_warmup("hot_t", lambda: versions.append(1) or {"version": len(versions)})
+        await optimizer.warmup_cache()
+        key = manager._generate_key("hot_t")
+
+        # 未臨近到期：不刷新
+        await endpoint()
+        assert await optimizer.refresh_ahead() == 0
+
+        # 臨近到期且期間被訪問：提前刷新
+        manager.memory_cache[key]["expires_at"] = datetime.now() + timedelta(seconds=5)
+        assert await optimizer.refresh_ahead() == 1
+        assert manager.get(key) == {"version": 2}
+        assert manager.remaining_ttl(key) > 50
+
+        # 刷新後未再被訪問：讓其自然過期
+        manager.memory_cache[key]["expires_at"] = datetime.now() + timedelta(seconds=5)
+        assert await optimizer.refresh_ahead() == 0
+        assert manager.prefix_stats["hot_t"].refreshes == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidated_hot_entry_is_reloaded(self, manager, optimizer):
+        register_warmup("inv_t", lambda: {"ok": True})
+        await optimizer.warmup_cache()
+        manager.record_miss("inv_t")
+        manager.invalidate_tags("inv_t")
+
+        assert await optimizer.refresh_ahead() == 1
+        assert manager.get(manager._generate_key("inv_t")) == {"ok": True}
+
+    @pytest.mark.asyncio
+    async def test_start_and_stop(self, optimizer):
+        optimizer.start()
+        assert optimizer._task is not None
+        await optimizer.stop()
+        assert optimizer._task is None
+
+
+class TestAdaptiveTTL:
+    """自適應 TTL 測試"""
+
+    def _observe(self, manager, prefix, hits, misses, compute_ms):
+        stats = manager._prefix_stats(prefix)
+        stats.hits += hits
+        stats.misses += misses
+        stats.computes += misses
+        stats.compute_ms += compute_ms * misses
+
+    def test_expensive_low_hit_prefix_grows_within_bounds(self, manager, optimizer):
+        manager.declared_ttls["slow_t"] = 60
+        for expected in (90, 135, 202, 240, 240):
+            self._observe(manager, "slow_t", hits=1, misses=9, compute_ms=500)
+            optimizer.tune_ttls()
+            assert manager.resolve_ttl("slow_t") == expected
+
+    def test_cheap_prefix_shrinks(self, manager, optimizer):
+        manager.declared_ttls["cheap_t"] = 120
+        self._observe(manager, "cheap_t", hits=9, misses=1, compute_ms=1)
+        assert optimizer.tune_ttls() == {"cheap_t": 84}
+
+    def test_insufficient_samples_keep_ttl(self, manager, optimizer):
+        manager.declared_ttls["quiet_t"] = 60
+        self._observe(manager, "quiet_t", hits=1, misses=1, compute_ms=500)
+        assert optimizer.tune_ttls() == {}
+        assert manager.resolve_ttl("quiet_t") == 60
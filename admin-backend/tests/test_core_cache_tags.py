@@ -0,0 +1,198 @@
+"""
+緩存標籤失效測試
+"""
+import fnmatch
+import json
+
+import pytest
+
+from app.core.cache import (
+    INVALIDATION_CHANNEL,
+    TAG_KEY_PREFIX,
+    CacheManager,
+    pattern_to_tag,
+)
+from app.core.cache_invalidation import CacheInvalidationStrategy
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def incr(self, key):
+        self.commands.append(key)
+
+    def execute(self):
+        return [self.redis.incr(key) for key in self.commands]
+
+
+class FakeRedis:
+    """最小 Redis 替身：支持緩存與標籤失效用到的命令，publish 同步投遞給已註冊的管理器"""
+
+    def __init__(self):
+        self.data = {}
+        self.subscribers = []
+        self.keys_called = False
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key) or 0) + 1)
+        return int(self.data[key])
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.data.pop(key, None) is not None)
+
+    def keys(self, pattern):
+        self.keys_called = True
+        return [key for key in self.data if fnmatch.fnmatch(key, pattern)]
+
+    def scan_iter(self, match=None, count=None):
+        return iter([key for key in list(self.data) if fnmatch.fnmatch(key, match)])
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def publish(self, channel, message):
+        assert channel == INVALIDATION_CHANNEL
+        for manager in self.subscribers:
+            manager.handle_invalidation_message(message)
+        return len(self.subscribers)
+
+
+def _worker(redis_client: FakeRedis) -> CacheManager:
+    """模擬一個使用共享 Redis 的 worker 進程"""
+    manager = CacheManager()
+    manager.redis_client = redis_client
+    manager.use_redis = True
+    redis_client.subscribers.append(manager)
+    return manager
+
+
+class TestMemoryTags:
+    """無 Redis 時的標籤失效測試"""
+
+    def test_invalidate_tag_drops_tagged_entries(self):
+        manager = CacheManager()
+        manager.set("accounts_list:a", [1], tags=["accounts_list"])
+        manager.set("account_detail:x", {"id": "x"}, tags=["account:x"])
+        manager.set("account_detail:y", {"id": "y"}, tags=["account:y"])
+
+        manager.invalidate_tags("account:x")
+
+        assert manager.get("account_detail:x") is None
+        assert manager.get("account_detail:y") == {"id": "y"}
+        assert manager.get("accounts_list:a") == [1]
+
+    def test_version_taken_before_compute_wins(self):
+        """計算期間發生的失效不會被較舊的結果覆蓋"""
+        manager = CacheManager()
+        versions = manager.get_tag_versions(["scripts_list"])
+        manager.invalidate_tags("scripts_list")
+        manager.set("scripts_list:k", ["old"], tags=versions)
+        assert manager.get("scripts_list:k") is None
+
+    def test_cached_decorator_resolves_argument_tags(self):
+        manager = CacheManager()
+        calls = []
+
+        @manager.cached(prefix="account_detail_t", ttl=60, tags=("account:{account_id}",))
+        def load(account_id: str):
+            calls.append(account_id)
+            return {"id": account_id, "version": len(calls)}
+
+        assert load("a")["version"] == 1
+        assert load("a")["version"] == 1
+        assert load(account_id="b")["version"] == 2
+
+        manager.invalidate_tags("account:a")
+        assert load("a")["version"] == 3
+        assert load(account_id="b")["version"] == 2
+
+        # 前綴標籤使該前綴下所有條目失效
+        manager.invalidate_tags("account_detail_t")
+        assert load(account_id="b")["version"] == 4
+
+    def test_pattern_to_tag(self):
+        assert pattern_to_tag("accounts_list:*") == "accounts_list"
+        assert pattern_to_tag("scripts_list*") == "scripts_list"
+        assert pattern_to_tag("scheduled_messages") == "scheduled_messages"
+
+
+class TestRedisTags:
+    """共享 Redis 的多 worker 標籤失效測試"""
+
+    def test_invalidation_reaches_other_workers(self):
+        redis_client = FakeRedis()
+        worker_a, worker_b = _worker(redis_client), _worker(redis_client)
+
+        worker_a.set("accounts_list:k", ["v1"], tags=["accounts_list"])
+        # worker_b 從 Redis 讀取並持有內存副本
+        assert worker_b.get("accounts_list:k") == ["v1"]
+        worker_b.memory_cache["accounts_list:k"] = {
+            **worker_a.memory_cache["accounts_list:k"],
+        }
+
+        worker_a.invalidate_tags("accounts_list")
+
+        assert redis_client.data[f"{TAG_KEY_PREFIX}accounts_list"] == "1"
+        assert "accounts_list:k" not in worker_b.memory_cache
+        assert worker_a.get("accounts_list:k") is None
+        assert worker_b.get("accounts_list:k") is None
+
+    def test_stale_redis_entry_without_broadcast(self):
+        """廣播丟失時，Redis 中的條目仍按全局版本號判定失效"""
+        redis_client = FakeRedis()
+        manager = _worker(redis_client)
+        manager.set("script_detail:s1", {"id": "s1"}, tags=["script:s1"])
+        redis_client.incr(f"{TAG_KEY_PREFIX}script:s1")
+        assert manager.get("script_detail:s1") is None
+
+    def test_untagged_values_keep_plain_format(self):
+        redis_client = FakeRedis()
+        manager = _worker(redis_client)
+        manager.set("plain", {"a": 1})
+        assert json.loads(redis_client.data["plain"]) == {"a": 1}
+
+    def test_clear_pattern_uses_scan(self):
+        redis_client = FakeRedis()
+        manager = _worker(redis_client)
+        for i in range(3):
+            manager.set(f"servers_list:{i}", i)
+        manager.set("other:1", 1)
+
+        manager.clear_pattern("servers_list:*")
+
+        assert not redis_client.keys_called
+        assert "other:1" in redis_client.data
+        assert not any(key.startswith("servers_list:") for key in redis_client.data)
+
+    def test_own_broadcast_is_ignored(self):
+        redis_client = FakeRedis()
+        manager = _worker(redis_client)
+        message = json.dumps({"origin": manager.instance_id, "tags": {"x": 5}})
+        assert manager.handle_invalidation_message(message) == 0
+        assert manager.tag_versions.get("x", 0) == 0
+
+
+class TestInvalidationRules:
+    """事件規則的標籤失效測試"""
+
+    def test_rule_tags_use_event_params(self, monkeypatch):
+        invalidated = []
+        monkeypatch.setattr("app.core.cache_invalidation.invalidate_tags", lambda *tags: invalidated.extend(tags))
+        strategy = CacheInvalidationStrategy()
+        strategy.register_invalidation_rule(pattern=None, on_events=["account.updated"], tags=["account:{account_id}"])
+
+        strategy.trigger_event("account.updated", account_id="acc-1")
+        strategy.trigger_event("account.updated")
+
+        assert invalidated == ["account:acc-1"]
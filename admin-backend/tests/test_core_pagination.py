@@ -0,0 +1,157 @@
+"""
+分頁工具測試
+"""
+import pytest
+from datetime import datetime, timedelta
+
+from app.core.pagination import (
+    CountMode,
+    InvalidCursorError,
+    count_rows,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+)
+from app.models.audit_log import AuditLog
+
+
+RESOURCE_TYPE = "pagination_test"
+
+
+@pytest.fixture
+def audit_rows(prepare_database):
+    """創建 25 條審計日誌，其中部分 created_at 相同以驗證次級排序"""
+    from app.db import SessionLocal
+    db = SessionLocal()
+    base = datetime(2024, 1, 1, 12, 0, 0)
+    try:
+        for i in range(25):
+            db.add(AuditLog(
+                user_id=1,
+                user_email="page@example.com",
+                action="CREATE",
+                resource_type=RESOURCE_TYPE,
+                resource_id=str(i),
+                created_at=base + timedelta(minutes=i // 3),
+            ))
+        db.commit()
+        yield db
+    finally:
+        db.query(AuditLog).filter(AuditLog.resource_type == RESOURCE_TYPE).delete()
+        db.commit()
+        db.close()
+
+
+def _query(db):
+    return db.query(AuditLog).filter(AuditLog.resource_type == RESOURCE_TYPE)
+
+
+class TestCursorEncoding:
+    """游標編解碼測試"""
+
+    def test_roundtrip(self):
+        cursor = encode_cursor({"s": "created_at", "d": "desc", "o": 20, "k": [1, 2]})
+        data = decode_cursor(cursor)
+        assert data["o"] == 20
+        assert data["k"] == [1, 2]
+        assert "=" not in cursor
+
+    def test_invalid_cursor(self):
+        with pytest.raises(InvalidCursorError):
+            decode_cursor("not-a-cursor")
+        assert InvalidCursorError().status_code == 400
+
+
+class TestPaginate:
+    """分頁測試"""
+
+    def test_page_number_compatible(self, audit_rows):
+        page = paginate(
+            _query(audit_rows),
+            sort_column=AuditLog.created_at,
+            tiebreak_column=AuditLog.id,
+            page=2,
+            page_size=10,
+        )
+        assert page.total == 25
+        assert page.total_pages == 3
+        assert page.page == 2
+        assert len(page.items) == 10
+        assert page.has_more is True
+
+    def test_cursor_walk_matches_offset(self, audit_rows):
+        expected = [
+            row.id for row in _query(audit_rows)
+            .order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).all()
+        ]
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            page = paginate(
+                _query(audit_rows),
+                sort_column=AuditLog.created_at,
+                tiebreak_column=AuditLog.id,
+                page_size=7,
+                cursor=cursor,
+                count_mode=CountMode.NONE,
+            )
+            pages += 1
+            assert page.page == pages
+            assert page.total is None
+            seen.extend(row.id for row in page.items)
+            if not page.has_more:
+                assert page.next_cursor is None
+                break
+            cursor = page.next_cursor
+        assert seen == expected
+
+    def test_ascending_cursor(self, audit_rows):
+        first = paginate(
+            _query(audit_rows),
+            sort_column=AuditLog.created_at,
+            tiebreak_column=AuditLog.id,
+            descending=False,
+            page_size=20,
+        )
+        second = paginate(
+            _query(audit_rows),
+            sort_column=AuditLog.created_at,
+            tiebreak_column=AuditLog.id,
+            descending=False,
+            page_size=20,
+            cursor=first.next_cursor,
+        )
+        assert len(second.items) == 5
+        assert second.has_more is False
+        assert {r.id for r in first.items}.isdisjoint({r.id for r in second.items})
+
+    def test_cursor_sort_mismatch(self, audit_rows):
+        page = paginate(
+            _query(audit_rows),
+            sort_column=AuditLog.created_at,
+            tiebreak_column=AuditLog.id,
+            page_size=5,
+        )
+        with pytest.raises(InvalidCursorError):
+            paginate(
+                _query(audit_rows),
+                sort_column=AuditLog.created_at,
+                tiebreak_column=AuditLog.id,
+                descending=False,
+                page_size=5,
+                cursor=page.next_cursor,
+            )
+
+
+class TestCountRows:
+    """計數模式測試"""
+
+    def test_exact_and_none(self, audit_rows):
+        assert count_rows(_query(audit_rows), CountMode.EXACT) == (25, False)
+        assert count_rows(_query(audit_rows), CountMode.NONE) == (None, False)
+
+    def test_estimated_falls_back_for_filtered_sqlite_query(self, audit_rows):
+        total, estimated = count_rows(_query(audit_rows), CountMode.ESTIMATED)
+        assert total == 25
+        assert estimated is False
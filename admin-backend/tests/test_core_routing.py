@@ -0,0 +1,75 @@
+"""
+聚合路由測試
+"""
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.routing import DeferredAPIRouter
+
+
+def _marker():
+    return "ok"
+
+
+def _route_table(app: FastAPI):
+    return [
+        (route.path, sorted(route.methods), list(route.tags), len(route.dependencies))
+        for route in app.routes
+        if hasattr(route, "tags")
+    ]
+
+
+def _build(aggregator_cls):
+    leaf = APIRouter(prefix="/items", tags=["items"])
+
+    @leaf.get("/")
+    def list_items():
+        return []
+
+    @leaf.get("/{item_id}")
+    def get_item(item_id: int):
+        return {"id": item_id}
+
+    other = APIRouter()
+
+    @other.get("/other")
+    def other_endpoint():
+        return "other"
+
+    group = aggregator_cls(prefix="/group", tags=["group"])
+    group.include_router(leaf, prefix="/v", tags=["leaf"], dependencies=[Depends(_marker)])
+    group.include_router(other)
+
+    root = aggregator_cls()
+    root.include_router(group)
+
+    app = FastAPI()
+    if isinstance(root, DeferredAPIRouter):
+        root.include_into(app, prefix="/api")
+    else:
+        app.include_router(root, prefix="/api")
+    return app
+
+
+class TestDeferredAPIRouter:
+    """聚合路由展開測試"""
+
+    def test_same_routes_as_nested_include(self):
+        assert _route_table(_build(DeferredAPIRouter)) == _route_table(_build(APIRouter))
+
+    def test_requests_are_served(self):
+        client = TestClient(_build(DeferredAPIRouter))
+        assert client.get("/api/group/v/items/3").json() == {"id": 3}
+        assert client.get("/api/group/other").json() == "other"
+
+    def test_child_routes_built_once(self):
+        group = DeferredAPIRouter(prefix="/group")
+        leaf = APIRouter()
+
+        @leaf.get("/x")
+        def x():
+            return 1
+
+        group.include_router(leaf)
+        assert group.routes == []
+        assert group.deferred_routers == [(leaf, {})]
@@ -0,0 +1,159 @@
+"""
+列表搜索測試：FTS5 索引與觸發器同步、相關度與前綴排序、短詞與通配符回退、列限定、審計日誌描述搜索
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.core import search as search_module
+from app.core.pagination import CountMode, paginate
+from app.core.search import SEARCH_SPECS, apply_search, rebuild_search_indexes, search_backend
+from app.crud.audit_log import get_audit_logs
+from app.db import SessionLocal, engine
+from app.models.audit_log import AuditLog
+from app.models.group_ai import GroupAIScript
+
+RESOURCE_TYPE = "search_test"
+
+
+@pytest.fixture
+def db(prepare_database):
+    session = SessionLocal()
+    session.add_all([
+        GroupAIScript(script_id="srch_hello", name="Hello world", version="1.0", description="greeting", yaml_content="scenes: intro"),
+        GroupAIScript(script_id="srch_other", name="Other", version="1.0", description="say hello to 新用戶", yaml_content="scenes: banana"),
+        GroupAIScript(script_id="srch_yaml", name="Plain", version="1.0", description="100% off", yaml_content="hello: world"),
+    ])
+    session.add_all([
+        AuditLog(user_id=1, user_email="s@example.com", action="UPDATE", resource_type=RESOURCE_TYPE, description=description)
+        for description in ("修改賬號 banana 的配置", "刪除劇本 apple", None)
+    ])
+    session.commit()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.query(GroupAIScript).filter(GroupAIScript.script_id.like("srch_%")).delete(synchronize_session=False)
+        session.query(AuditLog).filter(AuditLog.resource_type == RESOURCE_TYPE).delete(synchronize_session=False)
+        session.commit()
+        session.close()
+
+
+def _script_ids(session, term, **kwargs):
+    query = session.query(GroupAIScript).filter(GroupAIScript.script_id.like("srch_%"))
+    query = apply_search(query, GroupAIScript, term, **kwargs)
+    if not kwargs.get("ranked"):
+        query = query.order_by(GroupAIScript.script_id)
+    return [script.script_id for script in query]
+
+
+class TestApplySearch:
+    """搜索條件與排序"""
+
+    def test_index_tracks_inserts_updates_and_deletes(self, db):
+        assert _script_ids(db, "hello") == ["srch_hello", "srch_other"]
+        if engine.dialect.name == "sqlite":
+            tables = {name for (name,) in db.execute(text("SELECT name FROM sqlite_master WHERE name LIKE 'search_group_ai_scripts%'"))}
+            assert {"search_group_ai_scripts", "search_group_ai_scripts_au"} <= tables
+
+        script = db.query(GroupAIScript).filter_by(script_id="srch_yaml").one()
+        script.name = "Renamed plain"
+        db.commit()
+        assert _script_ids(db, "renamed") == ["srch_yaml"]
+        assert _script_ids(db, "plain") == ["srch_yaml"]
+
+        db.delete(script)
+        db.commit()
+        assert _script_ids(db, "renamed") == []
+
+        # 重建後結果不變
+        with engine.begin() as connection:
+            rebuild_search_indexes(connection)
+        assert _script_ids(db, "hello") == ["srch_hello", "srch_other"]
+
+    def test_ranked_puts_prefix_matches_first(self, db):
+        assert _script_ids(db, "hello", ranked=True) == ["srch_hello", "srch_other"]
+        assert _script_ids(db, "hello say", ranked=True) == ["srch_other"]
+
+        # 相關度排序時游標按偏移量翻頁
+        query = apply_search(db.query(GroupAIScript), GroupAIScript, "hello", ranked=True)
+        first = paginate(query, sort_column=GroupAIScript.created_at, tiebreak_column=GroupAIScript.id,
+                         page_size=1, count_mode=CountMode.NONE, keyset=False)
+        second = paginate(query, sort_column=GroupAIScript.created_at, tiebreak_column=GroupAIScript.id,
+                          page_size=1, cursor=first.next_cursor, count_mode=CountMode.NONE, keyset=False)
+        assert [first.items[0].script_id, second.items[0].script_id] == ["srch_hello", "srch_other"]
+        assert not second.has_more
+
+    def test_short_terms_and_wildcards(self, db):
+        assert _script_ids(db, "新用") == ["srch_other"]
+        assert _script_ids(db, "100%") == ["srch_yaml"]
+        assert _script_ids(db, "%") == ["srch_yaml"]
+        assert _script_ids(db, "  ") == ["srch_hello", "srch_other", "srch_yaml"]
+
+    def test_column_selection(self, db):
+        assert _script_ids(db, "banana") == []
+        assert _script_ids(db, "banana", columns=("yaml_content",)) == ["srch_other"]
+        with pytest.raises(ValueError):
+            apply_search(db.query(GroupAIScript), GroupAIScript, "x", columns=("status",))
+
+    def test_like_fallback_matches_index(self, db, monkeypatch):
+        expected = _script_ids(db, "hello world")
+        monkeypatch.setattr(search_module, "search_backend", lambda bind, table_name: "like")
+        assert _script_ids(db, "hello world") == expected == ["srch_hello"]
+
+
+class TestAuditLogSearch:
+    """審計日誌描述搜索"""
+
+    def test_search_description(self, db):
+        logs, total = get_audit_logs(db, resource_type=RESOURCE_TYPE, search="banana")
+        assert total == 1 and logs[0].description == "修改賬號 banana 的配置"
+        logs, total = get_audit_logs(db, resource_type=RESOURCE_TYPE, search="劇本")
+        assert [log.description for log in logs] == ["刪除劇本 apple"]
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    scratch = create_engine(f"sqlite:///{tmp_path / 'search.db'}")
+    with scratch.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE group_ai_scripts (id INTEGER PRIMARY KEY, script_id TEXT, name TEXT, description TEXT, yaml_content TEXT)"
+        )
+    try:
+        yield scratch
+    finally:
+        scratch.dispose()
+
+
+class TestIndexCreation:
+    """多進程並發創建與回退"""
+
+    def test_ddl_is_idempotent(self, scratch_engine):
+        # 兩個 worker 都在檢查時看到索引缺失，後執行的 DDL 不能失敗
+        statements = search_module._fts5_statements(SEARCH_SPECS["group_ai_scripts"])
+        with scratch_engine.begin() as connection:
+            for _ in range(2):
+                for _, ddl in statements:
+                    connection.exec_driver_sql(ddl)
+        assert search_backend(scratch_engine, "group_ai_scripts") == "fts5"
+
+    def test_transient_failure_is_not_cached(self, scratch_engine, monkeypatch):
+        statements = search_module._fts5_statements
+
+        def locked(spec):
+            raise OperationalError("CREATE VIRTUAL TABLE", {}, Exception("database is locked"))
+
+        monkeypatch.setattr(search_module, "_fts5_statements", locked)
+        assert search_backend(scratch_engine, "group_ai_scripts") == "like"
+        monkeypatch.setattr(search_module, "_fts5_statements", statements)
+        assert search_backend(scratch_engine, "group_ai_scripts") == "fts5"
+
+    def test_missing_tokenizer_falls_back_to_like(self, scratch_engine, monkeypatch):
+        statements = search_module._fts5_statements
+        monkeypatch.setattr(
+            search_module, "_fts5_statements",
+            lambda spec: [(name, ddl.replace("'trigram'", "'missing_tokenizer'")) for name, ddl in statements(spec)],
+        )
+        assert search_backend(scratch_engine, "group_ai_scripts") == "like"
+        monkeypatch.setattr(search_module, "_fts5_statements", statements)
+        assert search_backend(scratch_engine, "group_ai_scripts") == "like"
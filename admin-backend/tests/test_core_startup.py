@@ -0,0 +1,149 @@
+"""
+啟動階段編排測試
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.startup import DeferredStartupMiddleware, StartupPhase, StartupRunner
+
+
+def _sleep_phase(name, seconds, calls, **kwargs):
+    async def run():
+        calls.append(name)
+        await asyncio.sleep(seconds)
+    return StartupPhase(name, run, **kwargs)
+
+
+class TestStartupRunner:
+    """啟動階段執行器測試"""
+
+    @pytest.mark.asyncio
+    async def test_stages_run_in_order_and_background_in_parallel(self):
+        calls = []
+        phases = [
+            _sleep_phase("db", 0.01, calls, stage=0),
+            _sleep_phase("seed", 0.01, calls, stage=1),
+            _sleep_phase("scheduler", 0.2, calls, critical=False),
+            _sleep_phase("monitor", 0.2, calls, critical=False),
+            _sleep_phase("warmup", 0.2, calls, critical=False),
+        ]
+        runner = StartupRunner(phases)
+
+        started = time.perf_counter()
+        report = await runner.run()
+        elapsed = time.perf_counter() - started
+
+        assert calls[:2] == ["db", "seed"]
+        # 三個 0.2 秒的後台階段並行執行
+        assert elapsed < 0.5
+        assert report["mode"] == "normal"
+        assert all(phase["status"] == "ok" for phase in report["phases"])
+        assert all(phase["duration_ms"] > 0 for phase in report["phases"])
+
+    @pytest.mark.asyncio
+    async def test_blocking_phase_runs_in_thread(self):
+        """阻塞階段在線程池執行，同組的其他階段可以同時推進"""
+        ticks = []
+        finished = []
+
+        def blocking():
+            time.sleep(0.2)
+            finished.append(time.perf_counter())
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        runner = StartupRunner([
+            StartupPhase("blocking", blocking, blocking=True),
+            StartupPhase("ticker", ticker),
+        ])
+        await runner.run()
+        assert sum(1 for tick in ticks if tick < finished[0]) >= 2
+
+    @pytest.mark.asyncio
+    async def test_background_failure_is_recorded(self):
+        def broken():
+            raise RuntimeError("boom")
+
+        runner = StartupRunner([StartupPhase("broken", broken, critical=False)])
+        report = await runner.run()
+        assert report["phases"][0]["status"] == "failed"
+        assert report["phases"][0]["error"] == "boom"
+
+    @pytest.mark.asyncio
+    async def test_critical_failure_aborts_startup(self):
+        def broken():
+            raise RuntimeError("db down")
+
+        calls = []
+        runner = StartupRunner([
+            StartupPhase("db", broken, stage=0),
+            _sleep_phase("seed", 0, calls, stage=1),
+        ])
+        with pytest.raises(RuntimeError):
+            await runner.run()
+        assert calls == []
+
+    @pytest.mark.asyncio
+    async def test_fast_start_defers_background(self):
+        calls = []
+        runner = StartupRunner(
+            [_sleep_phase("db", 0, calls), _sleep_phase("scheduler", 0, calls, critical=False)],
+            fast_start=True,
+            max_defer_seconds=0,
+        )
+        report = await runner.run()
+        assert calls == ["db"]
+        assert report["phases"][1]["status"] == "deferred"
+
+        runner.trigger_background()
+        runner.trigger_background()
+        await asyncio.sleep(0.05)
+        assert calls == ["db", "scheduler"]
+        assert runner.get_report()["phases"][1]["status"] == "ok"
+
+    @pytest.mark.asyncio
+    async def test_fast_start_timeout_fallback(self):
+        calls = []
+        runner = StartupRunner(
+            [_sleep_phase("scheduler", 0, calls, critical=False)],
+            fast_start=True,
+            max_defer_seconds=0.05,
+        )
+        await runner.run()
+        await asyncio.sleep(0.2)
+        assert calls == ["scheduler"]
+        await runner.cancel()
+
+
+class TestDeferredStartupMiddleware:
+    """首個請求觸發推遲服務測試"""
+
+    def test_first_request_triggers_background(self):
+        calls = []
+        app = FastAPI()
+        app.add_middleware(DeferredStartupMiddleware)
+
+        @app.on_event("startup")
+        async def startup():
+            app.state.startup_runner = StartupRunner(
+                [_sleep_phase("scheduler", 0, calls, critical=False)],
+                fast_start=True,
+                max_defer_seconds=0,
+            )
+            await app.state.startup_runner.run()
+
+        @app.get("/ping")
+        async def ping():
+            await asyncio.sleep(0.01)
+            return {"calls": list(calls)}
+
+        with TestClient(app) as client:
+            assert client.get("/ping").json() == {"calls": []}
+            assert client.get("/ping").json() == {"calls": ["scheduler"]}
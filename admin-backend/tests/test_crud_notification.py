@@ -24,6 +24,8 @@ from app.crud.notification import (
     find_matching_template,
     mark_notifications_as_read,
     delete_notifications,
+    count_unread_notifications,
+    recalculate_unread_count,
 )
 from app.models.notification import (
     NotificationConfig,
@@ -31,6 +33,7 @@ from app.models.notification import (
     NotificationType,
     NotificationStatus,
     NotificationTemplate,
+    NotificationUnreadCounter,
 )
 
 
@@ -445,3 +448,54 @@ class TestNotificationTemplate:
         finally:
             db.close()
 
+
+class TestNotificationUnreadCounter:
+    """未讀計數表維護測試"""
+
+    RECIPIENT = "counter@example.com"
+
+    def _create(self, db, notification_type=NotificationType.BROWSER):
+        return create_notification(db, notification_type=notification_type, title="通知", message="消息", recipient=self.RECIPIENT)
+
+    def _assert_consistent(self, db, expected):
+        assert get_unread_count(db, recipient=self.RECIPIENT) == expected
+        assert count_unread_notifications(db, recipient=self.RECIPIENT) == expected
+
+    def test_counter_tracks_create_read_delete(self, prepare_database):
+        from app.db import SessionLocal
+        db = SessionLocal()
+        try:
+            recalculate_unread_count(db, recipient=self.RECIPIENT)
+            base = get_unread_count(db, recipient=self.RECIPIENT)
+            browser = [self._create(db) for _ in range(4)]
+            email = self._create(db, NotificationType.EMAIL)
+            self._assert_consistent(db, base + 4)
+
+            assert mark_notification_read(db, notification_id=browser[0].id, recipient=self.RECIPIENT) is True
+            assert mark_notification_read(db, notification_id=browser[0].id, recipient=self.RECIPIENT) is True
+            assert mark_notification_read(db, notification_id=email.id, recipient=self.RECIPIENT) is True
+            self._assert_consistent(db, base + 3)
+
+            assert mark_notifications_as_read(db, notification_ids=[browser[0].id, browser[1].id], recipient=self.RECIPIENT) == 1
+            self._assert_consistent(db, base + 2)
+
+            assert delete_notifications(db, notification_ids=[browser[1].id, browser[2].id, email.id], recipient=self.RECIPIENT) == 3
+            self._assert_consistent(db, base + 1)
+
+            mark_all_read(db, recipient=self.RECIPIENT)
+            self._assert_consistent(db, 0)
+        finally:
+            db.close()
+
+    def test_counter_initialized_lazily(self, prepare_database):
+        from app.db import SessionLocal
+        db = SessionLocal()
+        try:
+            self._create(db)
+            db.query(NotificationUnreadCounter).filter_by(recipient=self.RECIPIENT).delete()
+            db.commit()
+            expected = count_unread_notifications(db, recipient=self.RECIPIENT)
+            assert get_unread_count(db, recipient=self.RECIPIENT) == expected
+            assert db.query(NotificationUnreadCounter).filter_by(recipient=self.RECIPIENT).one().unread_count == expected
+        finally:
+            db.close()
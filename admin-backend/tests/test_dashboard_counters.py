@@ -0,0 +1,198 @@
+"""
+儀表板計數器測試：寫入時增量更新、與全量重建一致、儀表板只按主鍵讀取計數、夜間對賬與清理
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.api.group_ai.dashboard import collect_dashboard_stats
+from app.db import ReadSessionLocal, SessionLocal, engine, read_engine
+from app.models.group_ai import (
+    GroupAIDialogueHistory,
+    GroupAIMetric,
+    GroupAIStatsActiveUser,
+    GroupAIStatsCounter,
+)
+from app.services.dashboard_counters import (
+    TOTAL_BUCKET,
+    compact_dashboard_counters,
+    day_bucket,
+    ensure_dashboard_counters,
+    get_dashboard_counters,
+    hour_bucket,
+    rebuild_dashboard_counters,
+)
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    rebuild_dashboard_counters(session)
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.query(GroupAIDialogueHistory).filter(GroupAIDialogueHistory.account_id.like("dc_%")).delete(synchronize_session=False)
+        session.query(GroupAIMetric).filter(GroupAIMetric.account_id.like("dc_%")).delete(synchronize_session=False)
+        session.query(GroupAIStatsCounter).delete()
+        session.query(GroupAIStatsActiveUser).delete()
+        session.commit()
+        session.close()
+
+
+def _dialogue(user_id, reply_text="ok", timestamp=None):
+    return GroupAIDialogueHistory(
+        account_id="dc_acc", group_id=-100, message_id=1, user_id=user_id,
+        message_text="hi", reply_text=reply_text, timestamp=timestamp,
+    )
+
+
+def _metric(metric_type, value, timestamp=None):
+    return GroupAIMetric(account_id="dc_acc", metric_type=metric_type, metric_value=value, timestamp=timestamp)
+
+
+def _days():
+    today = date.today()
+    return [today, today - timedelta(days=1)]
+
+
+def _read(db):
+    db.expire_all()
+    return get_dashboard_counters(db, _days())
+
+
+class TestIncrementalCounters:
+    """寫入時增量更新"""
+
+    def test_inserts_update_counters(self, db):
+        before = _read(db)
+        yesterday = datetime.now() - timedelta(days=1)
+        db.add_all([
+            _dialogue(1), _dialogue(1), _dialogue(2, reply_text=None), _dialogue(3, timestamp=yesterday),
+            _metric("token_usage", 100), _metric("token_usage", 50), _metric("error", 1),
+            _metric("response_time", 2.0), _metric("response_time", 4.0), _metric("cpu", 0.5),
+        ])
+        db.commit()
+
+        after = _read(db)
+        today = after[day_bucket(date.today())]
+        assert today["sessions"] - before[day_bucket(date.today())]["sessions"] == 3
+        assert today["successful_sessions"] - before[day_bucket(date.today())]["successful_sessions"] == 2
+        assert today["active_users"] - before[day_bucket(date.today())]["active_users"] == 2
+        assert today["token_usage"] - before[day_bucket(date.today())]["token_usage"] == 150
+        assert today["response_time_count"] - before[day_bucket(date.today())]["response_time_count"] == 2
+        assert after[TOTAL_BUCKET]["sessions"] - before[TOTAL_BUCKET]["sessions"] == 4
+
+        # 增量結果與從原始表重建的結果一致
+        rebuilt = rebuild_dashboard_counters(db)
+        for bucket, values in after.items():
+            for name in ("sessions", "successful_sessions", "active_users", "token_usage", "error_count"):
+                assert rebuilt[bucket][name] == values[name], (bucket, name)
+
+    def test_update_and_delete_adjust_counters(self, db):
+        dialogue = _dialogue(5, reply_text=None)
+        metric = _metric("token_usage", 30)
+        db.add_all([dialogue, metric])
+        db.commit()
+        before = _read(db)[day_bucket(date.today())]
+
+        dialogue.reply_text = "done"
+        db.delete(metric)
+        db.commit()
+
+        after = _read(db)[day_bucket(date.today())]
+        assert after["successful_sessions"] == before["successful_sessions"] + 1
+        assert after["sessions"] == before["sessions"]
+        assert after["token_usage"] == before["token_usage"] - 30
+
+    def test_hourly_bucket_updated(self, db):
+        timestamp = datetime.now().replace(minute=5)
+        db.add(_dialogue(7, timestamp=timestamp))
+        db.commit()
+        row = db.get(GroupAIStatsCounter, hour_bucket(timestamp))
+        assert row is not None and row.sessions >= 1
+
+
+class TestDashboardReads:
+    """儀表板讀取"""
+
+    def test_stats_read_counters_not_raw_tables(self, db):
+        db.add_all([_dialogue(11), _metric("error", 1)])
+        db.commit()
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if "group_ai_dialogue_history" in statement or "group_ai_metrics" in statement:
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            stats = collect_dashboard_stats(db)["stats"]
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        # 只有最近會話/錯誤列表查詢原始表
+        assert len(statements) == 2
+        assert all("LIMIT" in statement and "GROUP BY" not in statement for statement in statements)
+        counters = _read(db)[day_bucket(date.today())]
+        assert stats["today_sessions"] == counters["sessions"]
+        assert stats["error_count"] == counters["error_count"]
+
+    def test_missing_total_triggers_rebuild(self, db):
+        db.add(_dialogue(12))
+        db.commit()
+        db.query(GroupAIStatsCounter).delete()
+        db.commit()
+        counters = _read(db)
+        assert counters[TOTAL_BUCKET]["sessions"] >= 1
+        assert db.get(GroupAIStatsCounter, TOTAL_BUCKET) is not None
+
+    def test_read_only_session_does_not_rebuild(self, db):
+        if read_engine is engine:
+            pytest.skip("需要獨立的只讀連接池（文件 SQLite）")
+        db.add(_dialogue(13))
+        db.commit()
+        db.query(GroupAIStatsCounter).delete()
+        db.commit()
+
+        read_db = ReadSessionLocal()
+        try:
+            counters = get_dashboard_counters(read_db, _days())
+        finally:
+            read_db.close()
+        assert counters[TOTAL_BUCKET]["sessions"] >= 1
+        assert counters[day_bucket(date.today())]["sessions"] >= 1
+        db.expire_all()
+        assert db.get(GroupAIStatsCounter, TOTAL_BUCKET) is None
+
+        # 啟動階段在可寫引擎上重建一次
+        assert ensure_dashboard_counters() is True
+        assert ensure_dashboard_counters() is False
+        db.expire_all()
+        assert db.get(GroupAIStatsCounter, TOTAL_BUCKET).sessions == counters[TOTAL_BUCKET]["sessions"]
+
+
+class TestCompaction:
+    """夜間對賬"""
+
+    def test_reconciles_recent_days_and_prunes(self, db):
+        db.add(_dialogue(21))
+        db.commit()
+        today = date.today()
+        old_hour = hour_bucket(datetime.now() - timedelta(days=30))
+        expected = _read(db)[day_bucket(today)]["sessions"]
+
+        db.query(GroupAIStatsCounter).filter_by(bucket=day_bucket(today)).update({"sessions": 999})
+        db.add(GroupAIStatsCounter(bucket=old_hour, sessions=1))
+        db.add(GroupAIStatsActiveUser(day=today - timedelta(days=10), user_id=21))
+        db.commit()
+
+        compact_dashboard_counters(db)
+
+        counters = _read(db)
+        assert counters[day_bucket(today)]["sessions"] == expected
+        assert db.get(GroupAIStatsCounter, old_hour) is None
+        assert db.query(GroupAIStatsActiveUser).filter(GroupAIStatsActiveUser.day < today - timedelta(days=1)).count() == 0
+        day_total = sum(row.sessions for row in db.query(GroupAIStatsCounter).filter(GroupAIStatsCounter.bucket.like("d:%")))
+        assert counters[TOTAL_BUCKET]["sessions"] == day_total
@@ -0,0 +1,112 @@
+"""
+異步數據庫會話測試
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import select, text
+
+from app.db import (
+    AsyncSessionLocal,
+    SyncSessionAdapter,
+    engine,
+    get_async_db,
+    get_async_engine,
+    get_async_read_db,
+    read_engine,
+    to_async_url,
+)
+from app.models.audit_log import AuditLog
+
+
+class TestAsyncUrl:
+    """異步驅動 URL 轉換測試"""
+
+    def test_postgresql(self):
+        assert to_async_url("postgresql://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+        assert to_async_url("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+
+    def test_sqlite_uses_adapter(self):
+        assert to_async_url("sqlite:///./admin.db") is None
+
+
+class TestSyncSessionAdapter:
+    """同步會話兼容層測試"""
+
+    @pytest.mark.asyncio
+    async def test_execute_and_scalar(self, prepare_database):
+        db = AsyncSessionLocal()
+        try:
+            if get_async_engine() is None:
+                assert isinstance(db, SyncSessionAdapter)
+            result = await db.execute(text("SELECT 1 + 1"))
+            assert result.scalar() == 2
+            assert await db.scalar(select(AuditLog.id).where(AuditLog.id == -1)) is None
+        finally:
+            await db.close()
+
+    @pytest.mark.asyncio
+    async def test_run_sync_passes_session(self, prepare_database):
+        db = AsyncSessionLocal()
+        try:
+            count = await db.run_sync(lambda session: session.query(AuditLog).count())
+            assert isinstance(count, int)
+        finally:
+            await db.close()
+
+    @pytest.mark.asyncio
+    async def test_dependency_closes_session(self, prepare_database):
+        gen = get_async_db()
+        db = await gen.__anext__()
+        assert (await db.execute(text("SELECT 1"))).scalar() == 1
+        with pytest.raises(StopAsyncIteration):
+            await gen.__anext__()
+
+    @pytest.mark.asyncio
+    async def test_read_dependency_uses_read_pool(self, prepare_database):
+        """只讀依賴：SQLite 下拒絕寫入，列表搜索仍可用（索引 DDL 走主引擎）"""
+        from app.core.search import apply_search
+
+        gen = get_async_read_db()
+        db = await gen.__anext__()
+        try:
+            rows = await db.run_sync(lambda s: apply_search(s.query(AuditLog), AuditLog, "read pool").all())
+            assert rows == []
+            if read_engine is not engine and get_async_engine() is None:
+                with pytest.raises(Exception):
+                    await db.execute(text("CREATE TABLE read_pool_probe (id INTEGER)"))
+        finally:
+            with pytest.raises(StopAsyncIteration):
+                await gen.__anext__()
+
+    @pytest.mark.asyncio
+    async def test_slow_query_does_not_block_loop(self, prepare_database):
+        """慢查詢執行期間事件循環仍可調度其他協程"""
+        if get_async_engine() is not None:
+            pytest.skip("僅驗證線程池兼容層")
+        slow = text(
+            "WITH RECURSIVE cnt(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM cnt WHERE x < 300000) "
+            "SELECT count(*) FROM cnt"
+        )
+        ticks = 0
+
+        async def ticker(stop: asyncio.Event):
+            nonlocal ticks
+            while not stop.is_set():
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        db = AsyncSessionLocal()
+        stop = asyncio.Event()
+        task = asyncio.create_task(ticker(stop))
+        try:
+            started = time.perf_counter()
+            await db.execute(slow)
+            elapsed = time.perf_counter() - started
+        finally:
+            stop.set()
+            await task
+            await db.close()
+        if elapsed > 0.02:
+            assert ticks > 1
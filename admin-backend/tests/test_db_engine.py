@@ -0,0 +1,163 @@
+"""
+數據庫引擎配置與寫入隊列測試
+"""
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from app.db import (
+    ReadSessionLocal,
+    SessionLocal,
+    WriteQueue,
+    engine,
+    get_pool_metrics,
+    is_sqlite,
+)
+from app.models.audit_log import AuditLog
+
+
+RESOURCE_TYPE = "write_queue_test"
+
+
+@pytest.fixture
+def cleanup_rows(prepare_database):
+    yield
+    db = SessionLocal()
+    try:
+        db.query(AuditLog).filter(AuditLog.resource_type == RESOURCE_TYPE).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _add_log(resource_id: str):
+    def operation(session):
+        log = AuditLog(
+            user_id=1,
+            user_email="queue@example.com",
+            action="CREATE",
+            resource_type=RESOURCE_TYPE,
+            resource_id=resource_id,
+        )
+        session.add(log)
+        session.flush()
+        return log.id
+    return operation
+
+
+def _count_logs() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(AuditLog).filter(AuditLog.resource_type == RESOURCE_TYPE).count()
+    finally:
+        db.close()
+
+
+@pytest.mark.skipif(not is_sqlite, reason="僅適用於 SQLite")
+class TestSQLiteProfile:
+    """SQLite 連接配置測試"""
+
+    def test_pragmas_applied(self, prepare_database):
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() > 0
+            assert conn.execute(text("PRAGMA foreign_keys")).scalar() == 1
+
+    def test_connections_are_pooled(self, prepare_database):
+        before = get_pool_metrics()["main"]["connects"]
+        for _ in range(5):
+            db = SessionLocal()
+            db.execute(text("SELECT 1"))
+            db.close()
+        # 順序使用會話時復用同一連接，不再重複建立連接和執行 PRAGMA
+        assert get_pool_metrics()["main"]["connects"] - before <= 1
+
+    def test_read_session_is_query_only(self, prepare_database):
+        db = ReadSessionLocal()
+        try:
+            assert db.execute(text("PRAGMA query_only")).scalar() == 1
+        finally:
+            db.close()
+
+
+class TestPoolMetrics:
+    """連接池指標測試"""
+
+    def test_metrics_shape(self, prepare_database):
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+            metrics = get_pool_metrics()["main"]
+            assert metrics["checkouts"] >= 1
+            assert "pool_class" in metrics
+        finally:
+            db.close()
+
+
+class TestWriteQueue:
+    """寫入隊列測試"""
+
+    def test_execute_returns_result(self, cleanup_rows):
+        queue = WriteQueue()
+        try:
+            log_id = queue.execute(_add_log("single"), timeout=10)
+            assert log_id is not None
+            assert _count_logs() == 1
+        finally:
+            queue.stop()
+
+    def test_concurrent_submits_are_batched(self, cleanup_rows):
+        queue = WriteQueue(flush_interval=0.05)
+        try:
+            futures = []
+            lock = threading.Lock()
+
+            def worker(i):
+                future = queue.submit(_add_log(str(i)))
+                with lock:
+                    futures.append(future)
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            ids = [f.result(timeout=10) for f in futures]
+
+            assert len(set(ids)) == 20
+            assert _count_logs() == 20
+            stats = queue.get_stats()
+            assert stats["operations"] == 20
+            assert stats["batches"] < 20
+        finally:
+            queue.stop()
+
+    def test_failed_operation_does_not_affect_batch(self, cleanup_rows):
+        queue = WriteQueue(flush_interval=0.05)
+
+        def broken(session):
+            session.add(AuditLog(resource_type=RESOURCE_TYPE))  # 缺少必填字段
+            session.flush()
+
+        try:
+            ok_first = queue.submit(_add_log("a"))
+            failed = queue.submit(broken)
+            ok_second = queue.submit(_add_log("b"))
+            assert ok_first.result(timeout=10) is not None
+            assert ok_second.result(timeout=10) is not None
+            with pytest.raises(Exception):
+                failed.result(timeout=10)
+            assert _count_logs() == 2
+        finally:
+            queue.stop()
+
+    @pytest.mark.asyncio
+    async def test_execute_async(self, cleanup_rows):
+        queue = WriteQueue()
+        try:
+            results = await asyncio.gather(*[queue.execute_async(_add_log(str(i))) for i in range(3)])
+            assert len(results) == 3
+            assert _count_logs() == 3
+        finally:
+            queue.stop()
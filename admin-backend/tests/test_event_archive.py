@@ -0,0 +1,174 @@
+"""
+監控事件歸檔測試：段編解碼、按時間 / 賬號只讀取相關段、重啟後恢復、過期刪除與小段合併、歷史接口
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.api.group_ai import monitor as monitor_api
+from group_ai_service import event_archive
+from group_ai_service.event_archive import ArchiveLockedError, EventArchive, decode_segment, encode_segment
+from group_ai_service.monitor_service import MonitorService
+
+
+def _event(offset_seconds, account_id="acc_1", event_type="message", **extra):
+    return {
+        "type": event_type,
+        "account_id": account_id,
+        "success": True,
+        "timestamp": datetime(2026, 10, 1, 12, 0, 0) + timedelta(seconds=offset_seconds),
+        **extra,
+    }
+
+
+class TestSegmentCodec:
+    """段編解碼"""
+
+    def test_roundtrip_keeps_fields(self):
+        events = [
+            _event(0, message_type="received"),
+            _event(1, event_type="reply", reply_time=1.5),
+            _event(2, account_id="acc_2", event_type="redpacket", amount=8.88, success=False),
+        ]
+        data = encode_segment(events)
+        decoded = list(decode_segment(data))
+        assert decoded[0] == events[0]
+        assert decoded[1]["reply_time"] == 1.5 and "amount" not in decoded[1]
+        assert (decoded[2]["amount"], decoded[2]["success"], decoded[2]["account_id"]) == (8.88, False, "acc_2")
+        assert len(data) < len(str(events))
+
+
+class TestEventArchive:
+    """歸檔寫入、查詢與維護"""
+
+    def test_range_query_reads_only_matching_segments(self, tmp_path, monkeypatch):
+        archive = EventArchive(tmp_path)
+        for hour in range(3):
+            for i in range(10):
+                archive.append(_event(hour * 7200 + i, account_id=f"acc_{hour}"))
+            archive.flush()
+        archive.append(_event(30000, account_id="acc_0"))
+        assert archive.get_stats()["segments"] == 3
+
+        read = []
+        original = archive._read_segment
+        monkeypatch.setattr(archive, "_read_segment", lambda segment: read.append(segment["file"]) or original(segment))
+
+        start = datetime(2026, 10, 1, 14, 0, 0)
+        events = list(archive.iter_events(start, start + timedelta(minutes=5)))
+        assert len(events) == 10 and {e["account_id"] for e in events} == {"acc_1"}
+        assert len(read) == 1
+
+        read.clear()
+        events = list(archive.iter_events(account_id="acc_0"))
+        assert len(events) == 11 and len(read) == 1
+        assert [e["timestamp"] for e in events] == sorted(e["timestamp"] for e in events)
+
+        recent = archive.recent_events(limit=3, account_id="acc_2")
+        assert [e["timestamp"].second for e in recent] == [7, 8, 9]
+        archive.close()
+
+    def test_seals_automatically_and_survives_restart(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(event_archive, "SEGMENT_MAX_EVENTS", 4)
+        archive = EventArchive(tmp_path)
+        for i in range(6):
+            archive.append(_event(i))
+        archive.sync()
+        assert archive.get_stats()["segments"] == 1 and archive.get_stats()["active_events"] == 2
+        archive.close()
+
+        reopened = EventArchive(tmp_path)
+        assert [e["timestamp"].second for e in reopened.iter_events()] == [0, 1, 2, 3, 4, 5]
+        reopened.close()
+
+    def test_retention_and_compaction(self, tmp_path):
+        archive = EventArchive(tmp_path, retention_days=1)
+        for segment in range(4):
+            archive.append(_event(segment * 60))
+            archive.flush()
+        archive.append(_event(-3 * 86400))
+        archive.flush()
+        files_before = {s["file"] for s in archive._segments}
+
+        now = datetime(2026, 10, 1, 13, 0, 0).timestamp()
+        result = archive.maintain(now=now)
+        assert (result["expired"], result["compacted"]) == (1, 4)
+        assert archive.get_stats()["segments"] == 1
+        assert [e["timestamp"].minute for e in archive.iter_events()] == [0, 1, 2, 3]
+        assert all((tmp_path / name).exists() for name in files_before)
+
+        assert archive.maintain(now=now)["deleted_files"] == 5
+        assert sorted(p.name for p in tmp_path.glob("seg-*.evs")) == [archive._segments[0]["file"]]
+        archive.close()
+
+    def test_compaction_swaps_segments_in_one_index_update(self, tmp_path, monkeypatch):
+        archive = EventArchive(tmp_path)
+        for segment in range(4):
+            archive.append(_event(segment * 60))
+            archive.flush()
+
+        indexed_counts = []
+        original = archive._save_index
+        monkeypatch.setattr(
+            archive, "_save_index",
+            lambda: indexed_counts.append(sum(s["count"] for s in archive._segments)) or original(),
+        )
+        assert archive.maintain(now=datetime(2026, 10, 1, 13, 0, 0).timestamp())["compacted"] == 4
+        assert indexed_counts and set(indexed_counts) == {4}
+        archive.close()
+
+    def test_append_does_not_wait_for_disk(self, tmp_path):
+        archive = EventArchive(tmp_path, queue_size=2)
+        release = threading.Event()
+        blocker = threading.Thread(target=archive._call, args=(release.wait,))
+        blocker.start()
+        while archive._queue.qsize():
+            time.sleep(0.01)
+
+        for i in range(3):
+            archive.append(_event(i))
+        assert len(list(archive.iter_events())) == 2
+        assert archive.get_stats()["dropped_events"] == 1
+        assert (tmp_path / "active.jsonl").read_text() == ""
+
+        release.set()
+        blocker.join()
+        archive.sync()
+        assert len((tmp_path / "active.jsonl").read_text().splitlines()) == 2
+        archive.close()
+
+    def test_directory_has_single_writer(self, tmp_path):
+        archive = EventArchive(tmp_path)
+        with pytest.raises(ArchiveLockedError):
+            EventArchive(tmp_path)
+        archive.close()
+        EventArchive(tmp_path).close()
+
+
+class TestMonitorIntegration:
+    """MonitorService 與歷史接口"""
+
+    def test_history_endpoints_read_archive(self, tmp_path, monkeypatch):
+        service = MonitorService(archive=EventArchive(tmp_path))
+        for _ in range(3):
+            service.record_message("archive_acc")
+        service.record_reply("archive_acc", reply_time=2.0)
+        service.archive.flush()
+        service.record_reply("archive_acc", reply_time=4.0)
+        service.event_log.clear()
+        monkeypatch.setattr(monitor_api, "monitor_service", service)
+
+        history = asyncio.run(monitor_api.get_account_metrics_history("archive_acc", metric_type="messages", period="1h"))
+        assert len(history.data_points) == 13
+        assert sum(point["value"] for point in history.data_points) == 3
+
+        statistics = asyncio.run(monitor_api.get_system_statistics(period="24h"))
+        assert (statistics.total_messages, statistics.total_replies, statistics.average_reply_time) == (3, 2, 3.0)
+
+        events = asyncio.run(monitor_api.get_events(account_id="archive_acc", event_type=None, limit=2))
+        assert [e["type"] for e in events] == ["reply", "reply"]
+        assert isinstance(events[0]["timestamp"], str)
+        service.archive.close()
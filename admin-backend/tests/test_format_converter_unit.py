@@ -333,7 +333,8 @@ class TestFormatConverter:
         """測試 AI 轉換結果包含代碼塊標記"""
         # 設置 API key
         with patch.object(format_converter, 'openai_api_key', 'test_key'):
-            with patch('group_ai_service.format_converter.openai') as mock_openai:
+            with patch.dict(sys.modules, {'openai': Mock()}):
+                mock_openai = sys.modules['openai']
                 mock_client = Mock()
                 mock_response = Mock()
                 mock_response.choices = [Mock()]
@@ -353,7 +354,8 @@ class TestFormatConverter:
         """測試 AI 轉換結果缺少必要字段"""
         # 設置 API key
         with patch.object(format_converter, 'openai_api_key', 'test_key'):
-            with patch('group_ai_service.format_converter.openai') as mock_openai:
+            with patch.dict(sys.modules, {'openai': Mock()}):
+                mock_openai = sys.modules['openai']
                 mock_client = Mock()
                 mock_response = Mock()
                 mock_response.choices = [Mock()]
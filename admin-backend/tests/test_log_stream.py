@@ -0,0 +1,161 @@
+"""
+日誌實時推送測試：按字節偏移增量讀取、輪轉與截斷、服務端過濾、慢客戶端丟棄最舊條目、回放與按需啟停
+"""
+import asyncio
+import os
+
+from app.api.group_ai import logs as logs_api
+from app.services import log_stream
+from app.services.log_stream import (
+    LocalLogTailer,
+    LogFilter,
+    LogStreamHub,
+    LogSubscription,
+    format_sse,
+    parse_journal_line,
+)
+
+
+def _append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+class TestLocalLogTailer:
+    """本地文件增量讀取"""
+
+    def test_reads_only_new_complete_lines(self, tmp_path):
+        log_file = tmp_path / "app.log"
+        _append(log_file, "2026-10-19 10:00:00 INFO 舊內容\n")
+        tailer = LocalLogTailer(tmp_path)
+        assert tailer.poll() == []
+
+        _append(log_file, "2026-10-19 10:00:01 ERROR 連接失敗\n2026-10-19 10:00:02 WARN")
+        entries = tailer.poll()
+        assert [(e["level"], e["message"]) for e in entries] == [("error", "連接失敗")]
+
+        _append(log_file, "ING 重試中\n")
+        assert [e["message"] for e in tailer.poll()] == ["重試中"]
+        assert tailer.poll() == []
+        tailer.close()
+
+    def test_rotation_and_truncation(self, tmp_path):
+        log_file = tmp_path / "app.log"
+        _append(log_file, "")
+        tailer = LocalLogTailer(tmp_path)
+        tailer.poll()
+
+        _append(log_file, "2026-10-19 10:00:00 INFO 輪轉前\n")
+        os.rename(log_file, tmp_path / "app.log.1")
+        _append(log_file, "2026-10-19 10:00:01 INFO 輪轉後\n")
+        assert [e["message"] for e in tailer.poll()] == ["輪轉前", "輪轉後"]
+
+        with open(log_file, "w", encoding="utf-8") as f:
+            f.write("截斷\n")
+        assert [e["message"] for e in tailer.poll()] == ["截斷"]
+        tailer.close()
+
+
+class TestFilters:
+    """過濾與格式"""
+
+    def test_filter_params(self):
+        log_filter = LogFilter.from_params(level="error,warn", source="local", q="Timeout")
+        assert log_filter.levels == {"error", "warning"}
+        assert log_filter.matches({"level": "WARNING", "source": "local", "message": "db timeout"})
+        assert not log_filter.matches({"level": "info", "source": "local", "message": "db timeout"})
+        assert not log_filter.matches({"level": "error", "source": "server_1", "message": "db timeout"})
+        assert not log_filter.matches({"level": "error", "source": "local", "message": "ok"})
+
+    def test_journal_line_and_sse_format(self):
+        entry = parse_journal_line("Oct 19 10:00:00 host python[123]: ERROR: 崩潰", "w1")
+        assert (entry["level"], entry["message"], entry["source"]) == ("error", "崩潰", "server_w1")
+        assert parse_journal_line("plain line", "w1") is None
+        assert format_sse({"id": "stream_1", "message": "崩潰"}) == (
+            'id: stream_1\nevent: log\ndata: {"id": "stream_1", "message": "崩潰"}\n\n'
+        )
+
+
+class TestLogStreamHub:
+    """分發中心"""
+
+    def test_fan_out_filters_before_enqueue(self, tmp_path):
+        async def run():
+            hub = LogStreamHub(log_dir=tmp_path, poll_interval=0.01)
+            errors = await hub.subscribe(LogFilter.from_params(level="error"))
+            everything = await hub.subscribe(LogFilter())
+            assert hub.running
+            hub.publish({"level": "info", "message": "a", "source": "local"})
+            hub.publish({"level": "err", "message": "b", "source": "local"})
+            assert errors.queue.qsize() == 1 and everything.queue.qsize() == 2
+            assert (await errors.get(timeout=1))["message"] == "b"
+            assert await errors.get(timeout=0.01) is None
+            stats = hub.get_stats()
+            assert (stats["published"], stats["filtered_out"], stats["subscribers"]) == (2, 1, 2)
+
+            hub.unsubscribe(errors)
+            assert hub.running
+            hub.unsubscribe(everything)
+            assert not hub.running
+
+        asyncio.run(run())
+
+    def test_local_files_streamed_and_history_replayed(self, tmp_path):
+        log_file = tmp_path / "worker.log"
+        _append(log_file, "")
+
+        async def run():
+            hub = LogStreamHub(log_dir=tmp_path, poll_interval=0.01)
+            first = await hub.subscribe(LogFilter())
+            await asyncio.sleep(0.05)
+            _append(log_file, "2026-10-19 10:00:00 ERROR 磁盤已滿\n2026-10-19 10:00:01 INFO 已清理\n")
+            entry = await first.get(timeout=2)
+            assert (entry["message"], entry["source"]) == ("磁盤已滿", "local")
+
+            late = await hub.subscribe(LogFilter.from_params(level="error"), history=10)
+            assert [e["message"] for e in [late.queue.get_nowait()]] == ["磁盤已滿"]
+            hub.unsubscribe(first)
+            hub.unsubscribe(late)
+
+        asyncio.run(run())
+
+    def test_slow_client_drops_oldest(self):
+        async def run():
+            subscription = LogSubscription(LogFilter(), max_queue=3)
+            for index in range(5):
+                subscription.offer({"id": index})
+            assert [subscription.queue.get_nowait()["id"] for _ in range(3)] == [2, 3, 4]
+            assert subscription.take_dropped() == 2
+            assert subscription.take_dropped() == 0
+
+        asyncio.run(run())
+
+
+class TestStreamEndpoint:
+    """SSE 接口"""
+
+    def test_stream_replays_filtered_history_and_unsubscribes(self, tmp_path, monkeypatch):
+        class FakeRequest:
+            def __init__(self):
+                self.checks = 0
+
+            async def is_disconnected(self):
+                self.checks += 1
+                return self.checks > 2
+
+        async def run():
+            hub = LogStreamHub(log_dir=tmp_path)
+            hub.publish({"level": "info", "message": "略過", "source": "local"})
+            hub.publish({"level": "error", "message": "回放", "source": "local"})
+            monkeypatch.setattr(log_stream, "_log_stream_hub", hub)
+
+            response = await logs_api.stream_logs(FakeRequest(), level="error", source=None, q=None, history=10)
+            assert response.media_type == "text/event-stream"
+            chunks = [chunk async for chunk in response.body_iterator]
+            assert len(chunks) == 2
+            assert chunks[0].startswith("id: stream_2\nevent: log\n") and "回放" in chunks[0]
+            assert chunks[1] == ": keepalive\n\n"
+            assert hub.get_stats()["subscribers"] == 0 and not hub.running
+
+        monkeypatch.setattr(logs_api, "SSE_KEEPALIVE_SECONDS", 0.01)
+        asyncio.run(run())
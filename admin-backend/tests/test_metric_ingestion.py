@@ -0,0 +1,174 @@
+"""
+指標寫入管道測試：內存按分鐘預聚合、批量 upsert 匯總與計數、可選原始行、失敗重試、ORM 寫入同步匯總、保留策略
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.api.group_ai.dashboard import collect_dashboard_stats
+from app.api.group_ai.monitor import _aggregate_history
+from app.db import SessionLocal, WriteQueue
+from app.models.group_ai import GroupAIMetric, GroupAIMetricRollup, GroupAIStatsCounter
+from app.services.dashboard_counters import day_bucket, get_dashboard_counters, rebuild_dashboard_counters
+from app.services.metric_ingestion import MetricIngestor, prune_metrics, query_metric_series
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    rebuild_dashboard_counters(session)
+    queue = WriteQueue(session_factory=SessionLocal, flush_interval=0)
+    try:
+        yield session, queue
+    finally:
+        queue.stop()
+        session.rollback()
+        session.query(GroupAIMetric).filter(GroupAIMetric.account_id.like("mi_%")).delete(synchronize_session=False)
+        session.query(GroupAIMetricRollup).filter(GroupAIMetricRollup.account_id.like("mi_%")).delete(synchronize_session=False)
+        session.query(GroupAIStatsCounter).delete()
+        session.commit()
+        session.close()
+
+
+def _rollups(session, account_id="mi_acc"):
+    session.expire_all()
+    return {
+        (row.metric_type, row.bucket): (row.count, row.value_sum)
+        for row in session.query(GroupAIMetricRollup).filter(GroupAIMetricRollup.account_id == account_id)
+    }
+
+
+def _today(session):
+    session.expire_all()
+    return get_dashboard_counters(session, [date.today()])[day_bucket(date.today())]
+
+
+class TestMetricIngestor:
+    """預聚合與批量寫入"""
+
+    def test_pre_aggregates_per_minute_and_upserts(self, db):
+        session, queue = db
+        minute = datetime.now().replace(second=0, microsecond=0)
+        before = _today(session)
+        ingestor = MetricIngestor(write_queue=queue)
+        for second in (1, 20, 59):
+            ingestor.record("token_usage", 10, account_id="mi_acc", timestamp=minute + timedelta(seconds=second))
+        ingestor.record("response_time", 2.0, account_id="mi_acc", timestamp=minute)
+        ingestor.record("error", 1, account_id="mi_acc", timestamp=minute + timedelta(minutes=1))
+        assert ingestor.pending() == 3
+
+        assert ingestor.flush() == 3
+        ingestor.record("token_usage", 5, account_id="mi_acc", timestamp=minute + timedelta(seconds=30))
+        ingestor.flush()
+
+        rollups = _rollups(session)
+        assert rollups[("token_usage", minute)] == (4, 35.0)
+        assert rollups[("error", minute + timedelta(minutes=1))] == (1, 1.0)
+        # 未開啟原始行時只保存 error 明細
+        raw_types = [row.metric_type for row in session.query(GroupAIMetric).filter(GroupAIMetric.account_id == "mi_acc")]
+        assert raw_types == ["error"]
+
+        after = _today(session)
+        if minute.date() == date.today():
+            assert after["token_usage"] - before["token_usage"] == 35
+            assert after["response_time_count"] - before["response_time_count"] == 1
+        stats = ingestor.get_stats()
+        assert (stats["points"], stats["flushes"], stats["pending_rollups"]) == (6, 2, 0)
+
+        # 與從匯總表重建的計數一致
+        rebuilt = rebuild_dashboard_counters(session)[day_bucket(date.today())]
+        assert rebuilt["token_usage"] == after["token_usage"]
+
+    def test_raw_points_are_optional_and_not_double_counted(self, db):
+        session, queue = db
+        before = _today(session)
+        ingestor = MetricIngestor(write_queue=queue, store_raw_points=True, max_raw_points=2)
+        for value in (1, 2, 3):
+            ingestor.record("token_usage", value, account_id="mi_raw", extra_data={"model": "x"})
+        ingestor.flush()
+
+        rows = session.query(GroupAIMetric).filter(GroupAIMetric.account_id == "mi_raw").all()
+        assert sorted(row.metric_value for row in rows) == [2, 3]
+        assert rows[0].extra_data == {"model": "x"}
+        assert sum(count for count, _ in _rollups(session, "mi_raw").values()) == 3
+        assert _today(session)["token_usage"] - before["token_usage"] == 6
+        assert ingestor.get_stats()["raw_dropped"] == 1
+        session.query(GroupAIMetricRollup).filter(GroupAIMetricRollup.account_id == "mi_raw").delete()
+        session.commit()
+
+    def test_errors_are_listed_on_dashboard_without_raw_points(self, db):
+        session, queue = db
+        ingestor = MetricIngestor(write_queue=queue)
+        ingestor.record("error", 1, account_id="mi_err", extra_data={"type": "網絡錯誤", "message": "timeout"})
+        ingestor.flush()
+        session.expire_all()
+
+        errors = collect_dashboard_stats(session)["recent_errors"]
+        assert {"type": "網絡錯誤", "message": "timeout"}.items() <= errors[0].items()
+        session.query(GroupAIMetric).filter(GroupAIMetric.account_id == "mi_err").delete()
+        session.query(GroupAIMetricRollup).filter(GroupAIMetricRollup.account_id == "mi_err").delete()
+        session.commit()
+
+    def test_failed_flush_is_retried(self, db):
+        session, queue = db
+
+        class BrokenQueue:
+            def execute(self, operation):
+                raise RuntimeError("database is locked")
+
+        ingestor = MetricIngestor(write_queue=BrokenQueue())
+        ingestor.record("error", 1, account_id="mi_acc")
+        assert ingestor.flush() == 0
+        ingestor.record("error", 1, account_id="mi_acc")
+        assert ingestor.get_stats()["failed_flushes"] == 1
+
+        ingestor._write_queue = queue
+        assert ingestor.flush() == 1
+        assert [count for count, _ in _rollups(session).values()] == [2]
+
+
+class TestRollups:
+    """ORM 寫入、查詢與保留策略"""
+
+    def test_orm_writes_keep_rollups_in_sync(self, db):
+        session, _ = db
+        timestamp = datetime.now().replace(second=30, microsecond=0)
+        metric = GroupAIMetric(account_id="mi_acc", metric_type="token_usage", metric_value=40, timestamp=timestamp)
+        session.add_all([metric, GroupAIMetric(account_id="mi_acc", metric_type="token_usage", metric_value=2, timestamp=timestamp)])
+        session.commit()
+        assert _rollups(session)[("token_usage", timestamp.replace(second=0))] == (2, 42.0)
+
+        session.delete(metric)
+        session.commit()
+        assert _rollups(session)[("token_usage", timestamp.replace(second=0))] == (1, 2.0)
+
+    def test_series_and_retention(self, db):
+        session, queue = db
+        now = datetime.now().replace(second=0, microsecond=0)
+        ingestor = MetricIngestor(write_queue=queue, store_raw_points=True)
+        for minutes_ago, value in ((5, 1.0), (50, 3.0), (70, 5.0)):
+            ingestor.record("response_time", value, account_id="mi_acc", timestamp=now - timedelta(minutes=minutes_ago))
+        ingestor.record("response_time", 9.0, account_id="mi_acc", timestamp=now - timedelta(days=40))
+        ingestor.flush()
+
+        series = query_metric_series(
+            session, "response_time", now - timedelta(minutes=120), now, account_id="mi_acc", interval_minutes=60
+        )
+        assert [(point["count"], point["avg"]) for point in series] == [(1, 5.0), (2, 2.0)]
+
+        result = prune_metrics(session, raw_retention_days=0, rollup_retention_days=30, now=now)
+        assert result["raw_deleted"] >= 4 and result["rollups_deleted"] >= 1
+        assert session.query(GroupAIMetric).filter(GroupAIMetric.account_id == "mi_acc").count() == 0
+        assert len(_rollups(session)) == 3
+
+    def test_monitor_history_reads_rollups(self, db):
+        session, queue = db
+        now = datetime.now().replace(second=0, microsecond=0)
+        ingestor = MetricIngestor(write_queue=queue)
+        for minutes_ago, value in ((10, 100), (12, 50), (40, 7)):
+            ingestor.record("token_usage", value, account_id="mi_acc", timestamp=now - timedelta(minutes=minutes_ago))
+        ingestor.flush()
+
+        points = _aggregate_history("token_usage", now - timedelta(minutes=60), now, 30, account_id="mi_acc")
+        assert [point["value"] for point in points] == [7, 150, 0]
+        assert points[0]["timestamp"] == (now - timedelta(minutes=60)).isoformat()
@@ -293,3 +293,32 @@ class TestNotificationAPIUnauthorized:
         resp = client.post("/api/v1/notifications/configs", json={})
         assert resp.status_code == 401
 
+
+
+class TestNotificationUnreadPush:
+    """未讀數 WebSocket 推送測試"""
+
+    def test_websocket_pushes_unread_count(self, prepare_database):
+        from app.core.config import get_settings
+        from app.db import SessionLocal
+
+        token = _get_token()
+        if not token:
+            pytest.skip("無法獲取認證 token")
+        email = get_settings().admin_default_email
+
+        db = SessionLocal()
+        try:
+            create_notification(db, notification_type=NotificationType.BROWSER, title="推送", message="消息", recipient=email)
+        finally:
+            db.close()
+
+        with client.websocket_connect(f"/api/v1/notifications/ws/{email}") as websocket:
+            initial = websocket.receive_json()
+            assert initial["type"] == "unread_count"
+            assert initial["unread_count"] >= 1
+
+            resp = client.post("/api/v1/notifications/mark-all-read", headers={"Authorization": f"Bearer {token}"})
+            assert resp.status_code == 200
+            update = websocket.receive_json()
+            assert update == {"type": "unread_count", "unread_count": 0, "delta": -initial["unread_count"]}
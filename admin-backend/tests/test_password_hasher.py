@@ -0,0 +1,167 @@
+"""
+密碼哈希線程池測試：哈希不阻塞事件循環、排隊上限、重新哈希策略、登錄時升級舊哈希與繁忙時返回 503
+"""
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import auth as auth_api
+from app.core.config import get_settings
+from app.core.password_hasher import PasswordHasher, PasswordHasherBusy
+from app.core.security import get_password_hash, password_hash_scheme, password_needs_rehash, verify_password
+from app.crud.user import create_user
+from app.db import SessionLocal
+from app.main import app
+from app.models.user import User
+
+client = TestClient(app)
+
+EMAIL = "password_hasher_user@example.com"
+
+
+@pytest.fixture
+def low_cost(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "password_bcrypt_rounds", 4)
+    return settings
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.query(User).filter(User.email == EMAIL).delete(synchronize_session=False)
+        session.commit()
+        session.close()
+
+
+class TestPasswordHasher:
+    """線程池與排隊上限"""
+
+    def test_hashing_does_not_block_event_loop(self, low_cost):
+        hasher = PasswordHasher(max_workers=2, queue_limit=8)
+        hashed = get_password_hash("secret-pass")
+
+        async def run():
+            ticks = 0
+            done = asyncio.Event()
+
+            async def ticker():
+                nonlocal ticks
+                while not done.is_set():
+                    ticks += 1
+                    await asyncio.sleep(0)
+
+            task = asyncio.create_task(ticker())
+            results = await asyncio.gather(*(hasher.verify("secret-pass", hashed) for _ in range(4)))
+            new_hash = await hasher.hash("another-pass")
+            done.set()
+            await task
+            return results, new_hash, ticks
+
+        results, new_hash, ticks = asyncio.run(run())
+        assert results == [True] * 4
+        assert verify_password("another-pass", new_hash)
+        assert ticks > 5
+        stats = hasher.get_stats()
+        assert (stats["verify"], stats["hash"], stats["in_flight"]) == (4, 1, 0)
+        assert stats["run_ms"]["samples"] == 5
+        hasher.shutdown()
+
+    def test_rejects_when_queue_full(self):
+        hasher = PasswordHasher(max_workers=1, queue_limit=1)
+        release = threading.Event()
+
+        async def run():
+            blocked = [asyncio.create_task(hasher._submit("hash", release.wait)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+            with pytest.raises(PasswordHasherBusy):
+                await hasher._submit("hash", release.wait)
+            assert hasher.get_stats()["queued"] == 1
+            release.set()
+            await asyncio.gather(*blocked)
+
+        asyncio.run(run())
+        stats = hasher.get_stats()
+        assert (stats["rejected"], stats["max_in_flight"], stats["in_flight"]) == (1, 2, 0)
+        hasher.shutdown()
+
+
+class TestRehashPolicy:
+    """重新哈希策略"""
+
+    def test_bcrypt_cost_change_requires_rehash(self, low_cost, monkeypatch):
+        hashed = get_password_hash("secret-pass")
+        assert hashed.split("$")[2] == "04"
+        assert not password_needs_rehash(hashed)
+        monkeypatch.setattr(low_cost, "password_bcrypt_rounds", 5)
+        assert password_needs_rehash(hashed)
+        assert verify_password("secret-pass", hashed)
+
+    def test_argon2_scheme_falls_back_without_library(self, low_cost, monkeypatch):
+        from app.core import security
+
+        monkeypatch.setattr(security, "argon2", None)
+        monkeypatch.setattr(low_cost, "password_hash_scheme", "argon2")
+        assert password_hash_scheme() == "bcrypt"
+        assert get_password_hash("secret-pass").startswith("$2")
+        assert not verify_password("secret-pass", "$argon2id$v=19$m=65536,t=3,p=4$c2FsdA$aGFzaA")
+
+
+class TestLogin:
+    """登錄流程"""
+
+    def test_login_upgrades_old_hash(self, db, low_cost, monkeypatch):
+        create_user(db, email=EMAIL, password="testpass123")
+        monkeypatch.setattr(low_cost, "password_bcrypt_rounds", 5)
+
+        resp = client.post(
+            "/api/v1/auth/login",
+            data={"username": EMAIL, "password": "testpass123"},
+            headers={"content-type": "application/x-www-form-urlencoded"},
+        )
+        assert resp.status_code == 200, resp.text
+        db.expire_all()
+        stored = db.query(User).filter(User.email == EMAIL).one().hashed_password
+        assert stored.split("$")[2] == "05"
+        assert verify_password("testpass123", stored)
+
+    def test_login_queries_user_off_event_loop(self, db, low_cost, monkeypatch):
+        create_user(db, email=EMAIL, password="testpass123")
+        lookup = auth_api.get_user_by_email
+        loops = []
+
+        def tracked(session, email):
+            try:
+                loops.append(asyncio.get_running_loop())
+            except RuntimeError:
+                loops.append(None)
+            return lookup(session, email=email)
+
+        monkeypatch.setattr(auth_api, "get_user_by_email", tracked)
+        resp = client.post(
+            "/api/v1/auth/login",
+            data={"username": EMAIL, "password": "testpass123"},
+            headers={"content-type": "application/x-www-form-urlencoded"},
+        )
+        assert resp.status_code == 200, resp.text
+        assert loops == [None]
+
+    def test_login_returns_503_when_busy(self, db, monkeypatch):
+        class BusyHasher(PasswordHasher):
+            async def verify(self, plain_password, hashed_password):
+                raise PasswordHasherBusy("full")
+
+        monkeypatch.setattr(auth_api, "get_password_hasher", lambda: BusyHasher(max_workers=1))
+        resp = client.post(
+            "/api/v1/auth/login",
+            data={"username": get_settings().admin_default_email, "password": "testpass123"},
+            headers={"content-type": "application/x-www-form-urlencoded"},
+        )
+        assert resp.status_code == 503
+        assert resp.headers["Retry-After"] == "1"
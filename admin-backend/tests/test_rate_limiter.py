@@ -0,0 +1,184 @@
+"""
+API 限流測試：GCRA 令牌桶、按類別獨立的額度、按主體的限流鍵、Redis 失敗退回進程內計數、429 響應與統計
+"""
+import asyncio
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from app.core import auth_cache as auth_cache_module
+from app.core import limiter as limiter_module
+from app.core.auth_cache import Principal, TokenCache
+from app.core.limiter import (
+    RateLimiter,
+    RedisRateLimitStore,
+    client_address,
+    enforce_rate_limit,
+    gcra,
+    parse_rate,
+    rate_limit_class,
+    rate_limit_key,
+    route_rate_class,
+)
+from app.core.security import create_access_token
+
+
+def _request(headers=None, client=("10.0.0.5", 1234), query=b"", method="GET", path="/api/v1/x"):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": client,
+    }
+    return Request(scope)
+
+
+def _hits(limiter, key, rate_class, count):
+    async def run():
+        return [await limiter.hit(key, rate_class) for _ in range(count)]
+    return asyncio.run(run())
+
+
+class FakeRedis:
+    """模擬 register_script：以 Python 版 GCRA 代替 Lua 腳本（時鐘由測試控制）"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.now = 1000.0
+        self.data = {}
+        self.calls = []
+
+    def register_script(self, script):
+        async def run(keys, args):
+            if self.fail:
+                raise ConnectionError("redis down")
+            self.calls.append((keys, args))
+            emission, burst, cost = (float(arg) for arg in args)
+            allowed, new_tat, value = gcra(self.data.get(keys[0]), self.now, emission, burst, cost)
+            if allowed:
+                self.data[keys[0]] = new_tat
+                return [1, str(value), str(new_tat - self.now)]
+            return [0, str(value), str(new_tat - self.now)]
+        return run
+
+
+class TestGCRA:
+    """令牌桶算法與類別額度"""
+
+    def test_parse_rate(self):
+        assert parse_rate("100/minute") == (100, 60)
+        assert parse_rate("10 per 2 hours") == (10, 7200)
+        with pytest.raises(ValueError):
+            parse_rate("fast")
+
+    def test_burst_then_reject_with_retry_after(self):
+        limiter = RateLimiter(default_rate="5/minute")
+        decisions = _hits(limiter, "user:1", "default", 6)
+        assert [d.allowed for d in decisions] == [True] * 5 + [False]
+        assert decisions[0].remaining == 4
+        assert decisions[-1].retry_after == pytest.approx(12, abs=0.5)
+        # 其他主體不受影響
+        assert _hits(limiter, "user:2", "default", 1)[0].allowed
+
+    def test_classes_have_independent_budgets(self):
+        limiter = RateLimiter()
+        assert limiter.bucket_for("auth") == (10, 6.0, 60)
+        assert limiter.bucket_for("unknown") == limiter.bucket_for("default")
+
+        auth = _hits(limiter, "ip:1", "auth", 11)
+        assert sum(d.allowed for d in auth) == 10
+        assert auth[0].limit == 10
+        # 同一主體的 auth 額度耗盡不影響其他類別
+        light = _hits(limiter, "ip:1", "light", 201)
+        assert sum(d.allowed for d in light) == 200
+        assert _hits(limiter, "ip:1", "detail", 1)[0].allowed
+
+    def test_registration_status_polling_is_not_auth(self):
+        assert route_rate_class(_request(method="POST", path="/api/v1/telegram-registration/start")) == "auth"
+        assert route_rate_class(_request(method="POST", path="/api/v1/telegram-registration/verify")) == "auth"
+        status_request = _request(path="/api/v1/telegram-registration/status/{registration_id}")
+        assert route_rate_class(status_request) == "detail"
+
+
+class TestRateLimitKey:
+    """限流主體"""
+
+    def test_user_apikey_and_ip(self, monkeypatch):
+        monkeypatch.setattr(auth_cache_module, "_token_cache", TokenCache(ttl_seconds=30))
+        token = create_access_token("admin@example.com")
+        # 不在認證緩存中時按簽名驗證後的 sub（各 worker 一致，不依賴緩存是否命中）
+        assert rate_limit_key(_request({"Authorization": f"Bearer {token}"})) == "user:admin@example.com"
+        auth_cache_module.get_token_cache().put(token, Principal(id=1, email="admin@example.com"), {}, None)
+        assert rate_limit_key(_request({"Authorization": "Bearer forged"})) == "ip:10.0.0.5"
+        monkeypatch.setattr("app.core.security.decode_access_token", lambda token: pytest.fail("緩存命中時不應解碼"))
+        assert rate_limit_key(_request({"Authorization": f"Bearer {token}"})) == "user:admin@example.com"
+        key = rate_limit_key(_request({"X-API-Key": "secret"}))
+        assert key.startswith("apikey:") and "secret" not in key
+        assert rate_limit_key(_request(query=b"api_key=secret")) == key
+
+    def test_forwarded_for_only_from_trusted_proxy(self):
+        headers = {"X-Forwarded-For": "1.2.3.4, 127.0.0.1"}
+        assert client_address(_request(headers, client=("127.0.0.1", 80))) == "1.2.3.4"
+        assert client_address(_request(headers, client=("8.8.8.8", 80))) == "8.8.8.8"
+
+
+class TestBackends:
+    """Redis 存儲與退回"""
+
+    def test_redis_store_shared_between_limiters(self):
+        redis_client = FakeRedis()
+        first = RateLimiter(default_rate="3/minute", redis_store=RedisRateLimitStore(redis_client))
+        second = RateLimiter(default_rate="3/minute", redis_store=RedisRateLimitStore(redis_client))
+        results = _hits(first, "user:1", "default", 2) + _hits(second, "user:1", "default", 2)
+        assert [d.allowed for d in results] == [True, True, True, False]
+        assert all(d.backend == "redis" for d in results)
+        assert redis_client.calls[0][0] == ["ratelimit:user:1:default"]
+
+    def test_falls_back_to_memory_when_redis_fails(self):
+        limiter = RateLimiter(default_rate="2/minute", redis_store=RedisRateLimitStore(FakeRedis(fail=True)))
+        decisions = _hits(limiter, "user:1", "default", 3)
+        assert [d.allowed for d in decisions] == [True, True, False]
+        assert decisions[0].backend == "memory"
+        stats = limiter.get_stats()
+        assert stats["redis_fallbacks"] == 1
+        assert stats["backend"] == "memory"
+
+
+class TestEnforcement:
+    """路由依賴"""
+
+    def test_429_with_headers_and_stats(self, monkeypatch):
+        limiter = RateLimiter()
+        monkeypatch.setattr(limiter_module, "_rate_limiter", limiter)
+        _hits(limiter, "ip:testclient", "heavy", 20)
+        app = FastAPI()
+
+        @app.get("/api/v1/items/{item_id}", dependencies=[Depends(enforce_rate_limit)])
+        async def item(item_id: int):
+            return {"id": item_id}
+
+        @app.post("/api/v1/items/rebuild", dependencies=[Depends(enforce_rate_limit)])
+        @rate_limit_class("heavy")
+        async def rebuild():
+            return {"ok": True}
+
+        client = TestClient(app)
+        first = client.get("/api/v1/items/1")
+        assert first.status_code == 200
+        assert first.headers["X-RateLimit-Limit"] == "100"
+        assert first.headers["X-RateLimit-Remaining"] == "99"
+
+        # heavy 額度已用完，detail 不受影響
+        rejected = client.post("/api/v1/items/rebuild")
+        assert rejected.status_code == 429
+        assert int(rejected.headers["Retry-After"]) >= 1
+
+        stats = limiter.get_stats()
+        assert stats["decisions"] == {"heavy": 21, "detail": 1}
+        assert stats["rejections"] == {"heavy": 1}
+        assert stats["limits"]["heavy"] == "20/minute"
+        assert stats["latency_ms"]["samples"] == 22
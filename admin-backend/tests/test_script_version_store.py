@@ -0,0 +1,237 @@
+"""
+劇本版本內容存儲測試：按哈希去重、差異鏈與完整快照、列表查詢不讀取內容、結構化差異、舊數據遷移與清理
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event, update
+
+from app.core.config import get_settings
+from app.db import SessionLocal, engine
+from app.main import app
+from app.models.group_ai import GroupAIScript, GroupAIScriptBlob, GroupAIScriptVersion
+from app.services.script_diff import structural_diff
+from app.services.script_version_store import (
+    SNAPSHOT_INTERVAL,
+    apply_delta,
+    clear_content_cache,
+    collect_unreferenced_blobs,
+    content_hash,
+    encode_blob,
+    load_content,
+    make_delta,
+    migrate_inline_contents,
+)
+
+client = TestClient(app)
+
+
+def _get_token() -> str:
+    settings = get_settings()
+    resp = client.post(
+        "/api/v1/auth/login",
+        data={"username": settings.admin_default_email, "password": "testpass123"},
+        headers={"content-type": "application/x-www-form-urlencoded"},
+    )
+    assert resp.status_code == 200, resp.text
+    return resp.json()["access_token"]
+
+
+def _script_yaml(scenes=3, reply="你好", extra_trigger=False, next_scene="s1"):
+    lines = ["script_id: svs_demo", "version: 1.0", "scenes:"]
+    for index in range(scenes):
+        lines += [
+            f"  - id: s{index}",
+            "    triggers:",
+            "      - type: keyword",
+            f"        keywords: [k{index}]",
+        ]
+        if extra_trigger and index == 0:
+            lines += ["      - type: new_member"]
+        lines += [
+            "    responses:",
+            f"      - template: '{reply} {index}'",
+            f"    next_scene: {next_scene if index == 0 else 's0'}",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    clear_content_cache()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.query(GroupAIScriptVersion).filter(GroupAIScriptVersion.script_id.like("svs_%")).delete(synchronize_session=False)
+        session.query(GroupAIScript).filter(GroupAIScript.script_id.like("svs_%")).delete(synchronize_session=False)
+        session.commit()
+        collect_unreferenced_blobs(session)
+        session.close()
+        clear_content_cache()
+
+
+def _blob(db, text):
+    return db.get(GroupAIScriptBlob, content_hash(text))
+
+
+class TestContentStore:
+    """內容存儲"""
+
+    def test_identical_content_stored_once(self, db):
+        text = _script_yaml()
+        db.add_all([GroupAIScriptVersion(script_id="svs_a", version=f"1.{i}", yaml_content=text) for i in range(3)])
+        db.commit()
+        assert db.query(GroupAIScriptBlob).filter_by(content_hash=content_hash(text)).count() == 1
+
+        db.expire_all()
+        clear_content_cache()
+        versions = db.query(GroupAIScriptVersion).filter_by(script_id="svs_a").all()
+        assert {v.yaml_content for v in versions} == {text}
+        assert all(v.inline_content is None for v in versions)
+
+    def test_delta_chain_roundtrip_with_snapshots(self, db):
+        base = _script_yaml(scenes=40)
+        texts = [base.replace("'你好 0'", f"'你好 v{i}'") for i in range(SNAPSHOT_INTERVAL + 3)]
+        started = datetime.now() - timedelta(hours=1)
+        for i, text in enumerate(texts):
+            db.add(GroupAIScriptVersion(
+                script_id="svs_chain", version=f"1.{i}", yaml_content=text, created_at=started + timedelta(minutes=i),
+            ))
+            db.commit()
+
+        blobs = [_blob(db, text) for text in texts]
+        assert blobs[0].base_hash is None
+        assert blobs[1].base_hash == blobs[0].content_hash and blobs[1].chain_depth == 1
+        assert max(blob.chain_depth for blob in blobs) < SNAPSHOT_INTERVAL
+        assert blobs[SNAPSHOT_INTERVAL].base_hash is None
+        assert all(len(blob.data) * 4 < len(blobs[0].data) for blob in blobs[1:SNAPSHOT_INTERVAL])
+
+        clear_content_cache()
+        db.expire_all()
+        stored = {v.version: v.yaml_content for v in db.query(GroupAIScriptVersion).filter_by(script_id="svs_chain")}
+        assert [stored[f"1.{i}"] for i in range(len(texts))] == texts
+
+    def test_delta_helpers(self):
+        base = "a\nb\nc\n"
+        target = "a\nx\nc\nd"
+        assert apply_delta(base, make_delta(base, target)) == target
+
+    def test_reassigning_content_clears_inline_column(self, db):
+        version = GroupAIScriptVersion(script_id="svs_inline", version="1.0", inline_content="legacy: true\n")
+        db.add(version)
+        db.commit()
+        assert version.content_hash is None and version.yaml_content == "legacy: true\n"
+
+        version.yaml_content = "legacy: false\n"
+        db.commit()
+        db.expire_all()
+        assert version.inline_content is None
+        assert version.yaml_content == "legacy: false\n"
+
+
+class TestVersionQueries:
+    """列表查詢與對比接口"""
+
+    def test_list_does_not_select_content(self, db):
+        db.add(GroupAIScript(script_id="svs_api", name="svs_api", version="1.1", yaml_content=_script_yaml()))
+        db.add(GroupAIScriptVersion(script_id="svs_api", version="1.0", yaml_content=_script_yaml(reply="舊")))
+        db.add(GroupAIScriptVersion(script_id="svs_api", version="1.1", yaml_content=_script_yaml()))
+        db.commit()
+        token = _get_token()
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if "group_ai_script_versions" in statement or "group_ai_script_blobs" in statement:
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            resp = client.get("/api/v1/group-ai/scripts/svs_api/versions", headers={"Authorization": f"Bearer {token}"})
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+        assert resp.status_code == 200, resp.text
+        assert len(resp.json()) == 2
+        assert statements and all("yaml_content" not in s and "group_ai_script_blobs" not in s for s in statements)
+
+    def test_compare_reports_structural_changes(self, db):
+        db.add(GroupAIScript(script_id="svs_cmp", name="svs_cmp", version="1.1", yaml_content=_script_yaml()))
+        db.add(GroupAIScriptVersion(script_id="svs_cmp", version="1.0", yaml_content=_script_yaml()))
+        db.add(GroupAIScriptVersion(
+            script_id="svs_cmp", version="1.1",
+            yaml_content=_script_yaml(scenes=4, reply="您好", extra_trigger=True, next_scene="s2"),
+        ))
+        db.commit()
+
+        resp = client.get(
+            "/api/v1/group-ai/scripts/svs_cmp/versions/compare",
+            params={"version1": "1.0", "version2": "1.1"},
+            headers={"Authorization": f"Bearer {_get_token()}"},
+        )
+        assert resp.status_code == 200, resp.text
+        types = [item["type"] for item in resp.json()["differences"]]
+        assert "scene_added" in types
+        assert "trigger_added" in types
+        assert types.count("response_changed") == 3
+        assert {"type": "scene_changed", "field": "next_scene"}.items() <= next(
+            item for item in resp.json()["differences"] if item["type"] == "scene_changed"
+        ).items()
+
+
+class TestStructuralDiff:
+    """結構化差異"""
+
+    def test_identical_and_format_only(self):
+        text = _script_yaml()
+        assert structural_diff(text, text) == []
+        assert [d["type"] for d in structural_diff(text, "# 註釋\n" + text)] == ["format_changed"]
+
+    def test_scene_removed_and_trigger_removed(self):
+        old = _script_yaml(scenes=3, extra_trigger=True)
+        new = _script_yaml(scenes=2)
+        types = sorted(d["type"] for d in structural_diff(old, new))
+        assert types == ["scene_removed", "trigger_removed"]
+
+    def test_invalid_yaml_falls_back_to_lines(self):
+        differences = structural_diff("a: [1\n", "a: 2\n")
+        assert differences[0]["type"] == "content_changed"
+        assert (differences[0]["lines_added"], differences[0]["lines_removed"]) == (1, 1)
+
+
+class TestMaintenance:
+    """舊數據遷移與清理"""
+
+    def test_migrate_inline_and_collect_garbage(self, db):
+        db.add(GroupAIScriptVersion(script_id="svs_legacy", version="1.0", inline_content="legacy: 1\n"))
+        db.add(GroupAIScriptVersion(script_id="svs_legacy", version="1.1", inline_content="legacy: 2\n"))
+        db.commit()
+
+        assert migrate_inline_contents(db, batch_size=1) >= 2
+        db.expire_all()
+        versions = db.query(GroupAIScriptVersion).filter_by(script_id="svs_legacy").order_by(GroupAIScriptVersion.version).all()
+        assert all(v.content_hash and v.inline_content is None for v in versions)
+        assert [v.yaml_content for v in versions] == ["legacy: 1\n", "legacy: 2\n"]
+
+        # 刪除 1.0 後其內容仍是 1.1 差異的基準時保留
+        base_of_second = _blob(db, "legacy: 2\n").base_hash
+        db.delete(versions[0])
+        db.commit()
+        collect_unreferenced_blobs(db)
+        assert (_blob(db, "legacy: 1\n") is not None) == (base_of_second == content_hash("legacy: 1\n"))
+
+        db.execute(update(GroupAIScriptVersion).where(GroupAIScriptVersion.script_id == "svs_legacy").values(content_hash=None))
+        db.commit()
+        assert collect_unreferenced_blobs(db) >= 1
+        assert _blob(db, "legacy: 2\n") is None
+
+    def test_codec_fallback_readable(self, db):
+        values = encode_blob("zlib: true\n", codec="zlib")
+        db.add(GroupAIScriptBlob(**values))
+        db.commit()
+        clear_content_cache()
+        assert load_content(db, values["content_hash"]) == "zlib: true\n"
+        db.delete(db.get(GroupAIScriptBlob, values["content_hash"]))
+        db.commit()
@@ -0,0 +1,167 @@
+"""
+流式導出引擎測試
+"""
+import csv
+import io
+
+import pytest
+
+from app.services.export_engine import (
+    EXCEL_AVAILABLE,
+    PDF_AVAILABLE,
+    ExportFormatError,
+    ExportJobManager,
+    iter_csv,
+    iter_export,
+    normalize_format,
+    write_pdf,
+    write_xlsx,
+)
+
+
+def _rows(n):
+    for i in range(n):
+        yield {"id": i, "name": f"名稱{i}", "tags": ["a", "b"], "note": None}
+
+
+class TestNormalizeFormat:
+    """格式規範化測試"""
+
+    def test_known_formats(self):
+        assert normalize_format("CSV") == "csv"
+        if EXCEL_AVAILABLE:
+            assert normalize_format("excel") == "xlsx"
+
+    def test_unknown_format(self):
+        with pytest.raises(ExportFormatError):
+            normalize_format("invalid")
+
+
+class TestCsvWriter:
+    """CSV 分塊寫入測試"""
+
+    def test_chunked_output(self):
+        chunks = list(iter_csv(_rows(25), ["id", "name", "tags", "note"], chunk_size=10))
+        # 3 個滿塊（第一塊含標題）+ 尾塊
+        assert len(chunks) == 3
+        rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+        assert len(rows) == 25
+        assert rows[0]["name"] == "名稱0"
+        assert rows[0]["tags"] == "['a', 'b']"
+        assert rows[0]["note"] == ""
+
+    def test_empty_fieldnames(self):
+        assert "".join(iter_csv([], [])).strip() == "無數據"
+
+    def test_iter_export_is_lazy(self):
+        consumed = []
+
+        def rows():
+            for row in _rows(3):
+                consumed.append(row)
+                yield row
+
+        stream = iter_export(rows(), ["id", "name"], "csv", "test")
+        assert consumed == []
+        "".join(stream)
+        assert len(consumed) == 3
+
+
+@pytest.mark.skipif(not EXCEL_AVAILABLE, reason="openpyxl 未安裝")
+class TestXlsxWriter:
+    """Excel write-only 寫入測試"""
+
+    def test_write_and_read_back(self, tmp_path):
+        import openpyxl
+
+        path = tmp_path / "out.xlsx"
+        write_xlsx(_rows(150), ["id", "name"], str(path), sheet_name="測試")
+        wb = openpyxl.load_workbook(path, read_only=True)
+        ws = wb["測試"]
+        values = list(ws.values)
+        assert values[0] == ("id", "name")
+        assert len(values) == 151
+        assert values[-1] == (149, "名稱149")
+
+
+@pytest.mark.skipif(not PDF_AVAILABLE, reason="reportlab 未安裝")
+class TestPdfWriter:
+    """PDF 分頁寫入測試"""
+
+    def test_paged_pdf(self, tmp_path):
+        path = tmp_path / "out.pdf"
+        write_pdf(_rows(95), ["id", "name"], str(path), title="測試", rows_per_page=40)
+        content = path.read_bytes()
+        assert content.startswith(b"%PDF")
+        # 95 行，每頁 40 行 -> 3 頁
+        assert b"/Count 3" in content
+
+
+class TestExportJobManager:
+    """後台導出任務測試"""
+
+    @pytest.mark.asyncio
+    async def test_run_job(self, prepare_database, tmp_path):
+        manager = ExportJobManager(export_dir=str(tmp_path))
+        job = manager.create_job("scripts", "csv", created_by="tester")
+        assert job.status == "pending"
+
+        job = await manager.run_job(job)
+        assert job.status == "completed"
+        assert job.file_path.exists()
+        header = job.file_path.read_text(encoding="utf-8").splitlines()[0]
+        assert "劇本ID" in header
+        assert manager.get_job(job.job_id).to_dict() == job.to_dict()
+
+    @pytest.mark.asyncio
+    async def test_jobs_are_shared_across_workers(self, prepare_database, tmp_path):
+        """任務元數據落盤：另一個 worker（或重啟後）可查詢、按創建者過濾"""
+        manager = ExportJobManager(export_dir=str(tmp_path))
+        mine = await manager.run_job(manager.create_job("scripts", "csv", created_by="a@example.com"))
+        manager.create_job("accounts", "csv", created_by="b@example.com")
+
+        other_worker = ExportJobManager(export_dir=str(tmp_path))
+        loaded = other_worker.get_job(mine.job_id)
+        assert loaded.status == "completed" and loaded.file_path == mine.file_path
+        assert [job.job_id for job in other_worker.list_jobs(created_by="a@example.com")] == [mine.job_id]
+        assert len(other_worker.list_jobs()) == 2
+        assert other_worker.get_job("../../etc/passwd") is None
+
+        # 創建任務的進程已不在（同主機 PID 復用），未完成的任務標記為失敗
+        pending = other_worker.list_jobs(created_by="b@example.com")[0]
+        assert pending.status == "failed"
+
+    def test_unknown_data_type(self, tmp_path):
+        manager = ExportJobManager(export_dir=str(tmp_path))
+        with pytest.raises(ExportFormatError):
+            manager.create_job("unknown", "csv")
+
+
+class TestExportJobAPI:
+    """後台導出任務接口的認證與可見性"""
+
+    def test_jobs_require_auth_and_hide_other_users_jobs(self, prepare_database, tmp_path, monkeypatch):
+        from fastapi.testclient import TestClient
+
+        from app.api.group_ai import export as export_api
+        from app.core.config import get_settings
+        from app.main import app
+
+        manager = ExportJobManager(export_dir=str(tmp_path))
+        foreign = manager.create_job("scripts", "csv", created_by="someone-else@example.com")
+        monkeypatch.setattr(export_api, "get_export_job_manager", lambda: manager)
+        client = TestClient(app)
+
+        assert client.get("/api/v1/group-ai/export/jobs").status_code == 401
+        assert client.get(f"/api/v1/group-ai/export/jobs/{foreign.job_id}/download").status_code == 401
+
+        settings = get_settings()
+        token = client.post(
+            "/api/v1/auth/login",
+            data={"username": settings.admin_default_email, "password": "testpass123"},
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        # 超級管理員可見全部任務
+        assert client.get(f"/api/v1/group-ai/export/jobs/{foreign.job_id}", headers=headers).status_code == 200
+
+        assert not export_api._job_visible(foreign, type("U", (), {"is_superuser": False, "email": "me@example.com"})())
@@ -0,0 +1,276 @@
+"""
+任務調度器測試：領導者租約、持久化存儲、misfire / coalesce、並發限制與調度指標
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.core.leader_lease import DatabaseLeaderLease, LeaderLease, RedisLeaderLease
+from app.db import SessionLocal
+from app.models.group_ai import GroupAIAutomationTask
+from app.services import task_scheduler as task_scheduler_module
+from app.services.task_scheduler import TaskScheduler
+
+
+class NeverLeaderLease(LeaderLease):
+    """始終拿不到租約的跟隨者"""
+
+    backend = "test"
+
+    def _try_acquire(self) -> bool:
+        return False
+
+
+class FakeRedis:
+    """租約用到的 SET NX / EVAL 替身"""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, owner, *args):
+        if self.data.get(key) != owner:
+            return 0
+        if "pexpire" in script:
+            return 1
+        del self.data[key]
+        return 1
+
+
+class FakeExecutor:
+    """記錄執行次數與最大並發數"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def execute_task(self, task):
+        self.calls.append(task.id)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return {"success": True}
+
+
+def _create_task(task_action: str, **kwargs) -> str:
+    db = SessionLocal()
+    try:
+        task = GroupAIAutomationTask(
+            name=f"{task_action}-task",
+            task_type="scheduled",
+            task_action=task_action,
+            schedule_config=kwargs.pop("schedule_config", {"interval_seconds": 3600}),
+            action_config={},
+            **kwargs,
+        )
+        db.add(task)
+        db.commit()
+        return task.id
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = FakeExecutor()
+    monkeypatch.setattr(task_scheduler_module, "get_task_executor", lambda: executor)
+    return executor
+
+
+@pytest.fixture
+async def make_scheduler(monkeypatch):
+    """創建調度器並註冊為全局實例（任務函數通過 get_task_scheduler 回到該實例）"""
+    created = []
+
+    def make(lease=None, **kwargs):
+        scheduler = TaskScheduler(job_store=kwargs.pop("job_store", "memory"), lease=lease or LeaderLease("test"), **kwargs)
+        monkeypatch.setattr(task_scheduler_module, "_task_scheduler", scheduler)
+        created.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in created:
+        if scheduler.is_running:
+            scheduler.stop()
+
+
+class TestLeaderLease:
+    """租約後端測試"""
+
+    def test_database_lease_is_exclusive_until_expiry(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'lease.db'}")
+        first = DatabaseLeaderLease("scheduler", engine=engine, ttl_seconds=30)
+        second = DatabaseLeaderLease("scheduler", engine=engine, ttl_seconds=30)
+
+        assert first.acquire() is True
+        assert second.acquire() is False
+        assert first.acquire() is True  # 續約
+
+        # 持有者失聯，租約過期後被接管
+        with engine.begin() as conn:
+            conn.execute(first.table.update().values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        assert second.acquire() is True
+        assert first.acquire() is False
+        assert first.is_leader is False
+
+    def test_database_lease_release(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'lease.db'}")
+        first = DatabaseLeaderLease("scheduler", engine=engine)
+        second = DatabaseLeaderLease("scheduler", engine=engine)
+        first.acquire()
+        first.release()
+        assert second.acquire() is True
+
+    def test_redis_lease_only_owner_renews_and_releases(self):
+        redis_client = FakeRedis()
+        first = RedisLeaderLease("scheduler", redis_client)
+        second = RedisLeaderLease("scheduler", redis_client)
+
+        assert first.acquire() is True
+        assert second.acquire() is False
+        second.is_leader = True
+        second.release()  # 非持有者不能刪除
+        assert redis_client.data["lease:scheduler"] == first.owner
+
+        first.release()
+        assert second.acquire() is True
+
+    def test_check_uses_cached_state_within_renew_interval(self):
+        calls = []
+
+        class CountingLease(LeaderLease):
+            def _try_acquire(self):
+                calls.append(1)
+                return True
+
+        lease = CountingLease("scheduler", ttl_seconds=30)
+        assert lease.check() and lease.check()
+        assert len(calls) == 1
+
+
+class TestTaskScheduler:
+    """調度器測試"""
+
+    @pytest.mark.asyncio
+    async def test_only_leader_fires_jobs(self, make_scheduler, executor):
+        task_id = _create_task("alert_check", schedule_config={"interval_seconds": 3600})
+        follower = make_scheduler(lease=NeverLeaderLease("test"))
+        follower.start()
+        await follower.sync_leadership()
+        assert follower.is_leader is False
+        assert follower.scheduler.state == 2  # STATE_PAUSED
+
+        leader = make_scheduler()
+        leader.start()
+        await leader.sync_leadership()
+        assert leader.is_leader is True
+        job = leader.scheduler.get_job(f"task_{task_id}")
+        assert job is not None
+
+        job.modify(next_run_time=datetime.now(job.next_run_time.tzinfo))
+        leader.scheduler.wakeup()
+        await asyncio.sleep(0.3)
+        assert executor.calls == [task_id]
+        assert leader.get_status()["metrics"]["alert_check"]["runs"] == 1
+
+    @pytest.mark.asyncio
+    async def test_misfire_is_coalesced_and_lag_recorded(self, make_scheduler, executor):
+        task_id = _create_task("data_backup", schedule_config={"interval_seconds": 20, "misfire_grace_seconds": 3600})
+        scheduler = make_scheduler(lease=NeverLeaderLease("test"))
+        scheduler.start()
+        scheduler.load_scheduled_tasks()
+
+        # 模擬無領導者期間錯過了三次觸發（50、30、10 秒前）
+        job = scheduler.scheduler.get_job(f"task_{task_id}")
+        job.modify(next_run_time=datetime.now(job.next_run_time.tzinfo) - timedelta(seconds=50))
+
+        scheduler.lease = LeaderLease("test")
+        await scheduler.sync_leadership()
+        await asyncio.sleep(0.3)
+
+        # 合併為一次執行，延遲按合併後的觸發時間（10 秒前）計算
+        assert executor.calls == [task_id]
+        metrics = scheduler.get_status()["metrics"]["data_backup"]
+        assert 9000 <= metrics["max_lag_ms"] < 30000
+
+    @pytest.mark.asyncio
+    async def test_misfire_beyond_grace_is_skipped(self, make_scheduler, executor):
+        task_id = _create_task("script_review", schedule_config={"interval_seconds": 3600, "misfire_grace_seconds": 1})
+        scheduler = make_scheduler(lease=NeverLeaderLease("test"))
+        scheduler.start()
+        scheduler.load_scheduled_tasks()
+        job = scheduler.scheduler.get_job(f"task_{task_id}")
+        job.modify(next_run_time=datetime.now(job.next_run_time.tzinfo) - timedelta(seconds=30))
+
+        scheduler.lease = LeaderLease("test")
+        await scheduler.sync_leadership()
+        await asyncio.sleep(0.3)
+
+        assert executor.calls == []
+        assert scheduler.get_status()["metrics"]["script_review"]["missed"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit_per_task_type(self, make_scheduler, executor):
+        executor.delay = 0.05
+        scheduler = make_scheduler(concurrency_limits={"data_export": 1})
+        exports = [_create_task("data_export") for _ in range(3)]
+        others = [_create_task("account_start") for _ in range(2)]
+
+        await asyncio.gather(*[scheduler._execute_task_wrapper(task_id) for task_id in exports])
+        assert executor.max_running == 1
+
+        executor.max_running = 0
+        await asyncio.gather(*[scheduler._execute_task_wrapper(task_id) for task_id in others])
+        assert executor.max_running == 2
+
+    @pytest.mark.asyncio
+    async def test_database_store_keeps_next_run_time_across_restarts(self, make_scheduler, executor):
+        task_id = _create_task("alert_check", schedule_config={"interval_seconds": 3600})
+        first = make_scheduler(job_store="database")
+        first.start()
+        await first.sync_leadership()
+        next_run_time = first.scheduler.get_job(f"task_{task_id}").next_run_time
+        first.stop()
+
+        await asyncio.sleep(0.05)
+        second = make_scheduler(job_store="database")
+        second.start()
+        await second.sync_leadership()
+        assert second.scheduler.get_job(f"task_{task_id}").next_run_time == next_run_time
+
+        # 停用的任務在接管對賬時從共享存儲移除
+        db = SessionLocal()
+        try:
+            db.query(GroupAIAutomationTask).filter(GroupAIAutomationTask.id == task_id).update({"enabled": False})
+            db.commit()
+        finally:
+            db.close()
+        second.load_scheduled_tasks()
+        assert second.scheduler.get_job(f"task_{task_id}") is None
+
+    @pytest.mark.asyncio
+    async def test_system_jobs_registered_by_leader(self, make_scheduler, monkeypatch):
+        monkeypatch.setattr(task_scheduler_module, "SYSTEM_JOBS", {"clock": ("time:time", {"hour": 3, "minute": 15})})
+        scheduler = make_scheduler()
+        scheduler.start()
+        await scheduler.sync_leadership()
+        job = scheduler.scheduler.get_job("system_clock")
+        assert job is not None and list(job.args) == ["clock"]
+
+        await scheduler._execute_system_job("clock")
+        assert scheduler.get_status()["metrics"]["system"]["runs"] == 1
+
+        # 從 SYSTEM_JOBS 移除後，接管對賬時刪除殘留 job
+        monkeypatch.setattr(task_scheduler_module, "SYSTEM_JOBS", {})
+        scheduler.load_scheduled_tasks()
+        assert scheduler.scheduler.get_job("system_clock") is None
@@ -0,0 +1,146 @@
+"""
+模板編譯器單元測試：與 str.format 一致、mustache 切分、緩存與通知逐接收者渲染
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# 添加項目根目錄到 Python 路徑
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+
+from app.models.notification import NotificationType
+from app.services import notification_service as notification_service_module
+from app.services.notification_service import NotificationService
+from group_ai_service.template_compiler import TemplateCache, tokenize_format, tokenize_mustache
+from group_ai_service.variable_resolver import VariableResolver
+
+
+class TestFormatTemplates:
+    """str.format 兼容性測試"""
+
+    @pytest.mark.parametrize("template", [
+        "[{alert_level}] {alert_title}",
+        "{{escaped}} {alert_title}",
+        "{count:>5} {ratio:.2f} {alert_title!r}",
+        "{item.name} / {items[1]}",
+        "no fields",
+        "",
+    ])
+    def test_matches_str_format(self, template):
+        context = {
+            "alert_level": "error",
+            "alert_title": "CPU 過高",
+            "count": 7,
+            "ratio": 0.456,
+            "item": SimpleNamespace(name="node-1"),
+            "items": ["a", "b"],
+        }
+        assert tokenize_format(template).render(context) == template.format(**context)
+
+    def test_missing_field_raises_key_error(self):
+        with pytest.raises(KeyError):
+            tokenize_format("{missing}").render({})
+
+    def test_literals_merged(self):
+        compiled = tokenize_format("a {{b}} c {x} d")
+        assert compiled.segments[0] == "a {b} c "
+        assert compiled.fields == ("x",)
+
+
+class TestMustacheTemplates:
+    """{{ 表達式 }} 切分測試"""
+
+    def test_expressions_bound_once(self):
+        bound = []
+
+        def bind(expression):
+            bound.append(expression)
+            return lambda values: values[expression]
+
+        compiled = tokenize_mustache("你好 {{ name }}，今天 {{day}}", bind)
+        assert bound == ["name", "day"]
+        assert compiled.render({"name": "小明", "day": "週一"}) == "你好 小明，今天 週一"
+
+    def test_cache_compiles_each_template_once(self):
+        compiled = []
+        cache = TemplateCache(lambda template: compiled.append(template) or tokenize_format(template), maxsize=2)
+        for _ in range(3):
+            cache.get("{a}")
+        cache.get("{b}")
+        cache.get("{c}")
+        cache.get("{a}")
+        assert compiled == ["{a}", "{b}", "{c}", "{a}"]
+        assert len(cache) == 2
+
+
+class TestVariableResolverCompiled:
+    """VariableResolver 預編譯測試"""
+
+    @pytest.fixture
+    def message(self):
+        message = Mock()
+        message.text = "今天天氣很好"
+        message.from_user = SimpleNamespace(id=42, first_name="小明", username="xm")
+        message.chat = SimpleNamespace(id=-100)
+        return message
+
+    def test_resolution_order_and_missing(self, message):
+        resolver = VariableResolver()
+        template = "{{user_name}} {{topic}} {{level}} {{user_id}} {{unknown}} {{upper('ok')}} {{detect_topic()}}"
+        result = resolver.resolve(template, message, context={"topic": "ctx"}, state={"topic": "state", "level": 3})
+        assert result == "小明 ctx 3 42 {{unknown}} OK 天氣"
+
+    def test_template_parsed_once(self, message, monkeypatch):
+        resolver = VariableResolver()
+        calls = []
+        original = resolver._bind_expression
+        monkeypatch.setattr(resolver, "_bind_expression", lambda expr: calls.append(expr) or original(expr))
+        for name in ("a", "b"):
+            assert resolver.resolve("hi {{name}}", message, context={"name": name}) == f"hi {name}"
+        assert calls == ["name"]
+
+    def test_function_registered_after_compile(self, message):
+        resolver = VariableResolver()
+        assert resolver.resolve("{{greet()}}", message) == ""
+        resolver.register_function("greet", lambda message, context, state: "hey")
+        assert resolver.resolve("{{greet()}}", message) == "hey"
+
+
+class TestNotificationTemplates:
+    """通知模板逐接收者渲染測試"""
+
+    def test_renders_each_recipient_from_one_template(self, monkeypatch):
+        template = SimpleNamespace(
+            id=1,
+            title_template="[{alert_level}] {alert_title}",
+            body_template="{recipient}：{alert_message}",
+            default_metadata={},
+        )
+        lookups = []
+        monkeypatch.setattr(
+            notification_service_module,
+            "find_matching_template",
+            lambda db, **kwargs: lookups.append(kwargs) or template,
+        )
+        service = NotificationService(db=Mock())
+        rendered = service._apply_notification_template(
+            notification_type=NotificationType.EMAIL,
+            alert_level="error",
+            event_type="alert",
+            resource_type=None,
+            resource_id=None,
+            base_title="磁盤已滿",
+            base_message="剩餘 1%",
+            recipients=["a@example.com", "b@example.com"],
+        )
+        assert len(lookups) == 1
+        assert rendered["by_recipient"]["a@example.com"] == ("[error] 磁盤已滿", "a@example.com：剩餘 1%")
+        assert rendered["by_recipient"]["b@example.com"][1] == "b@example.com：剩餘 1%"
+
+    def test_invalid_template_falls_back_to_source(self):
+        service = NotificationService(db=Mock())
+        assert service._render_template("{missing} text", {}) == "{missing} text"
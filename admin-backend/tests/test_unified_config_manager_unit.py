@@ -0,0 +1,146 @@
+"""
+ConfigManager 單元測試：分層合併、結果緩存與版本失效、從 unified_configs 批量載入
+"""
+import sys
+from pathlib import Path
+
+# 添加項目根目錄到 Python 路徑
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import pytest
+from sqlalchemy import event
+
+from app.db import SessionLocal, engine
+from app.models.unified_features import UnifiedConfig as DBUnifiedConfig
+from group_ai_service.unified_config_manager import (
+    ChatConfig,
+    ConfigLevel,
+    ConfigManager,
+    KeywordConfig,
+    UnifiedConfig,
+)
+
+
+def make_config(interval_min=30, keywords=None, **metadata):
+    return UnifiedConfig(
+        chat=ChatConfig(interval_min=interval_min),
+        keywords=KeywordConfig(keywords=keywords or []),
+        metadata=metadata,
+    )
+
+
+@pytest.fixture
+def manager():
+    manager = ConfigManager()
+    manager.set_group_config(100, make_config(interval_min=40, keywords=["紅包"], source="group"))
+    manager.set_role_config("host", make_config(interval_min=50, tone="warm"))
+    manager.set_account_config("acc1", make_config(interval_min=60, source="account"))
+    return manager
+
+
+class TestConfigResolution:
+    """配置合併與緩存測試"""
+
+    def test_priority_order(self, manager):
+        manager.set_task_config("t1", make_config(interval_min=70))
+        config = manager.get_config("acc1", group_id=100, role_id="host", task_id="t1")
+        assert config.chat.interval_min == 70
+        assert config.keywords.keywords == ["紅包"]
+        assert config.metadata == {"source": "account", "tone": "warm"}
+
+    def test_steady_state_hits_cache(self, manager, monkeypatch):
+        first = manager.get_config("acc1", group_id=100, role_id="host")
+        monkeypatch.setattr(manager, "_resolve", lambda *args: pytest.fail("不應重新合併"))
+        for _ in range(3):
+            assert manager.get_config("acc1", group_id=100, role_id="host") is first
+        assert manager.get_cache_stats()["hits"] == 3
+
+    @pytest.mark.parametrize("update", [
+        lambda m: m.set_global_config(make_config(interval_min=10, keywords=["global"])),
+        lambda m: m.set_group_config(100, make_config(interval_min=41)),
+        lambda m: m.set_role_config("host", make_config(interval_min=51)),
+        lambda m: m.set_account_config("acc1", make_config(interval_min=61)),
+        lambda m: m.remove_config(ConfigLevel.ACCOUNT, "acc1"),
+    ])
+    def test_contributing_level_change_invalidates(self, manager, update):
+        before = manager.get_config("acc1", group_id=100, role_id="host")
+        update(manager)
+        after = manager.get_config("acc1", group_id=100, role_id="host")
+        assert after is not before
+        assert after == manager._resolve("acc1", 100, "host", None)
+
+    def test_unrelated_change_keeps_cache(self, manager):
+        before = manager.get_config("acc1", group_id=100)
+        manager.set_group_config(200, make_config(interval_min=99))
+        manager.set_account_config("acc2", make_config(interval_min=99))
+        manager.set_role_config("host", make_config(interval_min=99))  # 本次查詢未使用角色
+        assert manager.get_config("acc1", group_id=100) is before
+
+    def test_new_level_entry_invalidates(self, manager):
+        before = manager.get_config("acc1", group_id=100, task_id="late")
+        manager.set_task_config("late", make_config(interval_min=5))
+        assert manager.get_config("acc1", group_id=100, task_id="late").chat.interval_min == 5
+        assert before.chat.interval_min == 60
+
+    def test_cache_size_bounded(self):
+        manager = ConfigManager(cache_size=2)
+        for account in ("a", "b", "c"):
+            manager.get_config(account)
+        assert manager.get_cache_stats()["size"] == 2
+
+
+class TestLoadFromDatabase:
+    """從 unified_configs 表載入"""
+
+    @pytest.fixture
+    def rows(self):
+        db = SessionLocal()
+        rows = [
+            DBUnifiedConfig(config_id="ucm_global", config_level="global", chat_config={"interval_min": 20}),
+            DBUnifiedConfig(config_id="ucm_group", config_level="group", level_id="-1001",
+                            keyword_config={"keywords": ["hi"], "unknown": 1}),
+            DBUnifiedConfig(config_id="ucm_acc", config_level="account", level_id="ucm_acc1",
+                            chat_config={"interval_min": 90}, extra_metadata={"k": "v"}),
+            DBUnifiedConfig(config_id="ucm_other", config_level="account", level_id="ucm_acc2",
+                            chat_config={"interval_min": 1}),
+        ]
+        db.add_all(rows)
+        db.commit()
+        try:
+            yield db
+        finally:
+            db.query(DBUnifiedConfig).filter(DBUnifiedConfig.config_id.like("ucm_%")).delete(synchronize_session=False)
+            db.commit()
+            db.close()
+
+    def test_bulk_load_in_one_query(self, rows):
+        manager = ConfigManager()
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            if "unified_configs" in statement:
+                statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            loaded = manager.load_from_db(rows, keys=[(-1001, "ucm_acc1", None, None)])
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+
+        assert len(statements) == 1
+        assert loaded == 3
+        assert "ucm_acc2" not in manager.account_configs
+        config = manager.get_config("ucm_acc1", group_id=-1001)
+        assert config.chat.interval_min == 90
+        assert config.keywords.keywords == ["hi"]
+        assert config.metadata == {"k": "v"}
+
+    def test_reload_invalidates_cached_result(self, rows):
+        manager = ConfigManager()
+        manager.load_from_db(rows)
+        assert manager.get_config("ucm_acc2").chat.interval_min == 1
+        rows.query(DBUnifiedConfig).filter_by(config_id="ucm_other").update({"chat_config": {"interval_min": 2}})
+        rows.commit()
+        manager.load_from_db(rows)
+        assert manager.get_config("ucm_acc2").chat.interval_min == 2
@@ -1,33 +1,317 @@
 """
 條件表達式評估器
 用於評估定時消息的條件觸發表達式
+
+表達式在首次使用時編譯為 Python 閉包並按原文緩存（LRU），之後每次評估只執行閉包，
+不再重新切分字符串和解析字面量。
+
+語法:
+    expr       := or_expr
+    or_expr    := and_expr ("or" and_expr)*
+    and_expr   := not_expr ("and" not_expr)*
+    not_expr   := "not" not_expr | comparison
+    comparison := operand [op operand]
+    op         := "==" | "!=" | ">" | ">=" | "<" | "<=" | "in" | "not in" | "contains"
+    operand    := "(" expr ")" | "[" [operand ("," operand)*] "]" | 數字 | 字符串 | true | false | null
+                  | "${" 路徑 "}" | 路徑
+
+路徑是點號分隔的變量名（例如 group.metrics.activity），從上下文字典（或對象屬性）中逐層取值。
+為兼容舊寫法，比較運算右側的裸路徑視為字符串字面量（"status == active"），
+連續的多個裸單詞合併為一個字符串（"msg == hello world" 等同 "msg == 'hello world'"），
+右側需要引用變量時使用 ${路徑}。
 """
 import logging
 import re
-from typing import Dict, Any, Optional
-from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 編譯結果緩存的表達式數量上限
+CONDITION_CACHE_SIZE = 1024
+
+_KEYWORDS = {"and", "or", "not", "in", "contains", "true", "false", "null", "none"}
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<number>-?\d+(?:\.\d+)?(?![\w.]))
+      | (?P<string>'[^']*'|"[^"]*")
+      | (?P<ref>\$\{[^}]*\})
+      | (?P<op>>=|<=|!=|==|>|<|\(|\)|\[|\]|,)
+      | (?P<name>[^\W\d][\w]*(?:\.[\w]+)*)
+    )""",
+    re.VERBOSE,
+)
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+
+def _contains(container: Any, item: Any) -> bool:
+    if isinstance(container, (str, list, tuple, set, frozenset, dict)):
+        try:
+            return item in container
+        except TypeError:
+            return False
+    return False
+
+
+OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    'in': lambda a, b: a in b,
+    'not in': lambda a, b: a not in b,
+    'contains': _contains,
+}
+
+
+class ConditionSyntaxError(ValueError):
+    """條件表達式語法錯誤（編譯期）"""
+
+
+class CompiledCondition:
+    """編譯後的條件表達式"""
+
+    __slots__ = ("source", "_func")
+
+    def __init__(self, source: str, func: Evaluator):
+        self.source = source
+        self._func = func
+
+    def __call__(self, context: Dict[str, Any]) -> bool:
+        return bool(self._func(context))
+
+    def __repr__(self) -> str:
+        return f"CompiledCondition({self.source!r})"
+
+
+def _make_path_getter(path: str) -> Evaluator:
+    """路徑取值：字典按鍵、其他對象按屬性；任一層缺失時返回 None"""
+    parts = tuple(path.split('.'))
+
+    if len(parts) == 1:
+        name = parts[0]
+
+        def get_single(context: Dict[str, Any]) -> Any:
+            return context.get(name) if isinstance(context, dict) else getattr(context, name, None)
+        return get_single
+
+    def get_nested(context: Dict[str, Any]) -> Any:
+        value: Any = context
+        for part in parts:
+            if isinstance(value, dict):
+                value = value.get(part)
+            elif hasattr(value, part):
+                value = getattr(value, part)
+            else:
+                return None
+        return value
+    return get_nested
+
+
+def _truthy(getter: Evaluator) -> Evaluator:
+    """單獨出現的值按舊規則判斷：布爾值取其本身，否則非 None 且非空字符串為真"""
+    def test(context: Dict[str, Any]) -> bool:
+        value = getter(context)
+        if isinstance(value, bool):
+            return value
+        return value is not None and value != ""
+    return test
+
+
+def _constant(value: Any) -> Evaluator:
+    return lambda context: value
+
+
+class _Parser:
+    """遞歸下降解析器，直接生成閉包"""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.spans: List[Tuple[int, int]] = []
+        self.tokens = self._tokenize(source)
+        self.pos = 0
+
+    def _tokenize(self, source: str) -> List[Tuple[str, str]]:
+        tokens: List[Tuple[str, str]] = []
+        pos = 0
+        length = len(source)
+        while pos < length:
+            if source[pos:].strip() == "":
+                break
+            match = _TOKEN_RE.match(source, pos)
+            if not match or match.end() == pos:
+                raise ConditionSyntaxError(f"無法識別的字符 {source[pos:].strip()[:10]!r}（位置 {pos}）")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "name" and value.lower() in _KEYWORDS:
+                kind, value = "keyword", value.lower()
+            tokens.append((kind, value))
+            self.spans.append((match.start(match.lastgroup), match.end()))
+            pos = match.end()
+        return tokens
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str]]:
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None, None
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        if token[0] is None:
+            raise ConditionSyntaxError("表達式不完整")
+        self.pos += 1
+        return token
+
+    def _accept(self, kind: str, value: Optional[str] = None) -> bool:
+        token_kind, token_value = self._peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.pos += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, value: str) -> None:
+        if not self._accept(kind, value):
+            found = self._peek()[1]
+            raise ConditionSyntaxError(f"期望 {value!r}，實際為 {found!r}" if found else f"缺少 {value!r}")
+
+    def parse(self) -> Evaluator:
+        if not self.tokens:
+            raise ConditionSyntaxError("條件表達式為空")
+        func = self._or()
+        if self.pos < len(self.tokens):
+            raise ConditionSyntaxError(f"多餘的內容: {self.tokens[self.pos][1]!r}")
+        return func
+
+    def _or(self) -> Evaluator:
+        terms = [self._and()]
+        while self._accept("keyword", "or"):
+            terms.append(self._and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda context: any(term(context) for term in terms)
+
+    def _and(self) -> Evaluator:
+        terms = [self._not()]
+        while self._accept("keyword", "and"):
+            terms.append(self._not())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda context: all(term(context) for term in terms)
+
+    def _not(self) -> Evaluator:
+        if self._accept("keyword", "not"):
+            inner = self._not()
+            return lambda context: not inner(context)
+        return self._comparison()
+
+    def _comparison_operator(self) -> Optional[str]:
+        kind, value = self._peek()
+        if kind == "op" and value in ('==', '!=', '>', '>=', '<', '<='):
+            self.pos += 1
+            return value
+        if kind == "keyword" and value in ("in", "contains"):
+            self.pos += 1
+            return value
+        if kind == "keyword" and value == "not" and self.pos + 1 < len(self.tokens) \
+                and self.tokens[self.pos + 1] == ("keyword", "in"):
+            self.pos += 2
+            return "not in"
+        return None
+
+    def _comparison(self) -> Evaluator:
+        left_kind, left = self._operand()
+        op = self._comparison_operator()
+        if op is None:
+            return left if left_kind == "group" else _truthy(left)
+
+        _, right = self._operand(rhs=True)
+        compare = OPERATORS[op]
+
+        def evaluate(context: Dict[str, Any]) -> bool:
+            try:
+                return compare(left(context), right(context))
+            except TypeError:
+                # 類型不可比較（例如變量缺失時 None > 5）視為不滿足
+                return False
+        return evaluate
+
+    def _operand(self, rhs: bool = False) -> Tuple[str, Evaluator]:
+        kind, value = self._next()
+        if kind == "number":
+            return "literal", _constant(float(value) if '.' in value else int(value))
+        if kind == "string":
+            return "literal", _constant(value[1:-1])
+        if kind == "ref":
+            path = value[2:-1].strip()
+            if not path:
+                raise ConditionSyntaxError("變量引用 ${} 為空")
+            return "path", _make_path_getter(path)
+        if kind == "keyword" and value in ("true", "false"):
+            return "literal", _constant(value == "true")
+        if kind == "keyword" and value in ("null", "none"):
+            return "literal", _constant(None)
+        if kind == "name":
+            if not rhs:
+                return "path", _make_path_getter(value)
+            # 兼容舊語法：比較右側的裸名稱是字符串字面量，其後緊跟的裸單詞 / 數字一併計入（保留原文間隔）
+            start = self.spans[self.pos - 1][0]
+            while self._peek()[0] in ("name", "number"):
+                self.pos += 1
+            return "literal", _constant(self.source[start:self.spans[self.pos - 1][1]])
+        if kind == "op" and value == "(":
+            inner = self._or()
+            self._expect("op", ")")
+            return "group", inner
+        if kind == "op" and value == "[":
+            items: List[Tuple[str, Evaluator]] = []
+            if not self._accept("op", "]"):
+                while True:
+                    items.append(self._operand(rhs=True))
+                    if self._accept("op", "]"):
+                        break
+                    self._expect("op", ",")
+            if all(item_kind == "literal" for item_kind, _ in items):
+                # 全部是字面量時在編譯期求值一次
+                return "literal", _constant([item({}) for _, item in items])
+            getters = [item for _, item in items]
+            return "list", lambda context: [getter(context) for getter in getters]
+        raise ConditionSyntaxError(f"意外的符號 {value!r}")
+
+
+@lru_cache(maxsize=CONDITION_CACHE_SIZE)
+def _compile_cached(condition: str) -> Tuple[Optional[CompiledCondition], Optional[str]]:
+    """編譯並緩存結果；語法錯誤也會被緩存，無效表達式不會被反復解析"""
+    try:
+        return CompiledCondition(condition, _Parser(condition).parse()), None
+    except ConditionSyntaxError as e:
+        return None, str(e)
+
+
+def compile_condition(condition: str) -> CompiledCondition:
+    """
+    編譯條件表達式（帶 LRU 緩存）
+
+    Raises:
+        ConditionSyntaxError: 表達式語法錯誤
+    """
+    compiled, error = _compile_cached((condition or "").strip())
+    if error:
+        raise ConditionSyntaxError(error)
+    return compiled
+
 
 class ConditionEvaluator:
     """條件表達式評估器"""
-    
+
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         # 支持的運算符
-        self.operators = {
-            '==': lambda a, b: a == b,
-            '!=': lambda a, b: a != b,
-            '>': lambda a, b: a > b,
-            '>=': lambda a, b: a >= b,
-            '<': lambda a, b: a < b,
-            '<=': lambda a, b: a <= b,
-            'in': lambda a, b: a in b,
-            'not in': lambda a, b: a not in b,
-            'contains': lambda a, b: b in a if isinstance(a, str) else False,
-        }
-    
+        self.operators = OPERATORS
+
     def evaluate(
         self,
         condition: str,
@@ -35,159 +319,51 @@ class ConditionEvaluator:
     ) -> bool:
         """
         評估條件表達式
-        
+
         支持的格式:
         - "group_activity < 5"
-        - "message_count > 10"
+        - "message_count > 10 and not is_weekend"
         - "is_weekend == true"
         - "hour in [9, 10, 11, 14, 15, 16]"
-        
+        - "(title contains '紅包' or group.metrics.activity >= 5) and hour not in [0, 1, 2]"
+
         Args:
             condition: 條件表達式字符串
             context: 上下文變量字典
-            
+
         Returns:
-            評估結果（True/False）
+            評估結果（True/False）；表達式無效或求值出錯時返回 False
         """
         if not condition or not condition.strip():
             return False
-        
+
         try:
-            # 清理條件字符串
-            condition = condition.strip()
-            
-            # 解析條件表達式
-            # 支持格式: "variable operator value"
-            # 例如: "group_activity < 5"
-            
-            # 嘗試匹配各種運算符
-            for op in ['>=', '<=', '!=', '==', 'not in', 'in', '>', '<', 'contains']:
-                if op in condition:
-                    parts = condition.split(op, 1)
-                    if len(parts) == 2:
-                        var_name = parts[0].strip()
-                        value_str = parts[1].strip()
-                        
-                        # 獲取變量值
-                        var_value = self._get_variable_value(var_name, context)
-                        
-                        # 解析右側值
-                        right_value = self._parse_value(value_str, context)
-                        
-                        # 執行比較
-                        if op in self.operators:
-                            result = self.operators[op](var_value, right_value)
-                            self.logger.debug(
-                                f"條件評估: {condition} -> "
-                                f"{var_name}({var_value}) {op} {right_value} = {result}"
-                            )
-                            return result
-            
-            # 如果沒有匹配到運算符，嘗試作為布爾表達式
-            # 例如: "is_weekend" 表示 is_weekend == True
-            var_value = self._get_variable_value(condition, context)
-            if isinstance(var_value, bool):
-                return var_value
-            
-            # 如果變量存在且非空，視為 True
-            return var_value is not None and var_value != ""
-            
-        except Exception as e:
-            self.logger.error(f"評估條件表達式失敗: {condition}, 錯誤: {e}", exc_info=True)
+            compiled = compile_condition(condition)
+        except ConditionSyntaxError as e:
+            self.logger.error(f"條件表達式無效: {condition}, 錯誤: {e}")
             return False
-    
-    def _get_variable_value(self, var_name: str, context: Dict[str, Any]) -> Any:
-        """
-        從上下文中獲取變量值
-        
-        支持嵌套變量，例如: "group.metrics.activity"
-        """
+
         try:
-            # 支持嵌套變量（使用點號分隔）
-            parts = var_name.split('.')
-            value = context
-            
-            for part in parts:
-                if isinstance(value, dict):
-                    value = value.get(part)
-                elif hasattr(value, part):
-                    value = getattr(value, part)
-                else:
-                    return None
-            
-            return value
+            result = compiled(context)
         except Exception as e:
-            self.logger.debug(f"獲取變量值失敗: {var_name}, 錯誤: {e}")
-            return None
-    
-    def _parse_value(self, value_str: str, context: Dict[str, Any]) -> Any:
-        """
-        解析值字符串
-        
-        支持:
-        - 數字: "5", "10.5"
-        - 布爾值: "true", "false"
-        - 字符串: "hello"
-        - 列表: "[1, 2, 3]"
-        - 變量引用: "${variable_name}"
-        """
-        value_str = value_str.strip()
-        
-        # 處理變量引用 ${variable_name}
-        if value_str.startswith('${') and value_str.endswith('}'):
-            var_name = value_str[2:-1]
-            return self._get_variable_value(var_name, context)
-        
-        # 處理列表 [1, 2, 3]
-        if value_str.startswith('[') and value_str.endswith(']'):
-            list_str = value_str[1:-1]
-            items = [item.strip() for item in list_str.split(',')]
-            return [self._parse_value(item, context) for item in items]
-        
-        # 處理布爾值
-        if value_str.lower() == 'true':
-            return True
-        if value_str.lower() == 'false':
+            self.logger.error(f"評估條件表達式失敗: {condition}, 錯誤: {e}", exc_info=True)
             return False
-        
-        # 處理數字
-        try:
-            if '.' in value_str:
-                return float(value_str)
-            else:
-                return int(value_str)
-        except ValueError:
-            pass
-        
-        # 處理字符串（移除引號）
-        if (value_str.startswith('"') and value_str.endswith('"')) or \
-           (value_str.startswith("'") and value_str.endswith("'")):
-            return value_str[1:-1]
-        
-        # 默認返回字符串
-        return value_str
-    
+
+        self.logger.debug(f"條件評估: {condition} -> {result}")
+        return result
+
     def validate_condition(self, condition: str) -> tuple[bool, Optional[str]]:
         """
-        驗證條件表達式是否有效
-        
+        驗證條件表達式是否有效（完整編譯一次，語法錯誤在保存時即可發現）
+
         Returns:
             (是否有效, 錯誤消息)
         """
         if not condition or not condition.strip():
             return False, "條件表達式為空"
-        
+
         try:
-            # 簡單驗證：檢查是否包含運算符
-            has_operator = any(op in condition for op in self.operators.keys())
-            
-            if not has_operator:
-                # 可能是簡單的變量名，這是允許的
-                return True, None
-            
-            # 嘗試解析（不執行）
-            # 這裡可以添加更複雜的語法檢查
-            return True, None
-            
-        except Exception as e:
+            compile_condition(condition)
+        except ConditionSyntaxError as e:
             return False, f"條件表達式無效: {e}"
+        return True, None
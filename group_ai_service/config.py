@@ -65,6 +65,8 @@ class GroupAIConfig(BaseSettings):
     # 監控配置
     metrics_collection_interval: int = 30  # 秒
     metrics_retention_days: int = 30
+    # 監控事件歸檔目錄（默認為空，只保留內存事件）；目錄加排他鎖，多 worker 部署中只有一個進程寫入
+    event_archive_directory: str = ""
     alert_check_interval: int = 60  # 秒
     
     # 告警配置
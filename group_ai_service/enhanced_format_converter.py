@@ -6,7 +6,6 @@ import yaml
 import re
 from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
-import openai
 import os
 
 logger = logging.getLogger(__name__)
@@ -0,0 +1,587 @@
+"""
+監控事件歸檔 - 追加寫入、按段壓縮並建立索引的事件存儲
+
+MonitorService.event_log 只是內存中最近 10000 條事件，重啟即丟失，7 天 / 30 天的歷史視圖無法準確。
+這裡把每條事件同時寫入磁盤：
+- 活動段（active.jsonl）：逐條追加的 JSON 行，進程崩潰最多丟失未刷盤的幾條；
+  達到 SEGMENT_MAX_EVENTS 條或跨度超過 SEGMENT_MAX_SECONDS 時封存
+- 封存段（seg-<開始>-<序號>.evs）：定長二進制記錄（struct，每條 27 字節）加段內字符串表，
+  整段以 zstd（未安裝 zstandard 時 zlib）壓縮
+- 索引（index.json）：每段的時間範圍、條數、賬號集合和事件類型計數；
+  範圍查詢只解壓時間重疊且包含目標賬號 / 類型的段，逐段流式返回，不把全部事件加載到內存
+- 維護：刪除超過保留天數（metrics_retention_days）的段，合併相鄰的小段；
+  被替換的段文件延遲到下一次維護才刪除，正在讀取舊索引快照的查詢不受影響
+- 寫入線程：append 只把事件放入有界隊列（調用方通常是事件循環），
+  刷盤、封存、合併和索引更新都在寫入線程中執行；隊列滿時丟棄事件而不阻塞
+
+同一目錄只能由一個進程寫入：打開歸檔時對目錄加排他文件鎖（.lock），
+多 worker 部署中未拿到鎖的進程不寫歸檔，只保留內存事件；
+同一進程內的多個 MonitorService 經 get_event_archive 共享同一實例。
+"""
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard 為可選依賴
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows 無 fcntl，不加目錄鎖
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_MAGIC = b"EVS1"
+SEGMENT_MAX_EVENTS = 5000  # 活動段封存的條數上限
+SEGMENT_MAX_SECONDS = 3600  # 活動段封存的時間跨度上限（秒）
+COMPACT_TARGET_EVENTS = 20000  # 合併後單段的條數上限
+COMPACT_MAX_SPAN_SECONDS = 86400  # 合併後單段的時間跨度上限（秒）
+MAINTENANCE_INTERVAL_SECONDS = 3600
+WRITE_QUEUE_SIZE = 10000  # 寫入隊列上限，寫入線程跟不上時超出的事件被丟棄
+
+# 時間戳、類型、賬號、消息類型（字符串表下標）、標誌位、回復耗時、金額
+_RECORD = struct.Struct("<dHHHBfd")
+_NO_STRING = 0xFFFF
+_FLAG_SUCCESS = 1
+_FLAG_REPLY_TIME = 2
+_FLAG_AMOUNT = 4
+
+_CODECS = {1: "zlib", 2: "zstd"}
+
+
+def _compress(payload: bytes) -> bytes:
+    if zstandard is not None:
+        return bytes([2]) + zstandard.ZstdCompressor(level=6).compress(payload)
+    return bytes([1]) + zlib.compress(payload, 6)
+
+
+def _decompress(data: bytes) -> bytes:
+    codec, body = _CODECS.get(data[0]), data[1:]
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("事件段使用 zstd 壓縮，但未安裝 zstandard")
+        return zstandard.ZstdDecompressor().decompress(body)
+    if codec == "zlib":
+        return zlib.decompress(body)
+    raise ValueError(f"未知的事件段編碼: {data[0]}")
+
+
+def _to_epoch(value: Any) -> float:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return time.time()
+
+
+def encode_segment(events: List[Dict[str, Any]]) -> bytes:
+    """把事件列表編碼為壓縮的段數據（事件需包含 timestamp / type / account_id）"""
+    strings: List[str] = []
+    lookup: Dict[str, int] = {}
+
+    def index(value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        value = str(value)
+        if value not in lookup:
+            if len(strings) >= _NO_STRING:
+                raise ValueError("段內字符串過多")
+            lookup[value] = len(strings)
+            strings.append(value)
+        return lookup[value]
+
+    records = bytearray()
+    for event in events:
+        flags = _FLAG_SUCCESS if event.get("success", True) else 0
+        reply_time = event.get("reply_time")
+        amount = event.get("amount")
+        if reply_time is not None:
+            flags |= _FLAG_REPLY_TIME
+        if amount is not None:
+            flags |= _FLAG_AMOUNT
+        records += _RECORD.pack(
+            _to_epoch(event.get("timestamp")),
+            index(event.get("type", "unknown")),
+            index(event.get("account_id")),
+            index(event.get("message_type")),
+            flags,
+            float(reply_time or 0.0),
+            float(amount or 0.0),
+        )
+    header = json.dumps(strings, ensure_ascii=False).encode("utf-8")
+    return SEGMENT_MAGIC + _compress(struct.pack("<I", len(header)) + header + bytes(records))
+
+
+def decode_segment(data: bytes) -> Iterator[Dict[str, Any]]:
+    """解碼段數據，按寫入順序逐條返回事件"""
+    if data[:4] != SEGMENT_MAGIC:
+        raise ValueError("不是事件段文件")
+    payload = _decompress(data[4:])
+    (header_size,) = struct.unpack_from("<I", payload)
+    strings = json.loads(payload[4:4 + header_size].decode("utf-8"))
+    for timestamp, type_index, account_index, message_type_index, flags, reply_time, amount in _RECORD.iter_unpack(
+        memoryview(payload)[4 + header_size:]
+    ):
+        event: Dict[str, Any] = {
+            "type": strings[type_index],
+            "account_id": strings[account_index] if account_index != _NO_STRING else None,
+            "success": bool(flags & _FLAG_SUCCESS),
+            "timestamp": datetime.fromtimestamp(timestamp),
+        }
+        if message_type_index != _NO_STRING:
+            event["message_type"] = strings[message_type_index]
+        if flags & _FLAG_REPLY_TIME:
+            event["reply_time"] = reply_time
+        if flags & _FLAG_AMOUNT:
+            event["amount"] = amount
+        yield event
+
+
+def _serialize(event: Dict[str, Any]) -> Dict[str, Any]:
+    return {**event, "timestamp": _to_epoch(event.get("timestamp"))}
+
+
+def _deserialize(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {**data, "timestamp": datetime.fromtimestamp(data["timestamp"])}
+
+
+class ArchiveLockedError(OSError):
+    """歸檔目錄已被其他進程打開"""
+
+
+def _lock_directory(directory: Path) -> Optional[IO]:
+    """對歸檔目錄加排他鎖（進程退出時由系統釋放）"""
+    if fcntl is None:
+        return None
+    lock_file = open(directory / ".lock", "a")
+    try:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        raise ArchiveLockedError(f"事件歸檔目錄 {directory} 已由其他進程寫入")
+    return lock_file
+
+
+class EventArchive:
+    """按段存儲的監控事件歸檔"""
+
+    def __init__(self, directory: Path, retention_days: int = 30, queue_size: int = WRITE_QUEUE_SIZE):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self._lock_file = _lock_directory(self.directory)
+        self._lock = threading.RLock()
+        self._active: List[Dict[str, Any]] = []
+        self._sealing: List[Dict[str, Any]] = []  # 正在封存的事件（寫入段文件並更新索引前仍可查詢）
+        self._active_path = self.directory / "active.jsonl"
+        self._index_path = self.directory / "index.json"
+        self._segments: List[Dict[str, Any]] = []
+        self._pending_delete: List[str] = []
+        self._sequence = 0
+        self._last_maintenance = 0.0
+        self._maintenance_queued = False
+        self._dropped = 0
+        self._load()
+        # 以下狀態只由寫入線程訪問：已寫入 active.jsonl 的事件（與 _active 的前綴一一對應）
+        self._written: List[Dict[str, Any]] = list(self._active)
+        self._active_file = open(self._active_path, "a", encoding="utf-8")
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._run_writer, name="event-archive-writer", daemon=True)
+        self._writer.start()
+
+    # ========== 寫入 ==========
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """
+        追加一條事件（timestamp 為 datetime 或時間戳）
+
+        只更新內存並放入寫入隊列，不做磁盤 I/O；寫入、封存和維護都在寫入線程中執行。
+        隊列已滿（磁盤寫入跟不上）時丟棄該事件，不阻塞調用方。
+        """
+        record = _serialize(event)
+        with self._lock:
+            # 入隊與追加到 _active 在同一把鎖內，保證兩者順序一致
+            try:
+                self._queue.put_nowait(("event", record))
+            except queue.Full:
+                self._dropped += 1
+                return
+            self._active.append(_deserialize(record))
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """等待此前追加的事件全部寫入，並把活動段封存為壓縮段"""
+        self._call(self._seal, timeout)
+
+    def sync(self, timeout: Optional[float] = None) -> None:
+        """等待此前追加的事件全部寫入活動段（不封存）"""
+        self._call(lambda: None, timeout)
+
+    def _call(self, func: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """在寫入線程中執行 func 並等待結果（排在已入隊的事件之後）"""
+        if threading.current_thread() is self._writer:
+            return func()
+        done = Future()
+        self._queue.put(("call", (func, done)))
+        return done.result(timeout)
+
+    def _run_writer(self) -> None:
+        while True:
+            kind, payload = self._queue.get()
+            try:
+                if kind == "stop":
+                    self._write_pending()
+                    return
+                if kind == "event":
+                    self._written.append(_deserialize(payload))
+                    self._active_file.write(json.dumps(payload, ensure_ascii=False, default=str) + "\n")
+                    # 隊列中沒有更多事件時才刷盤，突發寫入合併為一次 flush
+                    if self._queue.empty():
+                        self._active_file.flush()
+                    if self._should_seal():
+                        self._seal()
+                elif kind == "call":
+                    func, done = payload
+                    self._write_pending()
+                    try:
+                        done.set_result(func())
+                    except BaseException as e:
+                        done.set_exception(e)
+                elif kind == "maintain":
+                    self._write_pending()
+                    self._maintain_logged()
+            except Exception as e:  # 防止寫入線程意外退出
+                logger.error(f"監控事件歸檔寫入失敗: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _write_pending(self) -> None:
+        try:
+            self._active_file.flush()
+        except ValueError:
+            pass  # 文件已關閉
+
+    def _should_seal(self) -> bool:
+        if len(self._written) >= SEGMENT_MAX_EVENTS:
+            return True
+        first, last = self._written[0]["timestamp"], self._written[-1]["timestamp"]
+        return (last - first).total_seconds() >= SEGMENT_MAX_SECONDS
+
+    def _seal(self) -> None:
+        if not self._written:
+            return
+        count = len(self._written)
+        with self._lock:
+            # 封存期間事件移到 _sealing，查詢仍能看到，且不會與新段重複計數
+            self._sealing = self._active[:count]
+            del self._active[:count]
+        events = sorted(self._written, key=lambda e: e["timestamp"])
+        segment = self._write_segment_file(events)
+        with self._lock:
+            self._add_segments([segment])
+            self._sealing = []
+            self._save_index()
+        self._written = []
+        self._active_file.close()
+        self._active_file = open(self._active_path, "w", encoding="utf-8")
+
+    def _write_segment_file(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """寫入段文件並返回索引條目（不修改索引）"""
+        start = events[0]["timestamp"].timestamp()
+        self._sequence += 1
+        name = f"seg-{int(start)}-{self._sequence:06d}.evs"
+        data = encode_segment(events)
+        tmp_path = self.directory / (name + ".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, self.directory / name)
+        types: Dict[str, int] = {}
+        for event in events:
+            types[event.get("type", "unknown")] = types.get(event.get("type", "unknown"), 0) + 1
+        return {
+            "file": name,
+            "start": start,
+            "end": events[-1]["timestamp"].timestamp(),
+            "count": len(events),
+            "bytes": len(data),
+            "accounts": sorted({str(e["account_id"]) for e in events if e.get("account_id") is not None}),
+            "types": types,
+        }
+
+    def _add_segments(self, segments: List[Dict[str, Any]]) -> None:
+        self._segments.extend(segments)
+        self._segments.sort(key=lambda s: (s["start"], s["file"]))
+
+    # ========== 加載 ==========
+
+    def _load(self) -> None:
+        if self._index_path.exists():
+            try:
+                data = json.loads(self._index_path.read_text(encoding="utf-8"))
+                self._segments = data.get("segments", [])
+                self._sequence = data.get("sequence", 0)
+                self._pending_delete = data.get("pending_delete", [])
+            except Exception as e:
+                logger.error(f"讀取事件歸檔索引失敗，將重建: {e}")
+                self._rebuild_index()
+        if self._active_path.exists():
+            with open(self._active_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._active.append(_deserialize(json.loads(line)))
+                    except (ValueError, KeyError):
+                        continue  # 崩潰時寫了一半的行
+
+    def _rebuild_index(self) -> None:
+        self._segments = []
+        for path in sorted(self.directory.glob("seg-*.evs")):
+            try:
+                events = list(decode_segment(path.read_bytes()))
+            except Exception as e:
+                logger.warning(f"事件段 {path.name} 無法讀取，已跳過: {e}")
+                continue
+            if not events:
+                continue
+            types: Dict[str, int] = {}
+            for event in events:
+                types[event["type"]] = types.get(event["type"], 0) + 1
+            self._segments.append({
+                "file": path.name,
+                "start": events[0]["timestamp"].timestamp(),
+                "end": events[-1]["timestamp"].timestamp(),
+                "count": len(events),
+                "bytes": path.stat().st_size,
+                "accounts": sorted({e["account_id"] for e in events if e.get("account_id") is not None}),
+                "types": types,
+            })
+            self._sequence = max(self._sequence, int(path.stem.rsplit("-", 1)[-1]))
+        self._save_index()
+
+    def _save_index(self) -> None:
+        data = {"segments": self._segments, "sequence": self._sequence, "pending_delete": self._pending_delete}
+        tmp_path = self._index_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        os.replace(tmp_path, self._index_path)
+
+    # ========== 查詢 ==========
+
+    def iter_events(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        account_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """按時間順序返回範圍內的事件（只讀取時間、賬號和類型可能匹配的段）"""
+        start_ts = start.timestamp() if start else float("-inf")
+        end_ts = end.timestamp() if end else float("inf")
+        with self._lock:
+            segments = list(self._segments)
+            active = self._sealing + self._active
+        for segment in segments:
+            if not self._segment_matches(segment, start_ts, end_ts, account_id, event_type):
+                continue
+            for event in self._read_segment(segment):
+                if self._event_matches(event, start_ts, end_ts, account_id, event_type):
+                    yield event
+        for event in sorted(active, key=lambda e: e["timestamp"]):
+            if self._event_matches(event, start_ts, end_ts, account_id, event_type):
+                yield event
+
+    def recent_events(
+        self,
+        limit: int = 100,
+        account_id: Optional[str] = None,
+        event_type: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """最近的 limit 條事件（從最新的段往前讀，按時間正序返回）"""
+        with self._lock:
+            segments = list(self._segments)
+            active = self._sealing + self._active
+        result: List[Dict[str, Any]] = []
+        no_bounds = (float("-inf"), float("inf"))
+        for event in sorted(active, key=lambda e: e["timestamp"], reverse=True):
+            if self._event_matches(event, *no_bounds, account_id, event_type):
+                result.append(event)
+        for segment in reversed(segments):
+            if len(result) >= limit:
+                break
+            if not self._segment_matches(segment, *no_bounds, account_id, event_type):
+                continue
+            matched = [e for e in self._read_segment(segment) if self._event_matches(e, *no_bounds, account_id, event_type)]
+            result.extend(reversed(matched))
+        return list(reversed(result[:limit]))
+
+    @staticmethod
+    def _segment_matches(segment, start_ts, end_ts, account_id, event_type) -> bool:
+        if segment["end"] < start_ts or segment["start"] > end_ts:
+            return False
+        if account_id is not None and account_id not in segment["accounts"]:
+            return False
+        if event_type is not None and event_type not in segment["types"]:
+            return False
+        return True
+
+    @staticmethod
+    def _event_matches(event, start_ts, end_ts, account_id, event_type) -> bool:
+        timestamp = event["timestamp"].timestamp()
+        if timestamp < start_ts or timestamp > end_ts:
+            return False
+        if account_id is not None and event.get("account_id") != account_id:
+            return False
+        if event_type is not None and event.get("type") != event_type:
+            return False
+        return True
+
+    def _read_segment(self, segment: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        try:
+            data = (self.directory / segment["file"]).read_bytes()
+        except FileNotFoundError:
+            logger.warning(f"事件段 {segment['file']} 不存在，已跳過")
+            return iter(())
+        return decode_segment(data)
+
+    # ========== 維護 ==========
+
+    def maintain(self, now: Optional[float] = None) -> Dict[str, int]:
+        """刪除過期段、合併相鄰小段、清理已被替換的段文件（在寫入線程中執行並等待結果）"""
+        return self._call(lambda: self._maintain(now))
+
+    def _maintain(self, now: Optional[float] = None) -> Dict[str, int]:
+        now = now or time.time()
+        result = {"expired": 0, "compacted": 0, "deleted_files": 0}
+        with self._lock:
+            for name in self._pending_delete:
+                try:
+                    (self.directory / name).unlink()
+                    result["deleted_files"] += 1
+                except FileNotFoundError:
+                    pass
+            self._pending_delete = []
+            cutoff = now - self.retention_days * 86400
+            expired = [s for s in self._segments if s["end"] < cutoff]
+            if expired:
+                self._segments = [s for s in self._segments if s["end"] >= cutoff]
+                self._pending_delete.extend(s["file"] for s in expired)
+                result["expired"] = len(expired)
+            self._save_index()
+            segments = list(self._segments)
+        result["compacted"] = self._compact(segments)
+        self._last_maintenance = now
+        return result
+
+    def _maintain_logged(self) -> None:
+        self._maintenance_queued = False
+        try:
+            result = self._maintain()
+            if any(result.values()):
+                logger.info(f"監控事件歸檔維護完成: {result}")
+        except Exception as e:
+            logger.warning(f"監控事件歸檔維護失敗: {e}")
+
+    def _compact(self, segments: List[Dict[str, Any]]) -> int:
+        merged = 0
+        group: List[Dict[str, Any]] = []
+
+        def flush_group() -> None:
+            nonlocal merged
+            if len(group) > 1:
+                events = [event for segment in group for event in self._read_segment(segment)]
+                events.sort(key=lambda e: e["timestamp"])
+                names = {segment["file"] for segment in group}
+                replacement = self._write_segment_file(events)
+                with self._lock:
+                    # 移除原段與加入合併段在同一次索引更新中完成，查詢不會重複計數
+                    self._segments = [s for s in self._segments if s["file"] not in names]
+                    self._add_segments([replacement])
+                    self._pending_delete.extend(names)
+                    self._save_index()
+                merged += len(group)
+            group.clear()
+
+        for segment in segments:
+            if group and (
+                sum(s["count"] for s in group) + segment["count"] > COMPACT_TARGET_EVENTS
+                or segment["end"] - group[0]["start"] > COMPACT_MAX_SPAN_SECONDS
+            ):
+                flush_group()
+            if segment["count"] >= COMPACT_TARGET_EVENTS // 2:
+                flush_group()
+                continue
+            group.append(segment)
+        flush_group()
+        return merged
+
+    def maintain_in_background(self) -> bool:
+        """距上次維護超過 MAINTENANCE_INTERVAL_SECONDS 時把維護排入寫入線程（不等待）"""
+        if time.time() - self._last_maintenance < MAINTENANCE_INTERVAL_SECONDS or self._maintenance_queued:
+            return False
+        try:
+            self._queue.put_nowait(("maintain", None))
+        except queue.Full:
+            return False
+        self._maintenance_queued = True
+        self._last_maintenance = time.time()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": str(self.directory),
+                "segments": len(self._segments),
+                "archived_events": sum(s["count"] for s in self._segments),
+                "archived_bytes": sum(s["bytes"] for s in self._segments),
+                "active_events": len(self._sealing) + len(self._active),
+                "queued_events": self._queue.qsize(),
+                "dropped_events": self._dropped,
+                "oldest": datetime.fromtimestamp(self._segments[0]["start"]).isoformat() if self._segments else None,
+                "retention_days": self.retention_days,
+            }
+
+    def close(self) -> None:
+        """寫完隊列中的事件後停止寫入線程並釋放目錄鎖"""
+        if self._writer.is_alive():
+            self._queue.put(("stop", None))
+            self._writer.join()
+        self._active_file.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+_archives: Dict[str, EventArchive] = {}
+_archives_lock = threading.Lock()
+
+
+def get_event_archive(directory: Optional[str] = None) -> Optional[EventArchive]:
+    """獲取事件歸檔（同一目錄在進程內共享；配置為空或目錄不可用時返回 None）"""
+    from group_ai_service.config import get_group_ai_config
+
+    config = get_group_ai_config()
+    directory = config.event_archive_directory if directory is None else directory
+    if not directory:
+        return None
+    key = str(Path(directory).resolve())
+    with _archives_lock:
+        archive = _archives.get(key)
+        if archive is None:
+            try:
+                archive = EventArchive(Path(key), retention_days=config.metrics_retention_days)
+            except ArchiveLockedError as e:
+                logger.warning(f"{e}，本進程僅保留內存事件")
+                return None
+            except OSError as e:
+                logger.warning(f"監控事件歸檔目錄不可用（{key}），僅保留內存事件: {e}")
+                return None
+            _archives[key] = archive
+        return archive
@@ -6,7 +6,6 @@ import yaml
 import json
 from typing import Dict, Any, Optional, List
 from pathlib import Path
-import openai
 import os
 
 logger = logging.getLogger(__name__)
@@ -120,6 +119,8 @@ class FormatConverter:
     ) -> Dict[str, Any]:
         """使用AI进行转换"""
         try:
+            import openai  # openai SDK 導入約需 1 秒，僅在調用 AI 時導入
+
             client = openai.OpenAI(api_key=self.openai_api_key)
             
             # 构建提示词
@@ -468,6 +469,8 @@ class FormatConverter:
             return yaml_content
         
         try:
+            import openai  # openai SDK 導入約需 1 秒，僅在調用 AI 時導入
+
             client = openai.OpenAI(api_key=self.openai_api_key)
             
             optimize_prompts = {
@@ -4,11 +4,12 @@
 import logging
 import asyncio
 import concurrent.futures
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime, timedelta
 from collections import defaultdict, deque
 from dataclasses import dataclass, field
 
+from group_ai_service.event_archive import EventArchive, get_event_archive
 from group_ai_service.models.account import AccountStatusEnum
 
 logger = logging.getLogger(__name__)
@@ -55,11 +56,19 @@ class Alert:
 class MonitorService:
     """監控服務"""
     
-    def __init__(self):
+    def __init__(self, archive: Optional[EventArchive] = None):
         self.account_metrics: Dict[str, AccountMetrics] = {}
         self.system_metrics_history: deque = deque(maxlen=1000)  # 最近 1000 條系統指標
         self.alerts: List[Alert] = []
-        self.event_log: deque = deque(maxlen=10000)  # 最近 10000 條事件
+        self.event_log: deque = deque(maxlen=10000)  # 最近 10000 條事件（內存熱數據）
+        
+        # 持久化事件歸檔（歷史查詢走歸檔，未配置時退回內存事件）
+        if archive is None:
+            try:
+                archive = get_event_archive()
+            except Exception as e:
+                logger.warning(f"監控事件歸檔初始化失敗，僅保留內存事件: {e}")
+        self.archive: Optional[EventArchive] = archive
         
         # 事件日誌清理配置
         self.event_log_retention_hours = 24  # 保留 24 小時的事件
@@ -85,7 +94,7 @@ class MonitorService:
         if not success:
             metrics.error_count += 1
         
-        self.event_log.append({
+        self._append_event({
             "type": "message",
             "account_id": account_id,
             "message_type": message_type,
@@ -115,7 +124,7 @@ class MonitorService:
         else:
             metrics.error_count += 1
         
-        self.event_log.append({
+        self._append_event({
             "type": "reply",
             "account_id": account_id,
             "reply_time": reply_time,
@@ -144,7 +153,7 @@ class MonitorService:
         else:
             metrics.error_count += 1
         
-        self.event_log.append({
+        self._append_event({
             "type": "redpacket",
             "account_id": account_id,
             "success": success,
@@ -155,6 +164,34 @@ class MonitorService:
         # 定期清理舊事件（非阻塞）
         self._maybe_cleanup_old_events()
     
+    def _append_event(self, event: Dict[str, Any]):
+        """記錄事件到內存並追加到歸檔（歸檔失敗不影響主流程）"""
+        self.event_log.append(event)
+        if self.archive is not None:
+            try:
+                self.archive.append(event)
+            except Exception as e:
+                logger.warning(f"寫入監控事件歸檔失敗: {e}")
+    
+    def query_events(
+        self,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        account_id: Optional[str] = None,
+        event_type: Optional[str] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """按時間順序流式返回範圍內的事件（有歸檔時只讀取相關的段）"""
+        if self.archive is not None:
+            return self.archive.iter_events(start_time, end_time, account_id=account_id, event_type=event_type)
+        return (
+            e for e in list(self.event_log)
+            if isinstance(e.get("timestamp"), datetime)
+            and (start_time is None or e["timestamp"] >= start_time)
+            and (end_time is None or e["timestamp"] <= end_time)
+            and (account_id is None or e.get("account_id") == account_id)
+            and (event_type is None or e.get("type") == event_type)
+        )
+    
     def get_account_metrics(
         self,
         account_id: str,
@@ -655,6 +692,11 @@ class MonitorService:
         limit: int = 100
     ) -> List[Dict[str, Any]]:
         """獲取事件日誌"""
+        if self.archive is not None:
+            events = self.archive.recent_events(limit, account_id=account_id, event_type=event_type)
+            events.reverse()
+            return events
+        
         events = list(self.event_log)
         
         # 過濾
@@ -678,6 +720,9 @@ class MonitorService:
                 return
             
             self.last_cleanup_time = now
+            if self.archive is not None:
+                # 歸檔的過期刪除與小段合併在後台線程進行
+                self.archive.maintain_in_background()
             cutoff = now - timedelta(hours=self.event_log_retention_hours)
             
             # 清理超過保留時間的事件
@@ -0,0 +1,180 @@
+"""
+模板編譯器 - 模板只解析一次，之後每次渲染只做片段拼接
+
+模板被切分為字面量片段和變量片段，變量片段在編譯時綁定為解析函數；
+渲染時依次調用解析函數並用一次 ''.join 拼接。編譯結果按模板內容緩存（LRU），
+同一模板渲染給 N 個接收者時只解析一次。
+
+支持兩種語法:
+- mustache: {{ 表達式 }}，表達式的含義由綁定函數決定（劇本回復模板，見 VariableResolver）
+- format: 與 str.format 兼容的 {name}、{name.attr}、{name[0]}、{name!r:>10}、{{ / }} 轉義（通知模板）
+"""
+import logging
+import re
+import threading
+from collections import OrderedDict
+from string import Formatter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+_MUSTACHE_RE = re.compile(r'\{\{([^}]+)\}\}')
+_FORMATTER = Formatter()
+
+# 變量片段：接收渲染參數，返回字符串
+Renderer = Callable[..., str]
+Segment = Union[str, Renderer]
+
+
+class CompiledTemplate:
+    """編譯後的模板"""
+
+    __slots__ = ("source", "segments", "fields", "_parts", "_renderers")
+
+    def __init__(self, source: str, segments: List[Segment], fields: Tuple[str, ...]):
+        self.source = source
+        self.segments = segments
+        self.fields = fields
+        # 字面量預先放入結果列表，渲染時只填充變量所在位置
+        self._parts = [segment if isinstance(segment, str) else "" for segment in segments]
+        self._renderers = [(index, segment) for index, segment in enumerate(segments) if not isinstance(segment, str)]
+
+    def render(self, *args: Any) -> str:
+        """依次渲染變量片段並拼接；參數原樣傳給各片段的解析函數"""
+        parts = self._parts.copy()
+        for index, renderer in self._renderers:
+            parts[index] = renderer(*args)
+        return "".join(parts)
+
+    @property
+    def is_static(self) -> bool:
+        return not self.fields
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate({self.source[:40]!r}, fields={self.fields})"
+
+
+def _merge_literals(segments: List[Segment]) -> List[Segment]:
+    merged: List[Segment] = []
+    for segment in segments:
+        if isinstance(segment, str):
+            if not segment:
+                continue
+            if merged and isinstance(merged[-1], str):
+                merged[-1] += segment
+                continue
+        merged.append(segment)
+    return merged
+
+
+def tokenize_mustache(template: str, bind: Callable[[str], Renderer]) -> CompiledTemplate:
+    """切分 {{ 表達式 }} 模板；bind 把表達式文本編譯為解析函數"""
+    segments: List[Segment] = []
+    fields: List[str] = []
+    position = 0
+    for match in _MUSTACHE_RE.finditer(template):
+        segments.append(template[position:match.start()])
+        expression = match.group(1).strip()
+        segments.append(bind(expression))
+        fields.append(expression)
+        position = match.end()
+    segments.append(template[position:])
+    return CompiledTemplate(template, _merge_literals(segments), tuple(fields))
+
+
+def _format_field_getter(field_name: str) -> Callable[[Mapping[str, Any]], Any]:
+    """把 str.format 的字段名（a.b[0]）預先拆分為取值鏈"""
+    import _string  # str.format 自身使用的字段名解析
+
+    first, rest = _string.formatter_field_name_split(field_name)
+    chain = tuple(rest)
+
+    def get(context: Mapping[str, Any]) -> Any:
+        value = context[first]
+        for is_attr, key in chain:
+            value = getattr(value, key) if is_attr else value[key]
+        return value
+    return get
+
+
+def _bind_format_field(field_name: str, format_spec: str, conversion: Optional[str]) -> Renderer:
+    if not field_name or field_name.isdigit():
+        raise ValueError("通知模板只支持命名字段")
+    if "{" in format_spec:
+        raise ValueError("不支持嵌套的格式說明")
+    getter = _format_field_getter(field_name)
+
+    if conversion is None and not format_spec:
+        def render_plain(context: Mapping[str, Any]) -> str:
+            value = getter(context)
+            return value if value.__class__ is str else format(value)
+        return render_plain
+
+    def render(context: Mapping[str, Any]) -> str:
+        return format(_FORMATTER.convert_field(getter(context), conversion), format_spec)
+    return render
+
+
+def tokenize_format(template: str) -> CompiledTemplate:
+    """切分 str.format 模板；渲染結果與 template.format(**context) 一致，缺少字段時拋出 KeyError"""
+    segments: List[Segment] = []
+    fields: List[str] = []
+    for literal, field_name, format_spec, conversion in _FORMATTER.parse(template):
+        segments.append(literal)
+        if field_name is not None:
+            segments.append(_bind_format_field(field_name, format_spec or "", conversion))
+            fields.append(field_name)
+    return CompiledTemplate(template, _merge_literals(segments), tuple(fields))
+
+
+class TemplateCache:
+    """按模板內容緩存編譯結果的 LRU（Python 字符串的哈希值會被緩存，同一模板對象重複查找幾乎無開銷）"""
+
+    def __init__(self, compile_func: Callable[[str], CompiledTemplate], maxsize: int = 512):
+        self.compile_func = compile_func
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template: str) -> CompiledTemplate:
+        compiled = self._entries.get(template)
+        if compiled is not None:
+            self.hits += 1
+            try:
+                self._entries.move_to_end(template)
+            except KeyError:
+                pass
+            return compiled
+
+        self.misses += 1
+        compiled = self.compile_func(template)
+        with self._lock:
+            self._entries[template] = compiled
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return compiled
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_format_cache = TemplateCache(tokenize_format)
+
+
+def compile_format_template(template: str) -> CompiledTemplate:
+    """編譯（或從緩存獲取）str.format 風格的模板"""
+    return _format_cache.get(template)
+
+
+def render_format_template(template: str, context: Mapping[str, Any]) -> str:
+    """等價於 template.format(**context)，但模板只解析一次"""
+    return compile_format_template(template).render(context)
@@ -1,16 +1,27 @@
 """
 統一配置管理系統
 分層配置管理，解決配置衝突問題
+
+合併結果按 (group_id, account_id, role_id, task_id) 緩存。每個層級的每個配置項都有版本號，
+set_*_config / remove_config / 批量加載時遞增；緩存項記錄生成時各參與層級的版本，
+任一版本變化即失效，穩態下獲取配置只是一次字典查找。
 """
 import logging
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass, field
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterable, List, Tuple
+from dataclasses import dataclass, field, fields
 from enum import Enum
 
 from group_ai_service.models.account import AccountConfig
 
 logger = logging.getLogger(__name__)
 
+# 合併結果緩存的最大條目數
+RESOLVED_CACHE_SIZE = 4096
+
+ConfigKey = Tuple[Optional[int], str, Optional[str], Optional[str]]
+
 
 class ConfigLevel(Enum):
     """配置層級"""
@@ -65,46 +76,110 @@ class UnifiedConfig:
 class ConfigManager:
     """統一配置管理器"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = RESOLVED_CACHE_SIZE):
         self.logger = logging.getLogger(__name__)
         
-        # 分層配置存儲
+        # 分層配置存儲（修改請通過 set_*_config，直接改字典不會使緩存失效）
         self.global_config: Optional[UnifiedConfig] = None
         self.group_configs: Dict[int, UnifiedConfig] = {}  # group_id -> config
         self.account_configs: Dict[str, UnifiedConfig] = {}  # account_id -> config
         self.role_configs: Dict[str, UnifiedConfig] = {}  # role_id -> config
         self.task_configs: Dict[str, UnifiedConfig] = {}  # task_id -> config
         
+        # 各層級配置項的版本號（只增不減，刪除後重新設置也不會復用舊版本）
+        self._global_version = 0
+        self._versions: Dict[ConfigLevel, Dict[Any, int]] = {
+            ConfigLevel.GROUP: {},
+            ConfigLevel.ACCOUNT: {},
+            ConfigLevel.ROLE: {},
+            ConfigLevel.TASK: {},
+        }
+        # 合併結果緩存: key -> (版本戳, 配置)
+        self._resolved: "OrderedDict[ConfigKey, Tuple[Tuple[int, ...], UnifiedConfig]]" = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.RLock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
         # 初始化全局默認配置
         self.global_config = UnifiedConfig()
         
         self.logger.info("ConfigManager 初始化完成")
     
+    def _level_store(self, level: ConfigLevel) -> Dict[Any, UnifiedConfig]:
+        return {
+            ConfigLevel.GROUP: self.group_configs,
+            ConfigLevel.ACCOUNT: self.account_configs,
+            ConfigLevel.ROLE: self.role_configs,
+            ConfigLevel.TASK: self.task_configs,
+        }[level]
+    
+    def _store(self, level: ConfigLevel, level_id: Any, config: Optional[UnifiedConfig]) -> None:
+        """寫入（config 為 None 時刪除）某層級的配置並遞增其版本號"""
+        with self._lock:
+            if level == ConfigLevel.GLOBAL:
+                self.global_config = config
+                self._global_version += 1
+                return
+            store = self._level_store(level)
+            if config is None:
+                store.pop(level_id, None)
+            else:
+                store[level_id] = config
+            versions = self._versions[level]
+            versions[level_id] = versions.get(level_id, 0) + 1
+    
     def set_global_config(self, config: UnifiedConfig):
         """設置全局配置"""
-        self.global_config = config
+        self._store(ConfigLevel.GLOBAL, None, config)
         self.logger.info("全局配置已更新")
     
     def set_group_config(self, group_id: int, config: UnifiedConfig):
         """設置群組配置"""
-        self.group_configs[group_id] = config
+        self._store(ConfigLevel.GROUP, group_id, config)
         self.logger.info(f"群組 {group_id} 配置已更新")
     
     def set_account_config(self, account_id: str, config: UnifiedConfig):
         """設置賬號配置"""
-        self.account_configs[account_id] = config
+        self._store(ConfigLevel.ACCOUNT, account_id, config)
         self.logger.info(f"賬號 {account_id} 配置已更新")
     
     def set_role_config(self, role_id: str, config: UnifiedConfig):
         """設置角色配置"""
-        self.role_configs[role_id] = config
+        self._store(ConfigLevel.ROLE, role_id, config)
         self.logger.info(f"角色 {role_id} 配置已更新")
     
     def set_task_config(self, task_id: str, config: UnifiedConfig):
         """設置任務配置"""
-        self.task_configs[task_id] = config
+        self._store(ConfigLevel.TASK, task_id, config)
         self.logger.info(f"任務 {task_id} 配置已更新")
     
+    def remove_config(self, level: ConfigLevel, level_id: Any = None):
+        """刪除某層級的配置（全局配置刪除後按默認值合併）"""
+        self._store(level, level_id, None)
+        self.logger.info(f"{level.value} 配置 {level_id} 已刪除")
+    
+    def invalidate_cache(self):
+        """清空合併結果緩存（繞過 set_*_config 直接修改了配置對象時使用）"""
+        with self._lock:
+            self._resolved.clear()
+    
+    def _version_stamp(
+        self,
+        account_id: str,
+        group_id: Optional[int],
+        role_id: Optional[str],
+        task_id: Optional[str]
+    ) -> Tuple[int, ...]:
+        versions = self._versions
+        return (
+            self._global_version,
+            versions[ConfigLevel.GROUP].get(group_id, 0) if group_id else 0,
+            versions[ConfigLevel.ROLE].get(role_id, 0) if role_id else 0,
+            versions[ConfigLevel.ACCOUNT].get(account_id, 0),
+            versions[ConfigLevel.TASK].get(task_id, 0) if task_id else 0,
+        )
+    
     def get_config(
         self,
         account_id: str,
@@ -129,8 +204,34 @@ class ConfigManager:
             task_id: 任務 ID（可選）
             
         Returns:
-            合併後的 UnifiedConfig
+            合併後的 UnifiedConfig（緩存共享的對象，調用方不應修改）
         """
+        key = (group_id, account_id, role_id, task_id)
+        stamp = self._version_stamp(account_id, group_id, role_id, task_id)
+        cached = self._resolved.get(key)
+        if cached is not None and cached[0] == stamp:
+            self.cache_hits += 1
+            return cached[1]
+        
+        self.cache_misses += 1
+        result = self._resolve(account_id, group_id, role_id, task_id)
+        with self._lock:
+            # 合併期間配置被修改時不寫入，避免緩存舊結果
+            if stamp == self._version_stamp(account_id, group_id, role_id, task_id):
+                self._resolved[key] = (stamp, result)
+                self._resolved.move_to_end(key)
+                while len(self._resolved) > self._cache_size:
+                    self._resolved.popitem(last=False)
+        return result
+    
+    def _resolve(
+        self,
+        account_id: str,
+        group_id: Optional[int],
+        role_id: Optional[str],
+        task_id: Optional[str]
+    ) -> UnifiedConfig:
+        """逐層合併配置（不經過緩存）"""
         # 從全局配置開始
         result = UnifiedConfig()
         
@@ -155,6 +256,92 @@ class ConfigManager:
         
         return result
     
+    def get_configs(self, keys: Iterable[ConfigKey]) -> Dict[ConfigKey, UnifiedConfig]:
+        """批量獲取合併後的配置，keys 為 (group_id, account_id, role_id, task_id)"""
+        return {
+            key: self.get_config(key[1], group_id=key[0], role_id=key[2], task_id=key[3])
+            for key in keys
+        }
+    
+    @staticmethod
+    def config_from_row(row: Any) -> UnifiedConfig:
+        """把 unified_configs 表的一行轉換為 UnifiedConfig（缺失字段取默認值，未知字段忽略）"""
+        def build(cls, data):
+            if not isinstance(data, dict):
+                return cls()
+            names = {f.name for f in fields(cls)}
+            return cls(**{k: v for k, v in data.items() if k in names})
+        
+        return UnifiedConfig(
+            chat=build(ChatConfig, row.chat_config),
+            redpacket=build(RedpacketConfig, row.redpacket_config),
+            keywords=build(KeywordConfig, row.keyword_config),
+            metadata=dict(row.extra_metadata or {}),
+        )
+    
+    def load_from_rows(self, rows: Iterable[Any]) -> int:
+        """
+        批量載入 unified_configs 行（每行需有 config_level、level_id 及各配置 JSON 列）
+        
+        Returns:
+            載入的配置數
+        """
+        loaded = 0
+        with self._lock:
+            for row in rows:
+                try:
+                    level = ConfigLevel(row.config_level)
+                    level_id: Any = row.level_id
+                    if level == ConfigLevel.GROUP:
+                        level_id = int(level_id)
+                    elif level != ConfigLevel.GLOBAL and not level_id:
+                        raise ValueError("缺少 level_id")
+                    self._store(level, level_id, self.config_from_row(row))
+                    loaded += 1
+                except (ValueError, TypeError) as e:
+                    self.logger.warning(f"跳過無效的統一配置 {getattr(row, 'config_id', None)}: {e}")
+        return loaded
+    
+    def load_from_db(self, db: Any, keys: Optional[Iterable[ConfigKey]] = None) -> int:
+        """
+        從數據庫一次查詢載入配置
+        
+        Args:
+            db: SQLAlchemy Session
+            keys: 只載入這些 (group_id, account_id, role_id, task_id) 涉及的配置；None 時載入全部
+            
+        查詢條件按 (config_level, level_id) 過濾，命中 idx_unified_config_level_id 索引。
+        """
+        from sqlalchemy import and_, or_
+        from app.models.unified_features import UnifiedConfig as DBUnifiedConfig
+        
+        query = db.query(DBUnifiedConfig)
+        if keys is not None:
+            ids: Dict[ConfigLevel, set] = {level: set() for level in self._versions}
+            for group_id, account_id, role_id, task_id in keys:
+                if group_id:
+                    ids[ConfigLevel.GROUP].add(str(group_id))
+                if account_id:
+                    ids[ConfigLevel.ACCOUNT].add(account_id)
+                if role_id:
+                    ids[ConfigLevel.ROLE].add(role_id)
+                if task_id:
+                    ids[ConfigLevel.TASK].add(task_id)
+            conditions = [DBUnifiedConfig.config_level == ConfigLevel.GLOBAL.value]
+            conditions.extend(
+                and_(DBUnifiedConfig.config_level == level.value, DBUnifiedConfig.level_id.in_(sorted(level_ids)))
+                for level, level_ids in ids.items() if level_ids
+            )
+            query = query.filter(or_(*conditions))
+        
+        loaded = self.load_from_rows(query.all())
+        self.logger.info(f"從數據庫載入了 {loaded} 個統一配置")
+        return loaded
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """合併結果緩存統計"""
+        return {"size": len(self._resolved), "hits": self.cache_hits, "misses": self.cache_misses}
+    
     def _merge_config(self, base: UnifiedConfig, override: UnifiedConfig) -> UnifiedConfig:
         """合併配置（override 覆蓋 base）"""
         # 合併聊天配置
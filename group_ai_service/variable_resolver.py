@@ -1,22 +1,32 @@
 """
 變量解析器 - 解析和替換劇本模板中的變量
 """
-import re
 import logging
 from typing import Dict, Any, Optional, Callable
 from datetime import datetime
 
 from pyrogram.types import Message, User
 
+from group_ai_service.template_compiler import CompiledTemplate, TemplateCache, tokenize_mustache
+
 logger = logging.getLogger(__name__)
 
 
 class VariableResolver:
     """變量解析器"""
     
-    def __init__(self):
+    def __init__(self, cache_size: int = 512):
         self.functions: Dict[str, Callable] = {}
         self._register_builtin_functions()
+        # 內置變量只在被引用時計算
+        self._builtin_variables: Dict[str, Callable[[Message, Dict[str, Any], Dict[str, Any]], str]] = {
+            "user_name": self._extract_name,
+            "user_id": lambda message, context, state: str(message.from_user.id) if message.from_user else "",
+            "chat_id": lambda message, context, state: str(message.chat.id) if message.chat else "",
+            "message_text": lambda message, context, state: message.text or "",
+            "message_length": lambda message, context, state: str(len(message.text or "")),
+        }
+        self._templates = TemplateCache(self._compile_template, maxsize=cache_size)
     
     def _register_builtin_functions(self):
         """註冊內置函數"""
@@ -34,31 +44,21 @@ class VariableResolver:
         context: Optional[Dict[str, Any]] = None,
         state: Optional[Dict[str, Any]] = None
     ) -> str:
-        """解析模板中的變量"""
+        """解析模板中的變量（模板編譯結果按內容緩存，重複渲染不再重新解析）"""
         if not template:
             return template
         
-        context = context or {}
-        state = state or {}
-        
-        # 匹配 {{function_name}} 或 {{variable_name}}
-        pattern = r'\{\{([^}]+)\}\}'
-        
-        def replace_var(match):
-            var_expr = match.group(1).strip()
-            return self._resolve_variable(var_expr, message, context, state)
-        
-        result = re.sub(pattern, replace_var, template)
-        return result
+        return self.compile(template).render(message, context or {}, state or {})
     
-    def _resolve_variable(
-        self,
-        var_expr: str,
-        message: Message,
-        context: Dict[str, Any],
-        state: Dict[str, Any]
-    ) -> str:
-        """解析單個變量表達式"""
+    def compile(self, template: str) -> CompiledTemplate:
+        """編譯模板：匹配 {{function_name(...)}} 或 {{variable_name}}，變量片段綁定為解析函數"""
+        return self._templates.get(template)
+    
+    def _compile_template(self, template: str) -> CompiledTemplate:
+        return tokenize_mustache(template, self._bind_expression)
+    
+    def _bind_expression(self, var_expr: str) -> Callable[[Message, Dict[str, Any], Dict[str, Any]], str]:
+        """把單個變量表達式編譯為解析函數（函數名與參數在編譯時解析）"""
         # 支持函數調用: function_name(arg1, arg2)
         if '(' in var_expr:
             func_name, args_str = var_expr.split('(', 1)
@@ -72,42 +72,50 @@ class VariableResolver:
                 for arg in args_str.split(','):
                     arg = arg.strip().strip('"').strip("'")
                     args.append(arg)
+            args = tuple(args)
+            functions = self.functions
             
-            if func_name in self.functions:
+            def call_function(message, context, state) -> str:
+                # 渲染時查找函數，編譯後再註冊的函數同樣生效
+                func = functions.get(func_name)
+                if func is None:
+                    logger.warning(f"未知函數: {func_name}")
+                    return ""
                 try:
-                    result = self.functions[func_name](message, context, state, *args)
+                    result = func(message, context, state, *args)
                     return str(result) if result is not None else ""
                 except Exception as e:
                     logger.error(f"執行函數 {func_name} 失敗: {e}")
                     return ""
-            else:
-                logger.warning(f"未知函數: {func_name}")
-                return ""
-        
-        # 普通變量
-        # 1. 從 context 中查找
-        if var_expr in context:
-            return str(context[var_expr])
+            return call_function
         
-        # 2. 從 state 中查找
-        if var_expr in state:
-            return str(state[var_expr])
-        
-        # 3. 內置變量
-        builtin_vars = {
-            "user_name": self._extract_name(message, context, state),
-            "user_id": str(message.from_user.id) if message.from_user else "",
-            "chat_id": str(message.chat.id) if message.chat else "",
-            "message_text": message.text or "",
-            "message_length": str(len(message.text or "")),
-        }
+        builtin = self._builtin_variables.get(var_expr)
+        missing = f"{{{{{var_expr}}}}}"
         
-        if var_expr in builtin_vars:
-            return builtin_vars[var_expr]
-        
-        # 未找到，返回原表達式
-        logger.debug(f"未找到變量: {var_expr}")
-        return f"{{{{{var_expr}}}}}"
+        def lookup_variable(message, context, state) -> str:
+            # 1. 從 context 中查找
+            if var_expr in context:
+                return str(context[var_expr])
+            # 2. 從 state 中查找
+            if var_expr in state:
+                return str(state[var_expr])
+            # 3. 內置變量
+            if builtin is not None:
+                return builtin(message, context, state)
+            # 未找到，返回原表達式
+            logger.debug(f"未找到變量: {var_expr}")
+            return missing
+        return lookup_variable
+    
+    def _resolve_variable(
+        self,
+        var_expr: str,
+        message: Message,
+        context: Dict[str, Any],
+        state: Dict[str, Any]
+    ) -> str:
+        """解析單個變量表達式"""
+        return self._bind_expression(var_expr)(message, context, state)
     
     def register_function(self, name: str, func: Callable):
         """註冊自定義函數"""